@@ -11,6 +11,7 @@ from Autodesk.Revit.DB import (
     Family, 
     TransactionGroup
 )
+from Geometry.Occupancy import OccupancyIndex
 import os
 
 path, filename = os.path.split(__file__)
@@ -52,21 +53,13 @@ def get_existing_crop_circles():
     crop_circles = FilteredElementCollector(doc).OfCategory(BuiltInCategory.OST_GenericModel)\
                                                 .WhereElementIsNotElementType()\
                                                 .ToElements()
-    existing_locations = {}
+    occupied = OccupancyIndex()
     for cc in crop_circles:
         if cc.Symbol.Family.Name == FamilyName and cc.Symbol.get_Parameter(BuiltInParameter.SYMBOL_NAME_PARAM).AsString() == FamilyType:
             loc = cc.Location
             if isinstance(loc, DB.LocationPoint):
-                existing_locations[cc.Id] = loc.Point
-    return existing_locations
-
-def is_location_occupied(target_point, existing_locations, tolerance=0.01):
-    # Check if a target point is within tolerance of any existing Crop-Circle location.
-    for loc in existing_locations.values():
-        distance = target_point.DistanceTo(loc)
-        if distance <= tolerance:  # Tolerance in feet
-            return True
-    return False
+                occupied.add(loc.Point, cc.Id)
+    return occupied
 
 
 Hanger_collector = FilteredElementCollector(doc, curview.Id).OfCategory(BuiltInCategory.OST_FabricationHangers)\
@@ -104,7 +97,8 @@ for famtype in familyTypes:
                 rodloc = STName1.GetRodEndPosition(n)
                 ItmList2.append(rodloc)
         for hangerlocation in ItmList2:
-            if not is_location_occupied(hangerlocation, existing_crop_locations):
+            # Claimed as placed, so rods sharing an end get one circle
+            if existing_crop_locations.claim(hangerlocation):
                 familyInst = doc.Create.NewFamilyInstance(
                     hangerlocation, famtype, Structure.StructuralType.NonStructural
                 )
@@ -5,6 +5,7 @@ from Autodesk.Revit.UI import *
 from Autodesk.Revit.UI.Selection import *
 from Autodesk.Revit.DB import FilteredElementCollector, BuiltInCategory, FamilySymbol, Structure, Transaction, BuiltInParameter, \
                                 Family, TransactionGroup, FamilyInstance, FabricationRodInfo
+from Geometry.Occupancy import OccupancyIndex
 import os
 
 DB = Autodesk.Revit.DB
@@ -48,21 +49,13 @@ def get_existing_rod_controls():
     rod_controls = FilteredElementCollector(doc).OfCategory(BuiltInCategory.OST_StructuralFoundation)\
                                                .WhereElementIsNotElementType()\
                                                .ToElements()
-    existing_locations = {}
+    occupied = OccupancyIndex()
     for rc in rod_controls:
         if rc.Symbol.Family.Name == FamilyName and rc.Symbol.get_Parameter(BuiltInParameter.SYMBOL_NAME_PARAM).AsString() == FamilyType:
             loc = rc.Location
             if isinstance(loc, DB.LocationPoint):
-                existing_locations[rc.Id] = loc.Point
-    return existing_locations
-
-def is_location_occupied(target_point, existing_locations, tolerance=0.01):
-    # Check if a target point is within tolerance of any existing Rod Control location.
-    for loc in existing_locations.values():
-        distance = target_point.DistanceTo(loc)
-        if distance <= tolerance:  # Tolerance in feet
-            return True
-    return False
+                occupied.add(loc.Point, rc.Id)
+    return occupied
 
 if len(Hanger) > 0:
     path, filename = os.path.split(__file__)
@@ -122,7 +115,8 @@ if len(Hanger) > 0:
                     rodloc = rod_info.GetRodEndPosition(n)
                     ItmList2.append(rodloc)
             for hangerlocation in ItmList2:
-                if not is_location_occupied(hangerlocation, existing_rod_locations):
+                # Claimed as placed, so rods sharing an end get one control
+                if existing_rod_locations.claim(hangerlocation):
                     familyInst = doc.Create.NewFamilyInstance(hangerlocation, famtype, Structure.StructuralType.NonStructural)
     t.Commit()
 
@@ -7,6 +7,7 @@ import os, re, sys
 from math import atan2, pi
 from fractions import Fraction
 from Parameters.Add_SharedParameters import Shared_Params
+from Geometry.Occupancy import OccupancyIndex
 Shared_Params()
 
 doc = __revit__.ActiveUIDocument.Document
@@ -133,19 +134,13 @@ def get_existing_strut_clamps():
     strut_clamps = FilteredElementCollector(doc).OfCategory(BuiltInCategory.OST_PipeAccessory)\
                                                .WhereElementIsNotElementType()\
                                                .ToElements()
-    existing_locations = {}
+    occupied = OccupancyIndex()
     for sc in strut_clamps:
         if sc.Symbol.Family.Name == FamilyName:
             loc = sc.Location
             if isinstance(loc, DB.LocationPoint):
-                existing_locations[sc.Id] = loc.Point
-    return existing_locations
-
-def is_location_occupied(target_point, existing_locations, tolerance=0.01):
-    for loc in existing_locations.values():
-        if target_point.DistanceTo(loc) <= tolerance:
-            return True
-    return False
+                occupied.add(loc.Point, sc.Id)
+    return occupied
 
 try:
     # Select pipes and hangers
@@ -200,7 +195,7 @@ try:
                     insertion_point = DB.XYZ(projected_point.X, projected_point.Y, projected_point.Z)
 
                     # Check if location is already occupied
-                    if not is_location_occupied(insertion_point, existing_strut_locations):
+                    if not existing_strut_locations.is_occupied(insertion_point):
                         new_lrd = doc.Create.NewFamilyInstance(
                             insertion_point,
                             target_famtype,
@@ -236,7 +231,7 @@ try:
                             TaskDialog.Show("Warning", "Could not set Schedule Level for Strut Clamp on pipe")
 
                         # Update existing locations to include the new instance
-                        existing_strut_locations[new_lrd.Id] = insertion_point
+                        existing_strut_locations.add(insertion_point, new_lrd.Id)
 
                     t.Commit()
         else:
@@ -34,6 +34,9 @@ RevitINT = float(app.VersionNumber)
 SCHEMA_GUID = System.Guid("7B3F8A12-4C9E-4D21-8F6B-1E9A3C5D7F8E")
 DATA_STORAGE_NAME = "PipeHangerConfigData"
 
+# Session only dry run flag, read by the place script (must match)
+DRY_RUN_KEY = "WayTools.PlaceHangers.DryRun|{}".format(doc.PathName or doc.Title)
+
 
 def get_or_create_schema():
     schema = Schema.Lookup(SCHEMA_GUID)
@@ -296,12 +299,21 @@ class PipeServiceForm(Window):
 
             self.build_service_block(service, rules, service_hangers, default_hanger)
 
+        footer = StackPanel()
+        footer.Margin = Thickness(0, 12, 0, 0)
+        Grid.SetRow(footer, 2)
+        root.Children.Add(footer)
+
+        self.chk_dry_run = CheckBox()
+        self.chk_dry_run.Content = "Dry run for this session: write the hanger plan to C:\\Temp instead of placing hangers"
+        self.chk_dry_run.IsChecked = bool(System.AppDomain.CurrentDomain.GetData(DRY_RUN_KEY))
+        self.chk_dry_run.Margin = Thickness(0, 0, 0, 10)
+        footer.Children.Add(self.chk_dry_run)
+
         button_panel = StackPanel()
         button_panel.Orientation = Orientation.Horizontal
         button_panel.HorizontalAlignment = HorizontalAlignment.Center
-        button_panel.Margin = Thickness(0, 12, 0, 0)
-        Grid.SetRow(button_panel, 2)
-        root.Children.Add(button_panel)
+        footer.Children.Add(button_panel)
 
         ok_btn = Button()
         ok_btn.Content = "OK"
@@ -635,6 +647,7 @@ class PipeServiceForm(Window):
             values[service] = parsed_rules
 
         self.result = values
+        System.AppDomain.CurrentDomain.SetData(DRY_RUN_KEY, "1" if self.chk_dry_run.IsChecked else None)
         self.DialogResult = True
         self.Close()
 
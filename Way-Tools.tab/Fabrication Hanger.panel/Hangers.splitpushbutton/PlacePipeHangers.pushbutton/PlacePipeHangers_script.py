@@ -1,11 +1,16 @@
 # -*- coding: UTF-8 -*-
 import Autodesk
-from Autodesk.Revit.DB import Transaction, FabricationConfiguration, FabricationPart, XYZ, ConnectorProfileType, FilteredElementCollector
+from Autodesk.Revit.DB import (Transaction, FabricationPart, ConnectorProfileType, FilteredElementCollector,
+                               BuiltInCategory)
 from Autodesk.Revit.DB.ExtensibleStorage import Schema
 from Autodesk.Revit.UI.Selection import ISelectionFilter, ObjectType
 from Autodesk.Revit.UI import TaskDialog
 from pyrevit import forms
-import math
+from Diagnostics.Trace import ToolTrace, COLLECTOR, COMPUTE, TRANSACTION, UI
+from Fabrication.ButtonCatalog import ButtonCatalog, HANGER
+from Fabrication.ConnectorIndex import ConnectorIndex
+from Fabrication.HangerPlan import is_disabled_hanger, plan_selection, execute_plan, existing_hangers
+from Fabrication.HangerRules import compile_rules
 import os
 
 # Import .NET namespaces for native Windows Balloon Notification and path handling
@@ -21,9 +26,8 @@ uidoc = __revit__.ActiveUIDocument
 app = doc.Application
 RevitVersion = app.VersionNumber
 RevitINT = float(RevitVersion)
+trace = ToolTrace('Place Pipe Hangers', doc)
 
-DIRECTION_DOT_THRESHOLD = 0.999
-MARGIN = 0.01
 DIST_FROM_END = 1.0  # Default 1ft (12") from end since new UI omits this parameter
 ATOS = True
 
@@ -39,6 +43,14 @@ if not file_name:
 SCRIPT_DIR = os.path.dirname(__file__)
 CONFIG_SCRIPT_PATH = os.path.join(SCRIPT_DIR, "PlacePipeHangers_config.py")
 
+# Dry run, switched on for the Revit session from the hanger config ([Shift]+Click):
+# the plan is written, marked against existing hangers, and nothing is placed
+DRY_RUN_KEY = "WayTools.PlaceHangers.DryRun|{}".format(file_path or doc.Title)
+PLAN_EXPORT = r"C:\Temp\Ribbon_HangerPlan_{}.csv"
+
+# Rule per element, resolved once per run
+element_rules = {}
+
 
 def show_balloon_notification(title, message, timeout=5000):
     """Displays a native Windows balloon notification in the system tray area."""
@@ -58,101 +70,22 @@ class FabricationPartSelectionFilter(ISelectionFilter):
         return False
 
 
-def load_service_settings(doc):
-    settings = {}
+def load_hanger_rules(doc):
+    """ Compiled hanger rules from the config DataStorage, reused until the payload changes """
+    payload = None
     try:
         schema = Schema.Lookup(SCHEMA_GUID)
-        if not schema:
-            return settings
-
-        collector = FilteredElementCollector(doc).OfClass(Autodesk.Revit.DB.ExtensibleStorage.DataStorage)
-        target_ds = None
-        for ds in collector:
-            if ds.Name == DATA_STORAGE_NAME:
-                target_ds = ds
-                break
-
-        if not target_ds:
-            return settings
-
-        entity = target_ds.GetEntity(schema)
-        if not entity.IsValid():
-            return settings
-
-        val_string = entity.Get[System.String]("ConfigPayload")
-        if not val_string:
-            return settings
-
-        lines = val_string.split("\n")
-        for line in lines:
-            line = line.strip()
-            if "=" not in line:
-                continue
-            parts = line.split("=", 1)
-            if len(parts) != 2:
-                continue
-
-            key = parts[0].strip()
-            rule_block = parts[1].strip()
-            rules = []
-
-            if ":" not in rule_block:
-                vals = rule_block.split("|")
-                if len(vals) == 3:
-                    try:
-                        rules.append({
-                            "size": 999.0,
-                            "hanger": vals[0].strip(),
-                            "spacing": float(vals[1].strip()),
-                            "dist_from_end": 1.0,
-                            "joints": vals[2].strip().lower() == "true"
-                        })
-                    except:
-                        pass
-                elif len(vals) == 4:
-                    try:
-                        rules.append({
-                            "size": 999.0,
-                            "hanger": vals[0].strip(),
-                            "spacing": float(vals[1].strip()),
-                            "dist_from_end": float(vals[2].strip()),
-                            "joints": vals[3].strip().lower() == "true"
-                        })
-                    except:
-                        pass
-            else:
-                rule_strings = rule_block.split("|")
-                for rs in rule_strings:
-                    r_parts = rs.split(":")
-                    if len(r_parts) == 4:
-                        try:
-                            rules.append({
-                                "size": float(r_parts[0].strip()),
-                                "hanger": r_parts[1].strip(),
-                                "spacing": float(r_parts[2].strip()),
-                                "dist_from_end": 1.0,
-                                "joints": r_parts[3].strip().lower() == "true"
-                            })
-                        except:
-                            pass
-                    elif len(r_parts) == 5:
-                        try:
-                            rules.append({
-                                "size": float(r_parts[0].strip()),
-                                "hanger": r_parts[1].strip(),
-                                "spacing": float(r_parts[2].strip()),
-                                "dist_from_end": float(r_parts[3].strip()),
-                                "joints": r_parts[4].strip().lower() == "true"
-                            })
-                        except:
-                            pass
-
-            if rules:
-                rules.sort(key=lambda x: x["size"])
-                settings[key] = rules
+        if schema:
+            collector = FilteredElementCollector(doc).OfClass(Autodesk.Revit.DB.ExtensibleStorage.DataStorage)
+            for ds in collector:
+                if ds.Name == DATA_STORAGE_NAME:
+                    entity = ds.GetEntity(schema)
+                    if entity.IsValid():
+                        payload = entity.Get[System.String]("ConfigPayload")
+                    break
     except:
         pass
-    return settings
+    return compile_rules(doc, payload or "")
 
 
 def safe_param_string(elem, param_name):
@@ -190,18 +123,12 @@ def get_pipe_size(elem):
     return 999.0
 
 
-def is_disabled_hanger(hanger_name):
-    if not hanger_name: return True
-    h = hanger_name.strip().upper()
-    return h == "" or h == "--- NONE ---" or "NONE" in h
-
-
 def are_all_settings_none(settings):
     """Returns True if every rule across all services points to 'NONE'."""
     if not settings:
         return True
     
-    for svc, rules in settings.items():
+    for svc, rules in settings.settings.items():
         for r in rules:
             if not is_disabled_hanger(r.get("hanger", "")):
                 return False  # Found at least one active hanger rule
@@ -209,402 +136,34 @@ def are_all_settings_none(settings):
 
 
 def get_rule_for_element(elem, settings):
-    svc_name = get_service_name(elem).strip().lower()
-    size_inches = get_pipe_size(elem)
-    
-    rules = []
-    # 1. Exact match
-    for k, v in settings.items():
-        if k.strip().lower() == svc_name:
-            rules = v
-            break
-            
-    # 2. Substring/fuzzy match if exact match fails
-    if not rules:
-        for k, v in settings.items():
-            k_clean = k.strip().lower()
-            if k_clean in svc_name or svc_name in k_clean:
-                rules = v
-                break
-
-    if not rules:
-        return "--- NONE ---", 10.0, 1.0, True
-    
-    for rule in rules:
-        if size_inches <= rule["size"]:
-            return (
-                rule["hanger"],
-                rule["spacing"],
-                rule.get("dist_from_end", 1.0),
-                rule["joints"]
-            )
-            
-    last_rule = rules[-1]
-    return (
-        last_rule["hanger"],
-        last_rule["spacing"],
-        last_rule.get("dist_from_end", 1.0),
-        last_rule["joints"]
-    )
+    key = elem.Id
+    if key not in element_rules:
+        element_rules[key] = settings.rule_for(get_service_name(elem), get_pipe_size(elem))
+    return element_rules[key]
 
 
-def get_hanger_button(doc, elem, hanger_name):
+def get_hanger_button(hanger_name, svc_name):
     if is_disabled_hanger(hanger_name): return None
     try:
-        config = FabricationConfiguration.GetFabricationConfiguration(doc)
-        svc_name = get_service_name(elem).strip().lower()
-        target_hanger = hanger_name.strip().lower()
-        
-        for svc in config.GetAllLoadedServices():
-            if svc.Name:
-                s_name = svc.Name.strip().lower()
-                if s_name == svc_name or svc_name in s_name or s_name in svc_name:
-                    grp_count = svc.PaletteCount if RevitINT > 2022 else svc.GroupCount
-                    for gi in range(grp_count):
-                        for bi in range(svc.GetButtonCount(gi)):
-                            bt = svc.GetButton(gi, bi)
-                            if bt and bt.IsAHanger and bt.Name:
-                                if bt.Name.strip().lower() == target_hanger:
-                                    return bt
-                                    
-        for svc in config.GetAllLoadedServices():
-            grp_count = svc.PaletteCount if RevitINT > 2022 else svc.GroupCount
-            for gi in range(grp_count):
-                for bi in range(svc.GetButtonCount(gi)):
-                    bt = svc.GetButton(gi, bi)
-                    if bt and bt.IsAHanger and bt.Name:
-                        if bt.Name.strip().lower() == target_hanger:
-                            return bt
+        # Hanger from the part's own service first, any service otherwise
+        return catalog.button(catalog.find_near(hanger_name, svc_name, HANGER))
     except: pass
     return None
 
 
-def is_cid_2875(element):
-    try:
-        return element.ItemCustomId in (2875, 875)
-    except:
-        return False
-
-
-def vertical_fab(element):
-    pts = [c.Origin for c in element.ConnectorManager.Connectors]
-    if len(pts) >= 2:
-        v = pts[1].Subtract(pts[0])
-        if v.GetLength() < 0.0001:
-            return False
-        v = v.Normalize()
-        angle_from_horizontal = math.asin(abs(v.Z))
-        threshold = math.radians(22.5)
-        return angle_from_horizontal > threshold
-    return False
-
-
-def is_pipe(element):
-    try:
-        return element.LookupParameter('Part Pattern Number').AsInteger() == 2041
-    except:
-        return False
-
-
-def get_pipe_direction(entry_xyz, exit_xyz):
-    v = exit_xyz.Subtract(entry_xyz)
-    if v.GetLength() < 0.0001:
-        return None
-    return v.Normalize()
-
-
-# ==============================================================================
-# WALKING CHAINS & PLACING HANGERS
-# ==============================================================================
-
-def walk_chain(selected_elements, start_element, start_connector):
-    selected_ids = {e.Id: e for e in selected_elements}
-    ordered = [start_element]
-    entry_conns = {start_element.Id: start_connector}
-    visited = {start_element.Id}
-
-    all_start_conns = list(start_element.ConnectorManager.Connectors)
-    exit_conns_of_start = [c for c in all_start_conns if c.Id != start_connector.Id]
-    if not exit_conns_of_start:
-        leftovers = [e for e in selected_elements if e.Id not in visited]
-        return ordered, entry_conns, leftovers
-
-    current_exit_conn = exit_conns_of_start[0]
-
-    last_pipe_dir = None
-    if is_pipe(start_element) and not vertical_fab(start_element) and not is_cid_2875(start_element):
-        last_pipe_dir = get_pipe_direction(start_connector.Origin, current_exit_conn.Origin)
-
-    while True:
-        candidates = []
-        for eid, e in selected_ids.items():
-            if eid in visited:
-                continue
-            for c in e.ConnectorManager.Connectors:
-                if current_exit_conn.Origin.DistanceTo(c.Origin) < 0.1:
-                    candidates.append((e, c))
-                    break
-
-        if not candidates:
-            break
-
-        found_elem = candidates[0][0]
-        found_entry = candidates[0][1]
-
-        if len(candidates) > 1 and last_pipe_dir is not None:
-            best_dot = -2.0
-            for cand_elem, cand_entry in candidates:
-                other_conns = [c for c in cand_elem.ConnectorManager.Connectors if c.Id != cand_entry.Id]
-                if other_conns:
-                    d = get_pipe_direction(cand_entry.Origin, other_conns[0].Origin)
-                    if d is not None:
-                        dot = last_pipe_dir.DotProduct(d)
-                        if dot > best_dot:
-                            best_dot = dot
-                            found_elem = cand_elem
-                            found_entry = cand_entry
-
-        ordered.append(found_elem)
-        entry_conns[found_elem.Id] = found_entry
-        visited.add(found_elem.Id)
-
-        all_conns = list(found_elem.ConnectorManager.Connectors)
-        exits = [c for c in all_conns if c.Id != found_entry.Id]
-        if not exits:
-            break
-
-        if is_pipe(found_elem) and not vertical_fab(found_elem) and not is_cid_2875(found_elem):
-            last_pipe_dir = get_pipe_direction(found_entry.Origin, exits[0].Origin)
-
-        if is_cid_2875(found_elem):
-            current_exit_conn = exits[0]
-        elif len(exits) == 1:
-            current_exit_conn = exits[0]
-        else:
-            best_exit = exits[0]
-            if last_pipe_dir is not None:
-                best_dot = -2.0
-                for ex in exits:
-                    d = get_pipe_direction(current_exit_conn.Origin, ex.Origin)
-                    if d is not None:
-                        dot = last_pipe_dir.DotProduct(d)
-                        if dot > best_dot:
-                            best_dot = dot
-                            best_exit = ex
-            current_exit_conn = best_exit
-
-    leftovers = [e for e in selected_elements if e.Id not in visited]
-    return ordered, entry_conns, leftovers
-
-
-def chain_to_segments(ordered_chain, entry_conns):
-    pipe_dicts = []
-    for e in ordered_chain:
-        if not is_pipe(e) or vertical_fab(e):
-            continue
-        entry_conn = entry_conns.get(e.Id)
-        if entry_conn is None:
-            entry_conn = next(iter(e.ConnectorManager.Connectors), None)
-        if entry_conn is None:
-            continue
-        exit_conn = None
-        for c in e.ConnectorManager.Connectors:
-            if c.Id != entry_conn.Id:
-                exit_conn = c
-                break
-        if exit_conn is None:
-            continue
-        direction = get_pipe_direction(entry_conn.Origin, exit_conn.Origin)
-        pipe_dicts.append({
-            'element':    e,
-            'length':     e.CenterlineLength,
-            'entry_xyz':  entry_conn.Origin,
-            'exit_xyz':   exit_conn.Origin,
-            'entry_conn': entry_conn,
-            'direction':  direction,
-        })
-
-    if not pipe_dicts:
-        return []
-
-    segments = []
-    current_seg = [pipe_dicts[0]]
-    for i in range(1, len(pipe_dicts)):
-        prev_dir = pipe_dicts[i-1]['direction']
-        curr_dir = pipe_dicts[i]['direction']
-        if prev_dir is not None and curr_dir is not None:
-            dot = prev_dir.DotProduct(curr_dir)
-        else:
-            dot = 1.0
-        if dot < DIRECTION_DOT_THRESHOLD:
-            segments.append(current_seg)
-            current_seg = [pipe_dicts[i]]
-        else:
-            current_seg.append(pipe_dicts[i])
-    segments.append(current_seg)
-    return segments
-
-
-def place_segment(pipe_list, fab_btn, distancefromend, spacing, atos, force_end_hanger, doc):
-    placed_count = 0
-    def walk(start_idx, start_xyz, distance):
-        idx = start_idx
-        remaining = distance
-        cur_xyz = start_xyz
-        while idx < len(pipe_list):
-            pd = pipe_list[idx]
-            dist_to_exit = cur_xyz.DistanceTo(pd['exit_xyz'])
-            if remaining <= dist_to_exit + MARGIN:
-                direction = pd['exit_xyz'].Subtract(cur_xyz).Normalize()
-                landing = cur_xyz.Add(direction.Multiply(remaining))
-                local = pd['entry_xyz'].DistanceTo(landing)
-                return (idx, landing, local)
-            remaining -= dist_to_exit
-            next_idx = idx + 1
-            if next_idx >= len(pipe_list):
-                return None
-            gap = pd['exit_xyz'].DistanceTo(pipe_list[next_idx]['entry_xyz'])
-            remaining -= gap
-            if remaining < 0:
-                remaining = 0.0
-            cur_xyz = pipe_list[next_idx]['entry_xyz']
-            idx = next_idx
-        return None
-
-    first = pipe_list[0]
-    first_local = first['length'] / 2.0 if first['length'] < 2 * distancefromend else distancefromend
-    unit_dir = first['exit_xyz'].Subtract(first['entry_xyz']).Normalize()
-    cur_hanger_xyz = first['entry_xyz'].Add(unit_dir.Multiply(first_local))
-    cur_pipe_idx = 0
-
-    try:
-        FabricationPart.CreateHanger(doc, fab_btn, first['element'].Id, first['entry_conn'], first_local, atos)
-        placed_count += 1
-    except: pass
-
-    last_pipe = pipe_list[-1]
-    last_exit_xyz = last_pipe['exit_xyz']
-    end_local = last_pipe['length'] / 2.0 if last_pipe['length'] < 2 * distancefromend else last_pipe['length'] - distancefromend
-
-    while True:
-        result = walk(cur_pipe_idx, cur_hanger_xyz, spacing)
-        if result is None:
-            break
-        next_idx, next_xyz, local_offset = result
-        if force_end_hanger:
-            dist_to_end = next_xyz.DistanceTo(last_exit_xyz)
-            if dist_to_end < distancefromend - MARGIN:
-                break
-        pd = pipe_list[next_idx]
-        local_offset = max(MARGIN, min(local_offset, pd['length'] - MARGIN))
-        
-        try:
-            FabricationPart.CreateHanger(doc, fab_btn, pd['element'].Id, pd['entry_conn'], local_offset, atos)
-            placed_count += 1
-        except: pass
-        
-        cur_hanger_xyz = next_xyz
-        cur_pipe_idx = next_idx
-
-    if force_end_hanger:
-        try:
-            FabricationPart.CreateHanger(doc, fab_btn, last_pipe['element'].Id, last_pipe['entry_conn'], end_local, atos)
-            placed_count += 1
-        except: pass
-        
-    return placed_count
-
-
-def process_run(ordered_chain, entry_conns, settings, doc, atos):
-    run_placed = 0
-    segments = chain_to_segments(ordered_chain, entry_conns)
-    for i, seg in enumerate(segments):
-        is_last = (i == len(segments) - 1)
-        
-        first_pipe = seg[0]['element']
-        hanger_name, spacing, dist_from_end, _ = get_rule_for_element(first_pipe, settings)
-        
-        if is_disabled_hanger(hanger_name): 
-            continue
-            
-        fab_btn = get_hanger_button(doc, first_pipe, hanger_name)
-        if not fab_btn: 
-            continue
-
-        run_placed += place_segment(seg, fab_btn, dist_from_end, spacing, atos, is_last, doc)
-        
-    return run_placed
-
-
-def group_leftovers(leftovers):
-    if not leftovers:
-        return []
-    remaining = list(leftovers)
-    groups = []
-    while remaining:
-        group = [remaining.pop(0)]
-        changed = True
-        while changed:
-            changed = False
-            still_out = []
-            for e in remaining:
-                connected = False
-                for ge in group:
-                    for gc in ge.ConnectorManager.Connectors:
-                        for ec in e.ConnectorManager.Connectors:
-                            if gc.Origin.DistanceTo(ec.Origin) < 0.1:
-                                connected = True
-                                break
-                        if connected:
-                            break
-                    if connected:
-                        break
-                if connected:
-                    group.append(e)
-                    changed = True
-                else:
-                    still_out.append(e)
-            remaining = still_out
-        groups.append(group)
-    return groups
-
-
-def find_best_start(network):
-    if not network: return None, None
-    if len(network) == 1:
-        conns = list(network[0].ConnectorManager.Connectors)
-        return network[0], conns[0] if conns else None
-        
-    for e in network:
-        connected_count = 0
-        open_conn = None
-        for c in e.ConnectorManager.Connectors:
-            is_connected = False
-            for other in network:
-                if other.Id == e.Id: continue
-                for oc in other.ConnectorManager.Connectors:
-                    if c.Origin.DistanceTo(oc.Origin) < 0.1:
-                        is_connected = True
-                        break
-                if is_connected: break
-            
-            if is_connected:
-                connected_count += 1
-            else:
-                open_conn = c
-        
-        if open_conn and connected_count >= 0:
-            return e, open_conn
-            
-    conns = list(network[0].ConnectorManager.Connectors)
-    return network[0], conns[0] if conns else None
+def existing_plan_hangers(doc, plan):
+    """ Hangers already hosted on the planned parts, for the dry run report """
+    hangers = FilteredElementCollector(doc).OfCategory(BuiltInCategory.OST_FabricationHangers) \
+        .WhereElementIsNotElementType()
+    return existing_hangers(hangers, plan.host_keys())
 
 
 # ---------------------------------------------------------------------------
 # MAIN EXECUTION
 # ---------------------------------------------------------------------------
 try:
-    settings = load_service_settings(doc)
+    with trace.phase(COLLECTOR):
+        settings = load_hanger_rules(doc)
     
     # Prompt user if settings are missing OR if all configured rules evaluate to "--- NONE ---"
     if not settings or are_all_settings_none(settings):
@@ -626,7 +185,7 @@ try:
                     with open(CONFIG_SCRIPT_PATH, 'r') as cf:
                         exec(cf.read(), globals())
                     
-                    settings = load_service_settings(doc)
+                    settings = load_hanger_rules(doc)
                 except Exception as ex:
                     TaskDialog.Show("Configuration Error", "Failed to run config script:\n{}".format(str(ex)))
                     import sys
@@ -644,104 +203,49 @@ try:
             import sys
             sys.exit()
 
-    selected_refs = uidoc.Selection.PickObjects(
-        ObjectType.Element, FabricationPartSelectionFilter(),
-        "Select Fabrication Parts for Hanger Placement")
+    with trace.phase(UI):
+        selected_refs = uidoc.Selection.PickObjects(
+            ObjectType.Element, FabricationPartSelectionFilter(),
+            "Select Fabrication Parts for Hanger Placement")
         
-    selected_elements = [doc.GetElement(r) for r in selected_refs]
+    with trace.phase(COLLECTOR):
+        selected_elements = [doc.GetElement(r) for r in selected_refs]
+        catalog = ButtonCatalog.load(doc)
+    trace.elements = len(selected_elements)
     if not selected_elements:
         import sys
         sys.exit()
 
-    t = Transaction(doc, 'Place Hangers')
-    t.Start()
+    # Connector positions are read once, chain walking looks neighbours up in the index.
+    # Every hanger is planned before the transaction opens
+    with trace.phase(COMPUTE):
+        index = ConnectorIndex(selected_elements)
+        plan = plan_selection(selected_elements, lambda e: get_rule_for_element(e, settings), get_service_name,
+                              index)
 
-    placed_count = 0
-
-    elements_by_service = {}
-    for e in selected_elements:
-        svc_name = get_service_name(e)
-        if svc_name not in elements_by_service:
-            elements_by_service[svc_name] = []
-        elements_by_service[svc_name].append(e)
-
-    for svc_name, svc_elements in elements_by_service.items():
-        joints_elements = []
-        chain_elements = []
-        
-        for e in svc_elements:
-            hanger_name, _, _, joints = get_rule_for_element(e, settings)
-            if is_disabled_hanger(hanger_name): 
-                continue
-            
-            if joints:
-                joints_elements.append(e)
-            else:
-                chain_elements.append(e)
-
-        for e in joints_elements:
-            if not is_pipe(e) or vertical_fab(e): continue
-            
-            h_name, sp, dist_from_end, _ = get_rule_for_element(e, settings)
-            if is_disabled_hanger(h_name): continue
-            
-            btn = get_hanger_button(doc, e, h_name)
-            if not btn: continue
-            
-            pipelen = e.CenterlineLength
-            pipe_connectors = list(e.ConnectorManager.Connectors)
-            if not pipe_connectors: continue
-            
-            if pipelen < 2 * dist_from_end:
-                try: 
-                    FabricationPart.CreateHanger(doc, btn, e.Id, pipe_connectors[0], pipelen / 2.0, ATOS)
-                    placed_count += 1
-                except: 
-                    pass
-            else:
-                try:
-                    for c in pipe_connectors:
-                        FabricationPart.CreateHanger(doc, btn, e.Id, c, dist_from_end, ATOS)
-                        placed_count += 1
-                    if pipelen > sp + 2 * dist_from_end:
-                        pos = dist_from_end
-                        for _ in range(int((math.floor(pipelen) - 2 * dist_from_end) / sp)):
-                            pos += sp
-                            FabricationPart.CreateHanger(doc, btn, e.Id, pipe_connectors[0], pos, ATOS)
-                            placed_count += 1
-                except: 
-                    pass
-
-        if chain_elements:
-            networks = group_leftovers(chain_elements)
-            
-            for network in networks:
-                start_element, start_connector = find_best_start(network)
-                if not start_element or not start_connector: continue
-                
-                main_chain, main_entry_conns, leftovers = walk_chain(network, start_element, start_connector)
-                placed_count += process_run(main_chain, main_entry_conns, settings, doc, ATOS)
-
-                branch_groups = group_leftovers(leftovers)
-                for branch_elems in branch_groups:
-                    branch_start = branch_elems[0]
-                    branch_start_conn = next(iter(branch_start.ConnectorManager.Connectors), None)
-                    
-                    for be in branch_elems:
-                        for bc in be.ConnectorManager.Connectors:
-                            for me in main_chain:
-                                for mc in me.ConnectorManager.Connectors:
-                                    if bc.Origin.DistanceTo(mc.Origin) < 0.1:
-                                        branch_start = be
-                                        branch_start_conn = bc
-                                        break
-                                if branch_start_conn == bc: break
-                            if branch_start_conn == bc: break
-                    
-                    branch_chain, branch_entry_conns, _ = walk_chain(branch_elems, branch_start, branch_start_conn)
-                    placed_count += process_run(branch_chain, branch_entry_conns, settings, doc, ATOS)
+    if System.AppDomain.CurrentDomain.GetData(DRY_RUN_KEY):
+        with trace.phase(COLLECTOR):
+            new, unplanned = plan.compare(existing_plan_hangers(doc, plan))
+        try:
+            plan_note = "Plan written to {}".format(plan.write_csv(PLAN_EXPORT.format(file_name)))
+        except Exception as ex:
+            plan_note = "Plan not written: {}".format(ex)
+        trace.finish('dry run')
+        show_balloon_notification(
+            "Place Hangers - Dry Run",
+            "{} hangers planned, {} new.\n{} existing hangers not in the plan.\n{}\n"
+            "Turn off the dry run in the hanger config to place hangers.".format(
+                len(plan), len(new), len(unplanned), plan_note)
+        )
+        import sys
+        sys.exit()
 
-    t.Commit()
+    with trace.phase(TRANSACTION):
+        t = Transaction(doc, 'Place Hangers')
+        t.Start()
+        placed_count, _ = execute_plan(doc, plan, get_hanger_button, ATOS)
+        t.Commit()
+    trace.finish()
     
     show_balloon_notification(
         "Place Hangers", 
@@ -751,4 +255,5 @@ try:
 except Exception as ex:
     msg = str(ex).lower()
     if "cancel" not in msg:
+        trace.finish('error')
         TaskDialog.Show("Place Hangers", str(ex))
\ No newline at end of file
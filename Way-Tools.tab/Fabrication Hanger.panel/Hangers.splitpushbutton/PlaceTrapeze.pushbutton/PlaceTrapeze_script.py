@@ -13,6 +13,7 @@ from System.Windows import Window, Thickness, WindowStartupLocation, ResizeMode,
 from System.Windows.Controls import StackPanel, Label, ComboBox, TextBox, CheckBox, Button, Orientation
 from System.Windows.Media import FontFamily
 from System import Array
+from Fabrication.ButtonCatalog import ButtonCatalog, HANGER
 #------------------------------------------------------------------------------------DEFINE SOME VARIABLES EASY USE
 doc = __revit__.ActiveUIDocument.Document
 uidoc = __revit__.ActiveUIDocument
@@ -46,17 +47,8 @@ try:
     except ValueError:
         raise Exception("Selected service not found.")
     # Find all hanger buttons
-    buttonnames = []
-    unique_hangers = set()
-    for service_idx, service in enumerate(LoadedServices):
-        palette_count = service.PaletteCount if RevitINT > 2022 else service.GroupCount
-        for palette_idx in range(palette_count):
-            buttoncount = service.GetButtonCount(palette_idx)
-            for btn_idx in range(buttoncount):
-                bt = service.GetButton(palette_idx, btn_idx)
-                if bt.IsAHanger and bt.Name not in unique_hangers:
-                    unique_hangers.add(bt.Name)
-                    buttonnames.append(bt.Name)
+    catalog = ButtonCatalog.load(doc)
+    buttonnames = catalog.names(kind=HANGER)
     folder_name = "c:\\Temp"
     filepath = os.path.join(folder_name, 'Ribbon_PlaceTrapeze.txt')
     if not os.path.exists(folder_name):
@@ -251,23 +243,8 @@ try:
                 raise Exception("Selected service not found.")
          
             # Find the selected button
-            button_found = False
-            fab_btn = None
-            for servicenum, service in enumerate(LoadedServices):
-                if service.Name == SelectedServiceName:
-                    palette_count = service.PaletteCount if RevitINT > 2022 else service.GroupCount
-                    for palette_idx in range(palette_count):
-                        button_count = service.GetButtonCount(palette_idx)
-                        for btn_idx in range(button_count):
-                            bt = service.GetButton(palette_idx, btn_idx)
-                            if bt.Name == Selectedbutton:
-                                fab_btn = bt
-                                button_found = True
-                                break
-                        if button_found:
-                            break
-                    if button_found:
-                        break
+            fab_btn = catalog.button(catalog.find(Selectedbutton, service=SelectedServiceName, exact=True))
+            button_found = fab_btn is not None
          
             if not button_found:
                 print("'{}' not found in '{}'".format(Selectedbutton, SelectedServiceName))
@@ -541,23 +518,8 @@ try:
                 raise Exception("Selected service not found.")
          
             # Find the selected button
-            button_found = False
-            fab_btn = None
-            for servicenum, service in enumerate(LoadedServices):
-                if service.Name == SelectedServiceName:
-                    palette_count = service.PaletteCount if RevitINT > 2022 else service.GroupCount
-                    for palette_idx in range(palette_count):
-                        button_count = service.GetButtonCount(palette_idx)
-                        for btn_idx in range(button_count):
-                            bt = service.GetButton(palette_idx, btn_idx)
-                            if bt.Name == Selectedbutton:
-                                fab_btn = bt
-                                button_found = True
-                                break
-                        if button_found:
-                            break
-                    if button_found:
-                        break
+            fab_btn = catalog.button(catalog.find(Selectedbutton, service=SelectedServiceName, exact=True))
+            button_found = fab_btn is not None
          
             if not button_found:
                 print("'{}' not found in '{}'".format(Selectedbutton, SelectedServiceName))
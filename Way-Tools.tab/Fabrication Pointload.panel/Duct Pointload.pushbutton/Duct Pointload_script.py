@@ -8,6 +8,7 @@ import math
 import re
 import sys
 from Parameters.Add_SharedParameters import Shared_Params
+from Parameters.Get_Set_Params import set_parameter_if_changed, new_write_counts, write_failure
 
 Shared_Params()
 
@@ -57,9 +58,6 @@ def select_fabrication_elements():
 
 
 # --- Parameter helpers ---
-def set_parameter_by_name(element, parameterName, value):
-    element.LookupParameter(parameterName).Set(value)
-
 def get_parameter_value_by_name(element, parameterName):
     return element.LookupParameter(parameterName).AsValueString()
 
@@ -88,13 +86,19 @@ if len(Fpipework) > 0:
         t = Transaction(doc, 'Write Pointload Info')
         t.Start()
 
+        counts = new_write_counts()
         for whanger in Fhangers:
             numofrods = whanger.GetRodInfo().RodCount
             if numofrods > 0:
                 roundedpointload = round_up(pointload) / numofrods
-                set_parameter_by_name(whanger, "FP_Pointload", roundedpointload)
-
-        t.Commit()
+                set_parameter_if_changed(whanger, "FP_Pointload", roundedpointload, counts)
+
+        failure = write_failure(counts, "FP_Pointload")
+        if failure:
+            t.RollBack()
+            TaskDialog.Show("Error", failure)
+        else:
+            t.Commit()
     else:
         TaskDialog.Show("Error", "At least one fabrication hanger must be selected.")
 else:
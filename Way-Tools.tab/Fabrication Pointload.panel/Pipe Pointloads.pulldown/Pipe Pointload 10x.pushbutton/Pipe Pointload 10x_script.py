@@ -16,9 +16,11 @@ import Autodesk
 from Autodesk.Revit import DB
 from Autodesk.Revit.DB import Transaction, FilteredElementCollector, BuiltInCategory
 from Autodesk.Revit.UI.Selection import ISelectionFilter, ObjectType
+from Autodesk.Revit.UI import TaskDialog
 import math
 import re
 from Parameters.Add_SharedParameters import Shared_Params
+from Parameters.Get_Set_Params import set_parameter_if_changed, new_write_counts, write_failure
 
 Shared_Params()
 
@@ -29,9 +31,6 @@ curview = doc.ActiveView
 
 
 #start of defining functions to use
-def set_parameter_by_name(element, parameterName, value):
-    element.LookupParameter(parameterName).Set(value)
-
 def get_parameter_numvalue_by_name(element, parameterName):
     return element.LookupParameter(parameterName).AsDouble()
 
@@ -49,15 +48,21 @@ hanger_collector = FilteredElementCollector(doc, curview.Id).OfCategory(BuiltInC
 t = Transaction(doc, 'Divide Pointload 10x')
 #Start Transaction
 t.Start()
+counts = new_write_counts()
 for hanger in hanger_collector:
     ploadvalue = get_parameter_numvalue_by_name(hanger, 'FP_Pointload')
     try:
         newploadvalue = round_up(ploadvalue / 10)
         if newploadvalue:
-            set_parameter_by_name(hanger, 'FP_Pointload', newploadvalue)
+            set_parameter_if_changed(hanger, 'FP_Pointload', newploadvalue, counts)
     except:
         sys.exit() 
     
 #End Transaction
-t.Commit()
+failure = write_failure(counts, 'FP_Pointload')
+if failure:
+    t.RollBack()
+    TaskDialog.Show("Error", failure)
+else:
+    t.Commit()
 
@@ -7,6 +7,7 @@ import math
 import re
 import sys
 from Parameters.Add_SharedParameters import Shared_Params
+from Parameters.Get_Set_Params import set_parameter_if_changed, new_write_counts, write_failure
 
 Shared_Params()
 
@@ -56,9 +57,6 @@ def select_fabrication_elements():
         sys.exit() 
 
 #start of defining functions to use
-def set_parameter_by_name(element, parameterName, value):
-    element.LookupParameter(parameterName).Set(value)
-
 def get_parameter_numvalue_by_name(element, parameterName):
     return element.LookupParameter(parameterName).AsDouble()
 
@@ -109,12 +107,18 @@ if len(Fhangers) > 0:
     t = Transaction(doc, 'Write Pointload Info')
     t.Start()
 
+    counts = new_write_counts()
     for whanger in Fhangers:
         numofrods = whanger.GetRodInfo().RodCount
         if numofrods > 0:
             roundedpointload = pointload / numofrods
-            set_parameter_by_name(whanger, "FP_Pointload", roundedpointload)
-    
-    t.Commit()
+            set_parameter_if_changed(whanger, "FP_Pointload", roundedpointload, counts)
+
+    failure = write_failure(counts, "FP_Pointload")
+    if failure:
+        t.RollBack()
+        TaskDialog.Show("Error", failure)
+    else:
+        t.Commit()
 else:
     TaskDialog.Show("Error", "At least one fabrication hanger must be selected.")
\ No newline at end of file
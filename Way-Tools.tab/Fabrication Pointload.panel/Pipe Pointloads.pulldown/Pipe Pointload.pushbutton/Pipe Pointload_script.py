@@ -7,11 +7,14 @@ import math
 import re
 import sys
 from Parameters.Add_SharedParameters import Shared_Params
+from Parameters.Get_Set_Params import set_parameter_if_changed, new_write_counts, write_failure
+from Diagnostics.Trace import ToolTrace, COMPUTE, TRANSACTION, UI
 
 Shared_Params()
 
 doc = __revit__.ActiveUIDocument.Document
 uidoc = __revit__.ActiveUIDocument
+trace = ToolTrace('Pipe Pointload', doc)
 
 fraction_pattern = re.compile(r"^(?P<num>[0-9]+)/(?P<den>[0-9]+)$")
 
@@ -56,9 +59,6 @@ def select_fabrication_elements():
         sys.exit()  
 
 #start of defining functions to use
-def set_parameter_by_name(element, parameterName, value):
-    element.LookupParameter(parameterName).Set(value)
-
 def get_parameter_numvalue_by_name(element, parameterName):
     return element.LookupParameter(parameterName).AsDouble()
 
@@ -70,37 +70,40 @@ def round_up(n, decimals=0):
     return math.ceil(n * multiplier) / multiplier
 #end of defining functions to use
 
-Fpipework, Fhangers = select_fabrication_elements()
+with trace.phase(UI):
+    Fpipework, Fhangers = select_fabrication_elements()
+trace.elements = len(Fpipework) + len(Fhangers)
 
 # Iterate over fabrication pipes and collect length data
 Total_Weight = 0.0
 
-for pipe in Fpipework:
-    if pipe.ItemCustomId == 2041:
-        piperad = (get_parameter_numvalue_by_name(pipe, 'Main Primary Diameter') * 6)
-        pipelength = get_parameter_numvalue_by_name(pipe, 'Length')
-        B = (piperad * piperad * 3.14159)
-        C = ((pipelength * 12) * B)
-        D = (C / 231)
-        Z = (D * 8.34)
-        
-        # Safely handle Weight parameter
-        pweight_param = get_parameter_value_by_name(pipe, 'Weight')
-        pipelb_param = 0.0
-        
-        if pweight_param and isinstance(pweight_param, str) and " lbm" in pweight_param:
-            try:
-                pipelb_param = float(pweight_param.replace(" lbm", "").strip())
-            except ValueError:
-                pipelb_param = 0.0  # Fallback
-        
-        F = pipelb_param + Z
-        Total_Weight += F
-    else:
-        fweight_param = get_parameter_value_by_name(pipe, 'Weight')
-        if fweight_param and isinstance(fweight_param, str) and " lbm" in fweight_param:
-            fittinglb_param = float(fweight_param.replace(" lbm", ""))
-            Total_Weight = Total_Weight + fittinglb_param
+with trace.phase(COMPUTE):
+    for pipe in Fpipework:
+        if pipe.ItemCustomId == 2041:
+            piperad = (get_parameter_numvalue_by_name(pipe, 'Main Primary Diameter') * 6)
+            pipelength = get_parameter_numvalue_by_name(pipe, 'Length')
+            B = (piperad * piperad * 3.14159)
+            C = ((pipelength * 12) * B)
+            D = (C / 231)
+            Z = (D * 8.34)
+            
+            # Safely handle Weight parameter
+            pweight_param = get_parameter_value_by_name(pipe, 'Weight')
+            pipelb_param = 0.0
+            
+            if pweight_param and isinstance(pweight_param, str) and " lbm" in pweight_param:
+                try:
+                    pipelb_param = float(pweight_param.replace(" lbm", "").strip())
+                except ValueError:
+                    pipelb_param = 0.0  # Fallback
+            
+            F = pipelb_param + Z
+            Total_Weight += F
+        else:
+            fweight_param = get_parameter_value_by_name(pipe, 'Weight')
+            if fweight_param and isinstance(fweight_param, str) and " lbm" in fweight_param:
+                fittinglb_param = float(fweight_param.replace(" lbm", ""))
+                Total_Weight = Total_Weight + fittinglb_param
 
 if len(Fhangers) > 0:
     Hanger_Count = 0.0
@@ -111,15 +114,26 @@ if len(Fhangers) > 0:
     
     pointload = ((Total_Weight / Hanger_Count) / 10)
 
-    t = Transaction(doc, 'Write Pointload Info')
-    t.Start()
-
-    for whanger in Fhangers:
-        numofrods = whanger.GetRodInfo().RodCount
-        if numofrods > 0:
-            roundedpointload = round_up(pointload) / numofrods
-            set_parameter_by_name(whanger, "FP_Pointload", roundedpointload)
-    
-    t.Commit()
+    with trace.phase(TRANSACTION):
+        t = Transaction(doc, 'Write Pointload Info')
+        t.Start()
+
+        counts = new_write_counts()
+        for whanger in Fhangers:
+            numofrods = whanger.GetRodInfo().RodCount
+            if numofrods > 0:
+                roundedpointload = round_up(pointload) / numofrods
+                set_parameter_if_changed(whanger, "FP_Pointload", roundedpointload, counts)
+
+        failure = write_failure(counts, "FP_Pointload")
+        if failure:
+            t.RollBack()
+        else:
+            t.Commit()
+    if failure:
+        trace.finish('error')
+        TaskDialog.Show("Error", failure)
+    else:
+        trace.finish()
 else:
     TaskDialog.Show("Error", "At least one fabrication hanger must be selected.")
\ No newline at end of file
@@ -6,7 +6,8 @@ ParameterValueProvider, ElementId, FilterStringBeginsWith, Transaction, FilterSt
 ElementParameterFilter, ParameterValueProvider, LogicalOrFilter, TransactionGroup, FabricationPart, FabricationConfiguration
 from Autodesk.Revit.UI import TaskDialog
 from Parameters.Add_SharedParameters import Shared_Params
-from Parameters.Get_Set_Params import set_parameter_by_name, get_parameter_value_by_name_AsString
+from Parameters.Get_Set_Params import set_parameter_if_changed, new_write_counts, check_write_counts, get_id_value
+from Parameters.Fab_Snapshot import Field, STRING, build_snapshot, param_string
 
 # WPF Imports
 import clr
@@ -46,6 +47,15 @@ hanger_collector = FilteredElementCollector(doc, curview.Id).OfCategory(BuiltInC
                    .WhereElementIsNotElementType() \
                    .ToElements()
 
+def read_host_material(host, ctx):
+    return host.Parameter[BuiltInParameter.FABRICATION_PART_MATERIAL].AsValueString()
+
+# Hangers share hosts, so read each host's material and size once
+hanger_hosts = [(hanger, hanger.GetHostedInfo().HostId) for hanger in hanger_collector]
+host_ids = dict((get_id_value(host_id), host_id) for hanger, host_id in hanger_hosts)
+host_snapshot = build_snapshot([doc.GetElement(host_id) for host_id in host_ids.values()],
+                               [Field('Material', STRING, read_host_material), Field('Size', STRING, param_string('Size'))])
+
 # Collect error data
 error_data = []
 
@@ -53,135 +63,137 @@ t = Transaction(doc, 'Set Pointload Values')
 # Start Transaction
 t.Start()
 
-for hanger in hanger_collector:
-    hosted_info = hanger.GetHostedInfo().HostId
+for hanger, hosted_info in hanger_hosts:
+    host_key = get_id_value(hosted_info)
+    counts = new_write_counts()
     try:
-        Hostmat = doc.GetElement(hosted_info).Parameter[BuiltInParameter.FABRICATION_PART_MATERIAL].AsValueString()  # Copper: Hard Copper  # Cast Iron: Cast Iron
+        Hostmat = host_snapshot.get(host_key, 'Material')  # Copper: Hard Copper  # Cast Iron: Cast Iron
         if Hostmat == 'Pipe Systems: Cast Iron':
-            HostSize = get_parameter_value_by_name_AsString(doc.GetElement(hosted_info), 'Size')
+            HostSize = host_snapshot.get(host_key, 'Size')
             if HostSize == '2"ø':
-                set_parameter_by_name(hanger, 'FP_Pointload', 3)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 3, counts)
             if HostSize == '3"ø':
-                set_parameter_by_name(hanger, 'FP_Pointload', 5)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 5, counts)
             if HostSize == '4"ø':
-                set_parameter_by_name(hanger, 'FP_Pointload', 7)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 7, counts)
             if HostSize == '5"ø':
-                set_parameter_by_name(hanger, 'FP_Pointload', 9)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 9, counts)
             if HostSize == '6"ø':
-                set_parameter_by_name(hanger, 'FP_Pointload', 12)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 12, counts)
             if HostSize == '8"ø':
-                set_parameter_by_name(hanger, 'FP_Pointload', 20)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 20, counts)
             if HostSize == '10"ø':
-                set_parameter_by_name(hanger, 'FP_Pointload', 30)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 30, counts)
             if HostSize == '12"ø':
-                set_parameter_by_name(hanger, 'FP_Pointload', 42)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 42, counts)
             if HostSize == '15"ø':
-                set_parameter_by_name(hanger, 'FP_Pointload', 65)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 65, counts)
 
         if Hostmat == 'Pipe Systems: Copper':
-            HostSize = get_parameter_value_by_name_AsString(doc.GetElement(hosted_info), 'Size')
+            HostSize = host_snapshot.get(host_key, 'Size')
             if HostSize == '1/2"ø':
-                set_parameter_by_name(hanger, 'FP_Pointload', 1)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 1, counts)
             if HostSize == '3/4"ø':
-                set_parameter_by_name(hanger, 'FP_Pointload', 1)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 1, counts)
             if HostSize == '1"ø':
-                set_parameter_by_name(hanger, 'FP_Pointload', 2)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 2, counts)
             if HostSize == '1 1/4"ø':
-                set_parameter_by_name(hanger, 'FP_Pointload', 2)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 2, counts)
             if HostSize == '1 1/2"ø':
-                set_parameter_by_name(hanger, 'FP_Pointload', 2)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 2, counts)
             if HostSize == '2"':
-                set_parameter_by_name(hanger, 'FP_Pointload', 5)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 5, counts)
             if HostSize == '2 1/2"ø':
-                set_parameter_by_name(hanger, 'FP_Pointload', 6)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 6, counts)
             if HostSize == '3"ø':
-                set_parameter_by_name(hanger, 'FP_Pointload', 8)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 8, counts)
             if HostSize == '4"ø':
-                set_parameter_by_name(hanger, 'FP_Pointload', 15)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 15, counts)
             if HostSize == '6"ø':
-                set_parameter_by_name(hanger, 'FP_Pointload', 30)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 30, counts)
             if HostSize == '8"ø':
-                set_parameter_by_name(hanger, 'FP_Pointload', 50)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 50, counts)
 
         if Hostmat == 'Pipe Systems: Carbon Steel':
-            HostSize = get_parameter_value_by_name_AsString(doc.GetElement(hosted_info), 'Size')
+            HostSize = host_snapshot.get(host_key, 'Size')
             if HostSize == '1/2"ø':
-                set_parameter_by_name(hanger, 'FP_Pointload', 1)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 1, counts)
             if HostSize == '3/4"ø':
-                set_parameter_by_name(hanger, 'FP_Pointload', 2)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 2, counts)
             if HostSize == '1"ø':
-                set_parameter_by_name(hanger, 'FP_Pointload', 3)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 3, counts)
             if HostSize == '1 1/4"ø':
-                set_parameter_by_name(hanger, 'FP_Pointload', 4)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 4, counts)
             if HostSize == '1 1/2"ø':
-                set_parameter_by_name(hanger, 'FP_Pointload', 5)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 5, counts)
             if HostSize == '2"ø':
-                set_parameter_by_name(hanger, 'FP_Pointload', 6)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 6, counts)
             if HostSize == '2 1/2"ø':
-                set_parameter_by_name(hanger, 'FP_Pointload', 10)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 10, counts)
             if HostSize == '3"ø':
-                set_parameter_by_name(hanger, 'FP_Pointload', 12)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 12, counts)
             if HostSize == '4"ø':
-                set_parameter_by_name(hanger, 'FP_Pointload', 20)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 20, counts)
             if HostSize == '6"ø':
-                set_parameter_by_name(hanger, 'FP_Pointload', 36)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 36, counts)
             if HostSize == '8"ø':
-                set_parameter_by_name(hanger, 'FP_Pointload', 50)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 50, counts)
 
         if Hostmat in ['Stainless Steel: 304L', 'Stainless Steel: 316L']:
-            HostSize = get_parameter_value_by_name_AsString(doc.GetElement(hosted_info), 'Size')
+            HostSize = host_snapshot.get(host_key, 'Size')
             if HostSize == '1/2"ø':
-                set_parameter_by_name(hanger, 'FP_Pointload', 1)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 1, counts)
             if HostSize == '3/4"ø':
-                set_parameter_by_name(hanger, 'FP_Pointload', 1)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 1, counts)
             if HostSize == '1"ø':
-                set_parameter_by_name(hanger, 'FP_Pointload', 2)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 2, counts)
             if HostSize == '1 1/4"ø':
-                set_parameter_by_name(hanger, 'FP_Pointload', 3)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 3, counts)
             if HostSize == '1 1/2"ø':
-                set_parameter_by_name(hanger, 'FP_Pointload', 4)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 4, counts)
             if HostSize == '2"ø':
-                set_parameter_by_name(hanger, 'FP_Pointload', 5)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 5, counts)
             if HostSize == '2 1/2"ø':
-                set_parameter_by_name(hanger, 'FP_Pointload', 6)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 6, counts)
             if HostSize == '3"ø':
-                set_parameter_by_name(hanger, 'FP_Pointload', 8)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 8, counts)
             if HostSize == '4"ø':
-                set_parameter_by_name(hanger, 'FP_Pointload', 12)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 12, counts)
             if HostSize == '6"ø':
-                set_parameter_by_name(hanger, 'FP_Pointload', 24)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 24, counts)
             if HostSize == '8"ø':
-                set_parameter_by_name(hanger, 'FP_Pointload', 37)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 37, counts)
 
         if Hostmat in ['Pipe Systems: PVC']:
-            HostSize = get_parameter_value_by_name_AsString(doc.GetElement(hosted_info), 'Size')
+            HostSize = host_snapshot.get(host_key, 'Size')
             if HostSize == '2"ø':
-                set_parameter_by_name(hanger, 'FP_Pointload', 1)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 1, counts)
             if HostSize == '3"ø':
-                set_parameter_by_name(hanger, 'FP_Pointload', 2)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 2, counts)
             if HostSize == '4"ø':
-                set_parameter_by_name(hanger, 'FP_Pointload', 3)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 3, counts)
             if HostSize == '6"ø':
-                set_parameter_by_name(hanger, 'FP_Pointload', 6)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 6, counts)
             if HostSize == '8"ø':
-                set_parameter_by_name(hanger, 'FP_Pointload', 9)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 9, counts)
             if HostSize == '10"ø':
-                set_parameter_by_name(hanger, 'FP_Pointload', 14)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 14, counts)
 
         if Hostmat.startswith("PolyPro:"):
-            HostSize = get_parameter_value_by_name_AsString(doc.GetElement(hosted_info), 'Size')
+            HostSize = host_snapshot.get(host_key, 'Size')
             if HostSize == '2"ø':
-                set_parameter_by_name(hanger, 'FP_Pointload', 2)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 2, counts)
             if HostSize == '3"ø':
-                set_parameter_by_name(hanger, 'FP_Pointload', 3)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 3, counts)
             if HostSize == '4"ø':
-                set_parameter_by_name(hanger, 'FP_Pointload', 4)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 4, counts)
             if HostSize == '6"ø':
-                set_parameter_by_name(hanger, 'FP_Pointload', 6)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 6, counts)
             if HostSize == '8"ø':
-                set_parameter_by_name(hanger, 'FP_Pointload', 10)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 10, counts)
             if HostSize == '10"ø':
-                set_parameter_by_name(hanger, 'FP_Pointload', 15)
+                set_parameter_if_changed(hanger, 'FP_Pointload', 15, counts)
+        check_write_counts(counts, 'FP_Pointload')
 
     except Exception as e:
         family_name = get_parameter_value_by_name_AsValueString(hanger, 'Family')
@@ -21,6 +21,8 @@ from Autodesk.Revit.DB import (
     View3D, 
     ElementId
 )
+from Diagnostics.Trace import ToolTrace, TRANSACTION
+from Diagnostics.ApiCounter import unwrap
 
 # Get the current script's directory path and define the family file name
 path, filename = os.path.split(__file__)
@@ -34,6 +36,7 @@ curview = doc.ActiveView  # Current active view
 app = doc.Application
 RevitVersion = app.VersionNumber
 RevitINT = float(RevitVersion)
+trace = ToolTrace('Tag Pointload', doc)
 
 file_path = doc.PathName  # Full path of the current document
 file_name = System.IO.Path.GetFileNameWithoutExtension(file_path)  # Document name without extension
@@ -76,7 +79,7 @@ def get_existing_tags(element):
         element: The Revit element to check
     Returns:
         set: Set of ElementIds of tags associated with the element"""
-    tags = FilteredElementCollector(doc, curview.Id).OfCategory(BuiltInCategory.OST_FabricationHangerTags)\
+    tags = trace.counted(FilteredElementCollector(doc, curview.Id)).OfCategory(BuiltInCategory.OST_FabricationHangerTags)\
                                                     .WhereElementIsNotElementType()\
                                                     .ToElements()
     tagged_elements = set()
@@ -187,6 +190,7 @@ try:
         pass
 
     # Tag creation transaction
+    trace.begin(TRANSACTION)
     t = Transaction(doc, 'Tag Pointloads')
     t.Start()
     # Activate the correct family symbol
@@ -198,9 +202,9 @@ try:
                 doc.Regenerate()
 
     # Tag each hanger's rods if not already fully tagged
-    for e in Hanger_collector:
+    for e in trace.counted(Hanger_collector):
         try:
-            R = Reference(e)
+            R = Reference(unwrap(e))
             STName = e.GetRodInfo().RodCount
             ItmList1.append(STName)
             existing_tags = get_existing_tags(e)
@@ -228,6 +232,9 @@ try:
 
     t.Commit()
     tg.Assimilate()
+    trace.end(TRANSACTION)
+    trace.elements = len(ItmList1)
+    trace.finish()
 
 except Exception as e:
     # Catch any unforeseen errors in the main logic
@@ -2,7 +2,8 @@
 from Autodesk.Revit.DB import FilteredElementCollector, BuiltInCategory, BuiltInParameter, \
     ParameterValueProvider, ElementId, Transaction, FilterStringEquals, \
     FilterStringRule, ElementParameterFilter, LogicalOrFilter, TemporaryViewMode
-from Parameters.Get_Set_Params import get_parameter_value_by_name_AsString
+from Parameters.Get_Set_Params import get_id_value
+from Parameters.Fab_Snapshot import build_snapshot
 import clr, sys
 from Autodesk.Revit.UI import TaskDialog
 clr.AddReference('PresentationCore')
@@ -248,13 +249,8 @@ class ServiceSelectionForm(object):
         self._window.ShowDialog()
 
 # Collect unique services
-SrvcList = []
-for item in list(hanger_collector) + list(pipe_collector) + list(duct_collector):
-    name = get_parameter_value_by_name_AsString(item, 'Fabrication Service Name')
-    if name:
-        SrvcList.append(name)
-
-unique_services = set(SrvcList)
+snapshot = build_snapshot(list(hanger_collector) + list(pipe_collector) + list(duct_collector), ['Service Name'])
+unique_services = snapshot.distinct('Service Name')
 if not unique_services:
     TaskDialog.Show("Error", "No fabrication services found in the current view.")
     sys.exit()
@@ -263,14 +259,9 @@ if not unique_services:
 preselected_services = set()
 selection_ids = uidoc.Selection.GetElementIds()
 if selection_ids:
-    for eid in selection_ids:
-        el = doc.GetElement(eid)
-        try:
-            name = get_parameter_value_by_name_AsString(el, 'Fabrication Service Name')
-            if name:
-                preselected_services.add(name)
-        except:
-            pass
+    missing = [doc.GetElement(eid) for eid in selection_ids if get_id_value(eid) not in snapshot]
+    build_snapshot(missing, ['Service Name'], snapshot=snapshot)
+    preselected_services = snapshot.distinct('Service Name', snapshot.rows_for(get_id_value(eid) for eid in selection_ids))
 
 form = ServiceSelectionForm(unique_services)
 form.selected_services = list(preselected_services)
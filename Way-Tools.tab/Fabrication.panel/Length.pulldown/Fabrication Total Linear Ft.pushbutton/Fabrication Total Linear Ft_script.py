@@ -1,7 +1,7 @@
 # -*- coding: UTF-8 -*-
 from Autodesk.Revit.DB import FilteredElementCollector, BuiltInCategory, BuiltInParameter, FabricationPart
 from pyrevit import script
-from Parameters.Get_Set_Params import get_parameter_value_by_name_AsString
+from Parameters.Fab_Snapshot import Field, DOUBLE, SnapshotContext, build_snapshot
 import sys
 
 doc = __revit__.ActiveUIDocument.Document
@@ -36,8 +36,15 @@ if not Pipe_collector:
     print("No straight fabrication pipes with CID 2041 found.")
     sys.exit()
 
-def get_parameter_value_by_name(element, parameterName):
-    return element.LookupParameter(parameterName).AsValueString()
+def read_length(pipe, ctx):
+    len_param = pipe.get_Parameter(BuiltInParameter.FABRICATION_PART_LENGTH)
+    if len_param and len_param.HasValue:
+        return len_param.AsDouble()
+    return None
+
+# Read level, material, system and length of every pipe once
+ctx = SnapshotContext(doc)
+snapshot = build_snapshot(Pipe_collector, ['Level', 'Material', 'Service Name', Field('Length', DOUBLE, read_length)], ctx)
 
 # Dictionary to store total length for each level, material, and system
 level_material_total_lengths = {}
@@ -46,40 +53,22 @@ material_total_lengths = {}
 system_level_total_lengths = {}
 total_length = 0.0
 
-# Iterate over pipes and collect Length data
-for pipe in Pipe_collector:
-    len_param = pipe.get_Parameter(BuiltInParameter.FABRICATION_PART_LENGTH)
-    if len_param and len_param.HasValue:
-        length = len_param.AsDouble()
-        total_length += length
-        level_id = pipe.LevelId
-        level_name = doc.GetElement(level_id).Name
-        material_name = get_parameter_value_by_name(pipe, 'Part Material')
-        system_name = get_parameter_value_by_name_AsString(pipe, 'Fabrication Service Name')
-        
-        # Update level totals
-        if level_name not in level_total_lengths:
-            level_total_lengths[level_name] = 0.0
-        level_total_lengths[level_name] += length
-        
-        # Update level and material totals
-        if level_name not in level_material_total_lengths:
-            level_material_total_lengths[level_name] = {}
-        if material_name not in level_material_total_lengths[level_name]:
-            level_material_total_lengths[level_name][material_name] = 0.0
-        level_material_total_lengths[level_name][material_name] += length
-        
-        # Update material totals
-        if material_name not in material_total_lengths:
-            material_total_lengths[material_name] = 0.0
-        material_total_lengths[material_name] += length
-        
-        # Update level and system totals
-        if level_name not in system_level_total_lengths:
-            system_level_total_lengths[level_name] = {}
-        if system_name not in system_level_total_lengths[level_name]:
-            system_level_total_lengths[level_name][system_name] = 0.0
-        system_level_total_lengths[level_name][system_name] += length
+for (level_name, material_name, system_name), length in snapshot.group_sum(['Level', 'Material', 'Service Name'], 'Length').items():
+    total_length += length
+
+    # Update level totals
+    level_total_lengths[level_name] = level_total_lengths.get(level_name, 0.0) + length
+
+    # Update level and material totals
+    materials = level_material_total_lengths.setdefault(level_name, {})
+    materials[material_name] = materials.get(material_name, 0.0) + length
+
+    # Update material totals
+    material_total_lengths[material_name] = material_total_lengths.get(material_name, 0.0) + length
+
+    # Update level and system totals
+    systems = system_level_total_lengths.setdefault(level_name, {})
+    systems[system_name] = systems.get(system_name, 0.0) + length
 
 # Prepare data for tables
 # Table 1: Total Lengths by Level
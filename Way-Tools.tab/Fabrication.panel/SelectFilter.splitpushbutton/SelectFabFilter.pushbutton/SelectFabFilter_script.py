@@ -16,12 +16,14 @@ from Autodesk.Revit import DB
 from Autodesk.Revit.DB import FilteredElementCollector, FabricationConfiguration, Transaction, TemporaryViewMode, ParameterValueProvider, FilterStringRule, ElementParameterFilter, FilterStringContains
 from Autodesk.Revit.UI import UIDocument, TaskDialog, TaskDialogCommonButtons
 from Parameters.Add_SharedParameters import Shared_Params
-from Parameters.Get_Set_Params import (get_parameter_value_by_name_AsString,
-                                     get_parameter_value_by_name_AsValueString,
-                                     get_parameter_value_by_name_AsInteger)
+from Parameters.Get_Set_Params import (get_parameter_value_by_name_AsValueString,
+                                     get_parameter_value_by_name_AsInteger, get_id_value)
+from Parameters.Fab_Snapshot import Field, STRING, SnapshotContext, build_snapshot
+from Diagnostics.Trace import ToolTrace, COLLECTOR, COMPUTE, UI
 doc = __revit__.ActiveUIDocument.Document
 uidoc = __revit__.ActiveUIDocument
 curview = doc.ActiveView
+trace = ToolTrace('Select Fab Filter', doc)
 Config = FabricationConfiguration.GetFabricationConfiguration(doc)
 Shared_Params()
 class ValueItem(object):
@@ -121,10 +123,11 @@ class RemoveFilterDialog(Window):
         self.DialogResult = False
         self.Close()
 class MultiPropertyFilterForm(Window):
-    def __init__(self, property_options, fab_elements, all_elements):
+    def __init__(self, property_options, fab_elements, all_elements, snapshot):
         self.property_options = property_options
         self.fab_elements = fab_elements
         self.all_elements = all_elements
+        self.snapshot = snapshot
         self.selected_filters = {}
         self.InitializeComponents()
         if self.property_options:
@@ -337,20 +340,9 @@ class MultiPropertyFilterForm(Window):
                 .WhereElementIsNotElementType() \
                 .ToElements()
            
-            # Rebuild property options
-            self.property_options = {}
-            for prop in ['CID', 'ServiceType', 'Service Name', 'Service Abbreviation', 'Size',
-                        'STRATUS Assembly', 'Line Number', 'STRATUS Status', 'Reference Level',
-                        'Item Number', 'Bundle Number', 'REF BS Designation', 'REF Line Number',
-                        'Specification', 'Hanger Rod Size', 'Valve Number', 'Beam Hanger', 'Product Entry']:
-                values = set(filter(None, [get_property_value(elem, prop, debug=False) for elem in self.fab_elements]))
-                if values:
-                    self.property_options[prop] = sorted(values)
-            for prop in ['Name', 'Comments', 'Category']:
-                if self.all_elements:
-                    values = set(filter(None, [get_property_value(elem, prop, debug=False) for elem in self.all_elements]))
-                    if values:
-                        self.property_options[prop] = sorted(values)
+            # Re-read the snapshot and rebuild property options
+            self.snapshot = build_property_snapshot(self.fab_elements, self.all_elements)
+            self.property_options = get_property_options(self.snapshot)
             # Update ComboBox
             self.property_combo.Items.Clear()
             properties = sorted(self.property_options.keys()) # Sort properties alphabetically
@@ -494,24 +486,7 @@ class MultiPropertyFilterForm(Window):
             elements_to_filter = self.all_elements if ('Name' in self.selected_filters or 'Comments' in self.selected_filters or 'Category' in self.selected_filters) else self.fab_elements
             if preselection:
                 elements_to_filter = preselection
-            filtered_ids = []
-            for elem in elements_to_filter:
-                if elem is None or not elem.IsValidObject:
-                    continue
-                elem_values = {prop: get_property_value(elem, prop, debug=False) for prop in self.selected_filters}
-                matches = []
-                for prop, filter_list in self.selected_filters.items():
-                    elem_value = elem_values[prop]
-                    prop_matches = []
-                    for values, is_and in filter_list:
-                        prop_matches.append((str(elem_value) in [str(v) for v in values], is_and))
-                    and_matches_prop = [m for m, is_and in prop_matches if is_and]
-                    or_matches_prop = [m for m, is_and in prop_matches if not is_and]
-                    prop_result = (not and_matches_prop or all(and_matches_prop)) and \
-                                 (not or_matches_prop or any(or_matches_prop))
-                    matches.append(prop_result)
-                if all(matches):
-                    filtered_ids.append(elem.Id)
+            filtered_ids = self.filter_element_ids(elements_to_filter)
            
             if filtered_ids:
                 element_id_list = List[DB.ElementId](filtered_ids)
@@ -541,24 +516,7 @@ class MultiPropertyFilterForm(Window):
             elements_to_filter = self.all_elements if ('Name' in self.selected_filters or 'Comments' in self.selected_filters or 'Category' in self.selected_filters) else self.fab_elements
             if preselection:
                 elements_to_filter = preselection
-            filtered_ids = []
-            for elem in elements_to_filter:
-                if elem is None or not elem.IsValidObject:
-                    continue
-                elem_values = {prop: get_property_value(elem, prop, debug=False) for prop in self.selected_filters}
-                matches = []
-                for prop, filter_list in self.selected_filters.items():
-                    elem_value = elem_values[prop]
-                    prop_matches = []
-                    for values, is_and in filter_list:
-                        prop_matches.append((str(elem_value) in [str(v) for v in values], is_and))
-                    and_matches_prop = [m for m, is_and in prop_matches if is_and]
-                    or_matches_prop = [m for m, is_and in prop_matches if not is_and]
-                    prop_result = (not and_matches_prop or all(and_matches_prop)) and \
-                                 (not or_matches_prop or any(or_matches_prop))
-                    matches.append(prop_result)
-                if all(matches):
-                    filtered_ids.append(elem.Id)
+            filtered_ids = self.filter_element_ids(elements_to_filter)
            
             if filtered_ids:
                 element_id_list = List[DB.ElementId](filtered_ids)
@@ -574,39 +532,40 @@ class MultiPropertyFilterForm(Window):
             dialog.MainInstruction = "Select Error: {}".format(str(e))
             dialog.CommonButtons = TaskDialogCommonButtons.Ok
             dialog.Show()
+    @trace.timed(COMPUTE)
+    def filter_element_ids(self, elements):
+        elements = [elem for elem in elements if elem is not None and elem.IsValidObject]
+        # Elements selected after the form opened are read into the snapshot on demand
+        missing = [elem for elem in elements if get_id_value(elem.Id) not in self.snapshot]
+        if missing:
+            build_property_snapshot(missing, missing, self.snapshot)
+        index = self.snapshot.index
+        rows = self.snapshot.rows_for(get_id_value(elem.Id) for elem in elements)
+        matched = self.snapshot.match(self.selected_filters, rows)
+        return [elem.Id for elem in elements if index[get_id_value(elem.Id)] in matched]
     def cancel_clicked(self, sender, args):
         self.Close()
-def get_property_value(elem, property_name, debug=False):
-    if elem is None or not elem.IsValidObject:
-        return None
-    property_map = {
-        'CID': lambda x: str(x.ItemCustomId) if x.ItemCustomId else None,
-        'ServiceType': lambda x: Config.GetServiceTypeName(x.ServiceType) if x.ServiceType else None,
-        'Name': lambda x: get_parameter_value_by_name_AsValueString(x, 'Family') or x.get_Parameter(DB.BuiltInParameter.ELEM_FAMILY_PARAM).AsValueString() if x.get_Parameter(DB.BuiltInParameter.ELEM_FAMILY_PARAM) else None,
-        'Service Name': lambda x: get_parameter_value_by_name_AsString(x, 'Fabrication Service Name'),
-        'Service Abbreviation': lambda x: get_parameter_value_by_name_AsString(x, 'Fabrication Service Abbreviation'),
-        'Size': lambda x: get_parameter_value_by_name_AsString(x, 'Size of Primary End'),
-        'STRATUS Assembly': lambda x: get_parameter_value_by_name_AsString(x, 'STRATUS Assembly'),
-        'Line Number': lambda x: get_parameter_value_by_name_AsString(x, 'FP_Line Number'),
-        'STRATUS Status': lambda x: get_parameter_value_by_name_AsString(x, 'STRATUS Status'),
-        'Reference Level': lambda x: get_parameter_value_by_name_AsValueString(x, 'Reference Level'),
-        'Item Number': lambda x: get_parameter_value_by_name_AsString(x, 'Item Number'),
-        'Bundle Number': lambda x: get_parameter_value_by_name_AsString(x, 'FP_Bundle'),
-        'REF BS Designation': lambda x: get_parameter_value_by_name_AsString(x, 'FP_REF BS Designation'),
-        'REF Line Number': lambda x: get_parameter_value_by_name_AsString(x, 'FP_REF Line Number'),
-        'Comments': lambda x: get_parameter_value_by_name_AsString(x, 'Comments'),
-        'Specification': lambda x: Config.GetSpecificationName(x.Specification) if x.Specification else None,
-        'Hanger Rod Size': lambda x: get_parameter_value_by_name_AsValueString(x, 'FP_Rod Size'),
-        'Valve Number': lambda x: get_parameter_value_by_name_AsString(x, 'FP_Valve Number'),
-        'Beam Hanger': lambda x: get_parameter_value_by_name_AsString(x, 'FP_Beam Hanger'),
-        'Product Entry': lambda x: get_parameter_value_by_name_AsString(x, 'Product Entry'),
-        'Category': lambda x: x.Category.Name if x.Category else None,
-    }
-    try:
-        value = property_map.get(property_name, lambda x: None)(elem)
-        return value
-    except:
+FAB_PROPERTIES = ['CID', 'ServiceType', 'Service Name', 'Service Abbreviation', 'Size',
+                  'STRATUS Assembly', 'Line Number', 'STRATUS Status', 'Reference Level',
+                  'Item Number', 'Bundle Number', 'REF BS Designation', 'REF Line Number',
+                  'Specification', 'Hanger Rod Size', 'Valve Number', 'Beam Hanger', 'Product Entry']
+def read_name(x, ctx):
+    if not x.get_Parameter(DB.BuiltInParameter.ELEM_FAMILY_PARAM):
         return None
+    return get_parameter_value_by_name_AsValueString(x, 'Family') or x.get_Parameter(DB.BuiltInParameter.ELEM_FAMILY_PARAM).AsValueString()
+ELEMENT_PROPERTIES = [Field('Name', STRING, read_name), 'Comments', 'Category']
+def build_property_snapshot(fab_elements, all_elements, snapshot=None):
+    # One read per element and property; filtering afterwards only touches the columns
+    ctx = SnapshotContext(doc, Config)
+    snapshot = build_snapshot(fab_elements, FAB_PROPERTIES, ctx, snapshot)
+    return build_snapshot(all_elements, ELEMENT_PROPERTIES, ctx, snapshot)
+def get_property_options(snapshot):
+    property_options = {}
+    for prop in snapshot.columns:
+        values = snapshot.distinct(prop)
+        if values:
+            property_options[prop] = sorted(values)
+    return property_options
 def get_parameter_id(property_name):
     param_map = {
         'STRATUS Assembly': 'STRATUS Assembly',
@@ -629,30 +588,21 @@ def get_parameter_id(property_name):
     }
     return param_map.get(property_name)
 # Collect elements
-preselection = [doc.GetElement(id) for id in uidoc.Selection.GetElementIds()]
-fab_elements = preselection if preselection else FilteredElementCollector(doc, curview.Id) \
-    .OfClass(DB.FabricationPart) \
-    .WhereElementIsNotElementType() \
-    .ToElements()
-all_elements = preselection if preselection else FilteredElementCollector(doc, curview.Id) \
-    .WhereElementIsNotElementType() \
-    .ToElements()
+with trace.phase(COLLECTOR):
+    preselection = [doc.GetElement(id) for id in uidoc.Selection.GetElementIds()]
+    fab_elements = preselection if preselection else FilteredElementCollector(doc, curview.Id) \
+        .OfClass(DB.FabricationPart) \
+        .WhereElementIsNotElementType() \
+        .ToElements()
+    all_elements = preselection if preselection else FilteredElementCollector(doc, curview.Id) \
+        .WhereElementIsNotElementType() \
+        .ToElements()
+trace.elements = len(all_elements)
 
-# Build property options for fabrication parts
-property_options = {}
-for prop in ['CID', 'ServiceType', 'Service Name', 'Service Abbreviation', 'Size',
-             'STRATUS Assembly', 'Line Number', 'STRATUS Status', 'Reference Level',
-             'Item Number', 'Bundle Number', 'REF BS Designation', 'REF Line Number',
-             'Specification', 'Hanger Rod Size', 'Valve Number', 'Beam Hanger', 'Product Entry']:
-    values = set(filter(None, [get_property_value(elem, prop, debug=False) for elem in fab_elements]))
-    if values:
-        property_options[prop] = sorted(values)
-# Build property options for all elements
-for prop in ['Name', 'Comments', 'Category']:
-    if all_elements:
-        values = set(filter(None, [get_property_value(elem, prop, debug=False) for elem in all_elements]))
-        if values:
-            property_options[prop] = sorted(values)
+# Snapshot fabrication properties and element properties in one pass each
+with trace.phase(COMPUTE):
+    snapshot = build_property_snapshot(fab_elements, all_elements)
+    property_options = get_property_options(snapshot)
 if not property_options:
     dialog = TaskDialog("Error")
     dialog.MainInstruction = "No properties found for the selected elements."
@@ -661,8 +611,10 @@ if not property_options:
     import sys
     sys.exit()
 # Show form as modeless with DispatcherFrame
-form = MultiPropertyFilterForm(property_options, fab_elements, all_elements)
+form = MultiPropertyFilterForm(property_options, fab_elements, all_elements, snapshot)
 form.frame = DispatcherFrame()
 form.Closed += form.exit_frame
-form.Show()
-Dispatcher.PushFrame(form.frame)
\ No newline at end of file
+with trace.phase(UI):
+    form.Show()
+    Dispatcher.PushFrame(form.frame)
+trace.finish()
\ No newline at end of file
@@ -0,0 +1,118 @@
+# coding: utf8
+from Autodesk.Revit.DB import Transaction, FilteredElementCollector, FabricationPart
+from pyrevit import forms
+from Diagnostics.Trace import ToolTrace, COLLECTOR, COMPUTE, TRANSACTION, UI
+from Diagnostics.Reports import model_report_path
+from Fabrication.OpenEnds import open_ends, match_ends, connect_pairs, ConnectReport, TOLERANCE
+import System
+import os
+import sys
+
+doc = __revit__.ActiveUIDocument.Document
+uidoc = __revit__.ActiveUIDocument
+trace = ToolTrace('Auto Connect', doc)
+
+# Last gap used, in decimal inches
+temp_folder = r"C:\Temp"
+tolerance_file = os.path.join(temp_folder, 'Ribbon_AutoConnect.txt')
+REPORT_PATH = os.path.join(temp_folder, 'Ribbon_AutoConnect_{}.csv')
+
+if not os.path.exists(temp_folder):
+    os.makedirs(temp_folder)
+
+last_value = str(TOLERANCE * 12.0)
+if os.path.exists(tolerance_file):
+    with open(tolerance_file, 'r') as f:
+        last_value = f.read().strip() or last_value
+
+
+def collect_parts():
+    """Fabrication parts in the selection, or in the active view when nothing is selected."""
+    selected_ids = uidoc.Selection.GetElementIds()
+    if selected_ids.Count > 0:
+        elements = [doc.GetElement(eid) for eid in selected_ids]
+        return [el for el in elements if isinstance(el, FabricationPart)], 'selection'
+    parts = FilteredElementCollector(doc, doc.ActiveView.Id).OfClass(FabricationPart) \
+        .WhereElementIsNotElementType().ToElements()
+    return list(parts), 'view'
+
+
+with trace.phase(UI):
+    value = forms.ask_for_string(default=last_value, prompt='Largest gap to close (decimal inches):',
+                                 title='Auto Connect')
+if not value:
+    trace.finish('cancelled')
+    sys.exit()
+try:
+    tolerance = float(value) / 12.0
+except ValueError:
+    forms.alert("Enter the gap in decimal inches.", title="Auto Connect")
+    trace.finish('cancelled')
+    sys.exit()
+if tolerance <= 0:
+    forms.alert("The gap must be larger than zero.", title="Auto Connect")
+    trace.finish('cancelled')
+    sys.exit()
+
+with open(tolerance_file, 'w') as f:
+    f.write(value)
+
+with trace.phase(COLLECTOR):
+    parts, scope = collect_parts()
+    ends = open_ends(parts)
+trace.elements = len(parts)
+
+# Same size, facing ends within the gap, closest first
+with trace.phase(COMPUTE):
+    pairs, skipped = match_ends(ends, tolerance)
+
+if not pairs:
+    forms.show_balloon('Auto Connect', 'No open ends to connect among {} open end(s) in the {}'.format(
+        len(ends), scope))
+    trace.finish()
+    sys.exit()
+
+with trace.phase(UI):
+    choice = forms.alert("{} pair(s) of open ends within {} in. across {} open end(s) in the {}.{}".format(
+                             len(pairs), value, len(ends), scope,
+                             "\n{} pair(s) skipped, both parts are held by other connections.".format(len(skipped))
+                             if skipped else ""),
+                         title="Auto Connect", options=["Connect All", "Cancel"])
+if choice != "Connect All":
+    trace.finish('cancelled')
+    sys.exit()
+
+t = Transaction(doc, "Auto Connect Fabrication Parts")
+try:
+    trace.begin(TRANSACTION)
+    t.Start()
+    connected = connect_pairs(doc, pairs)
+    trace.regenerate()
+    if connected:
+        t.Commit()
+    else:
+        t.RollBack()
+    trace.end(TRANSACTION)
+except Exception as ex:
+    if t.HasStarted() and not t.HasEnded():
+        t.RollBack()
+    trace.finish('error')
+    forms.alert("Auto Connect failed: {}".format(ex), title="Auto Connect")
+    sys.exit()
+
+report = ConnectReport(pairs + skipped)
+report_path = model_report_path(REPORT_PATH, doc)
+try:
+    report.write_csv(report_path)
+    report_note = 'Report: {}'.format(report_path)
+except Exception as ex:
+    report_note = 'Report not written: {}'.format(ex)
+trace.finish()
+
+counts = report.counts()
+choice = forms.alert("Connected {} of {} pair(s). {} failed, {} skipped.\n{}".format(
+                         counts.get('Connected', 0), len(pairs), counts.get('Failed', 0),
+                         counts.get('Skipped', 0), report_note),
+                     title="Auto Connect", options=["Open Report", "Close"])
+if choice == "Open Report" and os.path.exists(report_path):
+    System.Diagnostics.Process.Start(report_path)
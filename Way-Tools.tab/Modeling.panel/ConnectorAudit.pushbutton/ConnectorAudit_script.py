@@ -0,0 +1,80 @@
+# coding: utf8
+from pyrevit import forms
+from Diagnostics.Reports import model_report_path
+from Diagnostics.Trace import ToolTrace, COLLECTOR, COMPUTE, UI
+from Fabrication.ConnectorAudit import audit_model, AuditReport, TOLERANCE, KINDS
+from Selection.Duplicates import fabrication_collectors, as_element_id, id_collection
+import System
+import os
+import sys
+
+doc = __revit__.ActiveUIDocument.Document
+uidoc = __revit__.ActiveUIDocument
+trace = ToolTrace('Connector Audit', doc)
+
+# Last tolerance used, in decimal inches
+temp_folder = r"C:\Temp"
+tolerance_file = os.path.join(temp_folder, 'Ribbon_ConnectorAudit.txt')
+REPORT_PATH = os.path.join(temp_folder, 'Ribbon_ConnectorAudit_{}.csv')
+OPEN_REPORT = "Open Report"
+
+if not os.path.exists(temp_folder):
+    os.makedirs(temp_folder)
+
+last_value = str(TOLERANCE * 12.0)
+if os.path.exists(tolerance_file):
+    with open(tolerance_file, 'r') as f:
+        last_value = f.read().strip() or last_value
+
+with trace.phase(UI):
+    value = forms.ask_for_string(default=last_value, prompt='Near miss distance (decimal inches):',
+                                 title='Connector Audit')
+if not value:
+    trace.finish('cancelled')
+    sys.exit()
+try:
+    tolerance = float(value) / 12.0
+except ValueError:
+    tolerance = 0.0
+if tolerance <= 0:
+    forms.alert("Enter a distance larger than zero in decimal inches.", title="Connector Audit")
+    trace.finish('cancelled')
+    sys.exit()
+
+with open(tolerance_file, 'w') as f:
+    f.write(value)
+
+# Whole model, every fabrication connector read once
+scanned = {}
+with trace.phase(COMPUTE):
+    report = AuditReport(audit_model(fabrication_collectors(doc), tolerance, scanned=scanned))
+trace.elements = sum(scanned.values())
+
+counts = report.counts()
+if not report.findings:
+    forms.show_balloon('Connector Audit', 'No findings in {} parts'.format(trace.elements))
+    trace.finish()
+    sys.exit()
+
+report_path = model_report_path(REPORT_PATH, doc)
+try:
+    with trace.phase(COLLECTOR):
+        report.write_csv(report_path)
+    report_note = 'Report: {}'.format(report_path)
+except Exception as ex:
+    report_note = 'Report not written: {}'.format(ex)
+trace.finish()
+
+summary = "\n".join("{}: {}".format(kind, counts[kind]) for kind in KINDS)
+options = ["Select {} ({})".format(kind, counts[kind]) for kind in KINDS if counts[kind]]
+choice = forms.alert("{} parts audited within {} in.\n\n{}\n\n{}".format(trace.elements, value, summary,
+                                                                          report_note),
+                     title="Connector Audit", options=options + [OPEN_REPORT])
+
+if choice == OPEN_REPORT and os.path.exists(report_path):
+    System.Diagnostics.Process.Start(report_path)
+elif choice:
+    for kind in KINDS:
+        if choice.startswith("Select {} (".format(kind)):
+            uidoc.Selection.SetElementIds(id_collection([as_element_id(key) for key in report.ids(kind)]))
+            break
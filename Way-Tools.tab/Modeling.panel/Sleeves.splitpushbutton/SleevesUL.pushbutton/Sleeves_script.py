@@ -17,10 +17,21 @@ from Autodesk.Revit.Exceptions import OperationCanceledException
 from System.Windows import Window, Thickness, WindowStartupLocation, ResizeMode
 from System.Windows.Controls import StackPanel, TextBox, ListBox, Label, ComboBox
 from System.Windows.Input import Keyboard
+from Diagnostics.Trace import ToolTrace, COLLECTOR, COMPUTE, TRANSACTION, UI
+from Fabrication.ButtonCatalog import ButtonCatalog
+from Fabrication.SleevePlacement import FloorSleeve, place_floor_sleeves, existing_sleeves, skip_served
+from Geometry.LevelPlanes import LevelPlanes
+from Geometry.SlabPenetrations import find_slab_crossings, slab
+from Geometry.WallPenetrations import run_segment
+from Parameters.Get_Set_Params import get_id_value
 
 # Revit
 doc = __revit__.ActiveUIDocument.Document
 uidoc = __revit__.ActiveUIDocument
+trace = ToolTrace('Sleeves UL', doc)
+
+# Vertical pipes this close in plan are one riser, ft
+RISER_TOL = 0.5 / 12.0
 
 # -----------------------------
 # DIAMETER MAP
@@ -96,7 +107,7 @@ def get_mapped_sleeve_diameter_feet(host_part):
 
     return 2.0 / 12.0
 
-def set_round_part_size_and_length(new_part, host_part):
+def set_round_part_size_and_length(new_part, host_part, length=None):
     try:
         new_diameter = get_mapped_sleeve_diameter_feet(host_part)
         size_param = new_part.LookupParameter("Main Primary Diameter")
@@ -108,7 +119,7 @@ def set_round_part_size_and_length(new_part, host_part):
     try:
         length_param = new_part.LookupParameter("Length")
         if length_param and not length_param.IsReadOnly:
-            length_param.Set(sleeve_length)
+            length_param.Set(length if length else sleeve_length)
     except:
         pass
 
@@ -186,45 +197,6 @@ def rotate_to_vector(doc, element, origin, from_vec, to_vec):
     rot_line = Line.CreateBound(origin, origin + axis)
     ElementTransformUtils.RotateElement(doc, element.Id, rot_line, angle)
 
-# -----------------------------
-# COORDINATE HELPERS
-# -----------------------------
-class PointConverter:
-    """Convert coordinates between internal / project / survey systems."""
-    def __init__(self, x, y, z, coord_sys='internal', doc=None):
-        if doc is None:
-            doc = __revit__.ActiveUIDocument.Document
-        self.doc = doc
-        pt = XYZ(x, y, z)
-
-        srv_trans = self._get_survey_transform()
-        proj_trans = self._get_project_transform()
-
-        if coord_sys.lower() == 'internal':
-            self.internal = pt
-            self.survey = srv_trans.Inverse.OfPoint(pt)
-            self.project = proj_trans.Inverse.OfPoint(pt)
-        elif coord_sys.lower() == 'project':
-            self.project = pt
-            self.internal = proj_trans.OfPoint(pt)
-            self.survey = srv_trans.Inverse.OfPoint(self.internal)
-        elif coord_sys.lower() == 'survey':
-            self.survey = pt
-            self.internal = srv_trans.OfPoint(pt)
-            self.project = proj_trans.Inverse.OfPoint(self.internal)
-        else:
-            raise ValueError("coord_sys must be 'internal', 'project' or 'survey'")
-
-    def _get_survey_transform(self):
-        return self.doc.ActiveProjectLocation.GetTotalTransform()
-
-    def _get_project_transform(self):
-        collector = FilteredElementCollector(self.doc).OfClass(ProjectLocation).WhereElementIsNotElementType()
-        for loc in collector:
-            if loc.Name == "Project":
-                return loc.GetTotalTransform()
-        return Transform.Identity
-
 def is_vertical_pipe(pipe):
     if pipe.ItemCustomId != 2041:
         return False
@@ -234,16 +206,6 @@ def is_vertical_pipe(pipe):
     direction = (conns[1].Origin - conns[0].Origin).Normalize()
     return abs(direction.Z) > 0.99
 
-def get_level_plane_z_internal(level):
-    """
-    Convert a level's Project Elevation to internal coordinates so pipe geometry
-    and level planes are compared in the same coordinate system.
-    """
-    try:
-        return PointConverter(0, 0, level.ProjectElevation, 'project', doc).internal.Z
-    except:
-        return level.Elevation
-
 # -----------------------------
 # WALL SLEEVE END-POINT HELPERS
 # -----------------------------
@@ -422,10 +384,11 @@ def set_rect_wall_size_and_length(new_part, group_data):
 # -----------------------------
 # LEVEL INTERSECTIONS
 # -----------------------------
-def get_pipe_intersections(pipe, levels):
+@trace.timed(COMPUTE)
+def get_pipe_intersections(pipe, planes):
     """
-    Find vertical pipe crossings using project-based level elevations converted
-    back to internal coordinates.
+    Find vertical pipe crossings with the level planes (project based level
+    elevations in internal coordinates, see Geometry.LevelPlanes).
     """
     if not is_vertical_pipe(pipe):
         return []
@@ -441,26 +404,82 @@ def get_pipe_intersections(pipe, levels):
     cx = (conns[0].Origin.X + conns[1].Origin.X) / 2.0
     cy = (conns[0].Origin.Y + conns[1].Origin.Y) / 2.0
 
-    intersection_data = []
+    return [(XYZ(cx, cy, z), level) for z, level in planes.crossings(bbox.Min.Z, bbox.Max.Z)]
 
-    for level in levels:
-        plane_z_internal = get_level_plane_z_internal(level)
+# -----------------------------
+# SLAB INTERSECTIONS
+# -----------------------------
+def collect_slabs():
+    """Floors and structural slabs in the model and in every loaded link, in host coordinates."""
+    slabs = []
+    for floor in FilteredElementCollector(doc).OfClass(Floor).WhereElementIsNotElementType():
+        slabs.append(slab(floor))
+
+    for link_instance in FilteredElementCollector(doc).OfClass(RevitLinkInstance):
+        link_doc = link_instance.GetLinkDocument()
+        if link_doc is None:
+            continue
+        transform = link_instance.GetTotalTransform()
+        link_key = get_id_value(link_instance.Id)
+        for floor in FilteredElementCollector(link_doc).OfClass(Floor).WhereElementIsNotElementType():
+            slabs.append(slab(floor, transform, (link_key, get_id_value(floor.Id))))
+
+    return [s for s in slabs if s is not None]
+
+def riser_key(run):
+    """Plan position of a vertical run, shared by the segments of one riser."""
+    x = (run.p0[0] + run.p1[0]) / 2.0
+    y = (run.p0[1] + run.p1[1]) / 2.0
+    return int(round(x / RISER_TOL)), int(round(y / RISER_TOL))
+
+def get_level_sleeves(host_parts, planes):
+    """Sleeves where vertical pipes cross the level planes."""
+    sleeves = []
+    for host_part in host_parts:
+        try:
+            intersections = get_pipe_intersections(host_part, planes)
+            if not intersections:
+                continue
 
-        if bbox.Min.Z < plane_z_internal < bbox.Max.Z:
-            pt = XYZ(cx, cy, plane_z_internal)
-            intersection_data.append((pt, level))
+            pipe_dir = get_pipe_direction(host_part)
 
-    return intersection_data
+            for pt, level in intersections:
+                sleeves.append(FloorSleeve(host_part, pt, level, pipe_dir))
 
-def align_top_to_point(doc, part, target_point):
-    bbox = part.get_BoundingBox(None)
-    if bbox is None:
-        return
+        except:
+            continue
+    return sleeves
 
-    top_z = bbox.Max.Z
-    delta_z = target_point.Z - top_z
-    move_vec = XYZ(0, 0, delta_z)
-    ElementTransformUtils.MoveElement(doc, part.Id, move_vec)
+def get_slab_sleeves(host_parts, slabs, planes):
+    """
+    Sleeves where vertical pipes pass through the slabs, top of slab to
+    bottom of slab, on the level nearest the slab top. Risers that pass
+    through no slab, such as those in a model without floors, get their
+    sleeves at the level planes instead.
+    """
+    by_key = {}
+    runs = []
+    for host_part in host_parts:
+        if not is_vertical_pipe(host_part):
+            continue
+        run = run_segment(host_part)
+        if run is not None:
+            by_key[run.key] = host_part
+            runs.append(run)
+
+    with trace.phase(COMPUTE):
+        crossings = find_slab_crossings(runs, slabs) if slabs else []
+
+    sleeves = []
+    for c in crossings:
+        host_part = by_key[c.run.key]
+        top = XYZ(*c.top)
+        sleeves.append(FloorSleeve(host_part, top, planes.nearest(top.Z), get_pipe_direction(host_part), c.length))
+
+    hit = set(riser_key(c.run) for c in crossings)
+    unslabbed = [by_key[run.key] for run in runs if riser_key(run) not in hit]
+    sleeves.extend(get_level_sleeves(unslabbed, planes))
+    return sleeves
 
 # -----------------------------
 # SELECTION FILTER
@@ -518,48 +537,42 @@ def collect_vertical_hosts():
 # -----------------------------
 # GET SERVICE & BUTTONS
 # -----------------------------
-config = FabricationConfiguration.GetFabricationConfiguration(doc)
-services = config.GetAllLoadedServices()
+with trace.phase(COLLECTOR):
+    catalog = ButtonCatalog.load(doc)
 target_service = None
 
-for s in services:
-    if s.Name and 'sleeves' in s.Name.lower():
-        target_service = s
+for name in catalog.service_names:
+    if name and 'sleeves' in name.lower():
+        target_service = name
         break
 
 if not target_service:
     TaskDialog.Show("Error", "Could not find a Fabrication Service name containing 'Sleeve'.")
     sys.exit()
 
-palette_names = []
+palette_names = catalog.palette_names(target_service)
 button_records = []
 
-for p in range(target_service.PaletteCount):
-    palette_name = target_service.GetPaletteName(p)
-    palette_names.append(palette_name)
-
-    for i in range(target_service.GetButtonCount(p)):
-        btn = target_service.GetButton(p, i)
-
-        if btn.ConditionCount > 1:
-            for c in range(btn.ConditionCount):
-                display = u"{} - {}".format(btn.Name, btn.GetConditionName(c))
-                button_records.append({
-                    "palette_index": p,
-                    "palette_name": palette_name,
-                    "display": display,
-                    "button": btn,
-                    "condition_index": c
-                })
-        else:
-            display = u"{}".format(btn.Name)
+for entry in catalog.buttons(service=target_service):
+    if entry.conditions:
+        for c, condition in enumerate(entry.conditions):
+            display = u"{} - {}".format(entry.name, condition)
             button_records.append({
-                "palette_index": p,
-                "palette_name": palette_name,
+                "palette_index": entry.palette_index,
+                "palette_name": entry.palette_name,
                 "display": display,
-                "button": btn,
-                "condition_index": 0
+                "entry": entry,
+                "condition_index": c
             })
+    else:
+        display = u"{}".format(entry.name)
+        button_records.append({
+            "palette_index": entry.palette_index,
+            "palette_name": entry.palette_name,
+            "display": display,
+            "entry": entry,
+            "condition_index": 0
+        })
 
 if not button_records:
     TaskDialog.Show("Error", "No fabrication buttons found for the sleeve service.")
@@ -649,11 +662,13 @@ class PartPicker(Window):
 # SHOW DIALOG
 # -----------------------------
 dlg = PartPicker(button_records, palette_names)
-if not dlg.ShowDialog():
+with trace.phase(UI):
+    dialog_result = dlg.ShowDialog()
+if not dialog_result:
     sys.exit()
 
 selected_record = dlg.selected_record
-fab_btn = selected_record["button"]
+fab_btn = catalog.button(selected_record["entry"])
 condition_index = selected_record["condition_index"]
 
 display_name = selected_record["display"].lower()
@@ -666,6 +681,7 @@ is_rectangular_wall_mode = "rectangular wall sleeve" in display_name
 t = None
 
 try:
+    trace.begin(TRANSACTION)
     t = Transaction(doc, "Place Fabrication Sleeves")
     t.Start()
 
@@ -703,18 +719,18 @@ try:
                 sys.exit()
 
             new_part = FabricationPart.Create(doc, fab_btn, condition_index, host_parts[0].LevelId)
-            doc.Regenerate()
+            trace.regenerate()
 
             set_rect_wall_size_and_length(new_part, group_data)
-            doc.Regenerate()
+            trace.regenerate()
 
             rotate_to_vector(doc, new_part, new_part.Origin, XYZ.BasisX, group_data["run_dir"])
-            doc.Regenerate()
+            trace.regenerate()
 
             end_point = get_end_connector_point(new_part, group_data["run_dir"])
             move_vec = insert_point - end_point
             ElementTransformUtils.MoveElement(doc, new_part.Id, move_vec)
-            doc.Regenerate()
+            trace.regenerate()
 
         else:
             # ---------------------------------
@@ -752,68 +768,53 @@ try:
             flat_pipe_dir = get_horizontal_pipe_direction(host_part)
 
             new_part = FabricationPart.Create(doc, fab_btn, condition_index, host_part.LevelId)
-            doc.Regenerate()
+            trace.regenerate()
 
             set_round_part_size_and_length(new_part, host_part)
-            doc.Regenerate()
+            trace.regenerate()
 
             rotate_to_vector(doc, new_part, new_part.Origin, XYZ.BasisX, flat_pipe_dir)
-            doc.Regenerate()
+            trace.regenerate()
 
             end_point = get_end_connector_point(new_part, flat_pipe_dir)
             move_vec = insert_point - end_point
             ElementTransformUtils.MoveElement(doc, new_part.Id, move_vec)
-            doc.Regenerate()
+            trace.regenerate()
 
     else:
         # ---------------------------------
         # FLOOR / VERTICAL SLEEVE MODE
         # ---------------------------------
-        host_parts = collect_vertical_hosts()
-        all_levels = list(FilteredElementCollector(doc).OfClass(Level))
-        placed_count = 0
-
-        for host_part in host_parts:
-            try:
-                intersections = get_pipe_intersections(host_part, all_levels)
-                if not intersections:
-                    continue
-
-                pipe_dir = get_pipe_direction(host_part)
-
-                for pt, level in intersections:
-                    new_part = FabricationPart.Create(
-                        doc,
-                        fab_btn,
-                        condition_index,
-                        level.Id
-                    )
+        with trace.phase(COLLECTOR):
+            host_parts = collect_vertical_hosts()
+            all_levels = list(FilteredElementCollector(doc).OfClass(Level))
+            planes = LevelPlanes.from_document(doc, all_levels)
+            slabs = collect_slabs()
 
-                    doc.Regenerate()
+        sleeves = get_slab_sleeves(host_parts, slabs, planes)
 
-                    set_round_part_size_and_length(new_part, host_part)
-                    doc.Regenerate()
+        with trace.phase(COLLECTOR):
+            sleeves, served = skip_served(sleeves, existing_sleeves(doc))
 
-                    move_vec = pt - new_part.Origin
-                    ElementTransformUtils.MoveElement(doc, new_part.Id, move_vec)
-
-                    rotate_to_vector(doc, new_part, pt, XYZ.BasisX, pipe_dir.Multiply(-1))
-                    doc.Regenerate()
-
-                    align_top_to_point(doc, new_part, pt)
-                    placed_count += 1
-
-            except:
-                continue
+        placed = place_floor_sleeves(doc, sleeves, fab_btn, condition_index, set_round_part_size_and_length,
+                                     trace.regenerate)
+        placed_count = len(placed)
+        trace.elements = placed_count
 
         if placed_count == 0:
-            TaskDialog.Show("Info", "No sleeves were placed.")
+            if served:
+                TaskDialog.Show("Info", "No sleeves were placed, {} crossings already have a sleeve.".format(len(served)))
+            else:
+                TaskDialog.Show("Info", "No sleeves were placed.")
             t.RollBack()
             sys.exit()
 
     t.Commit()
+    trace.end(TRANSACTION)
+    trace.finish()
 
 except Exception as ex:
+    trace.finish('error')
     if t and t.HasStarted() and not t.HasEnded():
         t.RollBack()
     TaskDialog.Show("Error", str(ex))
\ No newline at end of file
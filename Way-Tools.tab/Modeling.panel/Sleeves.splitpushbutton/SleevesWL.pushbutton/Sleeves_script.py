@@ -1,6 +1,5 @@
 # coding: utf8
 import clr
-import math
 import sys
 import re
 from fractions import Fraction
@@ -17,10 +16,20 @@ from Autodesk.Revit.Exceptions import OperationCanceledException
 from System.Windows import Window, Thickness, WindowStartupLocation, ResizeMode
 from System.Windows.Controls import StackPanel, TextBox, ListBox, Label, ComboBox
 from System.Windows.Input import Keyboard
+from pyrevit import forms
+from Diagnostics.Trace import ToolTrace, COLLECTOR, COMPUTE, TRANSACTION, UI
+from Fabrication.ButtonCatalog import ButtonCatalog
+from Fabrication.SleevePlacement import WallSleeve, place_wall_sleeves, existing_sleeves, skip_served
+from Parameters.Get_Set_Params import get_id_value
+from Geometry.WallPenetrations import find_penetrations, wall_segment, run_segment, runs_extent, wall_filter
 
 # Revit
 doc = __revit__.ActiveUIDocument.Document
 uidoc = __revit__.ActiveUIDocument
+trace = ToolTrace('Sleeves WL', doc)
+
+PICK_MODE = "Picked Pipes and Wall"
+VIEW_MODE = "All Pipes and Walls in View"
 
 # -----------------------------
 # DIAMETER MAP
@@ -115,54 +124,6 @@ def set_part_size_and_length(new_part, host_part, override_length=None):
     except:
         pass
 
-# -----------------------------
-# ROTATION
-# -----------------------------
-def rotate_to_vector(doc, element, origin, from_vec, to_vec):
-    from_vec = from_vec.Normalize()
-    to_vec = to_vec.Normalize()
-    axis = from_vec.CrossProduct(to_vec)
-
-    if axis.GetLength() < 1e-8:
-        dot = from_vec.DotProduct(to_vec)
-        if dot < 0:
-            axis = XYZ.BasisZ
-            angle = math.pi
-        else:
-            return
-    else:
-        axis = axis.Normalize()
-        angle = math.acos(max(min(from_vec.DotProduct(to_vec), 1.0), -1.0))
-
-    rot_line = Line.CreateBound(origin, origin + axis)
-    ElementTransformUtils.RotateElement(doc, element.Id, rot_line, angle)
-
-# -----------------------------
-# CONNECTOR HELPERS
-# -----------------------------
-def get_part_connectors(part):
-    try:
-        return list(part.ConnectorManager.Connectors)
-    except:
-        return []
-
-def get_end_connector_point(part, direction_vec):
-    conns = get_part_connectors(part)
-    if len(conns) < 2:
-        return part.Origin
-
-    best_conn = None
-    best_val = None
-
-    for c in conns:
-        pt = c.Origin
-        val = pt.X * direction_vec.X + pt.Y * direction_vec.Y + pt.Z * direction_vec.Z
-        if best_conn is None or val < best_val:
-            best_conn = c
-            best_val = val
-
-    return best_conn.Origin
-
 # -----------------------------
 # SELECTION FILTERS
 # -----------------------------
@@ -318,18 +279,94 @@ def get_wall_sleeve_data_from_link(host_part, link_ref):
     start_point = intersection_point - flat_dir.Multiply(wall_thickness * 0.5)
     return start_point, wall_thickness, flat_dir
 
+# -----------------------------
+# WHOLE VIEW HELPERS
+# -----------------------------
+def is_pipe_straight(element):
+    """Round sleeves are sized from the pipe size, ducts are left out."""
+    try:
+        return isinstance(element, FabricationPart) and isinstance(element.Location, LocationCurve) and \
+            get_id_value(element.Category.Id) == int(BuiltInCategory.OST_FabricationPipework)
+    except:
+        return False
+
+def collect_view_runs():
+    """Selected fabrication pipe straights, or every pipe straight in the active view."""
+    parts = []
+    for eid in uidoc.Selection.GetElementIds():
+        element = doc.GetElement(eid)
+        if is_pipe_straight(element):
+            parts.append(element)
+    if parts:
+        return parts
+
+    collector = FilteredElementCollector(doc, doc.ActiveView.Id).OfCategory(BuiltInCategory.OST_FabricationPipework) \
+        .WhereElementIsNotElementType()
+    for element in collector:
+        if is_pipe_straight(element):
+            parts.append(element)
+    return parts
+
+def collect_wall_segments(runs):
+    """Walls around the runs in the active view and in every loaded link, as plan segments in host coordinates."""
+    extent = runs_extent(runs)
+    if extent is None:
+        return []
+
+    segments = []
+    for wall in FilteredElementCollector(doc, doc.ActiveView.Id).OfClass(Wall).WherePasses(wall_filter(extent)):
+        segments.append(wall_segment(wall))
+
+    for link_instance in FilteredElementCollector(doc).OfClass(RevitLinkInstance):
+        link_doc = link_instance.GetLinkDocument()
+        if link_doc is None:
+            continue
+        transform = link_instance.GetTotalTransform()
+        link_key = get_id_value(link_instance.Id)
+        walls = FilteredElementCollector(link_doc).OfClass(Wall).WherePasses(wall_filter(extent, transform))
+        for wall in walls:
+            segments.append(wall_segment(wall, transform, (link_key, get_id_value(wall.Id))))
+
+    return [seg for seg in segments if seg is not None]
+
+def get_view_wall_sleeves(failed):
+    host_parts = collect_view_runs()
+    if not host_parts:
+        raise Exception("No fabrication pipes found in the selection or the active view.")
+
+    by_key = {}
+    runs = []
+    for host_part in host_parts:
+        try:
+            size = get_mapped_sleeve_diameter_feet(host_part)
+        except Exception as size_error:
+            failed.append("Part {}: {}".format(get_id_value(host_part.Id), str(size_error)))
+            continue
+        run = run_segment(host_part, size)
+        if run is not None:
+            by_key[run.key] = host_part
+            runs.append(run)
+
+    walls = collect_wall_segments(runs)
+    trace.elements = len(runs) + len(walls)
+
+    with trace.phase(COMPUTE):
+        penetrations = find_penetrations(runs, walls)
+
+    return [WallSleeve(by_key[p.run.key], XYZ(*p.start), XYZ(*p.direction), p.length) for p in penetrations]
+
 # -----------------------------
 # GET SERVICE & WALL BUTTONS ONLY
 # -----------------------------
-config = FabricationConfiguration.GetFabricationConfiguration(doc)
-services = config.GetAllLoadedServices()
+with trace.phase(COLLECTOR):
+    catalog = ButtonCatalog.load(doc)
 target_service = None
 
-for s in services:
-    if s.Name:
-        n = s.Name.lower()
+for name in catalog.service_names:
+    if name:
+        n = name.lower()
         if 'sleeve' in n or 'sleeves' in n:
-            target_service = s
+            target_service = name
             break
 
 if not target_service:
@@ -339,40 +376,24 @@ if not target_service:
 palette_names = []
 button_records = []
 
-for p in range(target_service.PaletteCount):
-    palette_name = target_service.GetPaletteName(p)
-    local_records = []
-
-    for i in range(target_service.GetButtonCount(p)):
-        btn = target_service.GetButton(p, i)
-
-        if btn.ConditionCount > 1:
-            for c in range(btn.ConditionCount):
-                display = u"{} - {}".format(btn.Name, btn.GetConditionName(c))
-                is_wall = ("wall" in display.lower()) or ("wall" in palette_name.lower())
-                if is_wall:
-                    local_records.append({
-                        "palette_index": p,
-                        "palette_name": palette_name,
-                        "display": display,
-                        "button": btn,
-                        "condition_index": c
-                    })
-        else:
-            display = u"{}".format(btn.Name)
-            is_wall = ("wall" in display.lower()) or ("wall" in palette_name.lower())
-            if is_wall:
-                local_records.append({
-                    "palette_index": p,
-                    "palette_name": palette_name,
-                    "display": display,
-                    "button": btn,
-                    "condition_index": 0
-                })
-
-    if local_records:
-        palette_names.append(palette_name)
-        button_records.extend(local_records)
+for entry in catalog.buttons(service=target_service):
+    if entry.conditions:
+        displays = [(c, u"{} - {}".format(entry.name, condition)) for c, condition in enumerate(entry.conditions)]
+    else:
+        displays = [(0, u"{}".format(entry.name))]
+
+    for c, display in displays:
+        is_wall = ("wall" in display.lower()) or ("wall" in entry.palette_name.lower())
+        if is_wall:
+            if entry.palette_name not in palette_names:
+                palette_names.append(entry.palette_name)
+            button_records.append({
+                "palette_index": entry.palette_index,
+                "palette_name": entry.palette_name,
+                "display": display,
+                "entry": entry,
+                "condition_index": c
+            })
 
 if not button_records:
     TaskDialog.Show("Error", "No wall sleeve fabrication buttons were found in the sleeve service.")
@@ -462,74 +483,95 @@ class PartPicker(Window):
 # SHOW DIALOG
 # -----------------------------
 dlg = PartPicker(button_records, palette_names)
-if not dlg.ShowDialog():
+with trace.phase(UI):
+    dialog_result = dlg.ShowDialog()
+if not dialog_result:
     sys.exit()
 
 selected_record = dlg.selected_record
-fab_btn = selected_record["button"]
+fab_btn = catalog.button(selected_record["entry"])
 condition_index = selected_record["condition_index"]
 
 # -----------------------------
 # MAIN
 # -----------------------------
+with trace.phase(UI):
+    mode = forms.alert("Place wall sleeves where pipes cross walls.", title="Wall Sleeves",
+                       options=[PICK_MODE, VIEW_MODE])
+if not mode:
+    sys.exit()
+
 t = None
 failed = []
 placed_count = 0
 
 try:
-    try:
-        host_parts = select_fabrication_pipes()
-    except OperationCanceledException:
-        sys.exit()
+    if mode == VIEW_MODE:
+        with trace.phase(COLLECTOR):
+            sleeves = get_view_wall_sleeves(failed)
+    else:
+        try:
+            host_parts = select_fabrication_pipes()
+        except OperationCanceledException:
+            sys.exit()
 
-    try:
-        wall_ref = select_linked_wall()
-    except OperationCanceledException:
+        try:
+            wall_ref = select_linked_wall()
+        except OperationCanceledException:
+            sys.exit()
+
+        sleeves = []
+        for host_part in host_parts:
+            try:
+                insert_point, wall_length, flat_pipe_dir = get_wall_sleeve_data_from_link(host_part, wall_ref)
+                sleeves.append(WallSleeve(host_part, insert_point, flat_pipe_dir, wall_length))
+            except Exception as pipe_error:
+                failed.append("Pipe {}: {}".format(get_id_value(host_part.Id), str(pipe_error)))
+
+    with trace.phase(COLLECTOR):
+        sleeves, served = skip_served(sleeves, existing_sleeves(doc))
+    skipped_note = "{} penetration(s) already sleeved, skipped.".format(len(served)) if served else ""
+
+    if not sleeves:
+        TaskDialog.Show("Wall Sleeve Placement", "No sleeves were placed. {}\n\n{}".format(
+            skipped_note, "\n".join(failed[:20])).strip())
         sys.exit()
 
+    trace.begin(TRANSACTION)
     t = Transaction(doc, "Place Fabrication Wall Sleeves")
     t.Start()
 
-    for host_part in host_parts:
-        try:
-            insert_point, wall_length, flat_pipe_dir = get_wall_sleeve_data_from_link(host_part, wall_ref)
-
-            new_part = FabricationPart.Create(doc, fab_btn, condition_index, host_part.LevelId)
-            doc.Regenerate()
-
-            set_part_size_and_length(new_part, host_part, wall_length)
-            doc.Regenerate()
-
-            rotate_to_vector(doc, new_part, new_part.Origin, XYZ.BasisX, flat_pipe_dir)
-            doc.Regenerate()
-
-            end_point = get_end_connector_point(new_part, flat_pipe_dir)
-            move_vec = insert_point - end_point
-            ElementTransformUtils.MoveElement(doc, new_part.Id, move_vec)
-            doc.Regenerate()
-
-            placed_count += 1
-
-        except Exception as pipe_error:
-            try:
-                failed.append("Pipe {}: {}".format(host_part.Id.IntegerValue, str(pipe_error)))
-            except:
-                failed.append(str(pipe_error))
+    placed = place_wall_sleeves(doc, sleeves, fab_btn, condition_index, set_part_size_and_length, trace.regenerate)
+    placed_count = len(placed)
+    for sleeve in sleeves:
+        if sleeve.part is None and sleeve.error is not None:
+            failed.append("Pipe {}: {}".format(get_id_value(sleeve.host.Id), str(sleeve.error)))
 
     if placed_count == 0:
         t.RollBack()
-        TaskDialog.Show("Wall Sleeve Placement", "No sleeves were placed.\n\n{}".format("\n".join(failed[:20])))
+        trace.end(TRANSACTION)
+        trace.finish()
+        TaskDialog.Show("Wall Sleeve Placement", "No sleeves were placed. {}\n\n{}".format(
+            skipped_note, "\n".join(failed[:20])).strip())
         sys.exit()
 
     t.Commit()
+    trace.end(TRANSACTION)
+    trace.finish()
 
     if failed:
         TaskDialog.Show(
             "Wall Sleeve Placement",
-            "Placed {} sleeve(s) with some issues.\n\n{}".format(placed_count, "\n".join(failed[:20]))
+            "Placed {} sleeve(s) with some issues. {}\n\n{}".format(placed_count, skipped_note,
+                                                                     "\n".join(failed[:20]))
         )
+    elif served:
+        TaskDialog.Show("Wall Sleeve Placement", "Placed {} sleeve(s). {}".format(placed_count, skipped_note))
+    elif mode == VIEW_MODE:
+        forms.show_balloon("Wall Sleeves", "Placed {} wall sleeve(s)".format(placed_count))
 
 except Exception as ex:
+    trace.finish('error')
     if t and t.HasStarted() and not t.HasEnded():
         t.RollBack()
-    TaskDialog.Show("Error", str(ex))
\ No newline at end of file
+    TaskDialog.Show("Error", str(ex))
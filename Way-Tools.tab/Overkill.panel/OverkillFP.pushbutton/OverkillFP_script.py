@@ -1,11 +1,15 @@
 from Autodesk.Revit.UI.Selection import ObjectType
-from Autodesk.Revit.DB import BoundingBoxXYZ, FilteredElementCollector, Transaction, BuiltInCategory, FabricationPart
+from Autodesk.Revit.DB import Transaction
 from pyrevit import forms
-import math
+from Diagnostics.Trace import ToolTrace, COMPUTE, TRANSACTION, UI
+from Selection.Duplicates import scan_model, fabrication_collectors, duplicate_ids, delete_elements
+import sys
 
 doc = __revit__.ActiveUIDocument.Document
 uidoc = __revit__.ActiveUIDocument
 curview = doc.ActiveView
+trace = ToolTrace('OverkillFP', doc)
+api_doc = trace.counted(doc)
 
 # .NET Imports
 import clr
@@ -71,66 +75,47 @@ class TXT_Form(Form):
 #Show the Form
 form = TXT_Form()
 # form.Show()
-Application.Run(form)
-
-def GetCenterPoint(ele):
-    bBox = doc.GetElement(ele).get_BoundingBox(None)
-    center = (bBox.Max + bBox.Min) / 2
-    return (center.X, center.Y, center.Z)
-
-def calculate_distance(point1, point2):
-    return math.sqrt((point1[0] - point2[0])**2 +
-                     (point1[1] - point2[1])**2 +
-                     (point1[2] - point2[2])**2)
+with trace.phase(UI):
+    Application.Run(form)
 
 # Fuzz distance in Revit units (0.25 inches = 0.020833333 feet)
 fuzz_distance = form.valuenum
 
-# Create a FilteredElementCollector to get all FabricationPart elements
-AllElements = FilteredElementCollector(doc, curview.Id).OfClass(FabricationPart) \
-                   .WhereElementIsNotElementType() \
-                   .ToElements()
-
-# Get the center point of each selected element
-element_ids = []
-center_points = []
-
-for reference in AllElements:
-    center_point = GetCenterPoint(reference.Id)
-    center_points.append(center_point)
-    element_ids.append(reference.Id)
-
-# Find the duplicates in the list of center points
-duplicates = []
-duplicate_element_ids = []
-unique_center_points = []
-
-for i, cp in enumerate(center_points):
-    found_duplicate = False
-    for ucp in unique_center_points:
-        if calculate_distance(cp, ucp) <= fuzz_distance:
-            found_duplicate = True
-            break
-    if not found_duplicate:
-        unique_center_points.append(cp)
-    else:
-        duplicates.append(cp)
-        duplicate_element_ids.append(element_ids[i])
-
-# Delete the elements that belong to duplicate center points
+if fuzz_distance is None:
+    trace.finish('cancelled')
+    sys.exit()
+
+# Parts of the same CID, size and type whose connector ends are within the fuzz,
+# searched one fabrication category of the view at a time
+scanned = {}
+with trace.phase(COMPUTE):
+    clusters = scan_model(fabrication_collectors(doc, curview.Id), fuzz_distance, scanned=scanned)
+    duplicates = duplicate_ids(clusters)
+trace.elements = sum(scanned.values())
+
+# Delete the duplicates in one call
+if not duplicates:
+    forms.show_balloon('Duplicates', 'No Duplicates Found')
+    trace.finish()
+    sys.exit()
+
+with trace.phase(UI):
+    forms.alert_ifnot(len(duplicates) < 0,
+                      ("Delete Duplicate(s): {}".format(len(duplicates))),
+                      yes=True, no=True, exitscript=True)
+
+t = Transaction(doc, "Delete Elements")
 try:
-    if duplicates:
-        forms.alert_ifnot(len(duplicates) < 0,
-                          ("Delete Duplicate(s): {}".format(len(duplicates))),
-                          yes=True, no=True, exitscript=True)
-        
-        with Transaction(doc, "Delete Elements") as transaction:
-            transaction.Start()
-            for element_id in duplicate_element_ids:
-                doc.Delete(element_id)
-            transaction.Commit()
-    else:
-        forms.show_balloon('Duplicates', 'No Duplicates Found')
-
-except:
-    pass
+    trace.begin(TRANSACTION)
+    t.Start()
+    delete_elements(api_doc, duplicates)
+    t.Commit()
+    trace.end(TRANSACTION)
+except Exception as ex:
+    if t.HasStarted() and not t.HasEnded():
+        t.RollBack()
+    trace.finish('error')
+    forms.alert("Deleting duplicates failed, nothing was deleted: {}".format(ex), title="Overkill FP")
+    sys.exit()
+
+trace.finish()
@@ -2,6 +2,7 @@ import Autodesk
 from Autodesk.Revit import DB
 from Autodesk.Revit.DB import Transaction, FilteredElementCollector, BuiltInCategory, ElementCategoryFilter, FamilyInstance
 from pyrevit import revit, DB, forms
+from Selection.Duplicates import find_duplicates, family_signature, delete_elements
 
 #define the active Revit application and document
 doc = __revit__.ActiveUIDocument.Document
@@ -48,11 +49,6 @@ try:
         for cat in selected_category:
             res = model_categories[cat]
 
-            def GetCenterPoint(ele):
-                bBox = doc.GetElement(ele).get_BoundingBox(None)
-                center = (bBox.Max + bBox.Min) / 2
-                return (center.X, center.Y, center.Z)
-
             def IsNestedFamily(element):
                 # Check if the element is a FamilyInstance and if it has a parent (indicating it's nested)
                 if isinstance(element, FamilyInstance):
@@ -65,26 +61,9 @@ try:
             # Filter out nested families
             main_families = [el for el in AllElements if not IsNestedFamily(el)]
 
-            # Get the center point of each selected element
-            element_ids = []
-            center_points = []
-
-            for reference in main_families:
-                center_point = GetCenterPoint(reference.Id)
-                center_points.append(center_point)
-                element_ids.append(reference.Id)
-
-            # Find the duplicates in the list of center points
-            duplicates = []
-            duplicate_element_ids = []
-            unique_center_points = []
-
-            for i, cp in enumerate(center_points):
-                if cp not in unique_center_points:
-                    unique_center_points.append(cp)
-                else:
-                    duplicates.append(cp)
-                    duplicate_element_ids.append(element_ids[i])
+            # Same family type at the same center
+            duplicates = find_duplicates(main_families, 0.0, family_signature)
+            duplicate_element_ids = [element.Id for element, _ in duplicates]
 
             try:
                 if duplicates:
@@ -94,8 +73,7 @@ try:
                     
                     with Transaction(doc, "Delete Elements") as transaction:
                         transaction.Start()
-                        for element_id in duplicate_element_ids:
-                            doc.Delete(element_id)
+                        delete_elements(doc, duplicate_element_ids)
                         transaction.Commit()
                 else:
                     forms.show_balloon('Duplicates', 'No Duplicates Found')
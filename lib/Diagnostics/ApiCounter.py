@@ -0,0 +1,225 @@
+# -*- coding: UTF-8 -*-
+# Opt-in Revit API call counting.
+#
+# ApiCounter.wrap(doc) returns a proxy that forwards everything to the
+# document and counts the calls in COUNTED. Elements handed out by a proxy
+# (GetElement, collector iteration, ToElements) are proxied as well, so a
+# loop like
+#
+#   for el in counter.wrap(FilteredElementCollector(doc)).OfClass(FabricationPart):
+#       el.LookupParameter('Size')
+#
+# ends up as ToElements/LookupParameter counts without touching the loop.
+#
+# Proxies are Python objects. The Revit API itself cannot take them, so pass
+# unwrap(obj) (or the original object) to Transaction, FilteredElementCollector,
+# FabricationPart.Create and friends. Headless stand-in objects take proxies.
+#
+# Counting is off unless C:\Temp\Ribbon_ApiCount.txt exists or
+# WAYTOOLS_COUNT=1 is set; off, wrap() returns its argument unchanged.
+# "Trace.py calls" prints the logged histograms.
+import json
+import os
+import time
+
+from Diagnostics.Trace import trace_folder, get_model_name
+
+COUNT_FLAG = 'Ribbon_ApiCount.txt'
+COUNT_LOG = 'Ribbon_ApiCount.jsonl'
+
+COUNTED = frozenset([
+    'LookupParameter', 'get_Parameter', 'GetParameters', 'GetElement', 'get_BoundingBox',
+    'GetDimensions', 'GetDimensionValue', 'GetRodInfo', 'GetHostedInfo', 'GetPartAncillaryUsage',
+    'Regenerate', 'Delete', 'ToElements', 'ToElementIds', 'FirstElement', 'GetElementCount',
+])
+
+# Values that are never proxied
+_PLAIN = (str, int, float, bool, list, tuple, dict)
+try:
+    _PLAIN += (unicode, long)
+except NameError:
+    pass
+
+# Calls whose result is handed back proxied
+_WRAP_RESULT = frozenset(['GetElement', 'FirstElement'])
+_WRAP_ITEMS = frozenset(['ToElements'])
+
+_enabled = None
+
+
+def log_path(folder=None):
+    return os.path.join(folder or trace_folder(), COUNT_LOG)
+
+
+def is_enabled():
+    global _enabled
+    if _enabled is None:
+        _enabled = os.environ.get('WAYTOOLS_COUNT') == '1' or \
+            os.path.exists(os.path.join(trace_folder(), COUNT_FLAG))
+    return _enabled
+
+
+def set_enabled(value):
+    global _enabled
+    _enabled = value
+
+
+def unwrap(obj):
+    """ The object behind a proxy, or obj itself """
+    return getattr(obj, '_ApiProxy__target', obj)
+
+
+def rewrap(like, obj):
+    """ Proxies obj with the counter of `like` when `like` is a proxy """
+    counter = getattr(like, '_ApiProxy__counter', None)
+    if counter is None:
+        return obj
+    return counter.wrap(obj)
+
+
+def _is_collector(obj):
+    return hasattr(obj, 'ToElements') and hasattr(obj, 'WhereElementIsNotElementType')
+
+
+class ApiProxy(object):
+    __slots__ = ('_ApiProxy__target', '_ApiProxy__counter')
+
+    def __init__(self, target, counter):
+        object.__setattr__(self, '_ApiProxy__target', target)
+        object.__setattr__(self, '_ApiProxy__counter', counter)
+
+    @property
+    def __class__(self):
+        # isinstance(proxy, FabricationPart) keeps working
+        return type(self.__target)
+
+    def __getattr__(self, name):
+        value = getattr(self.__target, name)
+        if not callable(value):
+            return value
+        counter = self.__counter
+        collector = _is_collector(self.__target)
+        if name not in COUNTED and not collector:
+            return value
+
+        def call(*args, **kwargs):
+            if name in COUNTED:
+                counter.count(name)
+            result = value(*args, **kwargs)
+            if result is None:
+                return result
+            if name in _WRAP_RESULT:
+                return counter.wrap(result)
+            if name in _WRAP_ITEMS:
+                return [counter.wrap(item) for item in result]
+            if collector and _is_collector(result):
+                return counter.wrap(result)
+            return result
+        return call
+
+    def __setattr__(self, name, value):
+        setattr(self.__target, name, value)
+
+    def __iter__(self):
+        counter = self.__counter
+        if _is_collector(self.__target):
+            # Iterating a collector runs the same element pass as ToElements
+            counter.count('ToElements')
+        for item in self.__target:
+            yield counter.wrap(item)
+
+    def __len__(self):
+        return len(self.__target)
+
+    def __bool__(self):
+        return bool(self.__target)
+
+    __nonzero__ = __bool__
+
+    def __eq__(self, other):
+        return self.__target == unwrap(other)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash(self.__target)
+
+    def __repr__(self):
+        return '<counted {!r}>'.format(self.__target)
+
+
+class ApiCounter(object):
+    def __init__(self, tool=None, enabled=None):
+        """ Call histogram of one tool run
+        :param enabled: force counting on or off, None follows is_enabled()"""
+        self.enabled = is_enabled() if enabled is None else enabled
+        self.tool = tool
+        self.calls = {}
+        self.elements = 0
+
+    def wrap(self, obj):
+        if not self.enabled or obj is None or isinstance(obj, (ApiProxy,) + _PLAIN):
+            return obj
+        if type(obj).__name__ in ('ElementId', 'XYZ'):
+            return obj
+        return ApiProxy(obj, self)
+
+    def count(self, name, n=1):
+        self.calls[name] = self.calls.get(name, 0) + n
+
+    def reset(self):
+        self.calls = {}
+
+    def histogram(self, elements=None):
+        """ :return: [(call, count, per element)] most frequent first"""
+        elements = elements if elements is not None else self.elements
+        rows = []
+        for name, count in sorted(self.calls.items(), key=lambda kv: (-kv[1], kv[0])):
+            rows.append((name, count, float(count) / elements if elements else None))
+        return rows
+
+    def record(self, doc=None):
+        return {
+            'tool': self.tool,
+            'model': get_model_name(unwrap(doc)),
+            'elements': self.elements,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'calls': dict(self.calls),
+        }
+
+    def save(self, doc=None, folder=None):
+        """ Appends the histogram to the count log; never raises """
+        if not self.enabled:
+            return
+        try:
+            with open(log_path(folder), 'a') as f:
+                f.write(json.dumps(self.record(doc), sort_keys=True) + '\n')
+        except:
+            pass
+
+
+def format_histogram(rows):
+    lines = ['{:<24} {:>10} {:>12}'.format('call', 'count', 'per element')]
+    for name, count, per in rows:
+        lines.append('{:<24} {:>10} {:>12}'.format(name, count, '{:.2f}'.format(per) if per is not None else '-'))
+    return '\n'.join(lines)
+
+
+def summarize(records, tool=None):
+    """ Calls per element summed over the logged runs of each tool
+    :return: {tool: [(call, count, per element)]}"""
+    totals = {}
+    for r in records:
+        if tool and r.get('tool') != tool:
+            continue
+        entry = totals.setdefault(r.get('tool'), [0, {}])
+        entry[0] += r.get('elements') or 0
+        for name, count in r.get('calls', {}).items():
+            entry[1][name] = entry[1].get(name, 0) + count
+    summary = {}
+    for name, (elements, calls) in totals.items():
+        counter = ApiCounter(name, enabled=True)
+        counter.calls = calls
+        summary[name] = counter.histogram(elements)
+    return summary
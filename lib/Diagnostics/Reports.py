@@ -0,0 +1,43 @@
+# -*- coding: UTF-8 -*-
+# CSV reports written by the pushbutton scripts.
+#
+# A report goes to a path template with one {} for the model name, such as
+# C:\Temp\Ribbon_AutoConnect_{}.csv:
+#
+#   path = model_report_path(REPORT_PATH, doc)
+#   write_csv(path, report.to_rows())
+#
+# write_csv opens the file the way the csv module wants it on IronPython 2.7
+# (binary) and CPython 3 (text, no newline translation) and creates the
+# folder when it is missing.
+import csv
+import os
+import re
+import sys
+
+from Diagnostics.Trace import get_model_name
+
+
+def safe_name(name, default='default'):
+    """ name with every run of characters unsafe in a file name replaced by _ """
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', name or default)
+
+
+def model_report_path(template, doc):
+    """ :param template: path with {} for the model name """
+    return template.format(safe_name(get_model_name(doc)))
+
+
+def write_csv(path, rows):
+    """ :param rows: lists of cell values, header first
+    :return: path"""
+    folder = os.path.dirname(path)
+    if folder and not os.path.exists(folder):
+        os.makedirs(folder)
+    if sys.version_info[0] < 3:
+        f = open(path, 'wb')
+    else:
+        f = open(path, 'w', newline='')
+    with f:
+        csv.writer(f).writerows(rows)
+    return path
@@ -0,0 +1,325 @@
+# -*- coding: UTF-8 -*-
+# Phase timing for pushbutton scripts.
+#
+# A script opens one ToolTrace per run and wraps its main phases:
+#
+#   trace = ToolTrace('Place Pipe Hangers', doc)
+#   with trace.phase(COLLECTOR):
+#       pipes = FilteredElementCollector(doc)...
+#   trace.elements = len(pipes)
+#   with trace.phase(TRANSACTION):
+#       ...
+#   trace.finish()
+#
+# Tracing is off unless C:\Temp\Ribbon_Trace.txt exists (or WAYTOOLS_TRACE=1
+# is set). Off, phase() hands back one shared no-op context and finish()
+# returns at once, so instrumented scripts pay an attribute check per span.
+# On, every run appends one JSON line to C:\Temp\Ribbon_Trace.jsonl.
+#
+# Phase totals are inclusive: a Regenerate inside a transaction counts
+# toward both. Run this module with "report" for p50/p95 per tool and phase
+# (and Regenerate calls per element, "regen/elem", for tools that set
+# trace.elements), or "calls" for the Diagnostics.ApiCounter histograms.
+import json
+import os
+import sys
+import time
+
+COLLECTOR = 'collector'
+COMPUTE = 'compute'
+TRANSACTION = 'transaction'
+REGENERATE = 'regenerate'
+UI = 'ui'
+PHASES = (COLLECTOR, COMPUTE, TRANSACTION, REGENERATE, UI)
+
+# Report row of Regenerate calls per element, a count rather than seconds
+REGEN_PER_ELEMENT = 'regen/elem'
+
+TRACE_FOLDER = 'C:\\Temp'
+TRACE_FLAG = 'Ribbon_Trace.txt'
+TRACE_LOG = 'Ribbon_Trace.jsonl'
+
+try:
+    clock = time.perf_counter
+except AttributeError:
+    clock = time.time
+
+_enabled = None
+
+
+def trace_folder():
+    folder = os.environ.get('WAYTOOLS_TRACE_FOLDER')
+    if folder:
+        return folder
+    return TRACE_FOLDER
+
+
+def log_path(folder=None):
+    return os.path.join(folder or trace_folder(), TRACE_LOG)
+
+
+def is_enabled():
+    """ Checked once per session, tracing starts with the next pyRevit reload """
+    global _enabled
+    if _enabled is None:
+        _enabled = os.environ.get('WAYTOOLS_TRACE') == '1' or \
+            os.path.exists(os.path.join(trace_folder(), TRACE_FLAG))
+    return _enabled
+
+
+def set_enabled(value):
+    global _enabled
+    _enabled = value
+
+
+def get_model_name(doc):
+    if doc is None:
+        return None
+    try:
+        return os.path.splitext(os.path.basename(doc.PathName))[0] or doc.Title
+    except:
+        return None
+
+
+class _NullSpan(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class _Span(object):
+    __slots__ = ('trace', 'name', 'start')
+
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.start = clock()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.trace.add(self.name, clock() - self.start)
+        return False
+
+
+class ToolTrace(object):
+    def __init__(self, tool, doc=None, enabled=None, folder=None):
+        """ Wall-clock spans of one tool run
+        :param tool: tool name as shown on the ribbon
+        :param enabled: force tracing on or off, None follows is_enabled()"""
+        self.enabled = is_enabled() if enabled is None else enabled
+        self.tool = tool
+        self.doc = doc
+        self.folder = folder
+        self.elements = 0
+        self.totals = {}
+        self.counts = {}
+        self._open = {}
+        self.start = clock() if self.enabled else None
+        self.finished = False
+        from Diagnostics.ApiCounter import ApiCounter
+        self.counter = ApiCounter(tool)
+
+    def phase(self, name):
+        if not self.enabled:
+            return NULL_SPAN
+        return _Span(self, name)
+
+    def begin(self, name):
+        """ Opens a span that does not fit a with block, closed by end(name) """
+        if self.enabled:
+            self._open[name] = clock()
+
+    def end(self, name):
+        if self.enabled and name in self._open:
+            self.add(name, clock() - self._open.pop(name))
+
+    def add(self, name, seconds):
+        self.totals[name] = self.totals.get(name, 0.0) + seconds
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def timed(self, name):
+        """ Decorator timing every call of a function as one span """
+        def decorate(func):
+            if not self.enabled:
+                return func
+
+            def wrapper(*args, **kwargs):
+                with _Span(self, name):
+                    return func(*args, **kwargs)
+            wrapper.__name__ = func.__name__
+            wrapper.__doc__ = func.__doc__
+            return wrapper
+        return decorate
+
+    def counted(self, obj):
+        """ obj behind an API call counting proxy while counting is on, see Diagnostics.ApiCounter """
+        return self.counter.wrap(obj)
+
+    def regenerate(self, doc=None):
+        """ doc.Regenerate() timed as a REGENERATE span """
+        from Diagnostics.ApiCounter import unwrap
+        with self.phase(REGENERATE):
+            self.counted(unwrap(doc or self.doc)).Regenerate()
+
+    def record(self, status='ok'):
+        return {
+            'tool': self.tool,
+            'model': get_model_name(self.doc),
+            'elements': self.elements,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'total': round(clock() - self.start, 6),
+            'phases': dict((k, round(v, 6)) for k, v in self.totals.items()),
+            'spans': dict(self.counts),
+            'status': status,
+        }
+
+    def finish(self, status='ok'):
+        """ Appends the run to the trace log, once; never raises """
+        if self.finished:
+            return
+        self.finished = True
+        if self.counter.enabled:
+            self.counter.elements = self.elements
+            self.counter.save(self.doc, self.folder)
+        if not self.enabled:
+            return
+        try:
+            path = log_path(self.folder)
+            folder = os.path.dirname(path)
+            if folder and not os.path.exists(folder):
+                os.makedirs(folder)
+            with open(path, 'a') as f:
+                f.write(json.dumps(self.record(status), sort_keys=True) + '\n')
+        except:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.finish('ok' if exc_type is None else 'error')
+        return False
+
+
+# ------------------------------------------------------------------------------------
+# Report
+# ------------------------------------------------------------------------------------
+def load_records(path=None):
+    records = []
+    path = path or log_path()
+    if not os.path.exists(path):
+        return records
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                pass
+    return records
+
+
+def percentile(values, p):
+    """ Linear interpolation between closest ranks, values must be sorted """
+    if not values:
+        return None
+    k = (len(values) - 1) * p / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def summarize(records, tool=None, model=None):
+    """ p50/p95 seconds per tool and phase, plus regenerations per element for tools that regenerate
+    :return: {tool: {'runs': n, 'elements': median, phase: (p50, p95), 'total': (p50, p95)}}"""
+    by_tool = {}
+    for r in records:
+        if tool and r.get('tool') != tool:
+            continue
+        if model and r.get('model') != model:
+            continue
+        by_tool.setdefault(r.get('tool'), []).append(r)
+
+    summary = {}
+    for name, runs in by_tool.items():
+        row = {'runs': len(runs)}
+        row['elements'] = percentile(sorted(r.get('elements') or 0 for r in runs), 50)
+        phases = set()
+        for r in runs:
+            phases.update(r.get('phases', {}))
+        for phase in ['total'] + sorted(phases):
+            if phase == 'total':
+                values = sorted(r.get('total', 0.0) for r in runs)
+            else:
+                values = sorted(r['phases'].get(phase, 0.0) for r in runs)
+            row[phase] = (percentile(values, 50), percentile(values, 95))
+        per_element = sorted(r['spans'][REGENERATE] / float(r['elements']) for r in runs
+                             if r.get('elements') and REGENERATE in r.get('spans', {}))
+        if per_element:
+            row[REGEN_PER_ELEMENT] = (percentile(per_element, 50), percentile(per_element, 95))
+        summary[name] = row
+    return summary
+
+
+def format_report(summary):
+    ordered = [p for p in ('total',) + PHASES]
+    lines = ['{:<32} {:>5} {:>8}  {:<12} {:>9} {:>9}'.format('tool', 'runs', 'elements', 'phase', 'p50 s', 'p95 s')]
+    for name in sorted(summary, key=lambda n: str(n)):
+        row = summary[name]
+        phases = [p for p in ordered if p in row] + sorted(p for p in row if p not in ordered and
+                                                           p not in ('runs', 'elements'))
+        first = True
+        for phase in phases:
+            p50, p95 = row[phase]
+            lines.append('{:<32} {:>5} {:>8}  {:<12} {:>9.3f} {:>9.3f}'.format(
+                str(name)[:32] if first else '', row['runs'] if first else '',
+                int(row['elements']) if first else '', phase, p50, p95))
+            first = False
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='Way-Tools phase timing and API call counts')
+    parser.add_argument('command', choices=['report', 'calls', 'enable', 'disable'])
+    parser.add_argument('--log', help='trace or count log, default in {}'.format(trace_folder()))
+    parser.add_argument('--tool')
+    parser.add_argument('--model')
+    parser.add_argument('--counting', action='store_true', help='enable/disable API call counting instead')
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from Diagnostics import ApiCounter
+
+    flag = os.path.join(trace_folder(), ApiCounter.COUNT_FLAG if args.counting else TRACE_FLAG)
+    what = 'call counting' if args.counting else 'tracing'
+    if args.command == 'enable':
+        with open(flag, 'w') as f:
+            f.write('1')
+        print('{} enabled, reload pyRevit to pick it up'.format(what))
+    elif args.command == 'disable':
+        if os.path.exists(flag):
+            os.remove(flag)
+        print('{} disabled'.format(what))
+    elif args.command == 'calls':
+        summary = ApiCounter.summarize(load_records(args.log or ApiCounter.log_path()), args.tool)
+        for name in sorted(summary, key=lambda n: str(n)):
+            print(name)
+            print(ApiCounter.format_histogram(summary[name]))
+            print('')
+    else:
+        print(format_report(summarize(load_records(args.log), args.tool, args.model)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,336 @@
+# -*- coding: UTF-8 -*-
+# Catalog of the service buttons in a document's fabrication configuration.
+#
+# Reading a button name costs a GetButton call, so scanning every service,
+# palette and button for one hanger is a few thousand API calls. The catalog
+# reads each button once per configuration revision, keeps plain records
+# indexed by service, name and kind, and hands the API button back with a
+# single GetButton on lookup.
+#
+# Records, and the palette names of every service including empty palettes,
+# are cached as JSON on the AppDomain for the Revit session and in
+# C:\Temp\Ribbon_ButtonCatalog_<configuration>.json between sessions. The
+# cache is keyed on the configuration name plus a hash of its database
+# location and version, so two databases sharing a configuration name do
+# not share a catalog. The revision is the list of loaded services with
+# their palette and button counts, so loading or unloading a service, or
+# reloading a changed configuration, rebuilds the catalog.
+import hashlib
+import json
+import os
+
+from Diagnostics.Reports import safe_name
+
+try:
+    import System
+except ImportError:
+    System = None       # headless, no session cache
+
+HANGER = 'hanger'
+SLEEVE = 'sleeve'
+PART = 'part'
+
+CACHE_FOLDER = 'C:\\Temp'
+CACHE_FILE = 'Ribbon_ButtonCatalog_{}.json'
+SESSION_KEY = 'WayTools.ButtonCatalog|{}'
+FORMAT = 2
+
+
+def palette_count(service):
+    # PaletteCount from Revit 2023, GroupCount before
+    try:
+        return service.PaletteCount
+    except AttributeError:
+        return service.GroupCount
+
+
+def palette_name(service, index):
+    try:
+        return service.GetPaletteName(index)
+    except AttributeError:
+        return service.GetGroupName(index)
+
+
+def name_key(name):
+    return (name or '').strip().lower()
+
+
+def get_configuration_name(config):
+    try:
+        return config.GetFabricationConfigurationInfo().Name or ''
+    except:
+        return ''
+
+
+def get_configuration_key(config):
+    """ Configuration name, with a hash of the database location and version when Revit reports them """
+    name = get_configuration_name(config)
+    try:
+        info = config.GetFabricationConfigurationInfo()
+        source = '|'.join(str(getattr(info, attr, None) or '') for attr in ('Location', 'Version'))
+    except:
+        source = '|'
+    if source == '|':
+        return name
+    return '{}_{}'.format(name, hashlib.md5(source.encode('utf-8')).hexdigest()[:8])
+
+
+def get_revision(config, services=None):
+    """ Loaded services with their palette and button counts, cheap to read """
+    revision = []
+    for service in services if services is not None else config.GetAllLoadedServices():
+        counts = [service.GetButtonCount(p) for p in range(palette_count(service))]
+        revision.append([service.ServiceId, service.Name or '', counts])
+    return revision
+
+
+def button_kind(service_name, button):
+    if button.IsAHanger:
+        return HANGER
+    if SLEEVE in name_key(service_name) or SLEEVE in name_key(button.Name):
+        return SLEEVE
+    return PART
+
+
+class ButtonRecord(object):
+    __slots__ = ('service_id', 'service_name', 'palette_index', 'palette_name', 'button_index', 'name',
+                 'kind', 'conditions')
+
+    def __init__(self, service_id, service_name, palette_index, palette_name, button_index, name, kind,
+                 conditions=None):
+        self.service_id = service_id
+        self.service_name = service_name
+        self.palette_index = palette_index
+        self.palette_name = palette_name
+        self.button_index = button_index
+        self.name = name
+        self.kind = kind
+        self.conditions = conditions or []    # condition names when ConditionCount > 1
+
+    @property
+    def is_hanger(self):
+        return self.kind == HANGER
+
+    def to_list(self):
+        return [self.service_id, self.service_name, self.palette_index, self.palette_name, self.button_index,
+                self.name, self.kind, self.conditions]
+
+    @classmethod
+    def from_list(cls, values):
+        return cls(*values)
+
+    def __repr__(self):
+        return '<ButtonRecord {} / {} / {}>'.format(self.service_name, self.palette_name, self.name)
+
+
+class ButtonCatalog(object):
+    def __init__(self, config, records, revision, services=None, palettes=None):
+        """ Use ButtonCatalog.load(doc) rather than building one directly
+        :param records: ButtonRecord list in service, palette, button order
+        :param palettes: {service name: palette names in palette order}"""
+        self.config = config
+        self.records = records
+        self.revision = revision
+        self.palettes = palettes or {}
+        self.name = get_configuration_name(config)
+        self.key = get_configuration_key(config)
+        self.services = dict((s.ServiceId, s) for s in
+                             (services if services is not None else config.GetAllLoadedServices()))
+        self.service_names = [name for _, name, _ in revision]
+        self.rescanned = False
+        self.folder = None      # file cache folder, None for CACHE_FOLDER
+        self.by_service = {}
+        self.by_name = {}
+        self.by_kind = {}
+        for record in records:
+            self.by_service.setdefault(record.service_name, []).append(record)
+            self.by_name.setdefault(name_key(record.name), []).append(record)
+            self.by_kind.setdefault(record.kind, []).append(record)
+
+    # --- building and caching ----------------------------------------------------
+    @classmethod
+    def scan(cls, config, services=None, revision=None):
+        """ Reads every button of the loaded services """
+        services = services if services is not None else list(config.GetAllLoadedServices())
+        records = []
+        palettes = {}
+        for service in services:
+            names = palettes.setdefault(service.Name or '', [])
+            for p in range(palette_count(service)):
+                p_name = palette_name(service, p)
+                names.append(p_name)
+                for i in range(service.GetButtonCount(p)):
+                    button = service.GetButton(p, i)
+                    if button is None:
+                        continue
+                    conditions = []
+                    if button.ConditionCount > 1:
+                        conditions = [button.GetConditionName(c) for c in range(button.ConditionCount)]
+                    records.append(ButtonRecord(service.ServiceId, service.Name or '', p, p_name, i,
+                                                button.Name or '', button_kind(service.Name, button),
+                                                conditions))
+        return cls(config, records, revision or get_revision(config, services), services, palettes)
+
+    @classmethod
+    def load(cls, doc, folder=None):
+        """ Catalog of doc's configuration, from the session or file cache while
+        the revision is unchanged, otherwise scanned and cached again """
+        from Autodesk.Revit.DB import FabricationConfiguration
+        return cls.for_configuration(FabricationConfiguration.GetFabricationConfiguration(doc), folder)
+
+    @classmethod
+    def for_configuration(cls, config, folder=None):
+        services = list(config.GetAllLoadedServices())
+        revision = get_revision(config, services)
+        key = get_configuration_key(config)
+
+        catalog = cls.from_json(config, get_session_data(key), revision, services)
+        if catalog is None:
+            text = read_cache_file(key, folder)
+            catalog = cls.from_json(config, text, revision, services)
+            if catalog is not None:
+                set_session_data(key, text)
+        if catalog is None:
+            catalog = cls.scan(config, services, revision)
+            text = catalog.to_json()
+            set_session_data(key, text)
+            write_cache_file(key, text, folder)
+        catalog.folder = folder
+        return catalog
+
+    def to_json(self):
+        return json.dumps({'format': FORMAT, 'configuration': self.name, 'revision': self.revision,
+                           'palettes': self.palettes, 'records': [r.to_list() for r in self.records]})
+
+    @classmethod
+    def from_json(cls, config, text, revision, services=None):
+        """ None when text is missing, unreadable or from another revision """
+        if not text:
+            return None
+        try:
+            data = json.loads(text)
+        except ValueError:
+            return None
+        if data.get('format') != FORMAT or data.get('revision') != revision:
+            return None
+        return cls(config, [ButtonRecord.from_list(v) for v in data['records']], revision, services,
+                   data.get('palettes'))
+
+    # --- lookups -----------------------------------------------------------------
+    def buttons(self, service=None, kind=None):
+        """ Records of one service name and/or kind, in palette order """
+        if service is not None:
+            records = self.by_service.get(service, [])
+            return [r for r in records if r.kind == kind] if kind else list(records)
+        if kind is not None:
+            return list(self.by_kind.get(kind, []))
+        return list(self.records)
+
+    def palette_names(self, service):
+        """ Palette names of a service name in palette order, empty palettes included """
+        return list(self.palettes.get(service, []))
+
+    def find_all(self, name, service=None, kind=None, exact=False):
+        """ Records named name, ignoring case and surrounding spaces
+        :param exact: compare the name as is"""
+        records = self.by_name.get(name_key(name), [])
+        return [r for r in records
+                if (service is None or r.service_name == service) and (kind is None or r.kind == kind) and
+                (not exact or r.name == name)]
+
+    def find(self, name, service=None, kind=None, exact=False):
+        records = self.find_all(name, service, kind, exact)
+        return records[0] if records else None
+
+    def find_near(self, name, service, kind=None):
+        """ First record named name from a service whose name contains or is
+        contained in service (ignoring case), else the first from any service """
+        records = self.find_all(name, kind=kind)
+        svc_name = name_key(service)
+        for r in records:
+            s_name = name_key(r.service_name)
+            if s_name and (s_name == svc_name or svc_name in s_name or s_name in svc_name):
+                return r
+        return records[0] if records else None
+
+    def names(self, kind=None):
+        """ Distinct button names in catalog order """
+        seen = set()
+        result = []
+        for record in self.buttons(kind=kind):
+            if record.name not in seen:
+                seen.add(record.name)
+                result.append(record.name)
+        return result
+
+    def button(self, record):
+        """ The FabricationServiceButton of a record. A button that moved or was
+        renamed since the catalog was cached triggers one rescan.
+        :return: button or None when it is gone"""
+        button = self._get_button(record)
+        if button is None and record is not None and not self.rescanned:
+            self.rescan()
+            button = self._get_button(self.find(record.name, record.service_name, exact=True))
+        return button
+
+    def rescan(self):
+        folder = self.folder
+        self.__dict__.update(ButtonCatalog.scan(self.config).__dict__)
+        self.rescanned = True
+        self.folder = folder
+        text = self.to_json()
+        set_session_data(self.key, text)
+        write_cache_file(self.key, text, folder)
+
+    def _get_button(self, record):
+        if record is None:
+            return None
+        service = self.services.get(record.service_id)
+        if service is None:
+            return None
+        try:
+            button = service.GetButton(record.palette_index, record.button_index)
+        except:
+            return None
+        if button is None or (button.Name or '') != record.name:
+            return None
+        return button
+
+
+# ------------------------------------------------------------------------------------
+# Session and file cache
+# ------------------------------------------------------------------------------------
+def get_session_data(key):
+    if System is None:
+        return None
+    data = System.AppDomain.CurrentDomain.GetData(SESSION_KEY.format(key))
+    return str(data) if data else None
+
+
+def set_session_data(key, text):
+    if System is not None:
+        System.AppDomain.CurrentDomain.SetData(SESSION_KEY.format(key), text)
+
+
+def cache_path(key, folder=None):
+    return os.path.join(folder or CACHE_FOLDER, CACHE_FILE.format(safe_name(key)))
+
+
+def read_cache_file(key, folder=None):
+    try:
+        with open(cache_path(key, folder)) as f:
+            return f.read()
+    except (IOError, OSError):
+        return None
+
+
+def write_cache_file(key, text, folder=None):
+    """ Never raises, the cache is only a shortcut """
+    try:
+        path = cache_path(key, folder)
+        if not os.path.exists(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'w') as f:
+            f.write(text)
+    except:
+        pass
@@ -0,0 +1,188 @@
+# -*- coding: UTF-8 -*-
+# Connector audit of the fabrication parts in a model.
+#
+# Every end connector is read once (origin, outward direction, profile and
+# the parts it is connected to) and hashed with OpenEnds.near_pairs, so the
+# connectors within tolerance of each other come out of the 27 cells around
+# each one instead of a pairwise distance check. From those pairs:
+#
+#   Dangling End            open connector in none of the findings below, alone or only beside
+#                           other parts' connectors it does not face
+#   Near Miss               two open connectors facing each other within tolerance, not connected
+#   Size Mismatch           connected, or nearly meeting, connectors of a different shape or size
+#   Overlapping Connection  a connector within tolerance of a connected one it is not connected to,
+#                           such as a part stacked over a joint
+#
+# Every open connector ends up in at least one finding. Only element id
+# values and coordinates are kept, so a 200k connector model costs a few
+# tuples per connector. The findings can be written to CSV and
+# their element ids handed to the selection.
+import math
+
+from Diagnostics.Reports import write_csv
+from Parameters.Get_Set_Params import get_id_value
+from Fabrication.OpenEnds import profile_key, is_end, near_pairs, facing, ANGLE_TOL
+
+TOLERANCE = 0.125 / 12.0    # ft
+
+DANGLING = 'Dangling End'
+NEAR_MISS = 'Near Miss'
+SIZE_MISMATCH = 'Size Mismatch'
+OVERLAP = 'Overlapping Connection'
+KINDS = (DANGLING, NEAR_MISS, SIZE_MISMATCH, OVERLAP)
+
+
+class AuditEnd(object):
+    __slots__ = ('key', 'x', 'y', 'z', 'direction', 'profile', 'partners')
+
+    def __init__(self, key, connector, partners):
+        self.key = key              # element id value
+        origin = connector.Origin
+        self.x, self.y, self.z = origin.X, origin.Y, origin.Z
+        basis = connector.CoordinateSystem.BasisZ
+        self.direction = (basis.X, basis.Y, basis.Z)
+        self.profile = profile_key(connector)
+        self.partners = partners    # id values of the parts connected here, empty when open
+
+    @property
+    def connected(self):
+        return bool(self.partners)
+
+
+class Finding(object):
+    __slots__ = ('kind', 'key', 'other', 'point', 'gap', 'note')
+
+    def __init__(self, kind, key, other, point, gap=None, note=''):
+        self.kind = kind
+        self.key = key              # element id value
+        self.other = other          # id value of the other part, None for dangling ends with none beside
+        self.point = point          # (x, y, z)
+        self.gap = gap              # ft
+        self.note = note
+
+
+def _describe(profile):
+    return ' x '.join([profile[0]] + ['{:g}"'.format(round(v * 12.0, 3)) for v in profile[1:]])
+
+
+def read_part(element, ends, findings):
+    """ AuditEnd of every end connector of element into ends; connected pairs of
+    a different profile go into findings, once per pair"""
+    try:
+        connectors = [c for c in element.ConnectorManager.Connectors if is_end(c)]
+    except:
+        return
+    key = get_id_value(element.Id)
+    for connector in connectors:
+        partners = []
+        if connector.IsConnected:
+            for ref in connector.AllRefs:
+                try:
+                    other = get_id_value(ref.Owner.Id)
+                except:
+                    continue
+                if other == key:
+                    continue
+                partners.append(other)
+                # Taps join a body connector, its profile is not the tap's size
+                if key < other and is_end(ref):
+                    own, theirs = profile_key(connector), profile_key(ref)
+                    if own != theirs:
+                        origin = connector.Origin
+                        findings.append(Finding(SIZE_MISMATCH, key, other, (origin.X, origin.Y, origin.Z), 0.0,
+                                                '{} to {}'.format(_describe(own), _describe(theirs))))
+        ends.append(AuditEnd(key, connector, tuple(partners)))
+
+
+def audit_ends(ends, tolerance=TOLERANCE, angle=ANGLE_TOL, candidates=None):
+    """ Findings among the connectors of ends, every open connector in at least one
+    :param candidates: sorted (gap, i, j) of the ends within tolerance, near_pairs by default
+    :return: list of Finding, dangling ends last"""
+    min_cos = math.cos(math.radians(angle))
+    if candidates is None:
+        candidates = near_pairs(ends, tolerance)
+    findings = []
+    reported = set()
+    beside = {}                 # end -> closest other part's connector it is not reported with
+    for gap, i, j in candidates:
+        a, b = ends[i], ends[j]
+        if b.key in a.partners:
+            continue
+        point = (a.x, a.y, a.z)
+        if a.connected or b.connected:
+            findings.append(Finding(OVERLAP, a.key, b.key, point, gap))
+        elif a.profile != b.profile:
+            findings.append(Finding(SIZE_MISMATCH, a.key, b.key, point, gap,
+                                    '{} to {}, not connected'.format(_describe(a.profile), _describe(b.profile))))
+        elif facing(a, b, min_cos):
+            findings.append(Finding(NEAR_MISS, a.key, b.key, point, gap))
+        else:
+            beside.setdefault(i, (b.key, gap))
+            beside.setdefault(j, (a.key, gap))
+            continue
+        reported.add(i)
+        reported.add(j)
+    for n, end in enumerate(ends):
+        if end.connected or n in reported:
+            continue
+        if n in beside:
+            other, gap = beside[n]
+            findings.append(Finding(DANGLING, end.key, other, (end.x, end.y, end.z), gap, 'Beside, not facing'))
+        else:
+            findings.append(Finding(DANGLING, end.key, None, (end.x, end.y, end.z)))
+    return findings
+
+
+def audit_model(collectors, tolerance=TOLERANCE, angle=ANGLE_TOL, scanned=None):
+    """ Reads every part once and audits their connectors
+    :param collectors: list of (category name, iterable of parts), see Selection.Duplicates.fabrication_collectors
+    :param scanned: optional dict, filled with the parts read per category
+    :return: list of Finding"""
+    ends = []
+    findings = []
+    for category, elements in collectors:
+        count = 0
+        for element in elements:
+            count += 1
+            read_part(element, ends, findings)
+        if scanned is not None:
+            scanned[category] = scanned.get(category, 0) + count
+    return findings + audit_ends(ends, tolerance, angle)
+
+
+class AuditReport(object):
+    COLUMNS = ['Finding', 'Element Id', 'Other Id', 'X', 'Y', 'Z', 'Gap (in)', 'Note']
+
+    def __init__(self, findings):
+        self.findings = sorted(findings, key=lambda f: KINDS.index(f.kind))
+
+    def counts(self):
+        counts = dict((kind, 0) for kind in KINDS)
+        for finding in self.findings:
+            counts[finding.kind] += 1
+        return counts
+
+    def ids(self, kind=None):
+        """ Id values of the parts in the findings of kind, every kind when None """
+        ids = []
+        seen = set()
+        for finding in self.findings:
+            if kind is not None and finding.kind != kind:
+                continue
+            for key in (finding.key, finding.other):
+                if key is not None and key not in seen:
+                    seen.add(key)
+                    ids.append(key)
+        return ids
+
+    def to_rows(self):
+        rows = [self.COLUMNS]
+        for f in self.findings:
+            x, y, z = f.point
+            gap = round(f.gap * 12.0, 4) if f.gap is not None else ''
+            rows.append([f.kind, f.key, f.other if f.other is not None else '', round(x, 4), round(y, 4),
+                         round(z, 4), gap, f.note])
+        return rows
+
+    def write_csv(self, path):
+        return write_csv(path, self.to_rows())
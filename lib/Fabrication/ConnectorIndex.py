@@ -0,0 +1,118 @@
+# -*- coding: UTF-8 -*-
+# Spatial hash of connector origins.
+#
+# Origins are bucketed into cubic cells one tolerance wide, so every origin
+# closer than the tolerance to a point sits in the point's cell or one of
+# its 26 neighbours. Building the index reads each connector once; a lookup
+# touches 27 buckets instead of every connector of the selection.
+#
+# Only duck-types the Revit API (ConnectorManager.Connectors, Origin, Id).
+import math
+
+from Parameters.Get_Set_Params import get_id_value
+
+TOLERANCE = 0.1     # ft, the distance PlacePipeHangers treats as connected
+
+
+class ConnectorEntry(object):
+    __slots__ = ('element', 'key', 'position', 'connector', 'index', 'x', 'y', 'z')
+
+    def __init__(self, element, key, position, connector, index):
+        self.element = element
+        self.key = key              # element id value
+        self.position = position    # element order in the indexed selection
+        self.connector = connector
+        self.index = index          # connector order on its element
+        origin = connector.Origin
+        self.x = origin.X
+        self.y = origin.Y
+        self.z = origin.Z
+
+
+class ConnectorIndex(object):
+    def __init__(self, elements, tolerance=TOLERANCE, connectors=None):
+        """ Indexes the connectors of elements, in selection order
+        :param tolerance: match distance, also the cell size
+        :param connectors: callable(element) -> connectors to index, default all of them"""
+        self.tolerance = tolerance
+        self.get_connectors = connectors
+        self.cells = {}
+        self.elements = []
+        self.positions = {}     # id value -> selection order
+        self.entries = {}       # id value -> [ConnectorEntry] in connector order
+        for element in elements:
+            self.add(element)
+
+    def cell(self, x, y, z):
+        t = self.tolerance
+        return (int(math.floor(x / t)), int(math.floor(y / t)), int(math.floor(z / t)))
+
+    def add(self, element):
+        key = get_id_value(element.Id)
+        if key in self.positions:
+            return
+        position = len(self.elements)
+        self.positions[key] = position
+        self.elements.append(element)
+        entries = []
+        try:
+            if self.get_connectors is not None:
+                connectors = list(self.get_connectors(element))
+            else:
+                connectors = list(element.ConnectorManager.Connectors)
+        except:
+            connectors = []
+        for i, connector in enumerate(connectors):
+            entry = ConnectorEntry(element, key, position, connector, i)
+            entries.append(entry)
+            self.cells.setdefault(self.cell(entry.x, entry.y, entry.z), []).append(entry)
+        self.entries[key] = entries
+
+    def connectors(self, element):
+        """ Connectors of an indexed element, read once """
+        return [e.connector for e in self.entries.get(get_id_value(element.Id), ())]
+
+    def position(self, element):
+        return self.positions.get(get_id_value(element.Id))
+
+    def near(self, point, tolerance=None):
+        """ Entries whose origin is closer than tolerance to point
+        :param tolerance: at most the index tolerance"""
+        tolerance = self.tolerance if tolerance is None else tolerance
+        x, y, z = point.X, point.Y, point.Z
+        cx, cy, cz = self.cell(x, y, z)
+        limit = tolerance * tolerance
+        cells = self.cells
+        found = []
+        for i in (cx - 1, cx, cx + 1):
+            for j in (cy - 1, cy, cy + 1):
+                for k in (cz - 1, cz, cz + 1):
+                    bucket = cells.get((i, j, k))
+                    if not bucket:
+                        continue
+                    for entry in bucket:
+                        dx = entry.x - x
+                        dy = entry.y - y
+                        dz = entry.z - z
+                        if dx * dx + dy * dy + dz * dz < limit:
+                            found.append(entry)
+        return found
+
+    def neighbours(self, element, members=None):
+        """ Keys of other elements with a connector closer than the tolerance
+        to one of element's connectors
+        :param members: optional set of keys to restrict the result to"""
+        key = get_id_value(element.Id)
+        result = set()
+        for entry in self.entries.get(key, ()):
+            for other in self.near(entry.connector.Origin):
+                if other.key != key and (members is None or other.key in members):
+                    result.add(other.key)
+        return result
+
+    def is_connected(self, entry, members=None):
+        """ True when another element (in members) has a connector at entry """
+        for other in self.near(entry.connector.Origin):
+            if other.key != entry.key and (members is None or other.key in members):
+                return True
+        return False
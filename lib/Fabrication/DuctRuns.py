@@ -0,0 +1,279 @@
+# -*- coding: UTF-8 -*-
+# Run grouping and hanger positions for PlaceDuctHangers.
+#
+# Hosts are linked through a ConnectorIndex over their main connectors, so
+# grouping reads every connector once instead of comparing all pairs.
+# Along a run, tap zones sit in an interval list sorted by start and the
+# part spans are searched by bisection, so each hanger position costs a
+# lookup instead of a pass over every zone and span of the run.
+#
+# Runs, entry connectors and hanger positions come out as the original
+# pairwise version produced them. Only duck-types the Revit API; connector
+# shapes are compared by ConnectorProfileType member name.
+from bisect import bisect_left, bisect_right
+from collections import deque
+
+from Fabrication.ConnectorIndex import ConnectorIndex
+
+from Parameters.Get_Set_Params import get_id_value
+
+CONNECT_TOL = 0.1
+TAP_BUFFER = 0.5        # ft kept clear on both sides of a tap
+TAP_SHIFT = 0.25        # ft a hanger is moved past a tap zone
+MAX_RUN = 1000          # parts walked per run
+
+
+def get_connectors(element):
+    try: return list(element.ConnectorManager.Connectors)
+    except: return []
+
+
+def get_main_connectors(elem):
+    """ The two connectors spanning the centreline, taps excluded """
+    conns = get_connectors(elem)
+    if len(conns) <= 2: return conns
+
+    try:
+        L = elem.CenterlineLength
+    except:
+        L = 0.0
+
+    if L <= 0:
+        return conns[:2]
+
+    best_pair = (conns[0], conns[1])
+    min_diff = float('inf')
+
+    for i in range(len(conns)):
+        for j in range(i + 1, len(conns)):
+            d = conns[i].Origin.DistanceTo(conns[j].Origin)
+            diff = abs(d - L)
+            if diff < min_diff:
+                min_diff = diff
+                best_pair = (conns[i], conns[j])
+    return list(best_pair)
+
+
+def _adjacency(index, keys):
+    # Same neighbour order as the pairwise scan: by partner selection order,
+    # then by connector order on the earlier of the two parts
+    adj = dict((k, []) for k in keys)
+    for k in keys:
+        pos = index.positions[k]
+        for entry in index.entries[k]:
+            first = {}
+            for other in index.near(entry.connector.Origin):
+                if other.position <= pos:
+                    continue
+                current = first.get(other.key)
+                if current is None or other.index < current.index:
+                    first[other.key] = other
+            for other in first.values():
+                adj[k].append(((other.position, entry.index), (other.key, entry.connector, other.connector)))
+                adj[other.key].append(((pos, entry.index), (k, other.connector, entry.connector)))
+    for k in keys:
+        adj[k] = [link for _, link in sorted(adj[k], key=lambda item: item[0])]
+    return adj
+
+
+def group_into_runs(valid_hosts, tolerance=CONNECT_TOL):
+    """ Connected hosts as ordered runs, walked from an open end
+    :return: list of runs, each a list of (part, entry connector)"""
+    index = ConnectorIndex(valid_hosts, tolerance, connectors=get_main_connectors)
+    keys = [get_id_value(e.Id) for e in index.elements]
+    host_dict = dict(zip(keys, index.elements))
+    adj = _adjacency(index, keys)
+
+    runs = []
+    unvisited = set(keys)
+
+    while unvisited:
+        start_id = unvisited.pop()
+        comp = [start_id]
+        queue = deque([start_id])
+
+        while queue:
+            curr = queue.popleft()
+            for nxt, _, _ in adj[curr]:
+                if nxt in unvisited:
+                    unvisited.remove(nxt)
+                    queue.append(nxt)
+                    comp.append(nxt)
+
+        # A component holds every neighbour of its members
+        endpoints = [nid for nid in comp if len(adj[nid]) <= 1]
+        start_node = endpoints[0] if endpoints else comp[0]
+
+        curr = start_node
+        prev = None
+        m_conns = [e.connector for e in index.entries[curr]]
+        if len(adj[curr]) == 1:
+            shared_c = adj[curr][0][1]
+            entry_conn = m_conns[0] if m_conns[1].Id == shared_c.Id else m_conns[1]
+        else:
+            entry_conn = m_conns[0]
+
+        ordered = []
+        while curr is not None and len(ordered) < MAX_RUN:
+            ordered.append((host_dict[curr], entry_conn))
+            next_step = None
+            for nxt, my_conn, their_conn in adj[curr]:
+                if nxt != prev:
+                    next_step = (nxt, their_conn)
+                    break
+            if next_step:
+                prev = curr
+                curr, entry_conn = next_step
+            else:
+                break
+
+        runs.append(ordered)
+
+    return runs
+
+
+def part_spans(run):
+    """ Distance along the run covered by each part
+    :return: (list of span dicts, run length)"""
+    run_length = 0.0
+    spans = []
+
+    for i in range(len(run)):
+        part, entry_conn = run[i]
+        m_conns = get_main_connectors(part)
+        exit_conn = m_conns[1] if m_conns[0].Id == entry_conn.Id else m_conns[0]
+
+        L = entry_conn.Origin.DistanceTo(exit_conn.Origin)
+        if L <= 0: L = 0.1
+
+        spans.append({
+            "part": part,
+            "entry_conn": entry_conn,
+            "exit_conn": exit_conn,
+            "start": run_length,
+            "end": run_length + L,
+            "L": L
+        })
+
+        run_length += L
+        if i < len(run) - 1:
+            next_part, next_entry = run[i + 1]
+            run_length += exit_conn.Origin.DistanceTo(next_entry.Origin)
+
+    return spans, run_length
+
+
+class TapZones(object):
+    def __init__(self, zones):
+        """ Stabbing queries over (start, end) intervals along a run
+        :param zones: intervals in creation order, which decides ties"""
+        self.zones = list(zones)
+        self.order = sorted(range(len(self.zones)), key=lambda n: self.zones[n][0])
+        self.starts = [self.zones[n][0] for n in self.order]
+        # reach[i]: furthest end among the first i + 1 zones by start
+        self.reach = []
+        furthest = float('-inf')
+        for n in self.order:
+            furthest = max(furthest, self.zones[n][1])
+            self.reach.append(furthest)
+
+    def __len__(self):
+        return len(self.zones)
+
+    def first_containing(self, pos):
+        """ Earliest created zone with start <= pos <= end, None when pos is clear """
+        i = bisect_right(self.starts, pos) - 1
+        best = None
+        while i >= 0 and self.reach[i] >= pos:
+            n = self.order[i]
+            if self.zones[n][1] >= pos and (best is None or n < best):
+                best = n
+            i -= 1
+        return self.zones[best] if best is not None else None
+
+
+def tap_zones(spans):
+    """ Zones around the tap and branch connectors of a run, tap width plus a buffer each side """
+    zones = []
+    for span in spans:
+        main_ids = {span["entry_conn"].Id, span["exit_conn"].Id}
+        if span["exit_conn"].Origin.IsAlmostEqualTo(span["entry_conn"].Origin): continue
+        direction = span["exit_conn"].Origin.Subtract(span["entry_conn"].Origin).Normalize()
+
+        for c in get_connectors(span["part"]):
+            if c.Id in main_ids: continue
+            v = c.Origin.Subtract(span["entry_conn"].Origin)
+            tap_loc = span["start"] + v.DotProduct(direction)
+
+            tap_width = 1.0
+            try:
+                shape = str(c.Shape)
+                if shape == 'Rectangular': tap_width = max(c.Width, c.Height)
+                elif shape == 'Round': tap_width = c.Radius * 2.0
+            except: pass
+
+            half_w = tap_width / 2.0
+            zones.append((tap_loc - half_w - TAP_BUFFER, tap_loc + half_w + TAP_BUFFER))
+    return TapZones(zones)
+
+
+def hanger_targets(run_length, dist_from_end, spacing, zones):
+    """ Hanger distances along a run: one per end, spacing apart in between,
+    stepping off taps
+    :param zones: TapZones of the run"""
+    targets = []
+    start_target = dist_from_end
+    end_target = run_length - dist_from_end
+    gap_length = end_target - start_target
+
+    if run_length <= dist_from_end * 2.0 or gap_length < 1.0:
+        targets.append(run_length / 2.0)
+        return targets
+
+    targets.append(start_target)
+    current_pos = start_target + spacing
+
+    loop_guard = 0
+    while current_pos < end_target - 0.5 and loop_guard < 500:
+        loop_guard += 1
+
+        zone = zones.first_containing(current_pos)
+        if zone is not None:
+            # Pull back before the tap unless that crowds the previous hanger
+            shifted_pos = zone[0] - TAP_SHIFT
+            if shifted_pos < targets[-1] + 1.0:
+                shifted_pos = zone[1] + TAP_SHIFT
+            current_pos = shifted_pos
+
+        if current_pos >= end_target - 0.5:
+            break
+
+        targets.append(current_pos)
+        current_pos += spacing
+
+    targets.append(end_target)
+    return targets
+
+
+def locate_targets(targets, spans, tolerance=CONNECT_TOL):
+    """ Part and distance from its entry connector for each target
+    :return: list of (span, local position)"""
+    # Spans follow each other along the run, so ends are sorted
+    ends = [span["end"] + tolerance for span in spans]
+    located = []
+    for t_abs in targets:
+        i = bisect_left(ends, t_abs)
+        if i == len(spans) or spans[i]["start"] - tolerance > t_abs:
+            continue
+        span = spans[i]
+        # Keep clear of the connector faces
+        local_pos = max(0.1, min(t_abs - span["start"], span["L"] - 0.1))
+        located.append((span, local_pos))
+    return located
+
+
+def hanger_positions(run, dist_from_end, spacing, tolerance=CONNECT_TOL):
+    """ :return: list of (span, local position) for one run from group_into_runs"""
+    spans, run_length = part_spans(run)
+    targets = hanger_targets(run_length, dist_from_end, spacing, tap_zones(spans))
+    return locate_targets(targets, spans, tolerance)
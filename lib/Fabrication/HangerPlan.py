@@ -0,0 +1,395 @@
+# -*- coding: UTF-8 -*-
+# Hanger layout for PlacePipeHangers, planned before anything is created.
+#
+# plan_selection works out every hanger of a selection - the per pipe joint
+# rules and the spacing walk along the straight segments of each run - into
+# a HangerPlan of plain placements: host, connector and distance as
+# CreateHanger takes them, plus the point and pipe direction they land on.
+# execute_plan then creates the whole plan in the caller's transaction,
+# resolving each hanger button once per hanger name and service.
+#
+# A plan can be written to CSV for a dry run, with each placement marked
+# against the hangers already hosted on the parts. Planning only reads
+# connectors and CenterlineLength; nothing here imports Revit at module level.
+import math
+
+from Diagnostics.Reports import write_csv
+from Fabrication.ConnectorIndex import ConnectorIndex
+from Parameters.Get_Set_Params import get_id_value
+from Fabrication.PipeChains import (vertical_fab, is_pipe, get_pipe_direction, group_networks, find_best_start,
+                                    walk_chain, find_branch_start)
+
+DIRECTION_DOT_THRESHOLD = 0.999
+MARGIN = 0.01
+MATCH_TOL = 0.1         # ft between a planned and an existing hanger
+
+# Placement kinds
+END = 'end'             # dist from end off a connector
+SPACING = 'spacing'     # spacing apart between the ends
+CENTER = 'center'       # middle of a part too short for two end hangers
+
+NEW = 'new'
+EXISTING = 'existing'
+
+
+def is_disabled_hanger(hanger_name):
+    if not hanger_name: return True
+    h = hanger_name.strip().upper()
+    return h == "" or h == "--- NONE ---" or "NONE" in h
+
+
+class Placement(object):
+    __slots__ = ('host', 'connector', 'distance', 'hanger', 'service', 'kind', 'point', 'direction', 'status')
+
+    def __init__(self, host, connector, distance, hanger, service, kind, point=None, direction=None):
+        self.host = host
+        self.connector = connector      # CreateHanger measures distance from here
+        self.distance = distance
+        self.hanger = hanger
+        self.service = service
+        self.kind = kind
+        self.point = point
+        self.direction = direction      # unit pipe direction at the hanger
+        self.status = NEW
+
+    @property
+    def host_key(self):
+        return get_id_value(self.host.Id)
+
+    def to_row(self):
+        p = self.point
+        d = self.direction
+        return [self.host_key, self.service, self.hanger, self.kind, round(self.distance, 4),
+                round(p.X, 4) if p else '', round(p.Y, 4) if p else '', round(p.Z, 4) if p else '',
+                round(d.X, 4) if d else '', round(d.Y, 4) if d else '', round(d.Z, 4) if d else '',
+                self.status]
+
+    def __repr__(self):
+        return '<Placement {} {} {:.3f} {}>'.format(self.host_key, self.hanger, self.distance, self.kind)
+
+
+class HangerPlan(object):
+    COLUMNS = ['Host Id', 'Service', 'Hanger', 'Kind', 'Distance', 'X', 'Y', 'Z', 'DirX', 'DirY', 'DirZ',
+               'Status']
+
+    def __init__(self):
+        self.placements = []
+
+    def __len__(self):
+        return len(self.placements)
+
+    def __iter__(self):
+        return iter(self.placements)
+
+    def add(self, placement):
+        self.placements.append(placement)
+
+    def counts(self):
+        """ {hanger name: placements} """
+        result = {}
+        for p in self.placements:
+            result[p.hanger] = result.get(p.hanger, 0) + 1
+        return result
+
+    def host_keys(self):
+        return set(p.host_key for p in self.placements)
+
+    def compare(self, existing, tolerance=MATCH_TOL):
+        """ Marks placements within tolerance of an existing hanger on the same host
+        :param existing: list of (host key, point) of hangers in the model
+        :return: (new placements, existing hangers nothing was planned for)"""
+        by_host = {}
+        for host_key, point in existing:
+            by_host.setdefault(host_key, []).append(point)
+        used = set()
+        new = []
+        for p in self.placements:
+            p.status = NEW
+            for i, point in enumerate(by_host.get(p.host_key, ())):
+                if (p.host_key, i) not in used and p.point is not None and \
+                        p.point.DistanceTo(point) < tolerance:
+                    used.add((p.host_key, i))
+                    p.status = EXISTING
+                    break
+            if p.status == NEW:
+                new.append(p)
+        unplanned = [(k, pt) for k, points in by_host.items() for i, pt in enumerate(points) if (k, i) not in used]
+        return new, unplanned
+
+    def to_rows(self):
+        return [self.COLUMNS] + [p.to_row() for p in self.placements]
+
+    def write_csv(self, path):
+        return write_csv(path, self.to_rows())
+
+
+# ------------------------------------------------------------------------------------
+# Planning
+# ------------------------------------------------------------------------------------
+def point_along(connector, other, distance):
+    """ Point distance in from connector toward other, and the unit direction """
+    direction = get_pipe_direction(connector.Origin, other.Origin)
+    if direction is None:
+        return connector.Origin, None
+    return connector.Origin.Add(direction.Multiply(distance)), direction
+
+
+def plan_joints(plan, element, rule, service):
+    """ Hangers of one pipe hung by itself: one per end, spacing apart between
+    them, or one in the middle of a short pipe """
+    hanger_name, sp, dist_from_end, _ = rule
+    pipelen = element.CenterlineLength
+    pipe_connectors = list(element.ConnectorManager.Connectors)
+    if not pipe_connectors: return
+
+    def add(connector, distance, kind):
+        others = [c for c in pipe_connectors if c.Id != connector.Id]
+        point, direction = point_along(connector, others[0], distance) if others else (None, None)
+        plan.add(Placement(element, connector, distance, hanger_name, service, kind, point, direction))
+
+    if pipelen < 2 * dist_from_end:
+        add(pipe_connectors[0], pipelen / 2.0, CENTER)
+    else:
+        for c in pipe_connectors:
+            add(c, dist_from_end, END)
+        if pipelen > sp + 2 * dist_from_end:
+            pos = dist_from_end
+            for _ in range(int((math.floor(pipelen) - 2 * dist_from_end) / sp)):
+                pos += sp
+                add(pipe_connectors[0], pos, SPACING)
+
+
+def chain_to_segments(ordered_chain, entry_conns):
+    """ Horizontal pipes of a chain split where the direction turns
+    :return: list of segments, each a list of pipe dicts"""
+    pipe_dicts = []
+    for e in ordered_chain:
+        if not is_pipe(e) or vertical_fab(e):
+            continue
+        entry_conn = entry_conns.get(e.Id)
+        if entry_conn is None:
+            entry_conn = next(iter(e.ConnectorManager.Connectors), None)
+        if entry_conn is None:
+            continue
+        exit_conn = None
+        for c in e.ConnectorManager.Connectors:
+            if c.Id != entry_conn.Id:
+                exit_conn = c
+                break
+        if exit_conn is None:
+            continue
+        direction = get_pipe_direction(entry_conn.Origin, exit_conn.Origin)
+        pipe_dicts.append({
+            'element':    e,
+            'length':     e.CenterlineLength,
+            'entry_xyz':  entry_conn.Origin,
+            'exit_xyz':   exit_conn.Origin,
+            'entry_conn': entry_conn,
+            'direction':  direction,
+        })
+
+    if not pipe_dicts:
+        return []
+
+    segments = []
+    current_seg = [pipe_dicts[0]]
+    for i in range(1, len(pipe_dicts)):
+        prev_dir = pipe_dicts[i-1]['direction']
+        curr_dir = pipe_dicts[i]['direction']
+        if prev_dir is not None and curr_dir is not None:
+            dot = prev_dir.DotProduct(curr_dir)
+        else:
+            dot = 1.0
+        if dot < DIRECTION_DOT_THRESHOLD:
+            segments.append(current_seg)
+            current_seg = [pipe_dicts[i]]
+        else:
+            current_seg.append(pipe_dicts[i])
+    segments.append(current_seg)
+    return segments
+
+
+def plan_segment(plan, pipe_list, rule, service, force_end_hanger):
+    """ Hangers along one straight segment: dist from end off its start,
+    then spacing apart measured along the pipes and across the joints
+    :param force_end_hanger: last segment of a run, ends with a hanger dist from its end"""
+    hanger_name, spacing, distancefromend, _ = rule
+
+    def add(pd, distance, kind):
+        # Where CreateHanger puts it, clamped offsets included
+        point = pd['entry_xyz'].Add(pd['direction'].Multiply(distance)) if pd['direction'] is not None else None
+        plan.add(Placement(pd['element'], pd['entry_conn'], distance, hanger_name, service, kind, point,
+                           pd['direction']))
+
+    def walk(start_idx, start_xyz, distance):
+        idx = start_idx
+        remaining = distance
+        cur_xyz = start_xyz
+        while idx < len(pipe_list):
+            pd = pipe_list[idx]
+            dist_to_exit = cur_xyz.DistanceTo(pd['exit_xyz'])
+            if remaining <= dist_to_exit + MARGIN:
+                direction = pd['exit_xyz'].Subtract(cur_xyz).Normalize()
+                landing = cur_xyz.Add(direction.Multiply(remaining))
+                local = pd['entry_xyz'].DistanceTo(landing)
+                return (idx, landing, local)
+            remaining -= dist_to_exit
+            next_idx = idx + 1
+            if next_idx >= len(pipe_list):
+                return None
+            gap = pd['exit_xyz'].DistanceTo(pipe_list[next_idx]['entry_xyz'])
+            remaining -= gap
+            if remaining < 0:
+                remaining = 0.0
+            cur_xyz = pipe_list[next_idx]['entry_xyz']
+            idx = next_idx
+        return None
+
+    first = pipe_list[0]
+    first_local = first['length'] / 2.0 if first['length'] < 2 * distancefromend else distancefromend
+    unit_dir = first['exit_xyz'].Subtract(first['entry_xyz']).Normalize()
+    cur_hanger_xyz = first['entry_xyz'].Add(unit_dir.Multiply(first_local))
+    cur_pipe_idx = 0
+    add(first, first_local, CENTER if first['length'] < 2 * distancefromend else END)
+
+    last_pipe = pipe_list[-1]
+    last_exit_xyz = last_pipe['exit_xyz']
+    end_local = last_pipe['length'] / 2.0 if last_pipe['length'] < 2 * distancefromend else last_pipe['length'] - distancefromend
+
+    while True:
+        result = walk(cur_pipe_idx, cur_hanger_xyz, spacing)
+        if result is None:
+            break
+        next_idx, next_xyz, local_offset = result
+        if force_end_hanger:
+            dist_to_end = next_xyz.DistanceTo(last_exit_xyz)
+            if dist_to_end < distancefromend - MARGIN:
+                break
+        pd = pipe_list[next_idx]
+        local_offset = max(MARGIN, min(local_offset, pd['length'] - MARGIN))
+        add(pd, local_offset, SPACING)
+
+        cur_hanger_xyz = next_xyz
+        cur_pipe_idx = next_idx
+
+    if force_end_hanger:
+        add(last_pipe, end_local, CENTER if last_pipe['length'] < 2 * distancefromend else END)
+
+
+def plan_run(plan, ordered_chain, entry_conns, rule_for, service_for):
+    """ Plans each segment of a chain with the rule of its first pipe """
+    segments = chain_to_segments(ordered_chain, entry_conns)
+    for i, seg in enumerate(segments):
+        is_last = (i == len(segments) - 1)
+        first_pipe = seg[0]['element']
+        rule = rule_for(first_pipe)
+        if is_disabled_hanger(rule[0]):
+            continue
+        plan_segment(plan, seg, rule, service_for(first_pipe), is_last)
+
+
+def plan_selection(selected_elements, rule_for, service_for, index=None, plan=None):
+    """ Every hanger PlacePipeHangers places for a selection, per service:
+    joint rules pipe by pipe, then the runs of the remaining parts
+    :param rule_for: callable(element) -> (hanger name, spacing, dist from end, joints)
+    :param service_for: callable(element) -> service name
+    :param index: ConnectorIndex over the selection, built when None
+    :return: HangerPlan"""
+    if index is None:
+        index = ConnectorIndex(selected_elements)
+    if plan is None:
+        plan = HangerPlan()
+
+    elements_by_service = {}
+    for e in selected_elements:
+        svc_name = service_for(e)
+        if svc_name not in elements_by_service:
+            elements_by_service[svc_name] = []
+        elements_by_service[svc_name].append(e)
+
+    for svc_name, svc_elements in elements_by_service.items():
+        joints_elements = []
+        chain_elements = []
+        for e in svc_elements:
+            hanger_name, _, _, joints = rule_for(e)
+            if is_disabled_hanger(hanger_name):
+                continue
+            if joints:
+                joints_elements.append(e)
+            else:
+                chain_elements.append(e)
+
+        for e in joints_elements:
+            if not is_pipe(e) or vertical_fab(e): continue
+            plan_joints(plan, e, rule_for(e), svc_name)
+
+        if not chain_elements:
+            continue
+        for network in group_networks(chain_elements, index):
+            start_element, start_connector = find_best_start(network, index)
+            if not start_element or not start_connector: continue
+
+            main_chain, main_entry_conns, leftovers = walk_chain(network, start_element, start_connector, index)
+            plan_run(plan, main_chain, main_entry_conns, rule_for, service_for)
+
+            for branch_elems in group_networks(leftovers, index):
+                branch_start, branch_start_conn = find_branch_start(branch_elems, main_chain, index)
+                branch_chain, branch_entry_conns, _ = walk_chain(branch_elems, branch_start, branch_start_conn,
+                                                                 index)
+                plan_run(plan, branch_chain, branch_entry_conns, rule_for, service_for)
+    return plan
+
+
+# ------------------------------------------------------------------------------------
+# Execution
+# ------------------------------------------------------------------------------------
+def execute_plan(doc, plan, button_for, attach=True, create=None):
+    """ Creates the placements of plan, inside a transaction the caller holds open
+    :param button_for: callable(hanger name, service name) -> button or None, called once per pair
+    :param create: CreateHanger to call, FabricationPart.CreateHanger when None
+    :return: (hangers created, placements skipped for a missing button or a failed create)"""
+    if create is None:
+        from Autodesk.Revit.DB import FabricationPart
+        create = FabricationPart.CreateHanger
+    buttons = {}
+    created = 0
+    skipped = 0
+    for p in plan:
+        key = (p.hanger, p.service)
+        if key not in buttons:
+            try:
+                buttons[key] = button_for(p.hanger, p.service)
+            except:
+                buttons[key] = None
+        btn = buttons[key]
+        if not btn:
+            skipped += 1
+            continue
+        try:
+            create(doc, btn, p.host.Id, p.connector, p.distance, attach)
+            created += 1
+        except:
+            skipped += 1
+    return created, skipped
+
+
+def existing_hangers(hangers, host_keys=None):
+    """ (host key, point) of hosted hangers, for HangerPlan.compare
+    :param host_keys: only hangers on these hosts when given"""
+    result = []
+    for hanger in hangers:
+        try:
+            host_key = get_id_value(hanger.GetHostedInfo().HostId)
+        except:
+            continue
+        if host_keys is not None and host_key not in host_keys:
+            continue
+        try:
+            point = hanger.Origin
+        except:
+            try:
+                point = hanger.Location.Point
+            except:
+                continue
+        result.append((host_key, point))
+    return result
@@ -0,0 +1,175 @@
+# -*- coding: UTF-8 -*-
+# Compiled PlacePipeHangers spacing rules.
+#
+# The "PipeHangerConfigData" DataStorage holds one line per service:
+#
+#   Service Name=size:hanger:spacing:dist:joints|size:hanger:spacing:dist:joints|...
+#
+# (older payloads drop dist, or carry a single hanger|spacing[|dist]|joints
+# rule for every size). CompiledRules parses the payload once into a map of
+# normalized service names with a sorted size table per service, so a rule
+# is a dictionary hit plus a bisection instead of a scan over every service
+# and size.
+#
+# pyRevit reloads this module on every button press, so the parsed settings
+# are cached per document as JSON on the AppDomain for the Revit session,
+# next to a hash of the payload they came from. A later run with the same
+# payload rebuilds the tables from the cached settings instead of parsing
+# the payload again; saving new settings from the config tool changes the
+# payload and so reparses on the next run.
+import hashlib
+import json
+from bisect import bisect_left
+
+try:
+    import System
+except ImportError:
+    System = None       # headless, no session cache
+
+NONE_RULE = ("--- NONE ---", 10.0, 1.0, True)
+DEFAULT_SIZE = 999.0
+SESSION_KEY = "WayTools.HangerRules|{}"
+
+
+def _rule(size, hanger, spacing, dist_from_end, joints):
+    return {
+        "size": float(size),
+        "hanger": hanger.strip(),
+        "spacing": float(spacing),
+        "dist_from_end": float(dist_from_end),
+        "joints": joints.strip().lower() == "true"
+    }
+
+
+def parse_payload(text):
+    """ Settings as {service key: [rule dicts sorted by size]}, bad entries skipped """
+    settings = {}
+    for line in (text or "").split("\n"):
+        line = line.strip()
+        if "=" not in line:
+            continue
+        key, rule_block = line.split("=", 1)
+        key = key.strip()
+        rule_block = rule_block.strip()
+        rules = []
+
+        if ":" not in rule_block:
+            vals = rule_block.split("|")
+            try:
+                if len(vals) == 3:
+                    rules.append(_rule(DEFAULT_SIZE, vals[0], vals[1].strip(), 1.0, vals[2]))
+                elif len(vals) == 4:
+                    rules.append(_rule(DEFAULT_SIZE, vals[0], vals[1].strip(), vals[2].strip(), vals[3]))
+            except ValueError:
+                pass
+        else:
+            for rs in rule_block.split("|"):
+                r_parts = rs.split(":")
+                try:
+                    if len(r_parts) == 4:
+                        rules.append(_rule(r_parts[0].strip(), r_parts[1], r_parts[2].strip(), 1.0, r_parts[3]))
+                    elif len(r_parts) == 5:
+                        rules.append(_rule(r_parts[0].strip(), r_parts[1], r_parts[2].strip(),
+                                           r_parts[3].strip(), r_parts[4]))
+                except ValueError:
+                    pass
+
+        if rules:
+            rules.sort(key=lambda x: x["size"])
+            settings[key] = rules
+    return settings
+
+
+class CompiledRules(object):
+    def __init__(self, settings, payload=None):
+        """ :param settings: parsed payload, see parse_payload
+        :param payload: text the settings came from, to tell when they go stale"""
+        self.settings = settings
+        self.payload = payload
+        self.exact = {}
+        self.fuzzy = []     # (normalized key, table) in settings order
+        for key, rules in settings.items():
+            table = ([r["size"] for r in rules],
+                     [(r["hanger"], r["spacing"], r.get("dist_from_end", 1.0), r["joints"]) for r in rules])
+            name = key.strip().lower()
+            if name not in self.exact:
+                self.exact[name] = table
+            self.fuzzy.append((name, table))
+        self._by_service = {}
+
+    @classmethod
+    def from_payload(cls, text):
+        return cls(parse_payload(text), text)
+
+    def __len__(self):
+        return len(self.settings)
+
+    def table(self, service_name):
+        """ (sizes, rules) for a service: exact name first, then the first
+        configured name containing or contained in it """
+        svc_name = (service_name or "").strip().lower()
+        if svc_name in self._by_service:
+            return self._by_service[svc_name]
+        table = self.exact.get(svc_name)
+        if table is None:
+            for name, candidate in self.fuzzy:
+                if name in svc_name or svc_name in name:
+                    table = candidate
+                    break
+        self._by_service[svc_name] = table
+        return table
+
+    def rule_for(self, service_name, size_inches):
+        """ :return: (hanger name, spacing, distance from end, joints) of the
+        smallest rule size that fits, the largest rule past the table"""
+        table = self.table(service_name)
+        if table is None:
+            return NONE_RULE
+        sizes, rules = table
+        i = bisect_left(sizes, size_inches)
+        return rules[i] if i < len(rules) else rules[-1]
+
+
+# ------------------------------------------------------------------------------------
+# Session cache
+# ------------------------------------------------------------------------------------
+def _doc_key(doc):
+    try:
+        return SESSION_KEY.format(doc.PathName or doc.Title)
+    except:
+        return SESSION_KEY.format(id(doc))
+
+
+def payload_hash(payload):
+    return hashlib.md5((payload or "").encode("utf-8")).hexdigest()
+
+
+def get_cached(doc, payload):
+    """ Settings cached for doc when they came from payload, else None """
+    if System is None:
+        return None
+    data = System.AppDomain.CurrentDomain.GetData(_doc_key(doc))
+    if not data:
+        return None
+    try:
+        cached = json.loads(str(data))
+    except ValueError:
+        return None
+    if cached.get("hash") != payload_hash(payload):
+        return None
+    return dict(cached.get("settings") or [])
+
+
+def set_cached(doc, payload, settings):
+    if System is not None:
+        text = json.dumps({"hash": payload_hash(payload), "settings": list(settings.items())})
+        System.AppDomain.CurrentDomain.SetData(_doc_key(doc), text)
+
+
+def compile_rules(doc, payload):
+    """ Compiled rules for doc's payload, parsed once per session while the payload is unchanged """
+    settings = get_cached(doc, payload)
+    if settings is None:
+        settings = parse_payload(payload)
+        set_cached(doc, payload, settings)
+    return CompiledRules(settings, payload)
@@ -0,0 +1,229 @@
+# -*- coding: UTF-8 -*-
+# Open fabrication connector ends and the pairs they could join.
+#
+# Every unconnected end connector is read once into an OpenEnd (origin,
+# outward direction, profile, size and domain) and hashed into cubic cells
+# one tolerance wide, like ConnectorIndex. Candidate pairs only come from the
+# 27 cells around each end, so pairing is near-linear in the number of ends
+# instead of comparing every end with every other. Two ends are compatible
+# when they sit on different parts, share domain, profile and size and face
+# each other within ANGLE_TOL.
+#
+# match_ends takes compatible pairs closest first, each end at most once,
+# and picks the part to move: never one that is held by another connection
+# or was moved or joined earlier in the batch, so aligning one pair does not
+# pull an earlier joint apart. connect_pairs aligns and couples the pairs
+# inside the transaction the caller holds open.
+#
+# Only duck-types the Revit API until connect_pairs.
+import math
+
+from Diagnostics.Reports import write_csv
+from Parameters.Get_Set_Params import get_id_value
+
+TOLERANCE = 0.5 / 12.0      # ft, default gap between the ends of a pair
+ANGLE_TOL = 5.0             # degrees the ends may be off facing each other
+COINCIDENT = 1e-6           # ft, ends this close are coupled without aligning
+SIZE_DIGITS = 4             # decimals of ft sizes are compared at
+
+
+def revit_db():
+    from Autodesk.Revit import DB
+    return DB
+
+
+def profile_key(connector):
+    """ (shape, diameter) for round connectors, (shape, width, height) for the others """
+    shape = str(connector.Shape)
+    try:
+        if shape == 'Round':
+            return shape, round(connector.Radius * 2.0, SIZE_DIGITS)
+        return shape, round(connector.Width, SIZE_DIGITS), round(connector.Height, SIZE_DIGITS)
+    except:
+        return (shape,)
+
+
+def is_end(connector):
+    try:
+        return str(connector.ConnectorType) == 'End'
+    except:
+        return True
+
+
+class OpenEnd(object):
+    __slots__ = ('element', 'key', 'position', 'connector', 'x', 'y', 'z', 'direction', 'profile', 'domain', 'held')
+
+    def __init__(self, element, key, position, connector, held):
+        self.element = element
+        self.key = key              # element id value
+        self.position = position    # element order in the scanned selection
+        self.connector = connector
+        origin = connector.Origin
+        self.x, self.y, self.z = origin.X, origin.Y, origin.Z
+        basis = connector.CoordinateSystem.BasisZ
+        self.direction = (basis.X, basis.Y, basis.Z)    # outward
+        self.profile = profile_key(connector)
+        self.domain = str(getattr(connector, 'Domain', ''))
+        self.held = held            # another connector of the part is connected
+
+    @property
+    def point(self):
+        return self.x, self.y, self.z
+
+
+def open_ends(elements):
+    """ OpenEnd of every unconnected end connector, in element then connector order """
+    ends = []
+    for position, element in enumerate(elements):
+        try:
+            connectors = [c for c in element.ConnectorManager.Connectors if is_end(c)]
+        except:
+            continue
+        held = any(c.IsConnected for c in connectors)
+        key = get_id_value(element.Id)
+        for connector in connectors:
+            if not connector.IsConnected:
+                ends.append(OpenEnd(element, key, position, connector, held))
+    return ends
+
+
+def distance(a, b):
+    return math.sqrt((a.x - b.x) ** 2 + (a.y - b.y) ** 2 + (a.z - b.z) ** 2)
+
+
+def facing(a, b, min_cos):
+    """ True when the outward directions of a and b are opposite within the angle of min_cos """
+    da, db = a.direction, b.direction
+    return da[0] * db[0] + da[1] * db[1] + da[2] * db[2] <= -min_cos
+
+
+def compatible(a, b, min_cos):
+    return a.key != b.key and a.domain == b.domain and a.profile == b.profile and facing(a, b, min_cos)
+
+
+def near_pairs(ends, tolerance):
+    """ (gap, i, j) of the ends closer than tolerance, i < j, on different parts
+    :param ends: list of objects with x, y, z and key"""
+    cells = {}
+    for n, end in enumerate(ends):
+        cell = (int(math.floor(end.x / tolerance)), int(math.floor(end.y / tolerance)),
+                int(math.floor(end.z / tolerance)))
+        cells.setdefault(cell, []).append(n)
+
+    pairs = []
+    for (cx, cy, cz), members in cells.items():
+        for i in (cx - 1, cx, cx + 1):
+            for j in (cy - 1, cy, cy + 1):
+                for k in (cz - 1, cz, cz + 1):
+                    others = cells.get((i, j, k))
+                    if not others:
+                        continue
+                    for a in members:
+                        for b in others:
+                            if b <= a or ends[a].key == ends[b].key:
+                                continue
+                            gap = distance(ends[a], ends[b])
+                            if gap < tolerance:
+                                pairs.append((gap, a, b))
+    pairs.sort()
+    return pairs
+
+
+class EndPair(object):
+    __slots__ = ('moved', 'target', 'gap', 'status', 'note')
+
+    def __init__(self, moved, target, gap):
+        self.moved = moved          # OpenEnd whose part is aligned onto target
+        self.target = target
+        self.gap = gap              # ft, before any part moved
+        self.status = None
+        self.note = ''
+
+
+def match_ends(ends, tolerance=TOLERANCE, angle=ANGLE_TOL, candidates=None):
+    """ Compatible ends paired closest first, each end used once
+    :param candidates: sorted (gap, i, j) of the ends within tolerance, near_pairs by default
+    :return: (pairs to connect, pairs skipped because neither part may move)"""
+    min_cos = math.cos(math.radians(angle))
+    fixed = set(end.key for end in ends if end.held)
+    used = set()
+    pairs = []
+    skipped = []
+    if candidates is None:
+        candidates = near_pairs(ends, tolerance)
+    for gap, i, j in candidates:
+        if i in used or j in used:
+            continue
+        a, b = ends[i], ends[j]
+        if not compatible(a, b, min_cos):
+            continue
+        if gap <= COINCIDENT or b.key not in fixed:
+            pair = EndPair(b, a, gap)
+        elif a.key not in fixed:
+            pair = EndPair(a, b, gap)
+        else:
+            pair = EndPair(b, a, gap)
+            pair.status = 'Skipped'
+            pair.note = 'Both parts are held by other connections'
+            skipped.append(pair)
+            continue
+        used.update((i, j))
+        fixed.update((a.key, b.key))
+        pairs.append(pair)
+    return pairs, skipped
+
+
+def connect_pairs(doc, pairs, api=None):
+    """ Aligns the moved part of each pair onto its target and couples them,
+    inside a transaction the caller holds open. A pair that fails is rolled
+    back on its own when the API has sub-transactions.
+    :return: number of pairs connected"""
+    api = api or revit_db()
+    sub_transaction = getattr(api, 'SubTransaction', None)
+    connected = 0
+    for pair in pairs:
+        sub = sub_transaction(doc) if sub_transaction is not None else None
+        try:
+            if sub is not None:
+                sub.Start()
+            if pair.gap > COINCIDENT:
+                api.FabricationPart.AlignPartByConnectors(doc, pair.moved.element, pair.moved.connector,
+                                                          pair.target.connector)
+            api.FabricationPart.ConnectAndCouple(doc, pair.moved.connector, pair.target.connector)
+            if sub is not None:
+                sub.Commit()
+            pair.status = 'Connected'
+            connected += 1
+        except Exception as ex:
+            if sub is not None:
+                try:
+                    sub.RollBack()
+                except:
+                    pass
+            pair.status = 'Failed'
+            pair.note = str(ex)
+    return connected
+
+
+class ConnectReport(object):
+    COLUMNS = ['Pair', 'Status', 'Moved Id', 'Target Id', 'Gap (in)', 'Shape', 'X', 'Y', 'Z', 'Note']
+
+    def __init__(self, pairs):
+        self.pairs = list(pairs)
+
+    def counts(self):
+        counts = {}
+        for pair in self.pairs:
+            counts[pair.status] = counts.get(pair.status, 0) + 1
+        return counts
+
+    def to_rows(self):
+        rows = [self.COLUMNS]
+        for n, pair in enumerate(self.pairs, 1):
+            target = pair.target
+            rows.append([n, pair.status, pair.moved.key, target.key, round(pair.gap * 12.0, 4), target.profile[0],
+                         round(target.x, 4), round(target.y, 4), round(target.z, 4), pair.note])
+        return rows
+
+    def write_csv(self, path):
+        return write_csv(path, self.to_rows())
@@ -0,0 +1,239 @@
+# -*- coding: UTF-8 -*-
+# Run extraction for PlacePipeHangers over a ConnectorIndex.
+#
+# Same results as the original scans: networks come out in the same order
+# with their members in the same order, the walk picks the same candidates,
+# and branches start at the same connector. Connectivity queries go through
+# the index instead of comparing every connector pair, so the whole
+# extraction is linear in the selection size.
+import math
+from collections import deque
+
+from Fabrication.ConnectorIndex import ConnectorIndex
+
+from Parameters.Get_Set_Params import get_id_value
+
+
+def is_cid_2875(element):
+    try:
+        return element.ItemCustomId in (2875, 875)
+    except:
+        return False
+
+
+def vertical_fab(element):
+    pts = [c.Origin for c in element.ConnectorManager.Connectors]
+    if len(pts) >= 2:
+        v = pts[1].Subtract(pts[0])
+        if v.GetLength() < 0.0001:
+            return False
+        v = v.Normalize()
+        angle_from_horizontal = math.asin(abs(v.Z))
+        threshold = math.radians(22.5)
+        return angle_from_horizontal > threshold
+    return False
+
+
+def is_pipe(element):
+    try:
+        return element.LookupParameter('Part Pattern Number').AsInteger() == 2041
+    except:
+        return False
+
+
+def get_pipe_direction(entry_xyz, exit_xyz):
+    v = exit_xyz.Subtract(entry_xyz)
+    if v.GetLength() < 0.0001:
+        return None
+    return v.Normalize()
+
+
+def _keys(elements):
+    return [get_id_value(e.Id) for e in elements]
+
+
+def group_networks(elements, index):
+    """ Connected groups of elements, ordered like the pass-by-pass merge
+    the script used: a group starts at its first element, then members join
+    pass by pass in selection order. The pass an element joins is a 0-1
+    shortest path from the first element (same pass when it comes after the
+    neighbour that pulls it in, next pass otherwise).
+    :return: list of element lists"""
+    keys = _keys(elements)
+    order = dict((k, i) for i, k in enumerate(keys))
+    by_key = dict(zip(keys, elements))
+    members = set(keys)
+    assigned = set()
+    groups = []
+    for root in keys:
+        if root in assigned:
+            continue
+        passes = {root: 0}
+        rank = {root: -1}
+        queue = deque([root])
+        while queue:
+            key = queue.popleft()
+            p = passes[key]
+            here = rank[key]
+            for other in index.neighbours(by_key[key], members):
+                if other in assigned:
+                    continue
+                step = 0 if order[other] > here else 1
+                if p + step < passes.get(other, p + 2):
+                    passes[other] = p + step
+                    rank[other] = order[other]
+                    if step:
+                        queue.append(other)
+                    else:
+                        queue.appendleft(other)
+        group = sorted(passes, key=lambda k: (passes[k], rank[k]))
+        assigned.update(group)
+        groups.append([by_key[k] for k in group])
+    return groups
+
+
+def find_best_start(network, index):
+    """ First element with an open connector, and its last open connector """
+    if not network:
+        return None, None
+    if len(network) == 1:
+        conns = index.connectors(network[0])
+        return network[0], conns[0] if conns else None
+
+    members = set(_keys(network))
+    for e in network:
+        open_conn = None
+        for entry in index.entries.get(get_id_value(e.Id), ()):
+            if not index.is_connected(entry, members):
+                open_conn = entry.connector
+        if open_conn:
+            return e, open_conn
+
+    conns = index.connectors(network[0])
+    return network[0], conns[0] if conns else None
+
+
+def _candidates(index, point, selected, visited):
+    """ (element, first matching connector) per unvisited selected element, in selection order """
+    best = {}
+    for entry in index.near(point):
+        pos = selected.get(entry.key)
+        if pos is None or entry.key in visited:
+            continue
+        current = best.get(entry.key)
+        if current is None or entry.index < current[1].index:
+            best[entry.key] = (pos, entry)
+    return [(entry.element, entry.connector) for pos, entry in sorted(best.values(), key=lambda v: v[0])]
+
+
+def walk_chain(selected_elements, start_element, start_connector, index):
+    """ Walks connected parts from start_connector, following the straightest exit
+    :return: (ordered chain, {element id: entry connector}, leftovers)"""
+    selected = dict((k, i) for i, k in enumerate(_keys(selected_elements)))
+    ordered = [start_element]
+    entry_conns = {start_element.Id: start_connector}
+    visited = {get_id_value(start_element.Id)}
+
+    exit_conns_of_start = [c for c in index.connectors(start_element) if c.Id != start_connector.Id]
+    if not exit_conns_of_start:
+        leftovers = [e for e in selected_elements if get_id_value(e.Id) not in visited]
+        return ordered, entry_conns, leftovers
+
+    current_exit_conn = exit_conns_of_start[0]
+
+    last_pipe_dir = None
+    if is_pipe(start_element) and not vertical_fab(start_element) and not is_cid_2875(start_element):
+        last_pipe_dir = get_pipe_direction(start_connector.Origin, current_exit_conn.Origin)
+
+    while True:
+        candidates = _candidates(index, current_exit_conn.Origin, selected, visited)
+        if not candidates:
+            break
+
+        found_elem = candidates[0][0]
+        found_entry = candidates[0][1]
+
+        if len(candidates) > 1 and last_pipe_dir is not None:
+            best_dot = -2.0
+            for cand_elem, cand_entry in candidates:
+                other_conns = [c for c in index.connectors(cand_elem) if c.Id != cand_entry.Id]
+                if other_conns:
+                    d = get_pipe_direction(cand_entry.Origin, other_conns[0].Origin)
+                    if d is not None:
+                        dot = last_pipe_dir.DotProduct(d)
+                        if dot > best_dot:
+                            best_dot = dot
+                            found_elem = cand_elem
+                            found_entry = cand_entry
+
+        ordered.append(found_elem)
+        entry_conns[found_elem.Id] = found_entry
+        visited.add(get_id_value(found_elem.Id))
+
+        exits = [c for c in index.connectors(found_elem) if c.Id != found_entry.Id]
+        if not exits:
+            break
+
+        if is_pipe(found_elem) and not vertical_fab(found_elem) and not is_cid_2875(found_elem):
+            last_pipe_dir = get_pipe_direction(found_entry.Origin, exits[0].Origin)
+
+        if is_cid_2875(found_elem):
+            current_exit_conn = exits[0]
+        elif len(exits) == 1:
+            current_exit_conn = exits[0]
+        else:
+            best_exit = exits[0]
+            if last_pipe_dir is not None:
+                best_dot = -2.0
+                for ex in exits:
+                    d = get_pipe_direction(current_exit_conn.Origin, ex.Origin)
+                    if d is not None:
+                        dot = last_pipe_dir.DotProduct(d)
+                        if dot > best_dot:
+                            best_dot = dot
+                            best_exit = ex
+            current_exit_conn = best_exit
+
+    leftovers = [e for e in selected_elements if get_id_value(e.Id) not in visited]
+    return ordered, entry_conns, leftovers
+
+
+def find_branch_start(branch_elems, main_chain, index):
+    """ Where a branch leaves the main chain: the last branch element touching
+    the chain, at its first touching connector. The original loop never
+    moves off the first element's first connector, so the first element only
+    counts when nothing else touches the chain.
+    :return: (element, connector)"""
+    first = branch_elems[0]
+    first_conns = index.connectors(first)
+    branch_start = first
+    branch_start_conn = first_conns[0] if first_conns else None
+
+    main = set(_keys(main_chain))
+    for be in branch_elems[1:]:
+        for entry in index.entries.get(get_id_value(be.Id), ()):
+            if index.is_connected(entry, main):
+                branch_start, branch_start_conn = be, entry.connector
+                break
+    return branch_start, branch_start_conn
+
+
+def extract_runs(elements, index=None):
+    """ Networks, main chains and branch chains of a selection
+    :param index: ConnectorIndex covering elements, built when None
+    :return: list of (ordered chain, entry connectors)"""
+    if index is None:
+        index = ConnectorIndex(elements)
+    runs = []
+    for network in group_networks(elements, index):
+        start_element, start_connector = find_best_start(network, index)
+        if not start_element or not start_connector:
+            continue
+        main_chain, main_entry_conns, leftovers = walk_chain(network, start_element, start_connector, index)
+        runs.append((main_chain, main_entry_conns))
+
+        for branch_elems in group_networks(leftovers, index):
+            branch_start, branch_start_conn = find_branch_start(branch_elems, main_chain, index)
+            branch_chain, branch_entry_conns, _ = walk_chain(branch_elems, branch_start, branch_start_conn, index)
+            runs.append((branch_chain, branch_entry_conns))
+    return runs
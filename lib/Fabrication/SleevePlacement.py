@@ -0,0 +1,366 @@
+# -*- coding: UTF-8 -*-
+# Batched floor and wall sleeve placement for the Sleeves tools.
+#
+# Placing sleeves one at a time regenerates the model after the create, the
+# size and length sets and the transforms of every sleeve, so a riser
+# schedule of 500 crossings costs some 1,500 regenerations. place_floor_sleeves
+# and place_wall_sleeves run the whole batch phase by phase instead:
+#
+#   1. create every sleeve
+#   2. set diameter and length on every sleeve
+#   3. regenerate once, so the sleeves take their final size
+#   4. move and rotate every sleeve onto its crossing
+#   5. regenerate once more
+#
+# Lining the sleeve top up with the level used to need a regenerated bounding
+# box after the rotation. Here the box read in phase 4 is rotated the same
+# way and the difference is folded into the move; wall sleeves find the end
+# connector they start from by turning the connectors the same way. Any
+# number of sleeves costs two regenerations.
+#
+# skip_served drops the penetrations a sleeve already goes through, so a
+# re-run after a design change only adds the missing sleeves. The sleeve
+# parts and families of the model go into a BoxIndex by bounding box, which
+# only narrows the search: a penetration is served when it lies within the
+# sleeve radius of the axis between the sleeve's end connectors. The box of
+# a sleeve on a skewed wall reaches well past the sleeve itself.
+#
+# Takes the Revit API as a module argument (Autodesk.Revit.DB by default) so
+# the headless stand-ins can run the same phases.
+import math
+
+from Geometry.Occupancy import BoxIndex, coords
+from Parameters.Get_Set_Params import get_id_value
+from Selection.Duplicates import delete_elements
+
+ANGLE_TOL = 1e-8
+SLEEVE = 'sleeve'       # in the service name of sleeve parts and the family name of sleeve families
+SERVED_TOL = 0.1        # ft between a penetration and the wall of an existing sleeve
+
+
+def revit_db():
+    from Autodesk.Revit import DB
+    return DB
+
+
+class FloorSleeve(object):
+    __slots__ = ('host', 'point', 'level', 'direction', 'length', 'part', 'error', 'existing')
+
+    def __init__(self, host, point, level, direction, length=None):
+        """ One sleeve to place
+        :param point: crossing of the host centerline with the level or slab top, where the sleeve top goes
+        :param direction: host pipe direction, the sleeve is laid against it
+        :param length: sleeve length, None for the default length"""
+        self.host = host
+        self.point = point
+        self.level = level
+        self.direction = direction
+        self.length = length
+        self.part = None
+        self.error = None
+        self.existing = None    # id value of the sleeve already there, see skip_served
+
+    @property
+    def level_id(self):
+        return self.level.Id
+
+    @property
+    def probe(self):
+        return self.point
+
+
+class WallSleeve(object):
+    __slots__ = ('host', 'point', 'direction', 'length', 'level_id', 'part', 'error', 'existing')
+
+    def __init__(self, host, point, direction, length, level_id=None):
+        """ One sleeve to place through a wall
+        :param point: where the sleeve starts, on the wall face behind the run direction
+        :param direction: run direction in plan, the sleeve is laid along it
+        :param length: sleeve length, None for the default length
+        :param level_id: level of the sleeve, the host's when None"""
+        self.host = host
+        self.point = point
+        self.direction = direction
+        self.length = length
+        self.level_id = level_id if level_id is not None else host.LevelId
+        self.part = None
+        self.error = None
+        self.existing = None
+
+    @property
+    def probe(self):
+        # Middle of the wall, inside any sleeve already through it
+        if not self.length:
+            return self.point
+        return self.point + self.direction.Multiply(self.length / 2.0)
+
+
+def rotation_to(from_vec, to_vec, api):
+    """ (axis, angle) turning from_vec onto to_vec, None when they already agree """
+    from_vec = from_vec.Normalize()
+    to_vec = to_vec.Normalize()
+    axis = from_vec.CrossProduct(to_vec)
+    if axis.GetLength() < ANGLE_TOL:
+        if from_vec.DotProduct(to_vec) < 0:
+            return api.XYZ.BasisZ, math.pi
+        return None
+    dot = max(min(from_vec.DotProduct(to_vec), 1.0), -1.0)
+    return axis.Normalize(), math.acos(dot)
+
+
+def rotate_point(point, origin, axis, angle):
+    """ point turned by angle about the unit axis through origin """
+    v = point - origin
+    c = math.cos(angle)
+    s = math.sin(angle)
+    return origin + v.Multiply(c) + axis.CrossProduct(v).Multiply(s) + axis.Multiply(axis.DotProduct(v) * (1.0 - c))
+
+
+def top_after(bbox, move, rotation, pivot, api):
+    """ Highest bounding box corner after moving by move and turning about pivot """
+    top = None
+    for x in (bbox.Min.X, bbox.Max.X):
+        for y in (bbox.Min.Y, bbox.Max.Y):
+            for z in (bbox.Min.Z, bbox.Max.Z):
+                corner = api.XYZ(x, y, z) + move
+                if rotation is not None:
+                    corner = rotate_point(corner, pivot, rotation[0], rotation[1])
+                if top is None or corner.Z > top:
+                    top = corner.Z
+    return top
+
+
+# ------------------------------------------------------------------------------------
+# Existing sleeves
+# ------------------------------------------------------------------------------------
+def is_sleeve_part(part):
+    try:
+        return SLEEVE in (part.ServiceName or '').lower()
+    except:
+        return False
+
+
+class SleeveAxis(object):
+    __slots__ = ('key', 'p0', 'p1', 'radius')
+
+    def __init__(self, key, p0, p1, radius):
+        """ :param p0, p1: (x, y, z) of the sleeve ends
+        :param radius: outside radius, ft"""
+        self.key = key
+        self.p0 = p0
+        self.p1 = p1
+        self.radius = radius
+
+    def distance(self, point):
+        """ Distance from point to the segment p0 p1 """
+        x, y, z = coords(point)
+        p0, p1 = self.p0, self.p1
+        d = (p1[0] - p0[0], p1[1] - p0[1], p1[2] - p0[2])
+        v = (x - p0[0], y - p0[1], z - p0[2])
+        length_sq = d[0] * d[0] + d[1] * d[1] + d[2] * d[2]
+        t = 0.0
+        if length_sq > 0.0:
+            t = max(0.0, min(1.0, (v[0] * d[0] + v[1] * d[1] + v[2] * d[2]) / length_sq))
+        return math.sqrt((v[0] - d[0] * t) ** 2 + (v[1] - d[1] * t) ** 2 + (v[2] - d[2] * t) ** 2)
+
+    def holds(self, point, tolerance=SERVED_TOL):
+        return self.distance(point) <= self.radius + tolerance
+
+
+def _connector_radius(connector):
+    try:
+        if str(connector.Shape) == 'Round':
+            return connector.Radius
+        return max(connector.Width, connector.Height) / 2.0
+    except:
+        return 0.0
+
+
+def sleeve_axis(element, bbox):
+    """ SleeveAxis between the two end connectors of element. Families without
+    connectors take the longest side of bbox through its middle, half the
+    larger of the other two sides as radius."""
+    key = get_id_value(element.Id)
+    manager = getattr(element, 'ConnectorManager', None)
+    if manager is None:
+        manager = getattr(getattr(element, 'MEPModel', None), 'ConnectorManager', None)
+    try:
+        connectors = list(manager.Connectors) if manager is not None else []
+    except:
+        connectors = []
+    if len(connectors) >= 2:
+        first, last = connectors[0], connectors[-1]
+        return SleeveAxis(key, coords(first.Origin), coords(last.Origin),
+                          max(_connector_radius(first), _connector_radius(last)))
+    lo, hi = coords(bbox.Min), coords(bbox.Max)
+    sides = [hi[i] - lo[i] for i in range(3)]
+    axis = sides.index(max(sides))
+    middle = [(lo[i] + hi[i]) / 2.0 for i in range(3)]
+    p0, p1 = list(middle), list(middle)
+    p0[axis], p1[axis] = lo[axis], hi[axis]
+    return SleeveAxis(key, tuple(p0), tuple(p1), max(sides[i] for i in range(3) if i != axis) / 2.0)
+
+
+def existing_sleeves(doc, api=None):
+    """ BoxIndex of the SleeveAxis of the sleeve service parts and sleeve family
+    instances (Floor Sleeve and the like) in doc, by bounding box; built once per run """
+    api = api or revit_db()
+    index = BoxIndex()
+
+    def add(element):
+        bbox = element.get_BoundingBox(None)
+        if bbox is not None:
+            index.add(bbox.Min, bbox.Max, sleeve_axis(element, bbox))
+
+    for part in api.FilteredElementCollector(doc).OfClass(api.FabricationPart).WhereElementIsNotElementType():
+        if is_sleeve_part(part):
+            add(part)
+
+    by_type = {}
+    for instance in api.FilteredElementCollector(doc).OfClass(api.FamilyInstance).WhereElementIsNotElementType():
+        type_key = get_id_value(instance.GetTypeId())
+        if type_key not in by_type:
+            try:
+                by_type[type_key] = SLEEVE in (instance.Symbol.Family.Name or '').lower()
+            except:
+                by_type[type_key] = False
+        if by_type[type_key]:
+            add(instance)
+    return index
+
+
+def skip_served(sleeves, index, tolerance=SERVED_TOL):
+    """ Sleeves no existing sleeve goes through. The others keep the id value of
+    the sleeve found in existing; the ones kept are added to index, so a second
+    request for the same penetration in one run is skipped too.
+    :param index: BoxIndex of SleeveAxis, see existing_sleeves
+    :return: (sleeves to place, sleeves already served)"""
+    to_place = []
+    served = []
+    for sleeve in sleeves:
+        probe = sleeve.probe
+        found = None
+        for axis in index.items(probe, tolerance):
+            if axis.holds(probe, tolerance):
+                found = axis
+                break
+        if found is not None:
+            sleeve.existing = found.key
+            served.append(sleeve)
+            continue
+        point = coords(probe)
+        index.add_point(point, SleeveAxis(None, point, point, 0.0), tolerance)
+        to_place.append(sleeve)
+    return to_place, served
+
+
+# ------------------------------------------------------------------------------------
+# Placement
+# ------------------------------------------------------------------------------------
+def create_sleeves(doc, sleeves, button, condition, set_size, regenerate, api):
+    """ Phases 1 to 3: every sleeve created, sized and regenerated once
+    :return: the sleeves created"""
+    for sleeve in sleeves:
+        try:
+            sleeve.part = api.FabricationPart.Create(doc, button, condition, sleeve.level_id)
+        except Exception as ex:
+            sleeve.error = ex
+
+    created = [s for s in sleeves if s.part is not None]
+    for sleeve in created:
+        set_size(sleeve)
+    if created:
+        regenerate()
+    return created
+
+
+def finish_sleeves(doc, created, failed, regenerate):
+    """ Phase 5: sleeves whose transforms failed deleted, one regeneration
+    :return: the sleeves placed"""
+    if failed:
+        delete_elements(doc, [s.part.Id for s in failed])
+        for sleeve in failed:
+            sleeve.part = None
+    regenerate()
+    return [s for s in created if s.part is not None]
+
+
+def place_floor_sleeves(doc, sleeves, button, condition, set_size, regenerate, api=None):
+    """ Creates, sizes and places sleeves, inside a transaction the caller holds open
+    :param sleeves: list of FloorSleeve, part is filled in on the ones placed
+    :param set_size: callable(sleeve part, host part, length), sets diameter and length
+    :param regenerate: callable() regenerating doc, called twice
+    :return: list of the FloorSleeve placed; sleeves that fail are deleted again"""
+    api = api or revit_db()
+    created = create_sleeves(doc, sleeves, button, condition, lambda s: set_size(s.part, s.host, s.length),
+                             regenerate, api)
+    if not created:
+        return []
+
+    basis_x = api.XYZ.BasisX
+    failed = []
+    for sleeve in created:
+        part = sleeve.part
+        try:
+            pt = sleeve.point
+            move = pt - part.Origin
+            rotation = rotation_to(basis_x, sleeve.direction.Multiply(-1), api)
+            bbox = part.get_BoundingBox(None)
+            lift = api.XYZ(0, 0, pt.Z - top_after(bbox, move, rotation, pt, api) if bbox is not None else 0.0)
+            # Moving up first and turning about the lifted point lands where
+            # turning about pt and then lifting would
+            api.ElementTransformUtils.MoveElement(doc, part.Id, move + lift)
+            if rotation is not None:
+                pivot = pt + lift
+                axis, angle = rotation
+                api.ElementTransformUtils.RotateElement(doc, part.Id, api.Line.CreateBound(pivot, pivot + axis),
+                                                        angle)
+        except Exception as ex:
+            sleeve.error = ex
+            failed.append(sleeve)
+
+    return finish_sleeves(doc, created, failed, regenerate)
+
+
+def place_wall_sleeves(doc, sleeves, button, condition, set_size, regenerate, api=None):
+    """ Creates, sizes and places wall sleeves, inside a transaction the caller holds open
+    :param sleeves: list of WallSleeve, part is filled in on the ones placed
+    :param set_size: callable(sleeve part, host part, length), sets diameter and length
+    :param regenerate: callable() regenerating doc, called twice
+    :return: list of the WallSleeve placed; sleeves that fail are deleted again"""
+    api = api or revit_db()
+    created = create_sleeves(doc, sleeves, button, condition, lambda s: set_size(s.part, s.host, s.length),
+                             regenerate, api)
+    if not created:
+        return []
+
+    basis_x = api.XYZ.BasisX
+    failed = []
+    for sleeve in created:
+        part = sleeve.part
+        try:
+            origin = part.Origin
+            rotation = rotation_to(basis_x, sleeve.direction, api)
+            # End connector against the run direction once turned, found
+            # without regenerating between the turn and the move
+            end_point = None
+            best = None
+            for c in part.ConnectorManager.Connectors:
+                pt = c.Origin
+                if rotation is not None:
+                    pt = rotate_point(pt, origin, rotation[0], rotation[1])
+                val = pt.DotProduct(sleeve.direction)
+                if best is None or val < best:
+                    end_point, best = pt, val
+            if end_point is None:
+                end_point = origin
+            if rotation is not None:
+                axis, angle = rotation
+                api.ElementTransformUtils.RotateElement(doc, part.Id, api.Line.CreateBound(origin, origin + axis),
+                                                        angle)
+            api.ElementTransformUtils.MoveElement(doc, part.Id, sleeve.point - end_point)
+        except Exception as ex:
+            sleeve.error = ex
+            failed.append(sleeve)
+
+    return finish_sleeves(doc, created, failed, regenerate)
@@ -0,0 +1,78 @@
+# -*- coding: UTF-8 -*-
+# Level planes crossed by vertical pipes, for SleevesUL floor mode.
+#
+# A level plane sits at the level's Project Elevation taken back to internal
+# coordinates through the "Project" location. The script used to build that
+# transform (a ProjectLocation collector) for every level of every pipe.
+# LevelPlanes reads the project and survey transforms once, converts every
+# level once and keeps the internal elevations sorted, so the levels a pipe
+# crosses are a bisection over its Z span: O(p log L) for p pipes and L
+# levels instead of O(p x L) conversions.
+#
+# Only reads Z values; the transforms come from the document handed to
+# from_document.
+from bisect import bisect_left, bisect_right
+
+
+def revit_db():
+    from Autodesk.Revit import DB
+    return DB
+
+
+def location_transforms(doc, api=None):
+    """ (project, survey) total transforms, identity for a missing "Project" location """
+    api = api or revit_db()
+    survey = doc.ActiveProjectLocation.GetTotalTransform()
+    project = api.Transform.Identity
+    collector = api.FilteredElementCollector(doc).OfClass(api.ProjectLocation).WhereElementIsNotElementType()
+    for loc in collector:
+        if loc.Name == "Project":
+            project = loc.GetTotalTransform()
+            break
+    return project, survey
+
+
+def internal_z(transform, project_z):
+    """ Z of the project point (0, 0, project_z) in internal coordinates """
+    return transform.Origin.Z + transform.BasisZ.Z * project_z
+
+
+class LevelPlanes(object):
+    def __init__(self, levels, project=None, survey=None):
+        """ :param levels: Level elements
+        :param project: "Project" location transform, None to use level.Elevation as is"""
+        self.project = project
+        self.survey = survey
+        planes = []
+        for level in levels:
+            try:
+                z = internal_z(project, level.ProjectElevation)
+            except:
+                z = level.Elevation
+            planes.append((z, level))
+        planes.sort(key=lambda plane: plane[0])
+        self.elevations = [z for z, _ in planes]
+        self.levels = [level for _, level in planes]
+
+    @classmethod
+    def from_document(cls, doc, levels, api=None):
+        project, survey = location_transforms(doc, api)
+        return cls(levels, project, survey)
+
+    def __len__(self):
+        return len(self.levels)
+
+    def crossings(self, z_min, z_max):
+        """ (internal elevation, level) of the planes strictly between z_min and z_max, lowest first """
+        lo = bisect_right(self.elevations, z_min)
+        hi = bisect_left(self.elevations, z_max)
+        return [(self.elevations[i], self.levels[i]) for i in range(lo, hi)]
+
+    def nearest(self, z):
+        """ Level whose plane is closest to z, None without levels """
+        if not self.levels:
+            return None
+        i = bisect_left(self.elevations, z)
+        if i == len(self.levels) or (i > 0 and z - self.elevations[i - 1] <= self.elevations[i] - z):
+            i -= 1
+        return self.levels[i]
@@ -0,0 +1,153 @@
+# -*- coding: UTF-8 -*-
+# Grid index of occupied insertion points.
+#
+# Placement tools skip a point when an instance already sits within a small
+# tolerance of it. Points are bucketed into cells one tolerance wide, so the
+# check looks at the point's cell and its neighbours (9 in plan, 27 in 3D)
+# instead of every instance in the model. Built once from the existing
+# instances and updated as new ones are placed, so a run never stacks two
+# instances on one point either.
+#
+# BoxIndex does the same for parts with an extent, such as sleeves: each
+# box goes into every cell it overlaps and a point is tested against the
+# boxes of the cells around it.
+#
+# Only reads X, Y and Z, so XYZ and (x, y, z) tuples both work.
+import math
+
+TOLERANCE = 0.01    # ft
+BOX_CELL = 2.0      # ft, BoxIndex cell
+
+
+def coords(point):
+    try:
+        return point.X, point.Y, point.Z
+    except AttributeError:
+        return point[0], point[1], point[2]
+
+
+def location_point(element):
+    """ Insertion point of a point-based instance, None for anything else """
+    try:
+        return element.Location.Point
+    except AttributeError:
+        return None
+
+
+class OccupancyIndex(object):
+    def __init__(self, points=(), tolerance=TOLERANCE, planar=False):
+        """ :param points: occupied points to start from
+        :param planar: compare X and Y only, for points that stack at any height"""
+        self.tolerance = tolerance
+        self.planar = planar
+        self.cells = {}
+        self.count = 0
+        for point in points:
+            self.add(point)
+
+    def __len__(self):
+        return self.count
+
+    def cell(self, x, y, z):
+        t = self.tolerance
+        if self.planar:
+            return (int(math.floor(x / t)), int(math.floor(y / t)))
+        return (int(math.floor(x / t)), int(math.floor(y / t)), int(math.floor(z / t)))
+
+    def add(self, point, item=None):
+        x, y, z = coords(point)
+        self.cells.setdefault(self.cell(x, y, z), []).append((x, y, z, item))
+        self.count += 1
+
+    def find(self, point):
+        """ (x, y, z, item) of an occupied point within tolerance, or None """
+        x, y, z = coords(point)
+        limit = self.tolerance * self.tolerance
+        key = self.cell(x, y, z)
+        rings = [(i, j) for i in (key[0] - 1, key[0], key[0] + 1) for j in (key[1] - 1, key[1], key[1] + 1)]
+        if self.planar:
+            keys = rings
+        else:
+            keys = [(i, j, k) for i, j in rings for k in (key[2] - 1, key[2], key[2] + 1)]
+        for k in keys:
+            for entry in self.cells.get(k, ()):
+                d = (entry[0] - x) ** 2 + (entry[1] - y) ** 2
+                if not self.planar:
+                    d += (entry[2] - z) ** 2
+                if d <= limit:
+                    return entry
+        return None
+
+    def is_occupied(self, point):
+        return self.find(point) is not None
+
+    def claim(self, point, item=None):
+        """ Marks point occupied unless it already is
+        :return: True when point was free"""
+        if self.find(point) is not None:
+            return False
+        self.add(point, item)
+        return True
+
+
+class BoxIndex(object):
+    def __init__(self, cell_size=BOX_CELL):
+        """ Axis aligned boxes bucketed into cubic cells, for "which box holds this point"
+        :param cell_size: ft, about the size of the boxes kept"""
+        self.cell_size = cell_size
+        self.cells = {}
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def _range(self, lo, hi):
+        return range(int(math.floor(lo / self.cell_size)), int(math.floor(hi / self.cell_size)) + 1)
+
+    def add(self, minimum, maximum, item=None):
+        """ :param minimum, maximum: box corners, XYZ or (x, y, z)"""
+        lo = coords(minimum)
+        hi = coords(maximum)
+        entry = (lo, hi, item)
+        for i in self._range(lo[0], hi[0]):
+            for j in self._range(lo[1], hi[1]):
+                for k in self._range(lo[2], hi[2]):
+                    self.cells.setdefault((i, j, k), []).append(entry)
+        self.count += 1
+
+    def add_point(self, point, item=None, pad=TOLERANCE):
+        x, y, z = coords(point)
+        self.add((x - pad, y - pad, z - pad), (x + pad, y + pad, z + pad), item)
+
+    def find(self, point, tolerance=TOLERANCE):
+        """ (min, max, item) of the first box within tolerance of point, or None """
+        x, y, z = coords(point)
+        for i in self._range(x - tolerance, x + tolerance):
+            for j in self._range(y - tolerance, y + tolerance):
+                for k in self._range(z - tolerance, z + tolerance):
+                    for lo, hi, item in self.cells.get((i, j, k), ()):
+                        if lo[0] - tolerance <= x <= hi[0] + tolerance and \
+                                lo[1] - tolerance <= y <= hi[1] + tolerance and \
+                                lo[2] - tolerance <= z <= hi[2] + tolerance:
+                            return lo, hi, item
+        return None
+
+    def items(self, point, tolerance=TOLERANCE):
+        """ Items of every box within tolerance of point, each once """
+        x, y, z = coords(point)
+        seen = set()
+        for i in self._range(x - tolerance, x + tolerance):
+            for j in self._range(y - tolerance, y + tolerance):
+                for k in self._range(z - tolerance, z + tolerance):
+                    for entry in self.cells.get((i, j, k), ()):
+                        lo, hi, item = entry
+                        if id(entry) in seen:
+                            continue
+                        if lo[0] - tolerance <= x <= hi[0] + tolerance and \
+                                lo[1] - tolerance <= y <= hi[1] + tolerance and \
+                                lo[2] - tolerance <= z <= hi[2] + tolerance:
+                            seen.add(id(entry))
+                            yield item
+
+    def contains(self, point, tolerance=TOLERANCE):
+        return self.find(point, tolerance) is not None
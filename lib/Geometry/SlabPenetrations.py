@@ -0,0 +1,228 @@
+# -*- coding: UTF-8 -*-
+# Pipe penetrations through floors and structural slabs, for floor sleeves.
+#
+# Taking floors as the level planes misses depressed slabs, mezzanines
+# between levels and sloped decks. Here every slab of the model and its
+# links comes down to its plan extent plus a top and a bottom: the planes of
+# the top and bottom faces where each is a single flat face, the bounding
+# box elevations otherwise. Slabs are bucketed into a 2D grid on their plan
+# extent, so a pipe segment is only intersected with the slabs in the cells
+# it passes over instead of every slab of every level.
+#
+# A crossing gives the points where the centerline passes the top and the
+# bottom of the slab and the sleeve length between them. It belongs to the
+# segment holding the middle of that span, so a pipe cut at the slab face is
+# sleeved once.
+#
+# Only duck-types the Revit API; slab() reads the faces through the API
+# handed in and falls back to the bounding box when they cannot be read.
+import math
+
+from Parameters.Get_Set_Params import get_id_value
+
+MIN_CROSSING_ANGLE = 15.0   # degrees between pipe and slab face
+MIN_CELL = 10.0             # ft
+PARALLEL_TOL = 1e-9
+
+
+def revit_db():
+    from Autodesk.Revit import DB
+    return DB
+
+
+def _apply(transform, x, y, z):
+    # transform.OfPoint on plain coordinates
+    o, bx, by, bz = transform.Origin, transform.BasisX, transform.BasisY, transform.BasisZ
+    return (o.X + bx.X * x + by.X * y + bz.X * z,
+            o.Y + bx.Y * x + by.Y * y + bz.Y * z,
+            o.Z + bx.Z * x + by.Z * y + bz.Z * z)
+
+
+def plane(origin, normal):
+    """ (a, b, c) of the plane z = a x + b y + c, None for vertical planes
+    :param origin, normal: (x, y, z)"""
+    if abs(normal[2]) < PARALLEL_TOL:
+        return None
+    a = -normal[0] / normal[2]
+    b = -normal[1] / normal[2]
+    return a, b, origin[2] - a * origin[0] - b * origin[1]
+
+
+class Slab(object):
+    __slots__ = ('key', 'x_min', 'y_min', 'x_max', 'y_max', 'z_min', 'z_max', 'top', 'bottom', 'inside')
+
+    def __init__(self, key, minimum, maximum, top=None, bottom=None, inside=None):
+        """ :param minimum, maximum: bounding box corners (x, y, z)
+        :param top, bottom: face planes, see plane; None for the bounding box elevations
+        :param inside: callable(x, y, z) -> bool for points on the top face, None to take the plan extent"""
+        self.key = key
+        self.x_min, self.y_min, self.z_min = minimum[0], minimum[1], minimum[2]
+        self.x_max, self.y_max, self.z_max = maximum[0], maximum[1], maximum[2]
+        self.top = top or (0.0, 0.0, self.z_max)
+        self.bottom = bottom or (0.0, 0.0, self.z_min)
+        self.inside = inside
+
+    def covers(self, x, y, z):
+        if not (self.x_min <= x <= self.x_max and self.y_min <= y <= self.y_max):
+            return False
+        return self.inside is None or self.inside(x, y, z)
+
+
+class SlabCrossing(object):
+    __slots__ = ('run', 'slab', 't', 'top', 'bottom', 'length')
+
+    def __init__(self, run, slab, t, top, bottom, length):
+        self.run = run
+        self.slab = slab
+        self.t = t                  # middle of the span through the slab along the run, 0 at p0
+        self.top = top              # (x, y, z) where the centerline passes the top face
+        self.bottom = bottom        # (x, y, z) where it passes the bottom face
+        self.length = length        # along the centerline, top to bottom
+
+
+def _face_t(p0, d, face):
+    # Run parameter where p0 + t d meets the face plane, None when parallel
+    a, b, c = face
+    slope = d[2] - a * d[0] - b * d[1]
+    if abs(slope) < PARALLEL_TOL:
+        return None
+    return (a * p0[0] + b * p0[1] + c - p0[2]) / slope
+
+
+def crossing(run, slab, min_sin=None):
+    """ SlabCrossing of run through slab, None when the centerline misses it
+    :param run: Geometry.WallPenetrations.RunSegment"""
+    if min_sin is None:
+        min_sin = math.sin(math.radians(MIN_CROSSING_ANGLE))
+    p0 = run.p0
+    d = (run.p1[0] - p0[0], run.p1[1] - p0[1], run.p1[2] - p0[2])
+    run_len = math.sqrt(d[0] * d[0] + d[1] * d[1] + d[2] * d[2])
+    if run_len < PARALLEL_TOL:
+        return None
+    a, b = slab.top[0], slab.top[1]
+    # Sine of the angle to the top face, |d . n| over the lengths
+    if abs(d[2] - a * d[0] - b * d[1]) / (run_len * math.sqrt(a * a + b * b + 1.0)) < min_sin:
+        return None
+    t_top = _face_t(p0, d, slab.top)
+    t_bottom = _face_t(p0, d, slab.bottom)
+    if t_top is None or t_bottom is None:
+        return None
+    t = (t_top + t_bottom) / 2.0
+    if not 0.0 <= t < 1.0:
+        return None
+    top = (p0[0] + d[0] * t_top, p0[1] + d[1] * t_top, p0[2] + d[2] * t_top)
+    if not slab.covers(top[0], top[1], top[2]):
+        return None
+    bottom = (p0[0] + d[0] * t_bottom, p0[1] + d[1] * t_bottom, p0[2] + d[2] * t_bottom)
+    return SlabCrossing(run, slab, t, top, bottom, abs(t_top - t_bottom) * run_len)
+
+
+class SlabGrid(object):
+    def __init__(self, slabs, cell_size=None):
+        """ Slabs bucketed into square plan cells over their extent
+        :param cell_size: ft, about the size of a slab by default"""
+        self.slabs = list(slabs)
+        self.cell_size = cell_size or cell_width(self.slabs)
+        self.cells = {}
+        for n, slab in enumerate(self.slabs):
+            for i in self._range(slab.x_min, slab.x_max):
+                for j in self._range(slab.y_min, slab.y_max):
+                    self.cells.setdefault((i, j), []).append(n)
+
+    def __len__(self):
+        return len(self.slabs)
+
+    def _range(self, lo, hi):
+        return range(int(math.floor(lo / self.cell_size)), int(math.floor(hi / self.cell_size)) + 1)
+
+    def candidates(self, run):
+        """ Slabs whose extent overlaps the extent of run, in slab order """
+        found = set()
+        for i in self._range(run.x_min, run.x_max):
+            for j in self._range(run.y_min, run.y_max):
+                found.update(self.cells.get((i, j), ()))
+        slabs = self.slabs
+        return [slabs[n] for n in sorted(found)
+                if not (run.z_max < slabs[n].z_min or run.z_min > slabs[n].z_max or
+                        run.x_max < slabs[n].x_min or run.x_min > slabs[n].x_max or
+                        run.y_max < slabs[n].y_min or run.y_min > slabs[n].y_max)]
+
+
+def cell_width(slabs):
+    """ Grid cell for SlabGrid, the average larger plan side of the slabs """
+    if not slabs:
+        return MIN_CELL
+    sides = [max(s.x_max - s.x_min, s.y_max - s.y_min) for s in slabs]
+    return max(MIN_CELL, sum(sides) / len(sides))
+
+
+def find_slab_crossings(runs, slabs, min_angle=MIN_CROSSING_ANGLE):
+    """ Every run crossing every slab
+    :param slabs: list of Slab or a SlabGrid built over them
+    :return: list of SlabCrossing, by run order then along each run"""
+    grid = slabs if isinstance(slabs, SlabGrid) else SlabGrid(slabs)
+    min_sin = math.sin(math.radians(min_angle))
+    found = []
+    for run in runs:
+        hits = [c for c in (crossing(run, slab, min_sin) for slab in grid.candidates(run)) if c is not None]
+        hits.sort(key=lambda c: c.t)
+        found.extend(hits)
+    return found
+
+
+# ------------------------------------------------------------------------------------
+# Extraction from Revit elements
+# ------------------------------------------------------------------------------------
+def _single_face(floor, references):
+    faces = [floor.GetGeometryObjectFromReference(ref) for ref in references]
+    if len(faces) != 1 or not hasattr(faces[0], 'FaceNormal'):
+        return None
+    return faces[0]
+
+
+def _face_plane(face, transform):
+    o, n = face.Origin, face.FaceNormal
+    if transform is None:
+        return plane((o.X, o.Y, o.Z), (n.X, n.Y, n.Z))
+    origin = _apply(transform, o.X, o.Y, o.Z)
+    t = transform.Origin
+    moved = _apply(transform, n.X, n.Y, n.Z)
+    return plane(origin, (moved[0] - t.X, moved[1] - t.Y, moved[2] - t.Z))
+
+
+def slab(floor, transform=None, key=None, api=None):
+    """ Slab of a floor or structural slab, None without a bounding box
+    :param transform: link instance total transform for slabs in a linked model"""
+    bbox = floor.get_BoundingBox(None)
+    if bbox is None:
+        return None
+    lo, hi = bbox.Min, bbox.Max
+    if transform is None:
+        minimum, maximum = (lo.X, lo.Y, lo.Z), (hi.X, hi.Y, hi.Z)
+    else:
+        corners = [_apply(transform, x, y, z) for x in (lo.X, hi.X) for y in (lo.Y, hi.Y) for z in (lo.Z, hi.Z)]
+        minimum = tuple(min(c[i] for c in corners) for i in range(3))
+        maximum = tuple(max(c[i] for c in corners) for i in range(3))
+
+    top = bottom = inside = None
+    try:
+        api = api or revit_db()
+        top_face = _single_face(floor, api.HostObjectUtils.GetTopFaces(floor))
+        bottom_face = _single_face(floor, api.HostObjectUtils.GetBottomFaces(floor))
+        if top_face is not None and bottom_face is not None:
+            top = _face_plane(top_face, transform)
+            bottom = _face_plane(bottom_face, transform)
+            inverse = transform.Inverse if transform is not None else None
+
+            def _covers(x, y, z):
+                # Points over openings and outside the outline do not project onto the face
+                point = api.XYZ(x, y, z)
+                if inverse is not None:
+                    point = inverse.OfPoint(point)
+                return top_face.Project(point) is not None
+            inside = _covers
+    except:
+        top = bottom = inside = None
+    if top is None or bottom is None:
+        top = bottom = inside = None
+    return Slab(key if key is not None else get_id_value(floor.Id), minimum, maximum, top, bottom, inside)
@@ -0,0 +1,246 @@
+# -*- coding: UTF-8 -*-
+# Pipe and duct penetrations through walls, for bulk wall sleeves.
+#
+# Walls come down to plan segments (centerline, thickness, bottom and top)
+# and runs to 3D centerline segments, so detection works on plain
+# coordinates and runs headless. The plan is cut into bands along Y and in
+# each band both are swept along X by the low end of their extents: an item
+# starting drops the items of the other kind that ended before it and is
+# tested against the rest only, so a run meets the walls near it instead of
+# every wall in the model (sweep and prune). Candidates are checked on Y and
+# Z extents before the run centerline is intersected with the wall in plan.
+#
+# A hit gives the centre of the penetration, the face the sleeve starts at,
+# the run direction in plan and the length through the wall: the thickness
+# over the sine of the crossing angle, so skewed crossings get a sleeve
+# from face to face. Runs that meet a wall at less than MIN_CROSSING_ANGLE
+# are left out, the sleeve would run along the wall.
+#
+# Walls are only read around the runs: wall_filter turns the box around
+# every run into a BoundingBoxIntersectsFilter for the host or a link
+# document, so a large linked model is not read wall by wall.
+import math
+
+from Parameters.Get_Set_Params import get_id_value
+
+MIN_CROSSING_ANGLE = 15.0   # degrees between run and wall in plan
+MIN_PLAN_LENGTH = 1e-4      # ft, runs shorter than this in plan are vertical
+DEDUPE_TOL = 0.1            # ft along a run, hits closer than this are one penetration (joined walls)
+MIN_BAND = 10.0             # ft
+EXTENT_MARGIN = 1.0         # ft around the runs that walls are collected in
+
+
+def revit_db():
+    from Autodesk.Revit import DB
+    return DB
+
+
+class WallSegment(object):
+    __slots__ = ('key', 'x0', 'y0', 'x1', 'y1', 'thickness', 'z_min', 'z_max', 'x_min', 'x_max', 'y_min', 'y_max')
+
+    def __init__(self, key, p0, p1, thickness, z_min, z_max):
+        """ :param p0, p1: centerline ends (x, y) in plan"""
+        self.key = key
+        self.x0, self.y0 = p0[0], p0[1]
+        self.x1, self.y1 = p1[0], p1[1]
+        self.thickness = thickness
+        self.z_min = z_min
+        self.z_max = z_max
+        half = thickness / 2.0
+        self.x_min = min(self.x0, self.x1) - half
+        self.x_max = max(self.x0, self.x1) + half
+        self.y_min = min(self.y0, self.y1) - half
+        self.y_max = max(self.y0, self.y1) + half
+
+
+class RunSegment(object):
+    __slots__ = ('key', 'p0', 'p1', 'size', 'x_min', 'x_max', 'y_min', 'y_max', 'z_min', 'z_max')
+
+    def __init__(self, key, p0, p1, size=None):
+        """ :param p0, p1: centerline ends (x, y, z)
+        :param size: sleeve size for the run, handed through to its penetrations"""
+        self.key = key
+        self.p0 = tuple(p0)
+        self.p1 = tuple(p1)
+        self.size = size
+        self.x_min, self.x_max = min(p0[0], p1[0]), max(p0[0], p1[0])
+        self.y_min, self.y_max = min(p0[1], p1[1]), max(p0[1], p1[1])
+        self.z_min, self.z_max = min(p0[2], p1[2]), max(p0[2], p1[2])
+
+
+class Penetration(object):
+    __slots__ = ('run', 'wall', 't', 'point', 'start', 'direction', 'thickness', 'length', 'size')
+
+    def __init__(self, run, wall, t, point, start, direction, length):
+        self.run = run
+        self.wall = wall
+        self.t = t                      # position along the run, 0 at p0
+        self.point = point              # (x, y, z) on the wall centerline
+        self.start = start              # (x, y, z) where the sleeve starts, on the face p0 is behind
+        self.direction = direction      # (x, y, 0) unit run direction in plan
+        self.thickness = wall.thickness
+        self.length = length
+        self.size = run.size
+
+
+def penetration(run, wall, min_sin=None):
+    """ Penetration of run through wall, None when the centerline misses it """
+    if min_sin is None:
+        min_sin = math.sin(math.radians(MIN_CROSSING_ANGLE))
+    ax, ay, az = run.p0
+    dx = run.p1[0] - ax
+    dy = run.p1[1] - ay
+    ex = wall.x1 - wall.x0
+    ey = wall.y1 - wall.y0
+    run_len = math.hypot(dx, dy)
+    wall_len = math.hypot(ex, ey)
+    if run_len < MIN_PLAN_LENGTH or wall_len < MIN_PLAN_LENGTH:
+        return None
+    denom = dx * ey - dy * ex
+    sin = abs(denom) / (run_len * wall_len)
+    if sin < min_sin:
+        return None
+    cx = wall.x0 - ax
+    cy = wall.y0 - ay
+    t = (cx * ey - cy * ex) / denom
+    u = (cx * dy - cy * dx) / denom
+    if not (0.0 <= t <= 1.0 and 0.0 <= u <= 1.0):
+        return None
+    z = az + (run.p1[2] - az) * t
+    if not (wall.z_min <= z <= wall.z_max):
+        return None
+    ux = dx / run_len
+    uy = dy / run_len
+    length = wall.thickness / sin
+    x = ax + dx * t
+    y = ay + dy * t
+    start = (x - ux * length / 2.0, y - uy * length / 2.0, z)
+    return Penetration(run, wall, t, (x, y, z), start, (ux, uy, 0.0), length)
+
+
+def band_width(runs, walls):
+    """ Plan Y band for find_penetrations, a few times the average item depth """
+    depths = [item.y_max - item.y_min for item in walls] + [item.y_max - item.y_min for item in runs]
+    if not depths:
+        return MIN_BAND
+    return max(MIN_BAND, 4.0 * sum(depths) / len(depths))
+
+
+def find_penetrations(runs, walls, min_angle=MIN_CROSSING_ANGLE, band=None):
+    """ Every run crossing every wall, by sweep and prune along X within bands along Y
+    :param band: Y band width, see band_width
+    :return: list of Penetration, by run order then along each run"""
+    min_sin = math.sin(math.radians(min_angle))
+    band = band or band_width(runs, walls)
+    order = dict((id(item), n) for items in (runs, walls) for n, item in enumerate(items))
+
+    bands = {}
+    for kind, items in ((0, walls), (1, runs)):
+        for n, item in enumerate(items):
+            for b in range(int(math.floor(item.y_min / band)), int(math.floor(item.y_max / band)) + 1):
+                bands.setdefault(b, []).append((item.x_min, kind, n, item))
+
+    found = []
+    for b, events in bands.items():
+        # Walls sort ahead of runs starting at the same X
+        events.sort(key=lambda e: e[:3])
+        active_walls = []
+        active_runs = []
+        for x, kind, _, item in events:
+            if kind == 0:
+                active_runs = [r for r in active_runs if r.x_max >= x]
+                active_walls.append(item)
+                pairs = [(r, item) for r in active_runs]
+            else:
+                active_walls = [w for w in active_walls if w.x_max >= x]
+                active_runs.append(item)
+                pairs = [(item, w) for w in active_walls]
+            for run, wall in pairs:
+                if run.y_max < wall.y_min or run.y_min > wall.y_max or \
+                        run.z_max < wall.z_min or run.z_min > wall.z_max:
+                    continue
+                # A pair sharing several bands is tested in the one its Y overlap starts in
+                if int(math.floor(max(run.y_min, wall.y_min) / band)) != b:
+                    continue
+                hit = penetration(run, wall, min_sin)
+                if hit is not None:
+                    found.append(hit)
+    found.sort(key=lambda p: (order[id(p.run)], p.t, order[id(p.wall)]))
+    return dedupe(found)
+
+
+def dedupe(penetrations, tolerance=DEDUPE_TOL):
+    """ First of the hits on a run closer than tolerance to each other, input sorted along each run """
+    result = []
+    for p in penetrations:
+        if result and result[-1].run is p.run:
+            last = result[-1].point
+            if math.sqrt(sum((a - b) ** 2 for a, b in zip(last, p.point))) < tolerance:
+                continue
+        result.append(p)
+    return result
+
+
+# ------------------------------------------------------------------------------------
+# Extraction from Revit elements
+# ------------------------------------------------------------------------------------
+def _xyz(point, transform=None):
+    if transform is not None:
+        point = transform.OfPoint(point)
+    return point.X, point.Y, point.Z
+
+
+def runs_extent(runs, margin=EXTENT_MARGIN):
+    """ (minimum, maximum) corners (x, y, z) of the box around every run, None without runs """
+    if not runs:
+        return None
+    return ((min(r.x_min for r in runs) - margin, min(r.y_min for r in runs) - margin,
+             min(r.z_min for r in runs) - margin),
+            (max(r.x_max for r in runs) + margin, max(r.y_max for r in runs) + margin,
+             max(r.z_max for r in runs) + margin))
+
+
+def wall_filter(extent, transform=None, api=None):
+    """ BoundingBoxIntersectsFilter for the elements that may meet the runs of extent
+    :param extent: see runs_extent, in host coordinates
+    :param transform: link instance total transform when filtering a linked document"""
+    api = api or revit_db()
+    minimum, maximum = extent
+    corners = [api.XYZ(x, y, z) for x in (minimum[0], maximum[0]) for y in (minimum[1], maximum[1])
+               for z in (minimum[2], maximum[2])]
+    if transform is not None:
+        inverse = transform.Inverse
+        corners = [inverse.OfPoint(c) for c in corners]
+    outline = api.Outline(api.XYZ(min(c.X for c in corners), min(c.Y for c in corners), min(c.Z for c in corners)),
+                          api.XYZ(max(c.X for c in corners), max(c.Y for c in corners), max(c.Z for c in corners)))
+    return api.BoundingBoxIntersectsFilter(outline)
+
+
+def wall_segment(wall, transform=None, key=None):
+    """ WallSegment of a straight wall, None for curved walls or walls without a location line
+    :param transform: link instance total transform for walls in a linked model"""
+    try:
+        curve = wall.Location.Curve
+    except AttributeError:
+        return None
+    if getattr(curve, 'IsCyclic', False):
+        return None
+    bbox = wall.get_BoundingBox(None)
+    if bbox is None:
+        return None
+    p0 = _xyz(curve.GetEndPoint(0), transform)
+    p1 = _xyz(curve.GetEndPoint(1), transform)
+    z0 = _xyz(bbox.Min, transform)[2]
+    z1 = _xyz(bbox.Max, transform)[2]
+    return WallSegment(key if key is not None else get_id_value(wall.Id), p0, p1, wall.Width, min(z0, z1),
+                       max(z0, z1))
+
+
+def run_segment(part, size=None, key=None):
+    """ RunSegment of a part with a location line, None for anything else """
+    try:
+        curve = part.Location.Curve
+    except AttributeError:
+        return None
+    return RunSegment(key if key is not None else get_id_value(part.Id), _xyz(curve.GetEndPoint(0)),
+                      _xyz(curve.GetEndPoint(1)), size)
@@ -0,0 +1,777 @@
+# -*- coding: UTF-8 -*-
+# Benchmark cases over Headless.SyntheticModel documents.
+#
+# A case gets the model built for the current size, prepares its input in
+# setup (not timed) and does the measured work in run. Baselines that are
+# quadratic or worse carry a max_size so large sizes skip them instead of
+# running for hours.
+from Headless import FakeRevit
+from Headless.FakeRevit import FilteredElementCollector, BuiltInCategory, BuiltInParameter, FabricationPart, \
+    FamilyInstance, FamilySymbol
+from Headless import LegacyPaths
+from Headless.SyntheticModel import FP_STRING_PARAMETERS, FP_DOUBLE_PARAMETERS
+from Fabrication import PipeChains, DuctRuns
+from Fabrication.ButtonCatalog import ButtonCatalog, HANGER
+from Fabrication.HangerRules import CompiledRules
+from Fabrication.HangerPlan import plan_selection, execute_plan
+from Fabrication.OpenEnds import open_ends, match_ends, distance, TOLERANCE
+from Fabrication.ConnectorAudit import audit_ends, read_part, TOLERANCE as AUDIT_TOLERANCE
+from Fabrication.SleevePlacement import FloorSleeve, WallSleeve, place_floor_sleeves, place_wall_sleeves, \
+    existing_sleeves, skip_served, is_sleeve_part, sleeve_axis, SERVED_TOL
+from Diagnostics.ApiCounter import unwrap, rewrap
+from Geometry.Occupancy import OccupancyIndex
+from Geometry.LevelPlanes import LevelPlanes
+from Geometry.WallPenetrations import find_penetrations, penetration, dedupe, wall_segment, run_segment
+from Geometry.SlabPenetrations import find_slab_crossings, crossing, slab
+from Selection.Duplicates import find_duplicates, scan_model, duplicate_ids, FABRICATION_CATEGORIES
+from Parameters import FP_Sync
+from Parameters.Get_Set_Params import get_id_value
+from Parameters.Fab_Snapshot import Field, STRING, SnapshotContext, build_snapshot, param_string
+
+# Model settings shared by every case, one model is built per size
+MODEL_OPTIONS = {'duplicate_share': 0.02, 'riser_share': 0.05, 'branch_share': 0.2, 'floors': True}
+
+# Duct-only models, the part count is the number of duct segments
+DUCT_OPTIONS = {'pipe_share': 0.0, 'duct_share': 1.0, 'hanger_share': 0.0, 'riser_share': 0.0, 'floors': False,
+                'tap_share': 0.3, 'run_length': (20, 120), 'elbow_every': 40}
+
+# A configuration closer to a shop's, a few hundred buttons per service
+BUTTON_OPTIONS = dict(MODEL_OPTIONS, extra_buttons=300)
+
+# Short walls, about 3 for every 5 pipe and duct parts
+WALL_OPTIONS = dict(MODEL_OPTIONS, wall_share=0.4, wall_length=(8, 40))
+
+# Every level's slab split into 8 x 8 slabs at a few elevations and thicknesses
+SLAB_OPTIONS = dict(MODEL_OPTIONS, slab_tiles=8)
+
+# One run in four ends in a straight left a little off the run
+GAP_OPTIONS = dict(MODEL_OPTIONS, gap_share=0.25)
+
+# Gaps mostly within the audit tolerance, a third of them turned off facing, plus a run in ten ending in a straight a size up
+AUDIT_OPTIONS = dict(GAP_OPTIONS, gap=(0.002, 0.015), skew_share=0.3, mismatch_share=0.1)
+
+# A model of its own for the cases that add sleeves to it
+SLEEVED_OPTIONS = dict(MODEL_OPTIONS, title='Sleeved')
+
+# Parameters the FP sync writes
+SYNC_TARGETS = [name for name in FP_STRING_PARAMETERS + FP_DOUBLE_PARAMETERS if name.startswith('FP_')] + \
+    ['FP_CID', 'Comments']
+
+FILTER_PROPERTIES = ['CID', 'ServiceType', 'Service Name', 'Size', 'Reference Level', 'Item Number']
+
+
+class Case(object):
+    def __init__(self, name, setup, run, max_size=None, group=None, result=None, options=None):
+        """ One measured code path
+        :param setup: callable(SyntheticModel) -> state, not timed
+        :param run: callable(state), timed
+        :param max_size: largest model size to run, None for no limit
+        :param group: cases of one group measure the same work, e.g. legacy and indexed
+        :param result: callable(run output) -> plain value, cases of one group must agree on it
+        :param options: build_model arguments replacing MODEL_OPTIONS for this case"""
+        self.name = name
+        self.setup = setup
+        self.run = run
+        self.max_size = max_size
+        self.group = group or name
+        self.result = result
+        self.options = options
+
+
+def collector(doc, scope=None):
+    # Keeps counting when Benchmark --calls hands in a counted document
+    return rewrap(doc, FilteredElementCollector(unwrap(doc), scope))
+
+
+def fab_parts(doc):
+    return collector(doc).OfClass(FabricationPart).WhereElementIsNotElementType().ToElements()
+
+
+def of_category(doc, bic):
+    return collector(doc).OfCategory(bic).WhereElementIsNotElementType().ToElements()
+
+
+def sync_items(doc):
+    fab_cat_map = {
+        BuiltInCategory.OST_FabricationHangers.value__: FP_Sync.CATEGORY_HANGER,
+        BuiltInCategory.OST_FabricationPipework.value__: FP_Sync.CATEGORY_PIPE,
+        BuiltInCategory.OST_FabricationDuctwork.value__: FP_Sync.CATEGORY_DUCT,
+    }
+    items = []
+    for element in fab_parts(doc):
+        items.append((fab_cat_map.get(get_id_value(element.Category.Id), FP_Sync.CATEGORY_PART), element))
+    for element in of_category(doc, BuiltInCategory.OST_FlexDuctCurves):
+        items.append((FP_Sync.CATEGORY_FLEX, element))
+    return items
+
+
+# ------------------------------------------------------------------------------------
+# Hanger chain walking and run grouping
+# ------------------------------------------------------------------------------------
+def setup_chains(model):
+    # PlacePipeHangers works on a selection, take the pipework of the busiest service
+    pipes = [el for el in of_category(model.doc, BuiltInCategory.OST_FabricationPipework)]
+    by_service = {}
+    for el in pipes:
+        by_service.setdefault(el.ServiceId, []).append(el)
+    return max(by_service.values(), key=len) if by_service else []
+
+
+def run_chains_legacy(selection):
+    return LegacyPaths.extract_runs(selection)
+
+
+def run_chains(selection):
+    return PipeChains.extract_runs(selection)
+
+
+def chain_result(runs):
+    # Element order and entry connector of every run
+    result = []
+    for chain, entry_conns in runs:
+        result.append([(get_id_value(e.Id), entry_conns[e.Id].Id) for e in chain])
+    return result
+
+
+# ------------------------------------------------------------------------------------
+# Duct run grouping and hanger positions
+# ------------------------------------------------------------------------------------
+DUCT_END_DIST = 1.0
+DUCT_SPACING = 8.0
+
+
+def setup_ducts(model):
+    # Straights are the hanger hosts PlaceDuctHangers keeps from a selection
+    return [el for el in of_category(model.doc, BuiltInCategory.OST_FabricationDuctwork) if el.IsAStraight()]
+
+
+def run_ducts_legacy(hosts):
+    return [(run, LegacyPaths.duct_hanger_positions(run, DUCT_END_DIST, DUCT_SPACING))
+            for run in LegacyPaths.duct_group_into_runs(hosts)]
+
+
+def run_ducts(hosts):
+    return [(run, DuctRuns.hanger_positions(run, DUCT_END_DIST, DUCT_SPACING))
+            for run in DuctRuns.group_into_runs(hosts)]
+
+
+def duct_result(runs):
+    # Part order, entry connectors and hanger positions of every run
+    result = []
+    for run, positions in runs:
+        result.append(([(get_id_value(part.Id), conn.Id) for part, conn in run],
+                       [(get_id_value(span['part'].Id), round(pos, 9)) for span, pos in positions]))
+    return result
+
+
+# ------------------------------------------------------------------------------------
+# Hanger button lookup
+# ------------------------------------------------------------------------------------
+def setup_buttons(model):
+    # One lookup per hanger host, as PlacePipeHangers does per segment
+    config = unwrap(model.doc).fabrication_configuration
+    names = ['Clevis Hanger', 'Band Hanger', 'Trapeze', 'Strap Hanger']
+    lookups = [(host.ServiceName, names[n % len(names)]) for n, host in enumerate(model.hangers)]
+    return config, lookups
+
+
+def run_buttons_legacy(state):
+    config, lookups = state
+    return [LegacyPaths.hanger_button(config, service, name) for service, name in lookups]
+
+
+def run_buttons(state):
+    # Catalog scanned once per run, the first tool run of a session
+    config, lookups = state
+    catalog = ButtonCatalog.scan(config)
+    return [catalog.button(catalog.find_near(name, service, HANGER)) for service, name in lookups]
+
+
+def button_result(buttons):
+    return [(b.ServiceId, b.Name) if b is not None else None for b in buttons]
+
+
+# ------------------------------------------------------------------------------------
+# Hanger spacing rules
+# ------------------------------------------------------------------------------------
+RULE_SIZES = [0.5, 0.75, 1.0, 1.25, 1.5, 2.0, 2.5, 3.0, 4.0, 6.0, 8.0, 12.0]
+
+
+def hanger_payload(service_names, extra_services=40):
+    # Rules for the model's services plus services of other trades, one line each
+    lines = []
+    for n, name in enumerate(list(service_names) + ['Other Service {}'.format(i) for i in range(extra_services)]):
+        rules = ['{}:Clevis Hanger:{}:1.0:{}'.format(size, 6.0 + (n + k) % 5, 'True' if k % 4 == 0 else 'False')
+                 for k, size in enumerate(RULE_SIZES)]
+        lines.append('{}={}'.format(name, '|'.join(rules)))
+    # Fuzzy-matched entries and an old single-rule line
+    lines.append('Water=Band Hanger|8.0|False')
+    return '\n'.join(lines)
+
+
+def setup_rules(model):
+    # Service name and size per pipe as get_rule_for_element reads them
+    lookups = []
+    services = set()
+    for el in of_category(model.doc, BuiltInCategory.OST_FabricationPipework):
+        conns = el.ConnectorManager.Connectors
+        size = conns[0].Radius * 2.0 * 12.0 if conns else 999.0
+        lookups.append((el.ServiceName, size))
+        services.add(el.ServiceName)
+    names = sorted(services)
+    # Leave one service to the fuzzy match
+    payload = hanger_payload(names[:-1] if len(names) > 1 else names)
+    return payload, lookups
+
+
+def run_rules_legacy(state):
+    payload, lookups = state
+    settings = LegacyPaths.parse_hanger_payload(payload)
+    return [LegacyPaths.hanger_rule(service, size, settings) for service, size in lookups]
+
+
+def run_rules(state):
+    payload, lookups = state
+    rules = CompiledRules.from_payload(payload)
+    return [rules.rule_for(service, size) for service, size in lookups]
+
+
+def rule_result(found):
+    return [tuple(rule) for rule in found]
+
+
+# ------------------------------------------------------------------------------------
+# Hanger layout
+# ------------------------------------------------------------------------------------
+class CreateRecorder(object):
+    # Stands in for CreateHanger so repeated runs leave the shared model alone
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, doc, button, host_id, connector, distance, attach):
+        self.calls.append((get_id_value(host_id), connector.Id, round(distance, 6), button))
+
+
+def setup_hangers(model):
+    selection = setup_chains(model)
+    rules = CompiledRules.from_payload(hanger_payload(sorted(set(el.ServiceName for el in selection))))
+    sizes = dict((el.Id, el.ConnectorManager.Connectors[0].Radius * 24.0) for el in selection)
+
+    def rule_for(el):
+        return rules.rule_for(el.ServiceName, sizes[el.Id])
+    return model.doc, selection, rule_for
+
+
+def service_name(el):
+    return el.ServiceName
+
+
+def hanger_name_button(hanger_name, svc_name):
+    return hanger_name
+
+
+def run_hangers_legacy(state):
+    doc, selection, rule_for = state
+    create = CreateRecorder()
+    LegacyPaths.place_pipe_hangers(doc, selection, rule_for, service_name, hanger_name_button, create)
+    return create.calls
+
+
+def run_hanger_plan(state):
+    doc, selection, rule_for = state
+    return plan_selection(selection, rule_for, service_name)
+
+
+def run_hangers(state):
+    doc, selection, rule_for = state
+    create = CreateRecorder()
+    execute_plan(doc, plan_selection(selection, rule_for, service_name), hanger_name_button, create=create)
+    return create.calls
+
+
+# ------------------------------------------------------------------------------------
+# Overkill duplicate search
+# ------------------------------------------------------------------------------------
+def setup_overkill(model):
+    return model.doc
+
+
+def run_overkill_legacy(doc):
+    return LegacyPaths.overkill_fp(doc, doc.ActiveView.Id, 0.0625 / 12)
+
+
+def run_overkill_centers(doc):
+    # Centers only, as the legacy scan compared them
+    parts = collector(doc, doc.ActiveView.Id).OfClass(FabricationPart).WhereElementIsNotElementType().ToElements()
+    return [element.Id for element, _ in find_duplicates(parts, 0.0625 / 12, None)]
+
+
+def run_overkill(doc):
+    # Signatures and connector ends, one category after the other as OverkillFP streams them
+    collectors = [(bic, collector(doc, doc.ActiveView.Id).OfCategory(getattr(BuiltInCategory, bic))
+                   .WhereElementIsNotElementType()) for bic in FABRICATION_CATEGORIES
+                  if hasattr(BuiltInCategory, bic)]
+    return duplicate_ids(scan_model(collectors, 0.0625 / 12))
+
+
+def overkill_result(ids):
+    return [get_id_value(eid) for eid in ids]
+
+
+# ------------------------------------------------------------------------------------
+# SelectFabFilter property options and filter evaluation
+# ------------------------------------------------------------------------------------
+def setup_filter(model):
+    doc = model.doc
+    elements = fab_parts(doc)
+    service = model.runs[0][0].LookupParameter('Fabrication Service Name').AsString() if model.runs else ''
+    filters = {'Service Name': [([service], True)],
+               'Reference Level': [([l.Name for l in model.levels[:3]], False)]}
+    return doc, elements, filters
+
+
+def run_filter_legacy(state):
+    doc, elements, filters = state
+    config = doc.fabrication_configuration
+    LegacyPaths.property_options(elements, FILTER_PROPERTIES, config)
+    return LegacyPaths.filter_elements(elements, filters, config)
+
+
+def run_filter_snapshot(state):
+    doc, elements, filters = state
+    snapshot = build_snapshot(elements, FILTER_PROPERTIES, SnapshotContext(doc, doc.fabrication_configuration))
+    for name in FILTER_PROPERTIES:
+        sorted(snapshot.distinct(name))
+    return [snapshot.ids[row] for row in snapshot.match(filters)]
+
+
+# ------------------------------------------------------------------------------------
+# FP parameter sync
+# ------------------------------------------------------------------------------------
+def setup_sync(model):
+    # FP_* values back to the part defaults, so every case writes them itself
+    doc = model.doc
+    for category, element in sync_items(unwrap(doc)):
+        if element._values:
+            for name in SYNC_TARGETS:
+                element._values.pop(name, None)
+    return doc
+
+
+def run_sync_legacy(doc):
+    LegacyPaths.fp_sync(doc, doc.fabrication_configuration)
+    return doc
+
+
+def run_sync(doc):
+    FP_Sync.sync_elements(sync_items(doc), doc.fabrication_configuration, doc.GetElement)
+    return doc
+
+
+def sync_result(doc):
+    rows = []
+    for category, element in sync_items(unwrap(doc)):
+        values = [element._get_value(name) for name in SYNC_TARGETS]
+        rows.append((get_id_value(element.Id), tuple(round(v, 6) if isinstance(v, float) else v for v in values)))
+    return sorted(rows)
+
+
+# ------------------------------------------------------------------------------------
+# Pointload computation
+# ------------------------------------------------------------------------------------
+def setup_pointload(model):
+    doc = model.doc
+    return (doc, of_category(doc, BuiltInCategory.OST_FabricationPipework),
+            of_category(doc, BuiltInCategory.OST_FabricationHangers))
+
+
+def run_pointload_legacy(state):
+    doc, pipes, hangers = state
+    LegacyPaths.pipe_pointload(pipes, hangers)
+    return LegacyPaths.host_material_sizes(doc, hangers)
+
+
+def read_host_material(el, ctx):
+    return el.Parameter[BuiltInParameter.FABRICATION_PART_MATERIAL].AsValueString()
+
+
+def run_pointload_snapshot(state):
+    doc, pipes, hangers = state
+    LegacyPaths.pipe_pointload(pipes, hangers)
+    fields = [Field('Material', STRING, read_host_material), Field('Size', STRING, param_string('Size'))]
+    host_ids = set()
+    for hanger in hangers:
+        host_ids.add(hanger.GetHostedInfo().HostId)
+    hosts = [doc.GetElement(i) for i in host_ids]
+    return build_snapshot(hosts, fields, SnapshotContext(doc))
+
+
+# ------------------------------------------------------------------------------------
+# Rod control occupancy
+# ------------------------------------------------------------------------------------
+def setup_rods(model):
+    # Every other hanger already has its controls
+    hangers = list(of_category(model.doc, BuiltInCategory.OST_FabricationHangers))
+    existing = {}
+    for hanger in hangers[::2]:
+        rod_info = hanger.GetRodInfo()
+        for n in range(rod_info.RodCount):
+            existing[(get_id_value(hanger.Id), n)] = rod_info.GetRodEndPosition(n)
+    return hangers, existing
+
+
+def run_rods_legacy(state):
+    hangers, existing = state
+    return LegacyPaths.rod_controls(hangers, existing)
+
+
+def run_rods(state):
+    hangers, existing = state
+    occupied = OccupancyIndex(existing.values())
+    placed = []
+    for e in hangers:
+        rod_info = e.GetRodInfo()
+        for n in range(rod_info.RodCount):
+            placed.append(occupied.claim(rod_info.GetRodEndPosition(n)))
+    return placed
+
+
+# ------------------------------------------------------------------------------------
+# Sleeve level intersection
+# ------------------------------------------------------------------------------------
+def setup_sleeves(model):
+    doc = model.doc
+    return doc, of_category(doc, BuiltInCategory.OST_FabricationPipework), list(model.levels)
+
+
+def run_sleeves_legacy(state):
+    doc, pipes, levels = state
+    found = []
+    for pipe in pipes:
+        found.extend(LegacyPaths.get_pipe_intersections(doc, pipe, levels))
+    return found
+
+
+def run_sleeves(state):
+    doc, pipes, levels = state
+    planes = LevelPlanes.from_document(unwrap(doc), levels, FakeRevit)
+    found = []
+    for pipe in pipes:
+        if not LegacyPaths.is_vertical_pipe(pipe):
+            continue
+        bbox = pipe.get_BoundingBox(None)
+        conns = pipe.ConnectorManager.Connectors
+        cx = (conns[0].Origin.X + conns[1].Origin.X) / 2.0
+        cy = (conns[0].Origin.Y + conns[1].Origin.Y) / 2.0
+        found.extend((FakeRevit.XYZ(cx, cy, z), level) for z, level in planes.crossings(bbox.Min.Z, bbox.Max.Z))
+    return found
+
+
+def crossing_result(found):
+    return sorted((round(pt.X, 6), round(pt.Y, 6), round(pt.Z, 6), get_id_value(level.Id)) for pt, level in found)
+
+
+def setup_sleeve_placement(model):
+    doc, pipes, levels = setup_sleeves(model)
+    crossings = []
+    for pipe in pipes:
+        conns = pipe.ConnectorManager.Connectors
+        for pt, level in LegacyPaths.get_pipe_intersections(doc, pipe, levels):
+            crossings.append((pipe, pt, level, (conns[1].Origin - conns[0].Origin).Normalize()))
+    button = unwrap(doc).fabrication_configuration.service_by_id(7).GetButton(0, 0)
+    return doc, crossings, button
+
+
+def sleeve_size(part, host, length=None):
+    param = part.LookupParameter('Length')
+    if param and not param.IsReadOnly:
+        param.Set(0.5)
+
+
+def placed_result(doc, parts):
+    # Ends of the placed sleeves, then the sleeves go again so repeated runs leave the model alone
+    ends = [tuple(round(v, 6) for v in (c.Origin.X, c.Origin.Y, c.Origin.Z))
+            for part in parts for c in part.ConnectorManager.Connectors]
+    unwrap(doc).Delete([part.Id for part in parts])
+    return ends
+
+
+def run_sleeve_placement_legacy(state):
+    doc, crossings, button = state
+    return placed_result(doc, LegacyPaths.place_floor_sleeves(doc, crossings, button, 0, sleeve_size))
+
+
+def run_sleeve_placement(state):
+    doc, crossings, button = state
+    sleeves = [FloorSleeve(*crossing) for crossing in crossings]
+    placed = place_floor_sleeves(doc, sleeves, button, 0, sleeve_size, doc.Regenerate, FakeRevit)
+    return placed_result(doc, [s.part for s in placed])
+
+
+# ------------------------------------------------------------------------------------
+# Slab penetrations
+# ------------------------------------------------------------------------------------
+def setup_slabs(model):
+    runs = [run_segment(part) for part in of_category(model.doc, BuiltInCategory.OST_FabricationPipework)]
+    slabs = [slab(floor, api=FakeRevit) for floor in model.floors]
+    return [r for r in runs if r is not None], slabs
+
+
+def run_slabs_pairwise(state):
+    runs, slabs = state
+    found = []
+    for run in runs:
+        hits = [c for c in (crossing(run, s) for s in slabs) if c is not None]
+        found.extend(sorted(hits, key=lambda c: c.t))
+    return found
+
+
+def run_slabs(state):
+    runs, slabs = state
+    return find_slab_crossings(runs, slabs)
+
+
+def slab_result(found):
+    return sorted((c.run.key, c.slab.key, tuple(round(v, 6) for v in c.top), round(c.length, 6)) for c in found)
+
+
+# ------------------------------------------------------------------------------------
+# Open end pairing
+# ------------------------------------------------------------------------------------
+def setup_open_ends(model):
+    return open_ends(fab_parts(model.doc))
+
+
+def run_open_ends_pairwise(ends):
+    # Every end against every later end
+    candidates = []
+    for i, a in enumerate(ends):
+        for j in range(i + 1, len(ends)):
+            b = ends[j]
+            if a.key != b.key:
+                gap = distance(a, b)
+                if gap < TOLERANCE:
+                    candidates.append((gap, i, j))
+    candidates.sort()
+    return match_ends(ends, candidates=candidates)
+
+
+def run_open_ends(ends):
+    return match_ends(ends)
+
+
+def pair_result(found):
+    pairs, skipped = found
+    return sorted((p.moved.key, p.target.key, round(p.gap, 6), p.status) for p in pairs + skipped)
+
+
+# ------------------------------------------------------------------------------------
+# Connector audit
+# ------------------------------------------------------------------------------------
+def setup_audit(model):
+    ends = []
+    findings = []
+    for part in fab_parts(model.doc):
+        read_part(part, ends, findings)
+    return ends, findings
+
+
+def run_audit_pairwise(state):
+    ends, findings = state
+    candidates = []
+    for i, a in enumerate(ends):
+        for j in range(i + 1, len(ends)):
+            b = ends[j]
+            if a.key != b.key:
+                gap = distance(a, b)
+                if gap < AUDIT_TOLERANCE:
+                    candidates.append((gap, i, j))
+    candidates.sort()
+    return findings + audit_ends(ends, candidates=candidates)
+
+
+def run_audit(state):
+    ends, findings = state
+    return findings + audit_ends(ends)
+
+
+def finding_result(found):
+    return sorted((f.kind, f.key, -1 if f.other is None else f.other, tuple(round(v, 6) for v in f.point))
+                  for f in found)
+
+
+def setup_listed_open(model):
+    return open_ends(fab_parts(model.doc))
+
+
+def run_listed_open(ends):
+    return sorted(set(end.key for end in ends))
+
+
+def run_audit_coverage(state):
+    # Parts with an open end that made it into a finding, must be every one of them
+    ends, findings = state
+    found = findings + audit_ends(ends)
+    keys = set(f.key for f in found) | set(f.other for f in found)
+    return sorted(set(end.key for end in ends if not end.connected) & keys)
+
+
+# ------------------------------------------------------------------------------------
+# Existing sleeves
+# ------------------------------------------------------------------------------------
+def setup_existing_sleeves(model):
+    # Half the crossings get a sleeve part and a sixth a Floor Sleeve family, once per model
+    doc, crossings, button = setup_sleeve_placement(model)
+    raw = unwrap(doc)
+    if not any(is_sleeve_part(part) for part in fab_parts(raw)):
+        place_floor_sleeves(raw, [FloorSleeve(*c) for c in crossings[::2]], button, 0, sleeve_size, raw.Regenerate,
+                            FakeRevit)
+        symbol = raw.add(FamilySymbol('Floor Sleeve', 'Floor Sleeve'))
+        for pipe, pt, level, direction in crossings[1::6]:
+            raw.Create.NewFamilyInstance(pt, symbol, level)
+    return doc, crossings
+
+
+def run_sleeve_scan(state):
+    # Every crossing against the axis of every sleeve
+    doc, crossings = state
+    axes = []
+    for part in fab_parts(doc):
+        if is_sleeve_part(part):
+            axes.append(sleeve_axis(part, part.get_BoundingBox(None)))
+    for instance in collector(doc).OfClass(FamilyInstance).WhereElementIsNotElementType():
+        if 'sleeve' in instance.Symbol.Family.Name.lower():
+            axes.append(sleeve_axis(instance, instance.get_BoundingBox(None)))
+    return [any(axis.holds(pt, SERVED_TOL) for axis in axes) for pipe, pt, level, direction in crossings]
+
+
+def run_sleeve_index(state):
+    doc, crossings = state
+    sleeves = [FloorSleeve(*crossing) for crossing in crossings]
+    skip_served(sleeves, existing_sleeves(doc, FakeRevit))
+    return [s.existing is not None for s in sleeves]
+
+
+# ------------------------------------------------------------------------------------
+# Wall penetrations and wall sleeves
+# ------------------------------------------------------------------------------------
+def setup_walls(model):
+    doc = model.doc
+    runs = []
+    for bic in (BuiltInCategory.OST_FabricationPipework, BuiltInCategory.OST_FabricationDuctwork):
+        for part in of_category(doc, bic):
+            run = run_segment(part, part.ConnectorManager.Connectors[0].Radius * 2.0)
+            if run is not None:
+                runs.append(run)
+    walls = [wall_segment(w) for w in model.walls]
+    return runs, [w for w in walls if w is not None]
+
+
+def run_walls_pairwise(state):
+    runs, walls = state
+    found = []
+    for run in runs:
+        hits = [p for p in (penetration(run, wall) for wall in walls) if p is not None]
+        found.extend(sorted(hits, key=lambda p: p.t))
+    return dedupe(found)
+
+
+def run_walls(state):
+    runs, walls = state
+    return find_penetrations(runs, walls)
+
+
+def penetration_result(found):
+    return sorted((p.run.key, p.wall.key, tuple(round(v, 6) for v in p.start), round(p.length, 6)) for p in found)
+
+
+def setup_wall_sleeves(model):
+    runs, walls = setup_walls(model)
+    doc = model.doc
+    items = []
+    for p in find_penetrations(runs, walls):
+        host = unwrap(doc).GetElement(p.run.key)
+        items.append((host, FakeRevit.XYZ(*p.start), p.length, FakeRevit.XYZ(*p.direction)))
+    button = unwrap(doc).fabrication_configuration.service_by_id(7).GetButton(0, 0)
+    return doc, items, button
+
+
+def wall_sleeve_size(part, host, length):
+    sleeve_size(part, host)
+
+
+def run_wall_sleeves_legacy(state):
+    doc, items, button = state
+    return placed_result(doc, LegacyPaths.place_wall_sleeves(doc, items, button, 0, wall_sleeve_size))
+
+
+def run_wall_sleeves(state):
+    doc, items, button = state
+    sleeves = [WallSleeve(host, point, direction, length) for host, point, length, direction in items]
+    placed = place_wall_sleeves(doc, sleeves, button, 0, wall_sleeve_size, doc.Regenerate, FakeRevit)
+    return placed_result(doc, [s.part for s in placed])
+
+
+CASES = [
+    Case('chains_legacy', setup_chains, run_chains_legacy, max_size=5000, group='chains', result=chain_result),
+    Case('chains', setup_chains, run_chains, group='chains', result=chain_result),
+    Case('ducts_legacy', setup_ducts, run_ducts_legacy, max_size=2000, group='ducts', result=duct_result,
+         options=DUCT_OPTIONS),
+    Case('ducts', setup_ducts, run_ducts, group='ducts', result=duct_result, options=DUCT_OPTIONS),
+    Case('buttons_legacy', setup_buttons, run_buttons_legacy, group='buttons', result=button_result,
+         options=BUTTON_OPTIONS),
+    Case('buttons', setup_buttons, run_buttons, group='buttons', result=button_result, options=BUTTON_OPTIONS),
+    Case('rules_legacy', setup_rules, run_rules_legacy, group='rules', result=rule_result),
+    Case('rules', setup_rules, run_rules, group='rules', result=rule_result),
+    Case('hangers_legacy', setup_hangers, run_hangers_legacy, max_size=5000, group='hangers', result=list),
+    Case('hangers', setup_hangers, run_hangers, group='hangers', result=list),
+    Case('hanger_plan', setup_hangers, run_hanger_plan, group='hangers'),
+    Case('overkill_legacy', setup_overkill, run_overkill_legacy, max_size=5000, group='overkill',
+         result=overkill_result),
+    Case('overkill_centers', setup_overkill, run_overkill_centers, group='overkill', result=overkill_result),
+    Case('overkill', setup_overkill, run_overkill, group='overkill'),
+    Case('filter_legacy', setup_filter, run_filter_legacy, group='filter'),
+    Case('filter_snapshot', setup_filter, run_filter_snapshot, group='filter'),
+    Case('sync_legacy', setup_sync, run_sync_legacy, group='sync', result=sync_result),
+    Case('sync', setup_sync, run_sync, group='sync', result=sync_result),
+    Case('pointload_legacy', setup_pointload, run_pointload_legacy, group='pointload'),
+    Case('pointload_snapshot', setup_pointload, run_pointload_snapshot, group='pointload'),
+    Case('rods_legacy', setup_rods, run_rods_legacy, max_size=20000, group='rods', result=list),
+    Case('rods', setup_rods, run_rods, group='rods', result=list),
+    Case('sleeves_legacy', setup_sleeves, run_sleeves_legacy, group='sleeves', result=crossing_result),
+    Case('sleeves', setup_sleeves, run_sleeves, group='sleeves', result=crossing_result),
+    Case('sleeve_placement_legacy', setup_sleeve_placement, run_sleeve_placement_legacy, group='sleeve_placement',
+         result=list),
+    Case('sleeve_placement', setup_sleeve_placement, run_sleeve_placement, group='sleeve_placement', result=list),
+    Case('slabs_pairwise', setup_slabs, run_slabs_pairwise, max_size=20000, group='slabs', result=slab_result,
+         options=SLAB_OPTIONS),
+    Case('slabs', setup_slabs, run_slabs, group='slabs', result=slab_result, options=SLAB_OPTIONS),
+    Case('open_ends_pairwise', setup_open_ends, run_open_ends_pairwise, max_size=5000, group='open_ends',
+         result=pair_result, options=GAP_OPTIONS),
+    Case('open_ends', setup_open_ends, run_open_ends, group='open_ends', result=pair_result, options=GAP_OPTIONS),
+    Case('audit_pairwise', setup_audit, run_audit_pairwise, max_size=5000, group='audit', result=finding_result,
+         options=AUDIT_OPTIONS),
+    Case('audit', setup_audit, run_audit, group='audit', result=finding_result, options=AUDIT_OPTIONS),
+    Case('audit_open_listed', setup_listed_open, run_listed_open, group='audit_coverage', result=list,
+         options=AUDIT_OPTIONS),
+    Case('audit_coverage', setup_audit, run_audit_coverage, group='audit_coverage', result=list,
+         options=AUDIT_OPTIONS),
+    Case('sleeve_scan', setup_existing_sleeves, run_sleeve_scan, max_size=20000, group='existing_sleeves', result=list,
+         options=SLEEVED_OPTIONS),
+    Case('sleeve_index', setup_existing_sleeves, run_sleeve_index, group='existing_sleeves', result=list,
+         options=SLEEVED_OPTIONS),
+    Case('walls_pairwise', setup_walls, run_walls_pairwise, max_size=5000, group='walls', result=penetration_result,
+         options=WALL_OPTIONS),
+    Case('walls', setup_walls, run_walls, group='walls', result=penetration_result, options=WALL_OPTIONS),
+    Case('wall_sleeves_legacy', setup_wall_sleeves, run_wall_sleeves_legacy, group='wall_sleeves', result=list,
+         options=WALL_OPTIONS),
+    Case('wall_sleeves', setup_wall_sleeves, run_wall_sleeves, group='wall_sleeves', result=list,
+         options=WALL_OPTIONS),
+]
+
+
+def get_cases(names=None):
+    """ :param names: case or group names, None for all"""
+    if not names:
+        return list(CASES)
+    return [c for c in CASES if c.name in names or c.group in names]
@@ -0,0 +1,290 @@
+# -*- coding: UTF-8 -*-
+# Benchmark runner for the headless cases in Headless.BenchCases.
+#
+# Every case runs on synthetic models of increasing size. Time and peak
+# memory are recorded per size, the growth exponent between sizes shows
+# where a code path turns super-linear, and the results are written as
+# sorted JSON so two runs can be diffed or compared with --compare.
+#
+#   python lib/Headless/Benchmark.py --sizes 1000,5000,20000 --out bench.json
+#   python lib/Headless/Benchmark.py --cases sync,filter --compare bench.json
+#   python lib/Headless/Benchmark.py --sizes 2000 --calls
+#   python lib/Headless/Benchmark.py --cases chains --sizes 500,2000 --check 5
+#
+# --calls runs every case once more on a counted document and stores the
+# Revit API call histogram (see Diagnostics.ApiCounter) next to the timings.
+# --check N skips timing and runs the cases of each group on N seeds,
+# reporting every model where a rewritten path disagrees with its baseline.
+import copy
+import gc
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None      # IronPython / py2, memory is not reported
+
+try:
+    clock = time.perf_counter
+except AttributeError:
+    clock = time.time
+
+DEFAULT_SIZES = [1000, 5000, 20000]
+
+# Growth exponent above which a case is flagged, 1.0 is linear
+SUPERLINEAR = 1.3
+
+# Runs shorter than this are too noisy to judge growth or regressions
+MIN_SECONDS = 0.005
+
+# Slowdown against the compared file that counts as a regression
+REGRESSION = 1.25
+
+
+def _round(value, digits=4):
+    # Significant digits keep the JSON diffs readable
+    if not value:
+        return value
+    return round(value, digits - 1 - int(math.floor(math.log10(abs(value)))))
+
+
+def time_case(case, state, repeat):
+    """ Best of repeat runs
+    :return: seconds"""
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        start = clock()
+        case.run(state)
+        elapsed = clock() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def peak_memory(case, state):
+    """ Peak bytes allocated during one run, None without tracemalloc """
+    if tracemalloc is None:
+        return None
+    gc.collect()
+    tracemalloc.start()
+    try:
+        case.run(state)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def case_model(case, size, seed, models):
+    """ Synthetic model for a case, shared by cases with the same options
+    :param models: cache for the current size, options -> model"""
+    from Headless.SyntheticModel import build_model
+    from Headless.BenchCases import MODEL_OPTIONS
+
+    options = case.options if case.options is not None else MODEL_OPTIONS
+    key = tuple(sorted(options.items()))
+    if key not in models:
+        models[key] = build_model(parts=size, seed=seed, **options)
+    return models[key]
+
+
+def count_calls(case, model):
+    """ API calls made by one run, setup calls excluded
+    :return: {call: count}"""
+    from Diagnostics.ApiCounter import ApiCounter
+    counter = ApiCounter(case.name, enabled=True)
+    counted = copy.copy(model)
+    counted.doc = counter.wrap(model.doc)
+    state = case.setup(counted)
+    counter.reset()
+    case.run(state)
+    return counter.calls
+
+
+def growth_exponents(rows):
+    """ Log-log slope of time against size between consecutive sizes """
+    exponents = []
+    for a, b in zip(rows, rows[1:]):
+        if a['seconds'] < MIN_SECONDS or b['seconds'] < MIN_SECONDS:
+            exponents.append(None)
+            continue
+        exponents.append(_round(math.log(b['seconds'] / a['seconds']) / math.log(float(b['size']) / a['size']), 3))
+    return exponents
+
+
+def git_commit():
+    try:
+        folder = os.path.dirname(os.path.abspath(__file__))
+        out = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=folder,
+                                      stderr=subprocess.STDOUT)
+        return out.decode('ascii', 'replace').strip()
+    except Exception:
+        return None
+
+
+def run_benchmarks(cases, sizes, repeat=1, memory=True, seed=0, log=None, calls=False):
+    """ Runs every case on a synthetic model per size
+    :param cases: Case objects from Headless.BenchCases
+    :param memory: also measure peak memory, costs one extra traced run
+    :param calls: also count API calls, costs one extra counted run
+    :param log: callable(str) for progress lines
+    :return: results dict as written to JSON"""
+    results = dict((case.name, {'group': case.group, 'sizes': []}) for case in cases)
+    for size in sizes:
+        models = {}
+        for case in cases:
+            if case.max_size is not None and size > case.max_size:
+                continue
+            model = case_model(case, size, seed, models)
+            state = case.setup(model)
+            seconds = time_case(case, state, repeat)
+            peak = peak_memory(case, state) if memory else None
+            row = {'size': size, 'seconds': _round(seconds),
+                   'peak_kb': int(peak / 1024) if peak is not None else None}
+            if calls:
+                row['calls'] = count_calls(case, model)
+            results[case.name]['sizes'].append(row)
+            if log:
+                log('{:<22} {:>7} parts {:>10.4f} s {:>10} KB'.format(
+                    case.name, size, seconds, row['peak_kb'] if row['peak_kb'] is not None else '-'))
+                if calls:
+                    log('    ' + ', '.join('{} {:.2f}/part'.format(name, float(n) / size)
+                                          for name, n in sorted(row['calls'].items(), key=lambda kv: -kv[1])))
+        models = model = state = None
+        gc.collect()
+
+    for name, result in results.items():
+        exponents = growth_exponents(result['sizes'])
+        result['exponents'] = exponents
+        result['superlinear'] = any(e is not None and e > SUPERLINEAR for e in exponents)
+    return {
+        'meta': {
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'seed': seed,
+            'repeat': repeat,
+            'sizes': list(sizes),
+        },
+        'results': results,
+    }
+
+
+def check_results(cases, sizes, seeds, log=None):
+    """ Runs the cases that define a result on every size and seed and
+    compares them with the first case of their group
+    :return: list of (case, baseline case, size, seed)"""
+    mismatches = []
+    for seed in seeds:
+        for size in sizes:
+            models = {}
+            baselines = {}
+            for case in cases:
+                if case.result is None or (case.max_size is not None and size > case.max_size):
+                    continue
+                value = case.result(case.run(case.setup(case_model(case, size, seed, models))))
+                if case.group not in baselines:
+                    baselines[case.group] = (case.name, value)
+                    continue
+                baseline, expected = baselines[case.group]
+                same = value == expected
+                if not same:
+                    mismatches.append((case.name, baseline, size, seed))
+                if log:
+                    log('{:<22} {:>7} parts seed {:<4} {} {}'.format(
+                        case.name, size, seed, 'matches' if same else 'DIFFERS from', baseline))
+            models = None
+            gc.collect()
+    return mismatches
+
+
+def compare(previous, current):
+    """ Cases and sizes that got slower than REGRESSION times the previous run
+    :return: list of (case, size, previous seconds, current seconds)"""
+    regressions = []
+    for name, result in current['results'].items():
+        before = previous.get('results', {}).get(name)
+        if not before:
+            continue
+        old = dict((row['size'], row['seconds']) for row in before['sizes'])
+        for row in result['sizes']:
+            seconds = old.get(row['size'])
+            if seconds is None or max(seconds, row['seconds']) < MIN_SECONDS:
+                continue
+            if row['seconds'] > seconds * REGRESSION:
+                regressions.append((name, row['size'], seconds, row['seconds']))
+    return regressions
+
+
+def save_results(path, results):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=1, sort_keys=True)
+        f.write('\n')
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    import argparse
+    from Headless.BenchCases import get_cases
+
+    parser = argparse.ArgumentParser(description='Way-Tools headless benchmarks')
+    parser.add_argument('--sizes', default=','.join(str(s) for s in DEFAULT_SIZES),
+                        help='comma separated part counts')
+    parser.add_argument('--cases', default='', help='comma separated case or group names, default all')
+    parser.add_argument('--repeat', type=int, default=1, help='best of N timed runs')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-memory', action='store_true', help='skip the traced peak memory run')
+    parser.add_argument('--calls', action='store_true', help='also record API call counts per case')
+    parser.add_argument('--out', help='write results JSON to this file')
+    parser.add_argument('--compare', help='results JSON of an earlier run to check for regressions')
+    parser.add_argument('--check', type=int, metavar='SEEDS',
+                        help='compare results within each group on this many seeds instead of timing')
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(',') if s.strip()]
+    cases = get_cases([n.strip() for n in args.cases.split(',') if n.strip()])
+    if not cases:
+        parser.error('no case matches {}'.format(args.cases))
+
+    def log(line):
+        print(line)
+        sys.stdout.flush()
+
+    if args.check:
+        seeds = range(args.seed, args.seed + args.check)
+        mismatches = check_results(cases, sizes, seeds, log)
+        log('{} mismatches'.format(len(mismatches)))
+        return 1 if mismatches else 0
+
+    results = run_benchmarks(cases, sizes, args.repeat, not args.no_memory, args.seed, log, args.calls)
+
+    flagged = [name for name, r in sorted(results['results'].items()) if r['superlinear']]
+    for name in flagged:
+        log('super-linear: {} exponents {}'.format(name, results['results'][name]['exponents']))
+
+    if args.out:
+        save_results(args.out, results)
+        log('results written to {}'.format(args.out))
+
+    status = 0
+    if args.compare:
+        for name, size, before, after in compare(load_results(args.compare), results):
+            log('regression: {} at {} parts {:.4f} s -> {:.4f} s'.format(name, size, before, after))
+            status = 1
+    return status
+
+
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    sys.exit(main())
@@ -0,0 +1,1361 @@
+# -*- coding: UTF-8 -*-
+# Headless stand-in for the subset of the Revit API the fabrication tools use.
+#
+# Lets the lib engines (FP_Sync, Fab_Snapshot, ...) and extracted script logic
+# run on plain CPython or IronPython outside Revit, so hot paths can be timed
+# and profiled on synthetic models (see Headless.SyntheticModel).
+#
+# Only behaviour the tools depend on is modelled. Transactions do not undo,
+# regeneration is a counter and geometry is limited to connector origins,
+# location curves/points and axis aligned bounding boxes.
+import math
+import zlib
+
+
+# ------------------------------------------------------------------------------------
+# ENUMS
+# ------------------------------------------------------------------------------------
+class EnumValue(object):
+    __slots__ = ('name', 'value__')
+
+    def __init__(self, name, value):
+        self.name = name
+        self.value__ = value
+
+    def __eq__(self, other):
+        return isinstance(other, EnumValue) and other.value__ == self.value__
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash(self.value__)
+
+    def __str__(self):
+        return self.name
+
+    __repr__ = __str__
+
+
+class Enum(object):
+    """ Enum namespace that creates unknown members on first access, so
+    scripts referencing members not listed here still import """
+    def __init__(self, name, members=None, start=0):
+        self._name = name
+        self._members = {}
+        self._next = start
+        for member, value in (members or {}).items():
+            self._members[member] = EnumValue(member, value)
+
+    def __getattr__(self, member):
+        if member.startswith('_'):
+            raise AttributeError(member)
+        value = self._members.get(member)
+        if value is None:
+            self._next -= 1
+            value = EnumValue(member, self._next)
+            self._members[member] = value
+        return value
+
+    def __iter__(self):
+        return iter(self._members.values())
+
+
+BuiltInCategory = Enum('BuiltInCategory', {
+    'OST_FabricationHangers': -2008193,
+    'OST_FabricationPipework': -2008208,
+    'OST_FabricationDuctwork': -2008209,
+    'OST_FlexDuctCurves': -2008020,
+    'OST_GenericModel': -2000151,
+    'OST_PipeAccessory': -2008055,
+    'OST_PlumbingFixtures': -2001160,
+    'OST_StructuralFraming': -2001320,
+    'OST_StructuralStiffener': -2001354,
+    'OST_Walls': -2000011,
+    'OST_Floors': -2000032,
+    'OST_Levels': -2000240,
+    'OST_Views': -2000279,
+}, start=-3000000)
+
+BuiltInParameter = Enum('BuiltInParameter', start=-4000000)
+StorageType = Enum('StorageType', {'None': 0, 'Integer': 1, 'Double': 2, 'String': 3, 'ElementId': 4})
+ConnectorProfileType = Enum('ConnectorProfileType', {'Invalid': -1, 'Round': 0, 'Rectangular': 1, 'Oval': 2})
+TransactionStatus = Enum('TransactionStatus', {
+    'Uninitialized': 0, 'Started': 1, 'RolledBack': 2, 'Committed': 3, 'Pending': 4, 'Error': 5})
+ViewType = Enum('ViewType', {'FloorPlan': 1, 'ThreeD': 4})
+TemporaryViewMode = Enum('TemporaryViewMode', {'TemporaryHideIsolate': 1})
+
+# BuiltInParameter -> parameter name, get_Parameter resolves through this map
+BUILTIN_PARAMETER_NAMES = {
+    'FABRICATION_PART_LENGTH': 'Length',
+    'FABRICATION_PART_MATERIAL': 'Part Material',
+    'FABRICATION_SERVICE_NAME': 'Fabrication Service Name',
+    'FABRICATION_SERVICE_ABBREVIATION': 'Fabrication Service Abbreviation',
+    'FABRICATION_PRODUCT_ENTRY': 'Product Entry',
+    'ELEM_FAMILY_PARAM': 'Family',
+    'ALL_MODEL_INSTANCE_COMMENTS': 'Comments',
+    'FAMILY_LEVEL_PARAM': 'Reference Level',
+}
+
+# Parameters the API refuses to Set
+READ_ONLY_PARAMETERS = frozenset([
+    'Fabrication Service Name', 'Fabrication Service Abbreviation', 'Size',
+    'Size of Primary End', 'Length', 'Part Material', 'Family', 'Reference Level'])
+
+
+# ------------------------------------------------------------------------------------
+# GEOMETRY
+# ------------------------------------------------------------------------------------
+class XYZ(object):
+    __slots__ = ('X', 'Y', 'Z')
+
+    def __init__(self, x=0.0, y=0.0, z=0.0):
+        self.X = float(x)
+        self.Y = float(y)
+        self.Z = float(z)
+
+    def __add__(self, other):
+        return XYZ(self.X + other.X, self.Y + other.Y, self.Z + other.Z)
+
+    def __sub__(self, other):
+        return XYZ(self.X - other.X, self.Y - other.Y, self.Z - other.Z)
+
+    def __mul__(self, scale):
+        return XYZ(self.X * scale, self.Y * scale, self.Z * scale)
+
+    __rmul__ = __mul__
+
+    def __div__(self, scale):
+        return XYZ(self.X / scale, self.Y / scale, self.Z / scale)
+
+    __truediv__ = __div__
+
+    def __neg__(self):
+        return XYZ(-self.X, -self.Y, -self.Z)
+
+    def __getitem__(self, i):
+        return (self.X, self.Y, self.Z)[i]
+
+    def __repr__(self):
+        return 'XYZ({:.6f}, {:.6f}, {:.6f})'.format(self.X, self.Y, self.Z)
+
+    def Add(self, other):
+        return self + other
+
+    def Subtract(self, other):
+        return self - other
+
+    def Multiply(self, scale):
+        return self * scale
+
+    def Divide(self, scale):
+        return self / scale
+
+    def Negate(self):
+        return -self
+
+    def DotProduct(self, other):
+        return self.X * other.X + self.Y * other.Y + self.Z * other.Z
+
+    def CrossProduct(self, other):
+        return XYZ(self.Y * other.Z - self.Z * other.Y,
+                   self.Z * other.X - self.X * other.Z,
+                   self.X * other.Y - self.Y * other.X)
+
+    def GetLength(self):
+        return math.sqrt(self.X * self.X + self.Y * self.Y + self.Z * self.Z)
+
+    def DistanceTo(self, other):
+        dx = self.X - other.X
+        dy = self.Y - other.Y
+        dz = self.Z - other.Z
+        return math.sqrt(dx * dx + dy * dy + dz * dz)
+
+    def Normalize(self):
+        length = self.GetLength()
+        if length == 0.0:
+            return XYZ()
+        return XYZ(self.X / length, self.Y / length, self.Z / length)
+
+    def IsZeroLength(self):
+        return self.GetLength() < 1e-9
+
+    def IsAlmostEqualTo(self, other, tolerance=1e-9):
+        return self.DistanceTo(other) <= tolerance
+
+    def AngleTo(self, other):
+        lengths = self.GetLength() * other.GetLength()
+        if lengths == 0.0:
+            return 0.0
+        return math.acos(max(-1.0, min(1.0, self.DotProduct(other) / lengths)))
+
+
+XYZ.Zero = XYZ(0, 0, 0)
+XYZ.BasisX = XYZ(1, 0, 0)
+XYZ.BasisY = XYZ(0, 1, 0)
+XYZ.BasisZ = XYZ(0, 0, 1)
+
+
+def perpendicular(direction):
+    """ Any unit vector perpendicular to direction """
+    helper = XYZ.BasisZ if abs(direction.Z) < 0.9 else XYZ.BasisX
+    return direction.CrossProduct(helper).Normalize()
+
+
+class Transform(object):
+    def __init__(self, origin=None, basis_x=None, basis_y=None, basis_z=None):
+        self.Origin = origin or XYZ.Zero
+        self.BasisX = basis_x or XYZ.BasisX
+        self.BasisY = basis_y or XYZ.BasisY
+        self.BasisZ = basis_z or XYZ.BasisZ
+
+    @staticmethod
+    def CreateTranslation(vector):
+        return Transform(vector)
+
+    def OfVector(self, v):
+        return self.BasisX * v.X + self.BasisY * v.Y + self.BasisZ * v.Z
+
+    def OfPoint(self, p):
+        return self.Origin + self.OfVector(p)
+
+    @property
+    def Inverse(self):
+        # Orthonormal bases only, which is all the tools create
+        bx, by, bz = self.BasisX, self.BasisY, self.BasisZ
+        inv_x = XYZ(bx.X, by.X, bz.X)
+        inv_y = XYZ(bx.Y, by.Y, bz.Y)
+        inv_z = XYZ(bx.Z, by.Z, bz.Z)
+        inverse = Transform(XYZ.Zero, inv_x, inv_y, inv_z)
+        inverse.Origin = -inverse.OfVector(self.Origin)
+        return inverse
+
+
+Transform.Identity = Transform()
+
+
+class BoundingBoxXYZ(object):
+    __slots__ = ('Min', 'Max')
+
+    def __init__(self, minimum=None, maximum=None):
+        self.Min = minimum or XYZ()
+        self.Max = maximum or XYZ()
+
+    @staticmethod
+    def from_points(points, pad=0.0):
+        xs = [p.X for p in points]
+        ys = [p.Y for p in points]
+        zs = [p.Z for p in points]
+        return BoundingBoxXYZ(XYZ(min(xs) - pad, min(ys) - pad, min(zs) - pad),
+                              XYZ(max(xs) + pad, max(ys) + pad, max(zs) + pad))
+
+
+class Line(object):
+    __slots__ = ('_p0', '_p1')
+
+    def __init__(self, p0, p1):
+        self._p0 = p0
+        self._p1 = p1
+
+    @staticmethod
+    def CreateBound(p0, p1):
+        return Line(p0, p1)
+
+    def GetEndPoint(self, index):
+        return self._p0 if index == 0 else self._p1
+
+    @property
+    def Length(self):
+        return self._p0.DistanceTo(self._p1)
+
+    @property
+    def Direction(self):
+        return (self._p1 - self._p0).Normalize()
+
+    def Evaluate(self, parameter, normalized=True):
+        if not normalized:
+            parameter = parameter / self.Length
+        return self._p0 + (self._p1 - self._p0) * parameter
+
+
+class LocationCurve(object):
+    __slots__ = ('Curve',)
+
+    def __init__(self, curve):
+        self.Curve = curve
+
+
+class LocationPoint(object):
+    __slots__ = ('Point', 'Rotation')
+
+    def __init__(self, point, rotation=0.0):
+        self.Point = point
+        self.Rotation = rotation
+
+
+# ------------------------------------------------------------------------------------
+# IDS, CATEGORIES, PARAMETERS
+# ------------------------------------------------------------------------------------
+class ElementId(object):
+    __slots__ = ('Value',)
+
+    def __init__(self, value):
+        self.Value = int(value.value__) if isinstance(value, EnumValue) else int(value)
+
+    @property
+    def IntegerValue(self):
+        return self.Value
+
+    def __eq__(self, other):
+        return isinstance(other, ElementId) and other.Value == self.Value
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash(self.Value)
+
+    def __repr__(self):
+        return str(self.Value)
+
+    __str__ = __repr__
+
+
+ElementId.InvalidElementId = ElementId(-1)
+
+
+def _id_value(eid):
+    if isinstance(eid, ElementId):
+        return eid.Value
+    return int(eid)
+
+
+class Category(object):
+    def __init__(self, name, bic):
+        self.Name = name
+        self.BuiltInCategory = bic
+        self.Id = ElementId(bic.value__)
+
+
+CATEGORY_NAMES = {
+    'OST_FabricationHangers': 'MEP Fabrication Hangers',
+    'OST_FabricationPipework': 'MEP Fabrication Pipework',
+    'OST_FabricationDuctwork': 'MEP Fabrication Ductwork',
+    'OST_GenericModel': 'Generic Models',
+    'OST_Walls': 'Walls',
+    'OST_Floors': 'Floors',
+    'OST_Levels': 'Levels',
+}
+
+_CATEGORIES = {}
+
+
+def get_category(bic):
+    """ Shared Category object for a BuiltInCategory member or name """
+    if not isinstance(bic, EnumValue):
+        bic = getattr(BuiltInCategory, bic)
+    category = _CATEGORIES.get(bic.name)
+    if category is None:
+        category = Category(CATEGORY_NAMES.get(bic.name, bic.name[4:]), bic)
+        _CATEGORIES[bic.name] = category
+    return category
+
+
+class Definition(object):
+    __slots__ = ('Name',)
+
+    def __init__(self, name):
+        self.Name = name
+
+
+def _storage_of(value):
+    if isinstance(value, bool):
+        return StorageType.Integer
+    if isinstance(value, float):
+        return StorageType.Double
+    if isinstance(value, int):
+        return StorageType.Integer
+    if isinstance(value, ElementId):
+        return StorageType.ElementId
+    return StorageType.String
+
+
+class Parameter(object):
+    """ View on one value of an element; created per lookup like the API """
+    __slots__ = ('_element', '_name')
+
+    def __init__(self, element, name):
+        self._element = element
+        self._name = name
+
+    @property
+    def Definition(self):
+        return Definition(self._name)
+
+    @property
+    def StorageType(self):
+        return _storage_of(self._element._get_value(self._name))
+
+    @property
+    def HasValue(self):
+        return self._element._get_value(self._name) is not None
+
+    @property
+    def IsReadOnly(self):
+        return self._name in READ_ONLY_PARAMETERS
+
+    @property
+    def Id(self):
+        return ElementId(-(zlib.crc32(self._name.encode('utf-8')) & 0xFFFFFF))
+
+    def AsString(self):
+        value = self._element._get_value(self._name)
+        if value is None or isinstance(value, str):
+            return value
+        try:
+            if isinstance(value, unicode):
+                return value
+        except NameError:
+            pass
+        return None
+
+    def AsDouble(self):
+        value = self._element._get_value(self._name)
+        return float(value) if isinstance(value, (int, float)) else 0.0
+
+    def AsInteger(self):
+        value = self._element._get_value(self._name)
+        return int(value) if isinstance(value, (int, float)) else 0
+
+    def AsElementId(self):
+        value = self._element._get_value(self._name)
+        return value if isinstance(value, ElementId) else ElementId.InvalidElementId
+
+    def AsValueString(self):
+        value = self._element._get_value(self._name)
+        if value is None:
+            return None
+        if isinstance(value, float):
+            return '{:g}'.format(value)
+        if isinstance(value, ElementId):
+            target = self._element.Document.GetElement(value) if self._element.Document else None
+            return target.Name if target is not None else None
+        return str(value)
+
+    def Set(self, value):
+        if self.IsReadOnly:
+            raise InvalidOperationException('Parameter {} is read-only'.format(self._name))
+        self._element._set_value(self._name, value)
+        return True
+
+
+class InvalidOperationException(Exception):
+    pass
+
+
+class ParameterIndexer(object):
+    """ Supports the IronPython element.Parameter[BuiltInParameter.X] form """
+    __slots__ = ('_element',)
+
+    def __init__(self, element):
+        self._element = element
+
+    def __getitem__(self, key):
+        if isinstance(key, EnumValue):
+            return self._element.get_Parameter(key)
+        return self._element.LookupParameter(key)
+
+
+# ------------------------------------------------------------------------------------
+# ELEMENTS
+# ------------------------------------------------------------------------------------
+class Element(object):
+    """ Parameter values live in a shared defaults dict plus per-element
+    overrides, so thousands of similar parts only store what differs """
+    __slots__ = ('Id', 'Document', 'Category', 'Name', 'LevelId', '_defaults', '_values', '__weakref__')
+    is_type = False
+
+    def __init__(self, category=None, name='', defaults=None, values=None, level_id=None):
+        self.Id = ElementId.InvalidElementId
+        self.Document = None
+        self.Category = get_category(category) if category is not None else None
+        self.Name = name
+        self.LevelId = level_id or ElementId.InvalidElementId
+        self._defaults = defaults if defaults is not None else {}
+        self._values = values
+
+    @property
+    def IsValidObject(self):
+        return self.Document is not None
+
+    def _get_value(self, name):
+        if self._values is not None and name in self._values:
+            return self._values[name]
+        return self._defaults.get(name)
+
+    def _has(self, name):
+        return (self._values is not None and name in self._values) or name in self._defaults
+
+    def _set_value(self, name, value):
+        if self._values is None:
+            self._values = {}
+        self._values[name] = value
+
+    def LookupParameter(self, name):
+        if not self._has(name):
+            return None
+        return Parameter(self, name)
+
+    def get_Parameter(self, bip):
+        name = BUILTIN_PARAMETER_NAMES.get(bip.name if isinstance(bip, EnumValue) else str(bip))
+        if name is None or not self._has(name):
+            return None
+        return Parameter(self, name)
+
+    @property
+    def Parameter(self):
+        return ParameterIndexer(self)
+
+    @property
+    def Parameters(self):
+        names = set(self._defaults)
+        if self._values:
+            names.update(self._values)
+        return [Parameter(self, n) for n in sorted(names)]
+
+    def GetTypeId(self):
+        return ElementId.InvalidElementId
+
+    def get_BoundingBox(self, view):
+        return None
+
+    @property
+    def Location(self):
+        return None
+
+    def _move(self, vector):
+        pass
+
+    def _rotate(self, origin, axis, angle):
+        pass
+
+
+class ElementType(Element):
+    __slots__ = ()
+    is_type = True
+
+
+class FamilySymbol(ElementType):
+    __slots__ = ('FamilyName', 'IsActive')
+
+    def __init__(self, family_name, name, category='OST_GenericModel'):
+        Element.__init__(self, category, name, {'Family': family_name, 'Type': name})
+        self.FamilyName = family_name
+        self.IsActive = True
+
+    def Activate(self):
+        self.IsActive = True
+
+    @property
+    def Family(self):
+        return Definition(self.FamilyName)
+
+
+class Level(Element):
+    __slots__ = ('Elevation', 'ProjectElevation')
+
+    def __init__(self, name, elevation, project_elevation=None):
+        Element.__init__(self, 'OST_Levels', name, {'Name': name, 'Elevation': float(elevation)})
+        self.Elevation = float(elevation)
+        self.ProjectElevation = float(elevation if project_elevation is None else project_elevation)
+
+
+class View(Element):
+    __slots__ = ('ViewType', 'element_ids', 'hidden_ids', 'isolated_ids')
+
+    def __init__(self, name='{3D}', view_type=None):
+        Element.__init__(self, 'OST_Views', name)
+        self.ViewType = view_type or ViewType.ThreeD
+        self.element_ids = None     # None shows every element
+        self.hidden_ids = set()
+        self.isolated_ids = None
+
+    def IsolateElementsTemporary(self, ids):
+        self.isolated_ids = set(_id_value(i) for i in ids)
+
+    def HideElementsTemporary(self, ids):
+        self.hidden_ids.update(_id_value(i) for i in ids)
+
+    def DisableTemporaryViewMode(self, mode):
+        self.isolated_ids = None
+        self.hidden_ids = set()
+
+    def shows(self, element):
+        return self.element_ids is None or element.Id.Value in self.element_ids
+
+
+class ProjectLocation(Element):
+    __slots__ = ('_transform',)
+
+    def __init__(self, name='Project', transform=None):
+        Element.__init__(self, None, name)
+        self._transform = transform or Transform.Identity
+
+    def GetTotalTransform(self):
+        return self._transform
+
+
+class FamilyInstance(Element):
+    __slots__ = ('Symbol', '_location', 'Host')
+
+    def __init__(self, symbol, point, level_id=None, category=None, values=None, rotation=0.0):
+        category = category or symbol.Category.BuiltInCategory
+        defaults = {'Family': symbol.FamilyName, 'Type': symbol.Name}
+        Element.__init__(self, category, symbol.Name, defaults, values, level_id)
+        self.Symbol = symbol
+        self._location = LocationPoint(point, rotation)
+        self.Host = None
+
+    @property
+    def Location(self):
+        return self._location
+
+    def GetTypeId(self):
+        return self.Symbol.Id
+
+    def get_BoundingBox(self, view):
+        return BoundingBoxXYZ.from_points([self._location.Point], 0.25)
+
+    def _move(self, vector):
+        self._location.Point = self._location.Point + vector
+
+    def _rotate(self, origin, axis, angle):
+        self._location.Point = rotate_point(self._location.Point, origin, axis, angle)
+        self._location.Rotation += angle
+
+
+class Wall(Element):
+    __slots__ = ('_curve', 'Width', 'height')
+
+    def __init__(self, p0, p1, width, height, level_id=None, name='Basic Wall'):
+        Element.__init__(self, 'OST_Walls', name, {'Width': float(width), 'Unconnected Height': float(height)},
+                         None, level_id)
+        self._curve = Line(p0, p1)
+        self.Width = float(width)
+        self.height = float(height)
+
+    @property
+    def Location(self):
+        return LocationCurve(self._curve)
+
+    def get_BoundingBox(self, view):
+        p0 = self._curve.GetEndPoint(0)
+        p1 = self._curve.GetEndPoint(1)
+        top = XYZ(p1.X, p1.Y, p1.Z + self.height)
+        return BoundingBoxXYZ.from_points([p0, p1, top], self.Width / 2.0)
+
+
+class Floor(Element):
+    __slots__ = ('_bbox',)
+
+    def __init__(self, minimum, maximum, level_id=None, name='Generic Floor'):
+        Element.__init__(self, 'OST_Floors', name, {'Thickness': float(maximum.Z - minimum.Z)}, None, level_id)
+        self._bbox = BoundingBoxXYZ(minimum, maximum)
+
+    def get_BoundingBox(self, view):
+        return BoundingBoxXYZ(self._bbox.Min, self._bbox.Max)
+
+
+def rotate_point(point, origin, axis, angle):
+    # Rodrigues rotation of point about the axis through origin
+    v = point - origin
+    k = axis.Normalize()
+    cos_a = math.cos(angle)
+    sin_a = math.sin(angle)
+    rotated = v * cos_a + k.CrossProduct(v) * sin_a + k * (k.DotProduct(v) * (1.0 - cos_a))
+    return origin + rotated
+
+
+# ------------------------------------------------------------------------------------
+# FABRICATION
+# ------------------------------------------------------------------------------------
+class FabricationConnectorInfo(object):
+    __slots__ = ('BodyConnectorId',)
+
+    def __init__(self, body_connector_id):
+        self.BodyConnectorId = body_connector_id
+
+
+class Connector(object):
+    __slots__ = ('Id', 'Owner', 'Origin', 'direction', 'Shape', 'Radius', 'Width', 'Height',
+                 'body_connector_id', '_refs')
+
+    def __init__(self, owner, index, origin, direction, shape=None, radius=0.0, width=0.0, height=0.0,
+                 body_connector_id=0):
+        self.Id = index
+        self.Owner = owner
+        self.Origin = origin
+        self.direction = direction      # outward facing, BasisZ of CoordinateSystem
+        self.Shape = shape or ConnectorProfileType.Round
+        self.Radius = radius
+        self.Width = width
+        self.Height = height
+        self.body_connector_id = body_connector_id
+        self._refs = None
+
+    @property
+    def CoordinateSystem(self):
+        basis_x = perpendicular(self.direction)
+        return Transform(self.Origin, basis_x, self.direction.CrossProduct(basis_x), self.direction)
+
+    @property
+    def IsConnected(self):
+        return bool(self._refs)
+
+    @property
+    def AllRefs(self):
+        return list(self._refs or ())
+
+    @property
+    def ConnectorType(self):
+        return 'End'
+
+    def IsConnectedTo(self, other):
+        return bool(self._refs) and other in self._refs
+
+    def ConnectTo(self, other):
+        if self._refs is None:
+            self._refs = []
+        if other._refs is None:
+            other._refs = []
+        if other not in self._refs:
+            self._refs.append(other)
+        if self not in other._refs:
+            other._refs.append(self)
+
+    def DisconnectFrom(self, other):
+        if self._refs and other in self._refs:
+            self._refs.remove(other)
+        if other._refs and self in other._refs:
+            other._refs.remove(self)
+
+    def GetFabricationConnectorInfo(self):
+        return FabricationConnectorInfo(self.body_connector_id)
+
+
+class ConnectorManager(object):
+    __slots__ = ('Connectors',)
+
+    def __init__(self, connectors):
+        self.Connectors = connectors
+
+    @property
+    def UnusedConnectors(self):
+        return [c for c in self.Connectors if not c.IsConnected]
+
+
+class FabricationDimensionDefinition(object):
+    __slots__ = ('Name',)
+
+    def __init__(self, name):
+        self.Name = name
+
+
+_DIMENSION_DEFINITIONS = {}
+
+
+def _dimension_definition(name):
+    definition = _DIMENSION_DEFINITIONS.get(name)
+    if definition is None:
+        definition = _DIMENSION_DEFINITIONS[name] = FabricationDimensionDefinition(name)
+    return definition
+
+
+class FabricationRodInfo(object):
+    def __init__(self, part, rod_ends, attached=False, diameter=0.03125):
+        self._part = part
+        self.rod_ends = rod_ends            # list of XYZ, one per rod
+        self.IsAttachedToStructure = attached
+        self.RodDiameter = diameter
+        self.lengths = [1.0] * len(rod_ends)
+
+    @property
+    def RodCount(self):
+        return len(self.rod_ends)
+
+    def GetRodEndPosition(self, index):
+        return self.rod_ends[index]
+
+    def GetRodLength(self, index):
+        return self.lengths[index]
+
+    def SetRodLength(self, index, length):
+        self.lengths[index] = length
+
+    def AttachToStructure(self):
+        self.IsAttachedToStructure = True
+
+    def CanRodsBeHosted(self):
+        return True
+
+
+class FabricationHostedInfo(object):
+    def __init__(self, part, host_id):
+        self._part = part
+        self.HostId = host_id
+
+    def DisconnectFromHost(self):
+        self.HostId = ElementId.InvalidElementId
+
+
+class FabricationAncillaryUsage(object):
+    __slots__ = ('AncillaryWidthOrDiameter',)
+
+    def __init__(self, width):
+        self.AncillaryWidthOrDiameter = width
+
+
+class FabricationPart(Element):
+    __slots__ = ('ItemCustomId', 'ServiceType', 'ServiceId', 'ServiceName', 'Specification', 'Alias',
+                 'ConnectorManager', '_dims', '_rod_info', '_hosted_info', '_location', 'straight')
+
+    def __init__(self, category, name, cid, service, defaults=None, values=None, level_id=None, straight=False):
+        Element.__init__(self, category, name, defaults, values, level_id)
+        self.ItemCustomId = cid
+        self.ServiceType = service.service_type if service else 0
+        self.ServiceId = service.ServiceId if service else -1
+        self.ServiceName = service.Name if service else ''
+        self.Specification = service.specification if service else 0
+        self.Alias = ''
+        self.ConnectorManager = ConnectorManager([])
+        self._dims = None
+        self._rod_info = None
+        self._hosted_info = None
+        self._location = None
+        self.straight = straight
+
+    # --- connectors -------------------------------------------------------------
+    def add_connector(self, origin, direction, radius=0.0, width=0.0, height=0.0, shape=None, body_connector_id=0):
+        connectors = self.ConnectorManager.Connectors
+        connector = Connector(self, len(connectors), origin, direction, shape, radius, width, height,
+                              body_connector_id)
+        connectors.append(connector)
+        return connector
+
+    def IsAStraight(self):
+        return self.straight
+
+    @property
+    def CenterlineLength(self):
+        conns = self.ConnectorManager.Connectors
+        if len(conns) < 2:
+            return 0.0
+        return conns[0].Origin.DistanceTo(conns[1].Origin)
+
+    @property
+    def Origin(self):
+        if self._location is not None:
+            return self._location.Point
+        conns = self.ConnectorManager.Connectors
+        if not conns:
+            return XYZ()
+        pts = [c.Origin for c in conns]
+        return XYZ(sum(p.X for p in pts) / len(pts), sum(p.Y for p in pts) / len(pts),
+                   sum(p.Z for p in pts) / len(pts))
+
+    @property
+    def Location(self):
+        if self._location is not None:
+            return self._location
+        conns = self.ConnectorManager.Connectors
+        if self.straight and len(conns) >= 2:
+            return LocationCurve(Line(conns[0].Origin, conns[1].Origin))
+        return LocationPoint(self.Origin)
+
+    def get_BoundingBox(self, view):
+        conns = self.ConnectorManager.Connectors
+        if not conns:
+            return BoundingBoxXYZ.from_points([self.Origin], 0.25)
+        pad = max(max(c.Radius, c.Width / 2.0, c.Height / 2.0) for c in conns)
+        return BoundingBoxXYZ.from_points([c.Origin for c in conns], pad)
+
+    def _move(self, vector):
+        for c in self.ConnectorManager.Connectors:
+            c.Origin = c.Origin + vector
+        if self._location is not None:
+            self._location.Point = self._location.Point + vector
+        if self._rod_info is not None:
+            self._rod_info.rod_ends = [p + vector for p in self._rod_info.rod_ends]
+
+    def _rotate(self, origin, axis, angle):
+        zero = XYZ.Zero
+        for c in self.ConnectorManager.Connectors:
+            c.Origin = rotate_point(c.Origin, origin, axis, angle)
+            c.direction = rotate_point(c.direction, zero, axis, angle)
+        if self._location is not None:
+            self._location.Point = rotate_point(self._location.Point, origin, axis, angle)
+
+    # --- dimensions -------------------------------------------------------------
+    def set_dimensions(self, values):
+        self._dims = dict(values)
+
+    def GetDimensions(self):
+        if not self._dims:
+            return []
+        return [_dimension_definition(name) for name in self._dims]
+
+    def GetDimensionValue(self, definition):
+        return self._dims[definition.Name]
+
+    def SetDimensionValue(self, definition, value):
+        if self._dims is None:
+            self._dims = {}
+        self._dims[definition.Name] = value
+
+    # --- hangers ----------------------------------------------------------------
+    def GetRodInfo(self):
+        if self._rod_info is None:
+            raise InvalidOperationException('Part is not a hanger')
+        return self._rod_info
+
+    def GetHostedInfo(self):
+        if self._hosted_info is None:
+            self._hosted_info = FabricationHostedInfo(self, ElementId.InvalidElementId)
+        return self._hosted_info
+
+    def GetPartAncillaryUsage(self):
+        if self._rod_info is None:
+            return []
+        return [FabricationAncillaryUsage(self._rod_info.RodDiameter)]
+
+    def SetPartCustomDataText(self, custom_id, value):
+        self._set_value('CustomData{}'.format(custom_id), value)
+
+    # --- connections ------------------------------------------------------------
+    @staticmethod
+    def AlignPartByConnectors(doc, part, part_connector, to_connector):
+        """ Turns part until part_connector faces to_connector and moves it onto it """
+        facing = -to_connector.direction
+        current = part_connector.direction
+        axis = current.CrossProduct(facing)
+        if axis.GetLength() > 1e-9:
+            angle = math.acos(max(min(current.DotProduct(facing), 1.0), -1.0))
+            part._rotate(part_connector.Origin, axis.Normalize(), angle)
+        elif current.DotProduct(facing) < 0:
+            part._rotate(part_connector.Origin, perpendicular(current), math.pi)
+        part._move(to_connector.Origin - part_connector.Origin)
+        doc.stats['moved'] += 1
+
+    @staticmethod
+    def ConnectAndCouple(doc, connector, other):
+        connector.ConnectTo(other)
+        doc.stats['connected'] += 1
+
+    # --- creation ---------------------------------------------------------------
+    @staticmethod
+    def Create(doc, button, condition, level_id):
+        """ Unconnected one foot part at the origin pointing up """
+        service = doc.fabrication_configuration.service_by_id(button.ServiceId)
+        part = FabricationPart('OST_FabricationPipework', button.Name, button.cid, service,
+                               button.defaults, None, level_id, straight=True)
+        doc.add(part)
+        part.add_connector(XYZ(0, 0, 0), -XYZ.BasisZ, 0.25)
+        part.add_connector(XYZ(0, 0, 1), XYZ.BasisZ, 0.25)
+        doc.stats['created'] += 1
+        return part
+
+    @staticmethod
+    def CreateHanger(doc, button, *args):
+        """ CreateHanger(doc, button, hostId, connector, distance, attach) or
+        CreateHanger(doc, button, condition, levelId) """
+        service = doc.fabrication_configuration.service_by_id(button.ServiceId)
+        if len(args) >= 4:
+            host_id, connector, distance, attach = args[:4]
+            host = doc.GetElement(host_id)
+            point = connector.Origin + (-connector.direction) * distance
+            level_id = host.LevelId
+        else:
+            host_id, connector, attach = ElementId.InvalidElementId, None, False
+            point, level_id = XYZ(), args[1]
+        hanger = FabricationPart('OST_FabricationHangers', button.Name, button.cid, service,
+                                 button.defaults, None, level_id)
+        doc.add(hanger)
+        hanger._location = LocationPoint(point)
+        hanger._rod_info = FabricationRodInfo(hanger, [point + XYZ(0, 0, 2.0)], attach)
+        hanger._hosted_info = FabricationHostedInfo(hanger, host_id)
+        doc.stats['created'] += 1
+        return hanger
+
+
+class FabricationServiceButton(object):
+    def __init__(self, name, cid=0, is_hanger=False, condition_count=1, code='', defaults=None):
+        self.Name = name
+        self.Code = code or name
+        self.IsAHanger = is_hanger
+        self.ConditionCount = condition_count
+        self.ServiceId = -1
+        self.cid = cid
+        self.defaults = defaults or {}
+
+    def GetConditionName(self, index):
+        return 'Condition {}'.format(index)
+
+    def GetConditionLowerValue(self, index):
+        return 0.0
+
+    def GetConditionUpperValue(self, index):
+        return 1000.0
+
+
+class FabricationService(object):
+    def __init__(self, service_id, name, abbreviation='', service_type=0, specification=0, palettes=None):
+        """ :param palettes: list of (palette name, [FabricationServiceButton]) """
+        self.ServiceId = service_id
+        self.Name = name
+        self.abbreviation = abbreviation
+        self.service_type = service_type
+        self.specification = specification
+        self.palettes = palettes or []
+        for palette_name, buttons in self.palettes:
+            for button in buttons:
+                button.ServiceId = service_id
+
+    @property
+    def PaletteCount(self):
+        return len(self.palettes)
+
+    GroupCount = PaletteCount
+
+    def GetPaletteName(self, index):
+        return self.palettes[index][0]
+
+    GetGroupName = GetPaletteName
+
+    def GetButtonCount(self, index):
+        return len(self.palettes[index][1])
+
+    def GetButton(self, palette, index):
+        return self.palettes[palette][1][index]
+
+
+class FabricationConfigurationInfo(object):
+    def __init__(self, name):
+        self.Name = name
+
+
+class FabricationConfiguration(object):
+    def __init__(self, name='Synthetic', services=None, service_types=None, specifications=None,
+                 connector_names=None):
+        self.name = name
+        self.services = services or []
+        self.service_types = service_types or {}
+        self.specifications = specifications or {}
+        self.connector_names = connector_names or {}
+        self._by_id = dict((s.ServiceId, s) for s in self.services)
+
+    @staticmethod
+    def GetFabricationConfiguration(doc):
+        return doc.fabrication_configuration
+
+    def GetFabricationConfigurationInfo(self):
+        return FabricationConfigurationInfo(self.name)
+
+    def GetAllLoadedServices(self):
+        return list(self.services)
+
+    def GetAllServices(self):
+        return list(self.services)
+
+    def service_by_id(self, service_id):
+        return self._by_id.get(service_id)
+
+    def GetServiceTypeName(self, service_type):
+        return self.service_types.get(service_type, '')
+
+    def GetSpecificationName(self, specification):
+        return self.specifications.get(specification, '')
+
+    def GetFabricationConnectorName(self, body_connector_id):
+        return self.connector_names.get(body_connector_id, '')
+
+
+# ------------------------------------------------------------------------------------
+# DOCUMENT, TRANSACTIONS, COLLECTORS
+# ------------------------------------------------------------------------------------
+class _Categories(object):
+    def get_Item(self, bic):
+        return get_category(bic)
+
+
+class _Settings(object):
+    def __init__(self):
+        self.Categories = _Categories()
+
+
+class _DocumentCreate(object):
+    def __init__(self, doc):
+        self._doc = doc
+
+    def NewFamilyInstance(self, point, symbol, *args):
+        level_id = None
+        for arg in args:
+            if isinstance(arg, Level):
+                level_id = arg.Id
+        instance = FamilyInstance(symbol, point, level_id)
+        self._doc.add(instance)
+        self._doc.stats['created'] += 1
+        return instance
+
+
+def new_document_stats():
+    return {'transactions': 0, 'regenerations': 0, 'created': 0, 'deleted': 0, 'moved': 0, 'rotated': 0,
+            'connected': 0}
+
+
+class Document(object):
+    def __init__(self, title='Synthetic', path_name='', configuration=None):
+        self.Title = title
+        self.PathName = path_name
+        self.elements = {}
+        self.fabrication_configuration = configuration or FabricationConfiguration()
+        self.stats = new_document_stats()
+        self.Settings = _Settings()
+        self.Create = _DocumentCreate(self)
+        self.open_transactions = 0
+        self._next_id = 1000
+        self.ActiveView = self.add(View())
+        self.ActiveProjectLocation = self.add(ProjectLocation('Survey'))
+        self.add(ProjectLocation('Project'))
+
+    def add(self, element):
+        element.Id = ElementId(self._next_id)
+        element.Document = self
+        self._next_id += 1
+        self.elements[element.Id.Value] = element
+        return element
+
+    def GetElement(self, eid):
+        if eid is None:
+            return None
+        try:
+            return self.elements.get(_id_value(eid))
+        except (TypeError, ValueError):
+            return None
+
+    def Delete(self, ids):
+        """ Accepts one ElementId or a collection, returns the deleted ids """
+        if isinstance(ids, (ElementId, int)):
+            ids = [ids]
+        deleted = []
+        for eid in ids:
+            element = self.elements.pop(_id_value(eid), None)
+            if element is None:
+                continue
+            if isinstance(element, FabricationPart):
+                for c in element.ConnectorManager.Connectors:
+                    for other in c.AllRefs:
+                        c.DisconnectFrom(other)
+            element.Document = None
+            deleted.append(ElementId(_id_value(eid)))
+        self.stats['deleted'] += len(deleted)
+        return deleted
+
+    def Regenerate(self):
+        self.stats['regenerations'] += 1
+
+    @property
+    def IsModifiable(self):
+        return self.open_transactions > 0
+
+    @property
+    def IsWorkshared(self):
+        return False
+
+
+class Transaction(object):
+    def __init__(self, doc, name=''):
+        self._doc = doc
+        self._name = name
+        self._status = TransactionStatus.Uninitialized
+
+    def GetName(self):
+        return self._name
+
+    def Start(self, name=None):
+        if name:
+            self._name = name
+        self._doc.open_transactions += 1
+        self._doc.stats['transactions'] += 1
+        self._status = TransactionStatus.Started
+        return self._status
+
+    def _close(self, status):
+        if self._status == TransactionStatus.Started:
+            self._doc.open_transactions -= 1
+        self._status = status
+        return status
+
+    def Commit(self):
+        return self._close(TransactionStatus.Committed)
+
+    def RollBack(self):
+        # Changes are not undone; the stand-in only tracks transaction shape
+        return self._close(TransactionStatus.RolledBack)
+
+    def GetStatus(self):
+        return self._status
+
+    def HasStarted(self):
+        return self._status == TransactionStatus.Started
+
+    def __enter__(self):
+        # Like Revit, the with block does not start the transaction
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._status == TransactionStatus.Started:
+            self.RollBack()
+        return False
+
+
+class TransactionGroup(Transaction):
+    def Start(self, name=None):
+        if name:
+            self._name = name
+        self._status = TransactionStatus.Started
+        return self._status
+
+    def _close(self, status):
+        self._status = status
+        return status
+
+    def Assimilate(self):
+        return self._close(TransactionStatus.Committed)
+
+
+class ElementTransformUtils(object):
+    @staticmethod
+    def MoveElement(doc, eid, vector):
+        doc.GetElement(eid)._move(vector)
+        doc.stats['moved'] += 1
+
+    @staticmethod
+    def RotateElement(doc, eid, axis_line, angle):
+        origin = axis_line.GetEndPoint(0)
+        axis = axis_line.GetEndPoint(1) - origin
+        doc.GetElement(eid)._rotate(origin, axis, angle)
+        doc.stats['rotated'] += 1
+
+
+class ElementCategoryFilter(object):
+    def __init__(self, bic, inverted=False):
+        self.category_id = _id_value(ElementId(bic)) if isinstance(bic, EnumValue) else _id_value(bic)
+        self.inverted = inverted
+
+    def PassesFilter(self, element):
+        match = element.Category is not None and element.Category.Id.Value == self.category_id
+        return match != self.inverted
+
+
+class ElementMulticategoryFilter(object):
+    def __init__(self, bics, inverted=False):
+        self.category_ids = set(ElementCategoryFilter(b).category_id for b in bics)
+        self.inverted = inverted
+
+    def PassesFilter(self, element):
+        match = element.Category is not None and element.Category.Id.Value in self.category_ids
+        return match != self.inverted
+
+
+class ElementClassFilter(object):
+    def __init__(self, cls):
+        self.cls = cls
+
+    def PassesFilter(self, element):
+        return isinstance(element, self.cls)
+
+
+class LogicalOrFilter(object):
+    def __init__(self, *filters):
+        if len(filters) == 1 and not hasattr(filters[0], 'PassesFilter'):
+            filters = list(filters[0])
+        self.filters = filters
+
+    def PassesFilter(self, element):
+        return any(f.PassesFilter(element) for f in self.filters)
+
+
+class LogicalAndFilter(LogicalOrFilter):
+    def PassesFilter(self, element):
+        return all(f.PassesFilter(element) for f in self.filters)
+
+
+class FilteredElementCollector(object):
+    """ Lazy filter chain over the document elements, like the API the
+    filters only run when the collector is iterated """
+    def __init__(self, doc, scope=None):
+        self._doc = doc
+        self._filters = []
+        self._ids = None
+        if isinstance(scope, ElementId):
+            view = doc.GetElement(scope)
+            if view is not None and getattr(view, 'element_ids', None) is not None:
+                self._ids = set(view.element_ids)
+        elif scope is not None:
+            self._ids = set(_id_value(i) for i in scope)
+
+    def _where(self, predicate):
+        self._filters.append(predicate)
+        return self
+
+    def OfClass(self, cls):
+        return self._where(lambda el: isinstance(el, cls))
+
+    def OfCategory(self, bic):
+        category_id = bic.value__
+        return self._where(lambda el: el.Category is not None and el.Category.Id.Value == category_id)
+
+    def OfCategoryId(self, category_id):
+        value = _id_value(category_id)
+        return self._where(lambda el: el.Category is not None and el.Category.Id.Value == value)
+
+    def WhereElementIsNotElementType(self):
+        return self._where(lambda el: not el.is_type)
+
+    def WhereElementIsElementType(self):
+        return self._where(lambda el: el.is_type)
+
+    def WherePasses(self, element_filter):
+        if hasattr(element_filter, 'PassesFilter'):
+            return self._where(element_filter.PassesFilter)
+        return self._where(element_filter)
+
+    def Excluding(self, ids):
+        excluded = set(_id_value(i) for i in ids)
+        return self._where(lambda el: el.Id.Value not in excluded)
+
+    def __iter__(self):
+        if self._ids is None:
+            elements = list(self._doc.elements.values())
+        else:
+            elements = [self._doc.elements[i] for i in self._ids if i in self._doc.elements]
+        filters = self._filters
+        for el in elements:
+            if all(f(el) for f in filters):
+                yield el
+
+    def ToElements(self):
+        return list(self)
+
+    def ToElementIds(self):
+        return [el.Id for el in self]
+
+    def FirstElement(self):
+        return next(iter(self), None)
+
+    def FirstElementId(self):
+        el = self.FirstElement()
+        return el.Id if el is not None else ElementId.InvalidElementId
+
+    def GetElementCount(self):
+        return sum(1 for _ in self)
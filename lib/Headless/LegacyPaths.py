@@ -0,0 +1,1143 @@
+# -*- coding: UTF-8 -*-
+# Headless copies of script hot paths as they ship today, kept as benchmark
+# baselines. The pushbutton scripts import Revit at module level, so their
+# loops are reproduced here against Headless.FakeRevit with the same call
+# pattern (same collectors, same per-element lookups, same nesting).
+#
+# Keep these in step with the scripts they mirror until the script switches
+# to a lib engine; after that they document the old cost.
+import math
+
+from Headless.FakeRevit import (XYZ, BuiltInCategory, BuiltInParameter, FabricationPart, ProjectLocation, Transform,
+                                ConnectorProfileType)
+from Headless import FakeRevit
+from Diagnostics.ApiCounter import unwrap, rewrap
+
+
+def FilteredElementCollector(doc, scope=None):
+    # A counted document (Benchmark --calls) hands out counted collectors
+    return rewrap(doc, FakeRevit.FilteredElementCollector(unwrap(doc), scope))
+
+
+# ------------------------------------------------------------------------------------
+# PlacePipeHangers - chain walking and run grouping
+# ------------------------------------------------------------------------------------
+def is_cid_2875(element):
+    try:
+        return element.ItemCustomId in (2875, 875)
+    except:
+        return False
+
+
+def vertical_fab(element):
+    pts = [c.Origin for c in element.ConnectorManager.Connectors]
+    if len(pts) >= 2:
+        v = pts[1].Subtract(pts[0])
+        if v.GetLength() < 0.0001:
+            return False
+        v = v.Normalize()
+        angle_from_horizontal = math.asin(abs(v.Z))
+        threshold = math.radians(22.5)
+        return angle_from_horizontal > threshold
+    return False
+
+
+def is_pipe(element):
+    try:
+        return element.LookupParameter('Part Pattern Number').AsInteger() == 2041
+    except:
+        return False
+
+
+def get_pipe_direction(entry_xyz, exit_xyz):
+    v = exit_xyz.Subtract(entry_xyz)
+    if v.GetLength() < 0.0001:
+        return None
+    return v.Normalize()
+
+
+def walk_chain(selected_elements, start_element, start_connector):
+    selected_ids = {e.Id: e for e in selected_elements}
+    ordered = [start_element]
+    entry_conns = {start_element.Id: start_connector}
+    visited = {start_element.Id}
+
+    all_start_conns = list(start_element.ConnectorManager.Connectors)
+    exit_conns_of_start = [c for c in all_start_conns if c.Id != start_connector.Id]
+    if not exit_conns_of_start:
+        leftovers = [e for e in selected_elements if e.Id not in visited]
+        return ordered, entry_conns, leftovers
+
+    current_exit_conn = exit_conns_of_start[0]
+
+    last_pipe_dir = None
+    if is_pipe(start_element) and not vertical_fab(start_element) and not is_cid_2875(start_element):
+        last_pipe_dir = get_pipe_direction(start_connector.Origin, current_exit_conn.Origin)
+
+    while True:
+        candidates = []
+        for eid, e in selected_ids.items():
+            if eid in visited:
+                continue
+            for c in e.ConnectorManager.Connectors:
+                if current_exit_conn.Origin.DistanceTo(c.Origin) < 0.1:
+                    candidates.append((e, c))
+                    break
+
+        if not candidates:
+            break
+
+        found_elem = candidates[0][0]
+        found_entry = candidates[0][1]
+
+        if len(candidates) > 1 and last_pipe_dir is not None:
+            best_dot = -2.0
+            for cand_elem, cand_entry in candidates:
+                other_conns = [c for c in cand_elem.ConnectorManager.Connectors if c.Id != cand_entry.Id]
+                if other_conns:
+                    d = get_pipe_direction(cand_entry.Origin, other_conns[0].Origin)
+                    if d is not None:
+                        dot = last_pipe_dir.DotProduct(d)
+                        if dot > best_dot:
+                            best_dot = dot
+                            found_elem = cand_elem
+                            found_entry = cand_entry
+
+        ordered.append(found_elem)
+        entry_conns[found_elem.Id] = found_entry
+        visited.add(found_elem.Id)
+
+        all_conns = list(found_elem.ConnectorManager.Connectors)
+        exits = [c for c in all_conns if c.Id != found_entry.Id]
+        if not exits:
+            break
+
+        if is_pipe(found_elem) and not vertical_fab(found_elem) and not is_cid_2875(found_elem):
+            last_pipe_dir = get_pipe_direction(found_entry.Origin, exits[0].Origin)
+
+        if is_cid_2875(found_elem):
+            current_exit_conn = exits[0]
+        elif len(exits) == 1:
+            current_exit_conn = exits[0]
+        else:
+            best_exit = exits[0]
+            if last_pipe_dir is not None:
+                best_dot = -2.0
+                for ex in exits:
+                    d = get_pipe_direction(current_exit_conn.Origin, ex.Origin)
+                    if d is not None:
+                        dot = last_pipe_dir.DotProduct(d)
+                        if dot > best_dot:
+                            best_dot = dot
+                            best_exit = ex
+            current_exit_conn = best_exit
+
+    leftovers = [e for e in selected_elements if e.Id not in visited]
+    return ordered, entry_conns, leftovers
+
+
+def group_leftovers(leftovers):
+    if not leftovers:
+        return []
+    remaining = list(leftovers)
+    groups = []
+    while remaining:
+        group = [remaining.pop(0)]
+        changed = True
+        while changed:
+            changed = False
+            still_out = []
+            for e in remaining:
+                connected = False
+                for ge in group:
+                    for gc in ge.ConnectorManager.Connectors:
+                        for ec in e.ConnectorManager.Connectors:
+                            if gc.Origin.DistanceTo(ec.Origin) < 0.1:
+                                connected = True
+                                break
+                        if connected:
+                            break
+                    if connected:
+                        break
+                if connected:
+                    group.append(e)
+                    changed = True
+                else:
+                    still_out.append(e)
+            remaining = still_out
+        groups.append(group)
+    return groups
+
+
+def find_best_start(network):
+    if not network:
+        return None, None
+    if len(network) == 1:
+        conns = list(network[0].ConnectorManager.Connectors)
+        return network[0], conns[0] if conns else None
+
+    for e in network:
+        connected_count = 0
+        open_conn = None
+        for c in e.ConnectorManager.Connectors:
+            is_connected = False
+            for other in network:
+                if other.Id == e.Id:
+                    continue
+                for oc in other.ConnectorManager.Connectors:
+                    if c.Origin.DistanceTo(oc.Origin) < 0.1:
+                        is_connected = True
+                        break
+                if is_connected:
+                    break
+
+            if is_connected:
+                connected_count += 1
+            else:
+                open_conn = c
+
+        if open_conn and connected_count >= 0:
+            return e, open_conn
+
+    conns = list(network[0].ConnectorManager.Connectors)
+    return network[0], conns[0] if conns else None
+
+
+def extract_runs(chain_elements):
+    """ Network, start, main chain and branch walk of the main loop in
+    PlacePipeHangers_script.py for one service
+    :return: list of (ordered chain, entry connectors)"""
+    runs = []
+    for network in group_leftovers(chain_elements):
+        start_element, start_connector = find_best_start(network)
+        if not start_element or not start_connector:
+            continue
+        main_chain, main_entry_conns, leftovers = walk_chain(network, start_element, start_connector)
+        runs.append((main_chain, main_entry_conns))
+
+        for branch_elems in group_leftovers(leftovers):
+            branch_start = branch_elems[0]
+            branch_start_conn = next(iter(branch_start.ConnectorManager.Connectors), None)
+
+            for be in branch_elems:
+                for bc in be.ConnectorManager.Connectors:
+                    for me in main_chain:
+                        for mc in me.ConnectorManager.Connectors:
+                            if bc.Origin.DistanceTo(mc.Origin) < 0.1:
+                                branch_start = be
+                                branch_start_conn = bc
+                                break
+                        if branch_start_conn == bc:
+                            break
+                    if branch_start_conn == bc:
+                        break
+
+            branch_chain, branch_entry_conns, _ = walk_chain(branch_elems, branch_start, branch_start_conn)
+            runs.append((branch_chain, branch_entry_conns))
+    return runs
+
+
+def chain_to_segments(ordered_chain, entry_conns):
+    pipe_dicts = []
+    for e in ordered_chain:
+        if not is_pipe(e) or vertical_fab(e):
+            continue
+        entry_conn = entry_conns.get(e.Id)
+        if entry_conn is None:
+            entry_conn = next(iter(e.ConnectorManager.Connectors), None)
+        if entry_conn is None:
+            continue
+        exit_conn = None
+        for c in e.ConnectorManager.Connectors:
+            if c.Id != entry_conn.Id:
+                exit_conn = c
+                break
+        if exit_conn is None:
+            continue
+        direction = get_pipe_direction(entry_conn.Origin, exit_conn.Origin)
+        pipe_dicts.append({'element': e, 'length': e.CenterlineLength, 'entry_xyz': entry_conn.Origin,
+                           'exit_xyz': exit_conn.Origin, 'entry_conn': entry_conn, 'direction': direction})
+
+    if not pipe_dicts:
+        return []
+
+    segments = []
+    current_seg = [pipe_dicts[0]]
+    for i in range(1, len(pipe_dicts)):
+        prev_dir = pipe_dicts[i-1]['direction']
+        curr_dir = pipe_dicts[i]['direction']
+        dot = prev_dir.DotProduct(curr_dir) if prev_dir is not None and curr_dir is not None else 1.0
+        if dot < 0.999:
+            segments.append(current_seg)
+            current_seg = [pipe_dicts[i]]
+        else:
+            current_seg.append(pipe_dicts[i])
+    segments.append(current_seg)
+    return segments
+
+
+def place_segment(pipe_list, fab_btn, distancefromend, spacing, atos, force_end_hanger, doc, create):
+    MARGIN = 0.01
+    placed_count = 0
+
+    def walk(start_idx, start_xyz, distance):
+        idx = start_idx
+        remaining = distance
+        cur_xyz = start_xyz
+        while idx < len(pipe_list):
+            pd = pipe_list[idx]
+            dist_to_exit = cur_xyz.DistanceTo(pd['exit_xyz'])
+            if remaining <= dist_to_exit + MARGIN:
+                direction = pd['exit_xyz'].Subtract(cur_xyz).Normalize()
+                landing = cur_xyz.Add(direction.Multiply(remaining))
+                local = pd['entry_xyz'].DistanceTo(landing)
+                return (idx, landing, local)
+            remaining -= dist_to_exit
+            next_idx = idx + 1
+            if next_idx >= len(pipe_list):
+                return None
+            gap = pd['exit_xyz'].DistanceTo(pipe_list[next_idx]['entry_xyz'])
+            remaining -= gap
+            if remaining < 0:
+                remaining = 0.0
+            cur_xyz = pipe_list[next_idx]['entry_xyz']
+            idx = next_idx
+        return None
+
+    first = pipe_list[0]
+    first_local = first['length'] / 2.0 if first['length'] < 2 * distancefromend else distancefromend
+    unit_dir = first['exit_xyz'].Subtract(first['entry_xyz']).Normalize()
+    cur_hanger_xyz = first['entry_xyz'].Add(unit_dir.Multiply(first_local))
+    cur_pipe_idx = 0
+
+    try:
+        create(doc, fab_btn, first['element'].Id, first['entry_conn'], first_local, atos)
+        placed_count += 1
+    except: pass
+
+    last_pipe = pipe_list[-1]
+    last_exit_xyz = last_pipe['exit_xyz']
+    end_local = last_pipe['length'] / 2.0 if last_pipe['length'] < 2 * distancefromend else last_pipe['length'] - distancefromend
+
+    while True:
+        result = walk(cur_pipe_idx, cur_hanger_xyz, spacing)
+        if result is None:
+            break
+        next_idx, next_xyz, local_offset = result
+        if force_end_hanger:
+            dist_to_end = next_xyz.DistanceTo(last_exit_xyz)
+            if dist_to_end < distancefromend - MARGIN:
+                break
+        pd = pipe_list[next_idx]
+        local_offset = max(MARGIN, min(local_offset, pd['length'] - MARGIN))
+        try:
+            create(doc, fab_btn, pd['element'].Id, pd['entry_conn'], local_offset, atos)
+            placed_count += 1
+        except: pass
+        cur_hanger_xyz = next_xyz
+        cur_pipe_idx = next_idx
+
+    if force_end_hanger:
+        try:
+            create(doc, fab_btn, last_pipe['element'].Id, last_pipe['entry_conn'], end_local, atos)
+            placed_count += 1
+        except: pass
+    return placed_count
+
+
+def place_pipe_hangers(doc, selected_elements, rule_for, service_for, button_for, create, atos=True):
+    """ Main loop of PlacePipeHangers_script.py: joint hangers and chain walks
+    creating each hanger as it is found
+    :return: hangers placed"""
+    placed_count = 0
+    elements_by_service = {}
+    for e in selected_elements:
+        svc_name = service_for(e)
+        if svc_name not in elements_by_service:
+            elements_by_service[svc_name] = []
+        elements_by_service[svc_name].append(e)
+
+    for svc_name, svc_elements in elements_by_service.items():
+        joints_elements = []
+        chain_elements = []
+        for e in svc_elements:
+            hanger_name, _, _, joints = rule_for(e)
+            if is_disabled_hanger(hanger_name):
+                continue
+            if joints:
+                joints_elements.append(e)
+            else:
+                chain_elements.append(e)
+
+        for e in joints_elements:
+            if not is_pipe(e) or vertical_fab(e): continue
+            h_name, sp, dist_from_end, _ = rule_for(e)
+            if is_disabled_hanger(h_name): continue
+            btn = button_for(h_name, service_for(e))
+            if not btn: continue
+
+            pipelen = e.CenterlineLength
+            pipe_connectors = list(e.ConnectorManager.Connectors)
+            if not pipe_connectors: continue
+
+            if pipelen < 2 * dist_from_end:
+                try:
+                    create(doc, btn, e.Id, pipe_connectors[0], pipelen / 2.0, atos)
+                    placed_count += 1
+                except:
+                    pass
+            else:
+                try:
+                    for c in pipe_connectors:
+                        create(doc, btn, e.Id, c, dist_from_end, atos)
+                        placed_count += 1
+                    if pipelen > sp + 2 * dist_from_end:
+                        pos = dist_from_end
+                        for _ in range(int((math.floor(pipelen) - 2 * dist_from_end) / sp)):
+                            pos += sp
+                            create(doc, btn, e.Id, pipe_connectors[0], pos, atos)
+                            placed_count += 1
+                except:
+                    pass
+
+        if not chain_elements:
+            continue
+        for ordered_chain, entry_conns in extract_runs(chain_elements):
+            segments = chain_to_segments(ordered_chain, entry_conns)
+            for i, seg in enumerate(segments):
+                first_pipe = seg[0]['element']
+                hanger_name, spacing, dist_from_end, _ = rule_for(first_pipe)
+                if is_disabled_hanger(hanger_name):
+                    continue
+                fab_btn = button_for(hanger_name, service_for(first_pipe))
+                if not fab_btn:
+                    continue
+                placed_count += place_segment(seg, fab_btn, dist_from_end, spacing, atos, i == len(segments) - 1,
+                                              doc, create)
+    return placed_count
+
+
+def is_disabled_hanger(hanger_name):
+    if not hanger_name: return True
+    h = hanger_name.strip().upper()
+    return h == "" or h == "--- NONE ---" or "NONE" in h
+
+
+def hanger_button(config, svc_name, hanger_name):
+    """ get_hanger_button of PlacePipeHangers_script.py: own service first, then every service """
+    svc_name = svc_name.strip().lower()
+    target_hanger = hanger_name.strip().lower()
+    for svc in config.GetAllLoadedServices():
+        if svc.Name:
+            s_name = svc.Name.strip().lower()
+            if s_name == svc_name or svc_name in s_name or s_name in svc_name:
+                for gi in range(svc.PaletteCount):
+                    for bi in range(svc.GetButtonCount(gi)):
+                        bt = svc.GetButton(gi, bi)
+                        if bt and bt.IsAHanger and bt.Name:
+                            if bt.Name.strip().lower() == target_hanger:
+                                return bt
+    for svc in config.GetAllLoadedServices():
+        for gi in range(svc.PaletteCount):
+            for bi in range(svc.GetButtonCount(gi)):
+                bt = svc.GetButton(gi, bi)
+                if bt and bt.IsAHanger and bt.Name:
+                    if bt.Name.strip().lower() == target_hanger:
+                        return bt
+    return None
+
+
+def parse_hanger_payload(val_string):
+    """ Payload parsing of load_service_settings in PlacePipeHangers_script.py """
+    settings = {}
+    for line in val_string.split("\n"):
+        line = line.strip()
+        if "=" not in line:
+            continue
+        parts = line.split("=", 1)
+        key = parts[0].strip()
+        rule_block = parts[1].strip()
+        rules = []
+        if ":" not in rule_block:
+            vals = rule_block.split("|")
+            if len(vals) == 3:
+                try:
+                    rules.append({"size": 999.0, "hanger": vals[0].strip(), "spacing": float(vals[1].strip()),
+                                  "dist_from_end": 1.0, "joints": vals[2].strip().lower() == "true"})
+                except:
+                    pass
+            elif len(vals) == 4:
+                try:
+                    rules.append({"size": 999.0, "hanger": vals[0].strip(), "spacing": float(vals[1].strip()),
+                                  "dist_from_end": float(vals[2].strip()), "joints": vals[3].strip().lower() == "true"})
+                except:
+                    pass
+        else:
+            for rs in rule_block.split("|"):
+                r_parts = rs.split(":")
+                if len(r_parts) == 4:
+                    try:
+                        rules.append({"size": float(r_parts[0].strip()), "hanger": r_parts[1].strip(),
+                                      "spacing": float(r_parts[2].strip()), "dist_from_end": 1.0,
+                                      "joints": r_parts[3].strip().lower() == "true"})
+                    except:
+                        pass
+                elif len(r_parts) == 5:
+                    try:
+                        rules.append({"size": float(r_parts[0].strip()), "hanger": r_parts[1].strip(),
+                                      "spacing": float(r_parts[2].strip()),
+                                      "dist_from_end": float(r_parts[3].strip()),
+                                      "joints": r_parts[4].strip().lower() == "true"})
+                    except:
+                        pass
+        if rules:
+            rules.sort(key=lambda x: x["size"])
+            settings[key] = rules
+    return settings
+
+
+def hanger_rule(svc_name, size_inches, settings):
+    """ get_rule_for_element of PlacePipeHangers_script.py after the service and size reads """
+    svc_name = svc_name.strip().lower()
+    rules = []
+    for k, v in settings.items():
+        if k.strip().lower() == svc_name:
+            rules = v
+            break
+    if not rules:
+        for k, v in settings.items():
+            k_clean = k.strip().lower()
+            if k_clean in svc_name or svc_name in k_clean:
+                rules = v
+                break
+    if not rules:
+        return "--- NONE ---", 10.0, 1.0, True
+    for rule in rules:
+        if size_inches <= rule["size"]:
+            return (rule["hanger"], rule["spacing"], rule.get("dist_from_end", 1.0), rule["joints"])
+    last_rule = rules[-1]
+    return (last_rule["hanger"], last_rule["spacing"], last_rule.get("dist_from_end", 1.0), last_rule["joints"])
+
+
+# ------------------------------------------------------------------------------------
+# PlaceDuctHangers - run grouping and hanger positions
+# ------------------------------------------------------------------------------------
+def duct_connectors(element):
+    try: return list(element.ConnectorManager.Connectors)
+    except: return []
+
+
+def duct_main_connectors(elem):
+    conns = duct_connectors(elem)
+    if len(conns) <= 2: return conns
+    try:
+        L = elem.CenterlineLength
+    except:
+        L = 0.0
+    if L <= 0:
+        return conns[:2]
+    best_pair = (conns[0], conns[1])
+    min_diff = float('inf')
+    for i in range(len(conns)):
+        for j in range(i+1, len(conns)):
+            d = conns[i].Origin.DistanceTo(conns[j].Origin)
+            diff = abs(d - L)
+            if diff < min_diff:
+                min_diff = diff
+                best_pair = (conns[i], conns[j])
+    return list(best_pair)
+
+
+def duct_group_into_runs(valid_hosts):
+    adj = {e.Id: [] for e in valid_hosts}
+    host_dict = {e.Id: e for e in valid_hosts}
+
+    for idx, e1 in enumerate(valid_hosts):
+        m1 = duct_main_connectors(e1)
+        for e2 in valid_hosts[idx+1:]:
+            m2 = duct_main_connectors(e2)
+            for c1 in m1:
+                for c2 in m2:
+                    if c1.Origin.DistanceTo(c2.Origin) < 0.1:
+                        adj[e1.Id].append((e2.Id, c1, c2))
+                        adj[e2.Id].append((e1.Id, c2, c1))
+                        break
+
+    runs = []
+    unvisited = set(host_dict.keys())
+    while unvisited:
+        start_id = unvisited.pop()
+        comp = [start_id]
+        queue = [start_id]
+        while queue:
+            curr = queue.pop(0)
+            for nxt, _, _ in adj[curr]:
+                if nxt in unvisited:
+                    unvisited.remove(nxt)
+                    queue.append(nxt)
+                    comp.append(nxt)
+
+        sub_adj = {nid: [x for x in adj[nid] if x[0] in comp] for nid in comp}
+        endpoints = [nid for nid in comp if len(sub_adj[nid]) <= 1]
+        start_node = endpoints[0] if endpoints else comp[0]
+
+        ordered = []
+        curr = start_node
+        prev = None
+        m_conns = duct_main_connectors(host_dict[curr])
+        if len(sub_adj[curr]) == 1:
+            shared_c = sub_adj[curr][0][1]
+            entry_conn = m_conns[0] if m_conns[1].Id == shared_c.Id else m_conns[1]
+        else:
+            entry_conn = m_conns[0]
+
+        safety_counter = 0
+        while curr and safety_counter < 1000:
+            safety_counter += 1
+            ordered.append((host_dict[curr], entry_conn))
+            next_step = None
+            for nxt, my_conn, their_conn in sub_adj[curr]:
+                if nxt != prev:
+                    next_step = (nxt, their_conn)
+                    break
+            if next_step:
+                prev = curr
+                curr = next_step[0]
+                entry_conn = next_step[1]
+            else:
+                break
+        runs.append(ordered)
+    return runs
+
+
+def duct_hanger_positions(run, dist_from_end, spacing):
+    """ Span, tap zone and target loops of the PlaceDuctHangers main loop for one run
+    :return: list of (span, local position)"""
+    run_length = 0.0
+    part_spans = []
+    for i in range(len(run)):
+        part, entry_conn = run[i]
+        m_conns = duct_main_connectors(part)
+        exit_conn = m_conns[1] if m_conns[0].Id == entry_conn.Id else m_conns[0]
+        L = entry_conn.Origin.DistanceTo(exit_conn.Origin)
+        if L <= 0: L = 0.1
+        part_spans.append({"part": part, "entry_conn": entry_conn, "exit_conn": exit_conn,
+                           "start": run_length, "end": run_length + L, "L": L})
+        run_length += L
+        if i < len(run) - 1:
+            next_part, next_entry = run[i+1]
+            run_length += exit_conn.Origin.DistanceTo(next_entry.Origin)
+
+    tap_zones = []
+    for span in part_spans:
+        conns = duct_connectors(span["part"])
+        main_ids = {span["entry_conn"].Id, span["exit_conn"].Id}
+        if span["exit_conn"].Origin.IsAlmostEqualTo(span["entry_conn"].Origin): continue
+        direction = span["exit_conn"].Origin.Subtract(span["entry_conn"].Origin).Normalize()
+        for c in conns:
+            if c.Id not in main_ids:
+                v = c.Origin.Subtract(span["entry_conn"].Origin)
+                tap_loc = span["start"] + v.DotProduct(direction)
+                tap_width = 1.0
+                try:
+                    if c.Shape == ConnectorProfileType.Rectangular: tap_width = max(c.Width, c.Height)
+                    elif c.Shape == ConnectorProfileType.Round: tap_width = c.Radius * 2.0
+                except: pass
+                half_w = tap_width / 2.0
+                tap_zones.append((tap_loc - half_w - 0.5, tap_loc + half_w + 0.5))
+
+    targets = []
+    start_target = dist_from_end
+    end_target = run_length - dist_from_end
+    gap_length = end_target - start_target
+    if run_length <= dist_from_end * 2.0 or gap_length < 1.0:
+        targets.append(run_length / 2.0)
+    else:
+        targets.append(start_target)
+        current_pos = start_target + spacing
+        loop_guard = 0
+        while current_pos < end_target - 0.5 and loop_guard < 500:
+            loop_guard += 1
+            for z_start, z_end in tap_zones:
+                if z_start <= current_pos <= z_end:
+                    shifted_pos = z_start - 0.25
+                    if shifted_pos < targets[-1] + 1.0:
+                        shifted_pos = z_end + 0.25
+                    current_pos = shifted_pos
+                    break
+            if current_pos >= end_target - 0.5:
+                break
+            targets.append(current_pos)
+            current_pos += spacing
+        targets.append(end_target)
+
+    positions = []
+    for t_abs in targets:
+        for span in part_spans:
+            if span["start"] - 0.1 <= t_abs <= span["end"] + 0.1:
+                local_pos = t_abs - span["start"]
+                local_pos = max(0.1, min(local_pos, span["L"] - 0.1))
+                positions.append((span, local_pos))
+                break
+    return positions
+
+
+# ------------------------------------------------------------------------------------
+# OverkillFP - bbox center duplicate search
+# ------------------------------------------------------------------------------------
+def overkill_fp(doc, view_id, fuzz_distance):
+    """ :return: ids of the duplicates OverkillFP would delete"""
+    def GetCenterPoint(ele):
+        bBox = doc.GetElement(ele).get_BoundingBox(None)
+        center = (bBox.Max + bBox.Min) / 2
+        return (center.X, center.Y, center.Z)
+
+    def calculate_distance(point1, point2):
+        return math.sqrt((point1[0] - point2[0])**2 +
+                         (point1[1] - point2[1])**2 +
+                         (point1[2] - point2[2])**2)
+
+    AllElements = FilteredElementCollector(doc, view_id).OfClass(FabricationPart) \
+        .WhereElementIsNotElementType() \
+        .ToElements()
+
+    element_ids = []
+    center_points = []
+    for reference in AllElements:
+        center_points.append(GetCenterPoint(reference.Id))
+        element_ids.append(reference.Id)
+
+    duplicate_element_ids = []
+    unique_center_points = []
+    for i, cp in enumerate(center_points):
+        found_duplicate = False
+        for ucp in unique_center_points:
+            if calculate_distance(cp, ucp) <= fuzz_distance:
+                found_duplicate = True
+                break
+        if not found_duplicate:
+            unique_center_points.append(cp)
+        else:
+            duplicate_element_ids.append(element_ids[i])
+    return duplicate_element_ids
+
+
+# ------------------------------------------------------------------------------------
+# SelectFabFilter - per element property reads
+# ------------------------------------------------------------------------------------
+def _as_string(x, name):
+    return x.LookupParameter(name).AsString()
+
+
+def _as_value_string(x, name):
+    return x.LookupParameter(name).AsValueString()
+
+
+def get_property_value(elem, property_name, config):
+    if elem is None or not elem.IsValidObject:
+        return None
+    property_map = {
+        'CID': lambda x: str(x.ItemCustomId) if x.ItemCustomId else None,
+        'ServiceType': lambda x: config.GetServiceTypeName(x.ServiceType) if x.ServiceType else None,
+        'Service Name': lambda x: _as_string(x, 'Fabrication Service Name'),
+        'Service Abbreviation': lambda x: _as_string(x, 'Fabrication Service Abbreviation'),
+        'Size': lambda x: _as_string(x, 'Size of Primary End'),
+        'STRATUS Assembly': lambda x: _as_string(x, 'STRATUS Assembly'),
+        'Line Number': lambda x: _as_string(x, 'FP_Line Number'),
+        'STRATUS Status': lambda x: _as_string(x, 'STRATUS Status'),
+        'Reference Level': lambda x: _as_value_string(x, 'Reference Level'),
+        'Item Number': lambda x: _as_string(x, 'Item Number'),
+        'Bundle Number': lambda x: _as_string(x, 'FP_Bundle'),
+        'REF BS Designation': lambda x: _as_string(x, 'FP_REF BS Designation'),
+        'REF Line Number': lambda x: _as_string(x, 'FP_REF Line Number'),
+        'Comments': lambda x: _as_string(x, 'Comments'),
+        'Specification': lambda x: config.GetSpecificationName(x.Specification) if x.Specification else None,
+        'Hanger Rod Size': lambda x: _as_value_string(x, 'FP_Rod Size'),
+        'Valve Number': lambda x: _as_string(x, 'FP_Valve Number'),
+        'Beam Hanger': lambda x: _as_string(x, 'FP_Beam Hanger'),
+        'Product Entry': lambda x: _as_string(x, 'Product Entry'),
+        'Category': lambda x: x.Category.Name if x.Category else None,
+    }
+    try:
+        return property_map.get(property_name, lambda x: None)(elem)
+    except:
+        return None
+
+
+def property_options(elements, properties, config):
+    options = {}
+    for prop in properties:
+        values = set(filter(None, [get_property_value(elem, prop, config) for elem in elements]))
+        if values:
+            options[prop] = sorted(values)
+    return options
+
+
+def filter_elements(elements, selected_filters, config):
+    filtered_ids = []
+    for elem in elements:
+        if elem is None or not elem.IsValidObject:
+            continue
+        elem_values = {prop: get_property_value(elem, prop, config) for prop in selected_filters}
+        matches = []
+        for prop, filter_list in selected_filters.items():
+            elem_value = elem_values[prop]
+            prop_matches = []
+            for values, is_and in filter_list:
+                prop_matches.append((str(elem_value) in [str(v) for v in values], is_and))
+            and_matches_prop = [m for m, is_and in prop_matches if is_and]
+            or_matches_prop = [m for m, is_and in prop_matches if not is_and]
+            prop_result = (not and_matches_prop or all(and_matches_prop)) and \
+                          (not or_matches_prop or any(or_matches_prop))
+            matches.append(prop_result)
+        if all(matches):
+            filtered_ids.append(elem.Id)
+    return filtered_ids
+
+
+# ------------------------------------------------------------------------------------
+# FabPart_Params - one pass per rule (before the FP_Sync engine)
+# ------------------------------------------------------------------------------------
+def fp_sync(doc, config):
+    def set_parameter_by_name(element, parameterName, value):
+        element.LookupParameter(parameterName).Set(value)
+
+    def get_string(element, parameterName):
+        return element.LookupParameter(parameterName).AsString()
+
+    def get_value_string(element, parameterName):
+        return element.LookupParameter(parameterName).AsValueString()
+
+    def get_double(element, parameterName):
+        return element.LookupParameter(parameterName).AsDouble()
+
+    hanger_collector = FilteredElementCollector(doc).OfCategory(BuiltInCategory.OST_FabricationHangers).WhereElementIsNotElementType().ToElements()
+    pipe_collector = FilteredElementCollector(doc).OfCategory(BuiltInCategory.OST_FabricationPipework).WhereElementIsNotElementType().ToElements()
+    duct_collector = FilteredElementCollector(doc).OfCategory(BuiltInCategory.OST_FabricationDuctwork).WhereElementIsNotElementType().ToElements()
+    AllElements = FilteredElementCollector(doc).OfClass(FabricationPart).WhereElementIsNotElementType().ToElements()
+    flex_duct_collector = FilteredElementCollector(doc).OfCategory(BuiltInCategory.OST_FlexDuctCurves).WhereElementIsNotElementType().ToElements()
+
+    for duct in duct_collector:
+        try:
+            TOPE = 0
+            BOTE = 0
+            for dta in duct.GetDimensions():
+                if dta.Name == 'Top Extension':
+                    TOPE = duct.GetDimensionValue(dta)
+                if dta.Name == 'Bottom Extension':
+                    BOTE = duct.GetDimensionValue(dta)
+            if TOPE and BOTE != 0:
+                set_parameter_by_name(duct, 'FP_Extension Top', TOPE)
+                set_parameter_by_name(duct, 'FP_Extension Bottom', BOTE)
+        except:
+            pass
+
+    for hanger in hanger_collector:
+        if hanger.GetRodInfo().RodCount < 2:
+            hosted_info = hanger.GetHostedInfo().HostId
+            try:
+                HostSize = get_string(doc.GetElement(hosted_info), 'Size').strip('"')
+                HangerSize = get_string(hanger, 'Product Entry')
+                set_parameter_by_name(hanger, 'FP_Product Entry', HangerSize)
+                set_parameter_by_name(hanger, 'Comments', HostSize)
+                set_parameter_by_name(hanger, 'FP_Hanger Host Diameter', HostSize)
+                set_parameter_by_name(hanger, 'FP_Hanger Shield', 'No' if HostSize == HangerSize else 'Yes')
+                for dta in hanger.GetDimensions():
+                    if dta.Name == 'Length A':
+                        RLA = hanger.GetDimensionValue(dta)
+                set_parameter_by_name(hanger, 'FP_Rod Length', RLA)
+                set_parameter_by_name(hanger, 'FP_Rod Length A', RLA)
+            except:
+                pass
+        try:
+            if hanger.GetRodInfo().RodCount > 1:
+                dims = {}
+                for dta in hanger.GetDimensions():
+                    dims[dta.Name] = hanger.GetDimensionValue(dta)
+                set_parameter_by_name(hanger, 'FP_Bearer Length', dims['Width'] + 2 * dims['Bearer Extn'])
+                set_parameter_by_name(hanger, 'FP_Rod Length', dims['Length A'])
+                set_parameter_by_name(hanger, 'FP_Rod Length A', dims['Length A'])
+                set_parameter_by_name(hanger, 'FP_Rod Length B', dims['Length B'])
+        except:
+            pass
+
+    def safely_set_parameter(action, elements):
+        for element in elements:
+            try:
+                action(element)
+            except Exception:
+                pass
+
+    actions = [
+        lambda x: set_parameter_by_name(x, 'FP_Centerline Length', x.CenterlineLength) if x.ItemCustomId == 2041 else None,
+        lambda x: set_parameter_by_name(x, 'FP_CID', x.ItemCustomId),
+        lambda x: set_parameter_by_name(x, 'FP_Service Type', config.GetServiceTypeName(x.ServiceType)),
+        lambda x: set_parameter_by_name(x, 'FP_Service Name', get_string(x, 'Fabrication Service Name')),
+        lambda x: set_parameter_by_name(x, 'FP_Service Abbreviation', get_string(x, 'Fabrication Service Abbreviation')),
+        lambda x: set_parameter_by_name(x, 'FP_Rod Attached', 'Yes') if x.GetRodInfo().IsAttachedToStructure else set_parameter_by_name(x, 'FP_Rod Attached', 'No'),
+        lambda x: [set_parameter_by_name(x, 'FP_Rod Size', n.AncillaryWidthOrDiameter) for n in x.GetPartAncillaryUsage() if n.AncillaryWidthOrDiameter > 0],
+        lambda x: set_parameter_by_name(x, 'FP_Hanger Diameter', get_string(x, 'Product Entry')) if x.LookupParameter('Product Entry') else None,
+        lambda x: set_parameter_by_name(x, 'FP_Product Entry', get_string(x, 'Product Entry')) if x.LookupParameter('Product Entry')
+        else set_parameter_by_name(x, 'FP_Product Entry', get_string(x, 'Size')),
+        lambda x: set_parameter_by_name(x, 'FP_Product Entry', (get_string(x, 'Size') or '') + ' x ' + (get_value_string(x, 'Angle') or ''))
+        if x.Alias and x.Alias.upper() == 'TRM' else set_parameter_by_name(x, 'FP_Product Entry', get_string(x, 'Size')),
+        lambda x: set_parameter_by_name(x, 'FP_Centerline Length', x.CenterlineLength),
+        lambda x: set_parameter_by_name(x, 'FP_Centerline Length', get_double(x, 'Length')),
+        lambda x: set_parameter_by_name(x, 'FP_Product Entry', get_string(x, 'Overall Size')),
+        lambda x: set_parameter_by_name(x, 'FP_Part Material', get_value_string(x, 'Part Material')) if get_value_string(x, 'Part Material') else None,
+    ]
+
+    safely_set_parameter(actions[0], AllElements)
+    safely_set_parameter(actions[1], AllElements)
+    safely_set_parameter(actions[2], AllElements)
+    safely_set_parameter(actions[3], AllElements)
+    safely_set_parameter(actions[4], AllElements)
+    safely_set_parameter(actions[5], hanger_collector)
+    safely_set_parameter(actions[6], hanger_collector)
+    safely_set_parameter(actions[7], hanger_collector)
+    safely_set_parameter(actions[8], AllElements)
+    safely_set_parameter(actions[9], pipe_collector)
+    safely_set_parameter(actions[10], duct_collector)
+    safely_set_parameter(actions[11], flex_duct_collector)
+    safely_set_parameter(actions[12], flex_duct_collector)
+    safely_set_parameter(actions[13], pipe_collector)
+    safely_set_parameter(actions[13], duct_collector)
+
+    try:
+        for x in AllElements:
+            for connector in x.ConnectorManager.Connectors:
+                try:
+                    body_id = connector.GetFabricationConnectorInfo().BodyConnectorId
+                    name = config.GetFabricationConnectorName(body_id)
+                    set_parameter_by_name(x, "FP_Connector C{}".format(connector.Id + 1), name)
+                except:
+                    pass
+    except:
+        pass
+
+
+# ------------------------------------------------------------------------------------
+# Pointload - Pipe Pointload weights and QuickPointloadByMaterial host reads
+# ------------------------------------------------------------------------------------
+def pipe_pointload(pipes, hangers):
+    """ :return: {hanger id: pointload} as Pipe Pointload would write it"""
+    def round_up(n, decimals=0):
+        multiplier = 10 ** decimals
+        return math.ceil(n * multiplier) / multiplier
+
+    Total_Weight = 0.0
+    for pipe in pipes:
+        if pipe.ItemCustomId == 2041:
+            piperad = pipe.LookupParameter('Main Primary Diameter').AsDouble() * 6
+            pipelength = pipe.LookupParameter('Length').AsDouble()
+            Z = ((pipelength * 12) * (piperad * piperad * 3.14159)) / 231 * 8.34
+            pweight_param = pipe.LookupParameter('Weight').AsValueString()
+            pipelb_param = 0.0
+            if pweight_param and isinstance(pweight_param, str) and " lbm" in pweight_param:
+                try:
+                    pipelb_param = float(pweight_param.replace(" lbm", "").strip())
+                except ValueError:
+                    pipelb_param = 0.0
+            Total_Weight += pipelb_param + Z
+        else:
+            fweight_param = pipe.LookupParameter('Weight').AsValueString()
+            if fweight_param and isinstance(fweight_param, str) and " lbm" in fweight_param:
+                Total_Weight += float(fweight_param.replace(" lbm", ""))
+
+    loads = {}
+    if hangers:
+        pointload = (Total_Weight / float(len(hangers))) / 10
+        for whanger in hangers:
+            numofrods = whanger.GetRodInfo().RodCount
+            if numofrods > 0:
+                loads[whanger.Id] = round_up(pointload) / numofrods
+    return loads
+
+
+def host_material_sizes(doc, hangers):
+    """ QuickPointloadByMaterial read pattern: host material and size per hanger
+    :return: {hanger id: (material, size)}"""
+    result = {}
+    for hanger in hangers:
+        hosted_info = hanger.GetHostedInfo().HostId
+        try:
+            Hostmat = doc.GetElement(hosted_info).Parameter[BuiltInParameter.FABRICATION_PART_MATERIAL].AsValueString()
+            HostSize = doc.GetElement(hosted_info).LookupParameter('Size').AsString()
+            result[hanger.Id] = (Hostmat, HostSize)
+        except Exception:
+            pass
+    return result
+
+
+
+# ------------------------------------------------------------------------------------
+# AnchorHangerRod / CropCircle - occupied rod end check
+# ------------------------------------------------------------------------------------
+def is_location_occupied(target_point, existing_locations, tolerance=0.01):
+    for loc in existing_locations.values():
+        distance = target_point.DistanceTo(loc)
+        if distance <= tolerance:
+            return True
+    return False
+
+
+def rod_controls(hangers, existing_locations):
+    """ Rod ends AnchorHangerRod places a control on
+    :return: list of bool per rod end"""
+    ItmList2 = []
+    for e in hangers:
+        rod_info = e.GetRodInfo()
+        for n in range(rod_info.RodCount):
+            ItmList2.append(rod_info.GetRodEndPosition(n))
+    return [not is_location_occupied(loc, existing_locations) for loc in ItmList2]
+
+
+# ------------------------------------------------------------------------------------
+# SleevesUL - floor crossings against level planes
+# ------------------------------------------------------------------------------------
+class PointConverter(object):
+    """ Same transform lookups as the Sleeves script, a collector per instance """
+    def __init__(self, x, y, z, coord_sys, doc):
+        self.doc = doc
+        pt = XYZ(x, y, z)
+        srv_trans = self.doc.ActiveProjectLocation.GetTotalTransform()
+        proj_trans = self._get_project_transform()
+        if coord_sys == 'internal':
+            self.internal = pt
+        elif coord_sys == 'project':
+            self.project = pt
+            self.internal = proj_trans.OfPoint(pt)
+            self.survey = srv_trans.Inverse.OfPoint(self.internal)
+        else:
+            self.survey = pt
+            self.internal = srv_trans.OfPoint(pt)
+
+    def _get_project_transform(self):
+        collector = FilteredElementCollector(self.doc).OfClass(ProjectLocation).WhereElementIsNotElementType()
+        for loc in collector:
+            if loc.Name == "Project":
+                return loc.GetTotalTransform()
+        return Transform.Identity
+
+
+def is_vertical_pipe(pipe):
+    if pipe.ItemCustomId != 2041:
+        return False
+    conns = list(pipe.ConnectorManager.Connectors)
+    if len(conns) < 2:
+        return False
+    direction = (conns[1].Origin - conns[0].Origin).Normalize()
+    return abs(direction.Z) > 0.99
+
+
+def get_level_plane_z_internal(doc, level):
+    try:
+        return PointConverter(0, 0, level.ProjectElevation, 'project', doc).internal.Z
+    except:
+        return level.Elevation
+
+
+def get_pipe_intersections(doc, pipe, levels):
+    if not is_vertical_pipe(pipe):
+        return []
+    bbox = pipe.get_BoundingBox(None)
+    if bbox is None:
+        return []
+    conns = list(pipe.ConnectorManager.Connectors)
+    if len(conns) < 2:
+        return []
+    cx = (conns[0].Origin.X + conns[1].Origin.X) / 2.0
+    cy = (conns[0].Origin.Y + conns[1].Origin.Y) / 2.0
+    intersection_data = []
+    for level in levels:
+        plane_z_internal = get_level_plane_z_internal(doc, level)
+        if bbox.Min.Z < plane_z_internal < bbox.Max.Z:
+            intersection_data.append((XYZ(cx, cy, plane_z_internal), level))
+    return intersection_data
+
+
+def rotate_to_vector(doc, element, origin, from_vec, to_vec):
+    from_vec = from_vec.Normalize()
+    to_vec = to_vec.Normalize()
+    axis = from_vec.CrossProduct(to_vec)
+    if axis.GetLength() < 1e-8:
+        dot = from_vec.DotProduct(to_vec)
+        if dot < 0:
+            axis = XYZ.BasisZ
+            angle = math.pi
+        else:
+            return
+    else:
+        axis = axis.Normalize()
+        angle = math.acos(max(min(from_vec.DotProduct(to_vec), 1.0), -1.0))
+    rot_line = FakeRevit.Line.CreateBound(origin, origin + axis)
+    FakeRevit.ElementTransformUtils.RotateElement(doc, element.Id, rot_line, angle)
+
+
+def align_top_to_point(doc, part, target_point):
+    bbox = part.get_BoundingBox(None)
+    if bbox is None:
+        return
+    FakeRevit.ElementTransformUtils.MoveElement(doc, part.Id, XYZ(0, 0, target_point.Z - bbox.Max.Z))
+
+
+def place_floor_sleeves(doc, crossings, button, condition, set_size):
+    """ The floor mode loop: create, size, move, rotate and align one sleeve at a time
+    :param crossings: list of (host, point, level, pipe direction)
+    :return: sleeves placed"""
+    placed = []
+    for host_part, pt, level, pipe_dir in crossings:
+        try:
+            new_part = FabricationPart.Create(doc, button, condition, level.Id)
+            doc.Regenerate()
+            set_size(new_part, host_part)
+            doc.Regenerate()
+            move_vec = pt - new_part.Origin
+            FakeRevit.ElementTransformUtils.MoveElement(doc, new_part.Id, move_vec)
+            rotate_to_vector(doc, new_part, pt, XYZ.BasisX, pipe_dir.Multiply(-1))
+            doc.Regenerate()
+            align_top_to_point(doc, new_part, pt)
+            placed.append(new_part)
+        except:
+            continue
+    return placed
+
+
+# ------------------------------------------------------------------------------------
+# SleevesWL - one wall sleeve at a time
+# ------------------------------------------------------------------------------------
+def get_end_connector_point(part, direction_vec):
+    conns = list(part.ConnectorManager.Connectors)
+    if len(conns) < 2:
+        return part.Origin
+    best_conn = None
+    best_val = None
+    for c in conns:
+        pt = c.Origin
+        val = pt.X * direction_vec.X + pt.Y * direction_vec.Y + pt.Z * direction_vec.Z
+        if best_conn is None or val < best_val:
+            best_conn = c
+            best_val = val
+    return best_conn.Origin
+
+
+def place_wall_sleeves(doc, items, button, condition, set_size):
+    """ The wall sleeve loop: create, size, rotate and move one sleeve at a time
+    :param items: list of (host, start point, length, flat direction)
+    :return: sleeves placed"""
+    placed = []
+    for host_part, insert_point, wall_length, flat_pipe_dir in items:
+        try:
+            new_part = FabricationPart.Create(doc, button, condition, host_part.LevelId)
+            doc.Regenerate()
+            set_size(new_part, host_part, wall_length)
+            doc.Regenerate()
+            rotate_to_vector(doc, new_part, new_part.Origin, XYZ.BasisX, flat_pipe_dir)
+            doc.Regenerate()
+            end_point = get_end_connector_point(new_part, flat_pipe_dir)
+            FakeRevit.ElementTransformUtils.MoveElement(doc, new_part.Id, insert_point - end_point)
+            doc.Regenerate()
+            placed.append(new_part)
+        except:
+            continue
+    return placed
@@ -0,0 +1,451 @@
+# -*- coding: UTF-8 -*-
+# Synthetic fabrication models on top of Headless.FakeRevit.
+#
+# build_model() lays out connected pipe and duct runs on a stack of levels,
+# vertical risers through the floors, hangers hosted on the straights and
+# optionally duplicated parts, walls and slabs. Layout is driven by a seeded
+# random.Random so the same arguments always produce the same model.
+import math
+import random
+
+from Headless.FakeRevit import (XYZ, Document, Level, Wall, Floor, FamilySymbol, FamilyInstance,
+                                FabricationPart, FabricationService, FabricationServiceButton,
+                                FabricationConfiguration, FabricationRodInfo, FabricationHostedInfo,
+                                LocationPoint, ConnectorProfileType, perpendicular)
+
+CID_PIPE = 2041
+CID_PIPE_ELBOW = 2048
+CID_DUCT = 866
+CID_DUCT_ELBOW = 35
+CID_HANGER = 1001
+CID_SLEEVE = 2875
+
+PIPE_SEGMENT = 10.0     # ft, straight pipe length before cuts
+DUCT_SEGMENT = 5.0      # ft, straight duct length
+ELBOW_OFFSET = 0.5      # ft, elbow connector distance from the corner
+
+# (name, nominal inches) - radius in feet is inches / 24
+PIPE_SIZES = [('1/2"', 0.5), ('3/4"', 0.75), ('1"', 1.0), ('1 1/4"', 1.25), ('1 1/2"', 1.5),
+              ('2"', 2.0), ('2 1/2"', 2.5), ('3"', 3.0), ('4"', 4.0), ('6"', 6.0), ('8"', 8.0)]
+DUCT_SIZES = [(12, 8), (14, 10), (18, 12), (24, 12), (30, 16), (36, 18)]
+TAP_RADII = [0.25, 0.333, 0.5]     # ft, round side taps on duct
+
+PIPE_MATERIALS = ['Pipe Systems: Copper', 'Pipe Systems: Carbon Steel', 'Pipe Systems: Cast Iron',
+                  'Pipe Systems: PVC']
+DUCT_MATERIAL = 'Galvanised Steel'
+
+# (service id, name, abbreviation, kind, service type)
+SERVICES = [
+    (1, 'Domestic Cold Water', 'CW', 'pipe', 1),
+    (2, 'Domestic Hot Water', 'HW', 'pipe', 1),
+    (3, 'Sanitary', 'SAN', 'pipe', 2),
+    (4, 'Fire Protection', 'FP', 'pipe', 3),
+    (5, 'Supply Air', 'SA', 'duct', 4),
+    (6, 'Return Air', 'RA', 'duct', 5),
+    (7, 'Sleeves', 'SLV', 'sleeve', 6),
+]
+SERVICE_TYPES = {1: 'Plumbing', 2: 'Sanitary', 3: 'Fire Protection', 4: 'Supply Air', 5: 'Return Air', 6: 'Sleeves'}
+SPECIFICATIONS = {1: 'Copper Type L', 2: 'Schedule 40', 3: 'Galvanised Duct'}
+CONNECTOR_NAMES = {1: 'Solder', 2: 'Groove', 3: 'Slip Joint', 4: 'TDC'}
+
+FP_STRING_PARAMETERS = [
+    'FP_Service Name', 'FP_Service Abbreviation', 'FP_Service Type', 'FP_Product Entry', 'FP_Part Material',
+    'FP_Rod Attached', 'FP_Rod Size', 'FP_Hanger Diameter', 'FP_Hanger Host Diameter', 'FP_Hanger Shield',
+    'FP_Line Number', 'FP_Bundle', 'FP_REF BS Designation', 'FP_REF Line Number', 'FP_Valve Number',
+    'FP_Beam Hanger', 'FP_Connector C1', 'FP_Connector C2', 'STRATUS Assembly', 'STRATUS Status', 'Comments',
+    'Item Number']
+FP_DOUBLE_PARAMETERS = [
+    'FP_Centerline Length', 'FP_Rod Length', 'FP_Rod Length A', 'FP_Rod Length B', 'FP_Bearer Length',
+    'FP_Extension Top', 'FP_Extension Bottom', 'FP_Pointload']
+
+
+class SyntheticModel(object):
+    def __init__(self, doc):
+        self.doc = doc
+        self.levels = []
+        self.runs = []          # lists of parts in connection order, straights and elbows
+        self.risers = []        # lists of vertical straights
+        self.hangers = []
+        self.duplicates = []    # (original, copy)
+        self.walls = []
+        self.floors = []
+        self.families = []
+        self.gaps = []          # parts left open a gap away from their run
+        self.mismatches = []    # parts connected to a run of another size
+
+    @property
+    def parts(self):
+        return [el for el in self.doc.elements.values() if isinstance(el, FabricationPart)]
+
+    def counts(self):
+        counts = {}
+        for el in self.doc.elements.values():
+            key = el.Category.Name if el.Category else type(el).__name__
+            counts[key] = counts.get(key, 0) + 1
+        return counts
+
+
+def build_configuration(extra_buttons=0):
+    """ :param extra_buttons: filler fittings per service, palette in front of the real buttons"""
+    services = []
+    for service_id, name, abbreviation, kind, service_type in SERVICES:
+        if kind == 'pipe':
+            palettes = [
+                ('Pipe', [FabricationServiceButton('Pipe', CID_PIPE), FabricationServiceButton('90 Elbow', CID_PIPE_ELBOW)]),
+                ('Hangers', [FabricationServiceButton('Clevis Hanger', CID_HANGER, True, 11),
+                             FabricationServiceButton('Band Hanger', CID_HANGER, True, 11),
+                             FabricationServiceButton('Trapeze', CID_HANGER, True, 1)])]
+            specification = 1 if service_type == 1 else 2
+        elif kind == 'duct':
+            palettes = [
+                ('Duct', [FabricationServiceButton('Straight', CID_DUCT), FabricationServiceButton('Radius Bend', CID_DUCT_ELBOW)]),
+                ('Hangers', [FabricationServiceButton('Unistrut Trapeze', CID_HANGER, True, 1),
+                             FabricationServiceButton('Strap Hanger', CID_HANGER, True, 1)])]
+            specification = 3
+        else:
+            palettes = [('Sleeves', [FabricationServiceButton('Round Sleeve', CID_SLEEVE, False, 12),
+                                     FabricationServiceButton('Rectangular Sleeve', CID_SLEEVE, False, 1)])]
+            specification = 0
+        if extra_buttons:
+            fittings = [FabricationServiceButton('Fitting {}'.format(n + 1), 0, False, 1 + n % 3)
+                        for n in range(extra_buttons)]
+            palettes.insert(0, ('Fittings', fittings))
+        services.append(FabricationService(service_id, name, abbreviation, service_type, specification, palettes))
+    return FabricationConfiguration('Synthetic', services, dict(SERVICE_TYPES), dict(SPECIFICATIONS),
+                                    dict(CONNECTOR_NAMES))
+
+
+class _Builder(object):
+    def __init__(self, model, rng):
+        self.model = model
+        self.doc = model.doc
+        self.rng = rng
+        self.config = self.doc.fabrication_configuration
+        self._defaults = {}
+        self._item = 0
+
+    def defaults(self, service, level, kind, size, material, family, cid=0, diameter=0.0):
+        # Parts sharing service, level, size and material share one defaults dict
+        key = (service.ServiceId, level.Id.Value, kind, size, material, family, cid)
+        values = self._defaults.get(key)
+        if values is None:
+            values = dict((name, '') for name in FP_STRING_PARAMETERS)
+            values.update((name, 0.0) for name in FP_DOUBLE_PARAMETERS)
+            values.update({
+                'FP_CID': 0,
+                'Fabrication Service Name': service.Name,
+                'Fabrication Service Abbreviation': service.abbreviation,
+                'Size': size,
+                'Size of Primary End': size,
+                'Product Entry': size,
+                'Part Material': material,
+                'Family': family,
+                'Reference Level': level.Name,
+                'Length': 0.0,
+                'Part Pattern Number': cid,
+                'Main Primary Diameter': diameter,
+                'Weight': '{:.2f} lbm'.format(1.0 + diameter * 40.0),
+            })
+            self._defaults[key] = values
+        return values
+
+    def item_values(self):
+        self._item += 1
+        return {'Item Number': str(self._item)}
+
+    def straight(self, category, cid, service, level, kind, size, material, family, p0, p1, radius=0.0,
+                 width=0.0, height=0.0, shape=None, body_id=1):
+        defaults = self.defaults(service, level, kind, size, material, family, cid, radius * 2.0)
+        part = FabricationPart(category, family, cid, service, defaults, self.item_values(), level.Id, straight=True)
+        self.doc.add(part)
+        direction = (p1 - p0).Normalize()
+        part.add_connector(p0, -direction, radius, width, height, shape, body_id)
+        part.add_connector(p1, direction, radius, width, height, shape, body_id)
+        part._set_value('Length', p0.DistanceTo(p1))
+        return part
+
+    def elbow(self, category, cid, service, level, kind, size, material, family, corner, dir_in, dir_out,
+              radius=0.0, width=0.0, height=0.0, shape=None, body_id=1):
+        defaults = self.defaults(service, level, kind, size, material, family, cid, radius * 2.0)
+        part = FabricationPart(category, family, cid, service, defaults, self.item_values(), level.Id)
+        self.doc.add(part)
+        part.add_connector(corner - dir_in * ELBOW_OFFSET, -dir_in, radius, width, height, shape, body_id)
+        part.add_connector(corner + dir_out * ELBOW_OFFSET, dir_out, radius, width, height, shape, body_id)
+        part.set_dimensions({'Angle': 90.0})
+        return part
+
+    def hanger(self, host, service, level, rod_top, attached=True):
+        conns = host.ConnectorManager.Connectors
+        point = (conns[0].Origin + conns[1].Origin) * 0.5
+        size = host._get_value('Size')
+        defaults = self.defaults(service, level, 'hanger', size, 'Hanger', 'Clevis Hanger', CID_HANGER)
+        hanger = FabricationPart('OST_FabricationHangers', 'Clevis Hanger', CID_HANGER, service, defaults,
+                                 self.item_values(), level.Id)
+        self.doc.add(hanger)
+        hanger._location = LocationPoint(point)
+        rod_end = XYZ(point.X, point.Y, rod_top)
+        hanger._rod_info = FabricationRodInfo(hanger, [rod_end], attached, 0.03125)
+        hanger._rod_info.lengths = [rod_top - point.Z]
+        hanger._hosted_info = FabricationHostedInfo(hanger, host.Id)
+        hanger.set_dimensions({'Length A': rod_top - point.Z, 'Length B': 0.0, 'Width': 0.0, 'Bearer Extn': 0.0})
+        return hanger
+
+
+def _turn(direction, rng):
+    # 90 degree turn in plan, left or right
+    left = XYZ(-direction.Y, direction.X, 0.0)
+    return left if rng.random() < 0.5 else -left
+
+
+def build_model(parts=1000, seed=0, levels=10, level_height=12.0, pipe_share=0.5, duct_share=0.2,
+                hanger_share=0.3, riser_share=0.05, duplicate_share=0.0, branch_share=0.0, tap_share=0.0,
+                extra_buttons=0, walls=0, wall_share=0.0, wall_length=None, floors=True, run_length=(4, 30),
+                elbow_every=8, families=0, slab_tiles=0, gap_share=0.0, gap=(0.005, 0.04), skew_share=0.0,
+                mismatch_share=0.0, title='Synthetic'):
+    """ Builds a synthetic document with about `parts` fabrication parts
+    :param pipe_share, duct_share, hanger_share: split of parts between pipework, ductwork and hangers
+    :param riser_share: share of the pipework placed in vertical risers through the levels
+    :param duplicate_share: share of straights copied in place, for Overkill
+    :param branch_share: share of pipe runs with a branch teed off one of their joints
+    :param tap_share: share of duct straights with a round side tap
+    :param extra_buttons: filler buttons per service in the fabrication configuration
+    :param walls: number of walls across the plan, for wall penetrations
+    :param wall_share: further walls per part, so the wall count follows the model size
+    :param wall_length: (min, max) ft for short walls at random spots instead of walls across the plan
+    :param floors: one slab per level spanning the plan
+    :param slab_tiles: split each level's slab into slab_tiles x slab_tiles slabs, some depressed or thicker
+    :param gap_share: share of the runs whose last straight is pulled off the run, left open a gap away
+    :param gap: (min, max) ft of those gaps
+    :param skew_share: share of those straights turned 90 or 180 degrees about their open end, beside the run's
+            end without facing it
+    :param mismatch_share: share of the other runs whose last straight is a size up, still connected
+    :param families: generic model family instances scattered over the plan
+    :return: SyntheticModel"""
+    rng = random.Random(seed)
+    doc = Document(title, '', build_configuration(extra_buttons))
+    model = SyntheticModel(doc)
+    builder = _Builder(model, rng)
+    config = doc.fabrication_configuration
+    pipe_services = [config.service_by_id(s[0]) for s in SERVICES if s[3] == 'pipe']
+    duct_services = [config.service_by_id(s[0]) for s in SERVICES if s[3] == 'duct']
+
+    for i in range(levels):
+        model.levels.append(doc.add(Level('Level {}'.format(i + 1), i * level_height)))
+
+    # Plan extent grows with the part count so density stays constant
+    extent = max(100.0, math.sqrt(max(parts, 1) / float(levels)) * 20.0)
+
+    def random_point(level, height):
+        return XYZ(rng.uniform(0, extent), rng.uniform(0, extent), level.Elevation + height)
+
+    def random_direction():
+        return rng.choice([XYZ.BasisX, -XYZ.BasisX, XYZ.BasisY, -XYZ.BasisY])
+
+    pipe_budget = int(parts * pipe_share)
+    riser_budget = int(pipe_budget * riser_share)
+    pipe_budget -= riser_budget
+    duct_budget = int(parts * duct_share)
+    straights = []
+
+    # Horizontal pipe runs
+    while pipe_budget > 0:
+        level = rng.choice(model.levels)
+        service = rng.choice(pipe_services)
+        size, inches = rng.choice(PIPE_SIZES)
+        material = rng.choice(PIPE_MATERIALS)
+        radius = inches / 24.0
+        point = random_point(level, level_height * 0.75)
+        direction = random_direction()
+        run = []
+        count = min(pipe_budget, rng.randint(run_length[0], run_length[1]))
+        previous = None
+        for n in range(count):
+            if n and n % elbow_every == 0 and n < count - 1:
+                new_direction = _turn(direction, rng)
+                corner = point + direction * ELBOW_OFFSET
+                part = builder.elbow('OST_FabricationPipework', CID_PIPE_ELBOW, service, level, 'elbow', size,
+                                     material, '90 Elbow', corner, direction, new_direction, radius)
+                direction = new_direction
+                point = corner + direction * ELBOW_OFFSET
+            else:
+                end = point + direction * PIPE_SEGMENT
+                part = builder.straight('OST_FabricationPipework', CID_PIPE, service, level, 'pipe', size,
+                                        material, 'Pipe', point, end, radius)
+                straights.append(part)
+                point = end
+            if previous is not None:
+                previous.ConnectorManager.Connectors[1].ConnectTo(part.ConnectorManager.Connectors[0])
+            previous = part
+            run.append(part)
+        model.runs.append(run)
+        pipe_budget -= count
+
+        # Branch leaving a joint between two straights at right angles
+        joints = [n for n in range(1, len(run)) if run[n].Name == 'Pipe' and run[n - 1].Name == 'Pipe']
+        if joints and pipe_budget > 0 and rng.random() < branch_share:
+            conns = run[rng.choice(joints)].ConnectorManager.Connectors
+            joint = conns[0].Origin
+            branch_dir = _turn((conns[1].Origin - joint).Normalize(), rng)
+            branch = []
+            point = joint
+            for n in range(min(pipe_budget, rng.randint(2, 6))):
+                end = point + branch_dir * PIPE_SEGMENT
+                part = builder.straight('OST_FabricationPipework', CID_PIPE, service, level, 'pipe', size,
+                                        material, 'Pipe', point, end, radius)
+                straights.append(part)
+                if branch:
+                    branch[-1].ConnectorManager.Connectors[1].ConnectTo(part.ConnectorManager.Connectors[0])
+                branch.append(part)
+                point = end
+            model.runs.append(branch)
+            pipe_budget -= len(branch)
+
+    # Vertical risers crossing several levels
+    while riser_budget > 0 and levels > 1:
+        service = rng.choice(pipe_services)
+        size, inches = rng.choice(PIPE_SIZES)
+        material = rng.choice(PIPE_MATERIALS)
+        first = rng.randint(0, levels - 2)
+        count = min(riser_budget, rng.randint(2, levels - first))
+        base = random_point(model.levels[first], 1.0)
+        riser = []
+        previous = None
+        for n in range(count):
+            level = model.levels[min(first + n, levels - 1)]
+            p0 = XYZ(base.X, base.Y, base.Z + n * level_height)
+            p1 = XYZ(base.X, base.Y, base.Z + (n + 1) * level_height)
+            part = builder.straight('OST_FabricationPipework', CID_PIPE, service, level, 'pipe', size,
+                                    material, 'Pipe', p0, p1, inches / 24.0)
+            if previous is not None:
+                previous.ConnectorManager.Connectors[1].ConnectTo(part.ConnectorManager.Connectors[0])
+            previous = part
+            riser.append(part)
+        model.risers.append(riser)
+        riser_budget -= count
+
+    # Rectangular duct runs
+    while duct_budget > 0:
+        level = rng.choice(model.levels)
+        service = rng.choice(duct_services)
+        width_in, height_in = rng.choice(DUCT_SIZES)
+        size = '{}x{}'.format(width_in, height_in)
+        width, height = width_in / 12.0, height_in / 12.0
+        point = random_point(level, level_height * 0.85)
+        direction = random_direction()
+        run = []
+        count = min(duct_budget, rng.randint(run_length[0], run_length[1]))
+        previous = None
+        for n in range(count):
+            if n and n % elbow_every == 0 and n < count - 1:
+                new_direction = _turn(direction, rng)
+                corner = point + direction * ELBOW_OFFSET
+                part = builder.elbow('OST_FabricationDuctwork', CID_DUCT_ELBOW, service, level, 'elbow', size,
+                                     DUCT_MATERIAL, 'Radius Bend', corner, direction, new_direction, 0.0,
+                                     width, height, ConnectorProfileType.Rectangular, 4)
+                direction = new_direction
+                point = corner + direction * ELBOW_OFFSET
+            else:
+                end = point + direction * DUCT_SEGMENT
+                part = builder.straight('OST_FabricationDuctwork', CID_DUCT, service, level, 'duct', size,
+                                        DUCT_MATERIAL, 'Straight', point, end, 0.0, width, height,
+                                        ConnectorProfileType.Rectangular, 4)
+                part.set_dimensions({'Top Extension': 0.0, 'Bottom Extension': 0.0})
+                if tap_share and rng.random() < tap_share:
+                    side = XYZ(-direction.Y, direction.X, 0.0)
+                    at = point + direction * rng.uniform(0.5, DUCT_SEGMENT - 0.5) + side * (width / 2.0)
+                    part.add_connector(at, side, rng.choice(TAP_RADII), 0.0, 0.0, ConnectorProfileType.Round, 4)
+                straights.append(part)
+                point = end
+            if previous is not None:
+                previous.ConnectorManager.Connectors[1].ConnectTo(part.ConnectorManager.Connectors[0])
+            previous = part
+            run.append(part)
+        model.runs.append(run)
+        duct_budget -= count
+
+    # Hangers, spread evenly over the horizontal straights
+    hanger_budget = int(parts * hanger_share)
+    if straights and hanger_budget:
+        step = len(straights) / float(hanger_budget)
+        index = 0.0
+        while hanger_budget > 0:
+            host = straights[int(index) % len(straights)]
+            level = doc.GetElement(host.LevelId)
+            service = config.service_by_id(host.ServiceId)
+            model.hangers.append(builder.hanger(host, service, level, level.Elevation + level_height))
+            index += step
+            hanger_budget -= 1
+
+    # In-place copies for Overkill
+    if duplicate_share and straights:
+        for original in rng.sample(straights, min(len(straights), int(len(straights) * duplicate_share))):
+            conns = original.ConnectorManager.Connectors
+            c0, c1 = conns[0], conns[1]
+            copy = FabricationPart(original.Category.BuiltInCategory, original.Name, original.ItemCustomId,
+                                   config.service_by_id(original.ServiceId), original._defaults,
+                                   dict(original._values or {}), original.LevelId, straight=True)
+            doc.add(copy)
+            copy.add_connector(c0.Origin, c0.direction, c0.Radius, c0.Width, c0.Height, c0.Shape, c0.body_connector_id)
+            copy.add_connector(c1.Origin, c1.direction, c1.Radius, c1.Width, c1.Height, c1.Shape, c1.body_connector_id)
+            model.duplicates.append((original, copy))
+
+    if floors and slab_tiles:
+        tile = extent / slab_tiles
+        for level in model.levels[1:]:
+            for i in range(slab_tiles):
+                for j in range(slab_tiles):
+                    top = level.Elevation - rng.choice([0.0, 0.0, 0.0, 0.25, 0.5])
+                    bottom = top - rng.choice([0.5, 0.75, 1.0])
+                    model.floors.append(doc.add(Floor(XYZ(i * tile, j * tile, bottom),
+                                                      XYZ((i + 1) * tile, (j + 1) * tile, top), level.Id)))
+    elif floors:
+        for level in model.levels[1:]:
+            model.floors.append(doc.add(Floor(XYZ(0, 0, level.Elevation - 1.0), XYZ(extent, extent, level.Elevation),
+                                              level.Id)))
+
+    for n in range(walls + int(parts * wall_share)):
+        level = model.levels[n % levels]
+        if wall_length:
+            p0 = random_point(level, 0.0)
+            p1 = p0 + random_direction() * rng.uniform(*wall_length)
+        elif n % 2:
+            x = rng.uniform(0, extent)
+            p0, p1 = XYZ(x, 0, level.Elevation), XYZ(x, extent, level.Elevation)
+        else:
+            y = rng.uniform(0, extent)
+            p0, p1 = XYZ(0, y, level.Elevation), XYZ(extent, y, level.Elevation)
+        model.walls.append(doc.add(Wall(p0, p1, rng.choice([0.5, 0.667, 1.0]), level_height, level.Id)))
+
+    if families:
+        symbol = doc.add(FamilySymbol('Crop-Circle', 'Crop-Circle'))
+        for n in range(families):
+            level = model.levels[n % levels]
+            point = random_point(level, level_height)
+            model.families.append(doc.add(FamilyInstance(symbol, point, level.Id)))
+
+    # Near-miss open ends, the last straight of a run disconnected and nudged away
+    if gap_share:
+        for run in model.runs:
+            if len(run) < 2 or not run[-1].straight or rng.random() >= gap_share:
+                continue
+            joint = run[-1].ConnectorManager.Connectors[0]
+            for other in joint.AllRefs:
+                joint.DisconnectFrom(other)
+            offset = -joint.direction * rng.uniform(*gap)
+            if rng.random() < 0.5:
+                offset = offset + perpendicular(joint.direction) * rng.uniform(0.0, gap[0])
+            run[-1]._move(offset)
+            if rng.random() < skew_share:
+                run[-1]._rotate(joint.Origin, perpendicular(joint.direction), rng.choice([0.5, 1.0]) * math.pi)
+            model.gaps.append(run[-1])
+
+    if mismatch_share:
+        gapped = set(id(part) for part in model.gaps)
+        for run in model.runs:
+            if len(run) < 2 or not run[-1].straight or id(run[-1]) in gapped or rng.random() >= mismatch_share:
+                continue
+            for connector in run[-1].ConnectorManager.Connectors:
+                connector.Radius += 1.0 / 24.0
+            model.mismatches.append(run[-1])
+
+    return model
@@ -1,5 +1,9 @@
 import os
+import hashlib
+import System
 from Autodesk.Revit.DB import BuiltInCategory, Transaction, TransactionGroup, FilteredElementCollector, ParameterElement, SharedParameterElement
+from Autodesk.Revit.DB.ExtensibleStorage import Schema, SchemaBuilder, Entity, AccessLevel, DataStorage
+from Parameters.SharedParamFile import load_shared_param_file, plan_bindings
 
 doc = __revit__.ActiveUIDocument.Document
 uidoc = __revit__.ActiveUIDocument
@@ -7,74 +11,223 @@ app = doc.Application
 RevitVersion = app.VersionNumber
 RevitINT = float(RevitVersion)
 
-def Shared_Params():
+PARAM_GROUPS = ('FP Parameters', 'STRATUS Parameters', 'MC_General Data')
+
+# Bump when the groups or category set change so stored fingerprints are ignored
+BINDING_VERSION = 1
+
+# Fingerprint of the bound GUID set, stored in the model so a new session can
+# skip the binding pass without opening a transaction
+SCHEMA_GUID = System.Guid("3C1E6F2A-9B47-4E85-A0D3-5F2B8C7E1D94")
+DATA_STORAGE_NAME = "SharedParamBindingData"
+
+# Per-session cache lives on the AppDomain so it survives between button runs
+SESSION_KEY = "WayTools.SharedParams|{}"
+
+
+def shared_param_file_path():
     path, filename = os.path.split(__file__)
-    NewFilename = 'WAY Shared Parameters.txt'
-    fullPath = os.path.join(path, NewFilename)
-
-    # Define categories
-    cat1 = doc.Settings.Categories.get_Item(BuiltInCategory.OST_FabricationPipework)
-    cat2 = doc.Settings.Categories.get_Item(BuiltInCategory.OST_FabricationHangers)
-    cat3 = doc.Settings.Categories.get_Item(BuiltInCategory.OST_FabricationDuctwork)
-    cat4 = doc.Settings.Categories.get_Item(BuiltInCategory.OST_PlumbingFixtures)
-    cat5 = doc.Settings.Categories.get_Item(BuiltInCategory.OST_PipeAccessory)
-    cat6 = doc.Settings.Categories.get_Item(BuiltInCategory.OST_GenericModel)
-    cat7 = doc.Settings.Categories.get_Item(BuiltInCategory.OST_StructuralFraming)
-    cat8 = doc.Settings.Categories.get_Item(BuiltInCategory.OST_PipeFitting)
-    cat9 = doc.Settings.Categories.get_Item(BuiltInCategory.OST_DuctAccessory)
-    cat10 = doc.Settings.Categories.get_Item(BuiltInCategory.OST_FlexDuctCurves)
-    cat11 = doc.Settings.Categories.get_Item(BuiltInCategory.OST_StructuralStiffener)
-
-    STRATUScatSet = app.Create.NewCategorySet()
-    STRATUScatSet.Insert(cat1)
-    STRATUScatSet.Insert(cat2)
-    STRATUScatSet.Insert(cat3)
-    STRATUScatSet.Insert(cat4)
-    STRATUScatSet.Insert(cat5)
-    STRATUScatSet.Insert(cat6)
-    STRATUScatSet.Insert(cat7)
-    STRATUScatSet.Insert(cat8)
-    STRATUScatSet.Insert(cat9)
-    STRATUScatSet.Insert(cat10)
-    STRATUScatSet.Insert(cat11)
+    return os.path.join(path, 'WAY Shared Parameters.txt')
 
-    t = Transaction(doc, 'Add Parameters')
-    t.Start()
 
-    app.SharedParametersFilename = fullPath
-    spFile = app.OpenSharedParameterFile()
+def file_fingerprint(fullPath):
+    """ Content hash of the shared parameter file plus the binding version """
+    with open(fullPath, 'rb') as f:
+        digest = hashlib.md5(f.read()).hexdigest()
+    return '{}:{}'.format(BINDING_VERSION, digest)
+
+
+def get_doc_key(doc):
+    return SESSION_KEY.format(doc.PathName or doc.Title)
+
+
+def get_session_state(doc):
+    """ Returns (file mtime, fingerprint) cached for this document or None """
+    state = System.AppDomain.CurrentDomain.GetData(get_doc_key(doc))
+    if not state:
+        return None
+    mtime, sep, fingerprint = str(state).partition('|')
+    return mtime, fingerprint
+
+
+def set_session_state(doc, mtime, fingerprint):
+    System.AppDomain.CurrentDomain.SetData(get_doc_key(doc), '{}|{}'.format(mtime, fingerprint))
+
+
+def get_or_create_schema():
+    schema = Schema.Lookup(SCHEMA_GUID)
+    if schema is not None:
+        return schema
+
+    builder = SchemaBuilder(SCHEMA_GUID)
+    builder.SetReadAccessLevel(AccessLevel.Public)
+    builder.SetWriteAccessLevel(AccessLevel.Public)
+    builder.SetVendorId("BIMTools")
+    builder.SetSchemaName("SharedParamBindingSchema")
+
+    builder.AddSimpleField("Fingerprint", System.String)
+    builder.AddSimpleField("BoundGuids", System.String)
+    return builder.Finish()
+
+
+def get_binding_storage(doc):
+    for ds in FilteredElementCollector(doc).OfClass(DataStorage):
+        if ds.Name == DATA_STORAGE_NAME:
+            return ds
+    return None
+
+
+def load_model_state(doc):
+    """ Returns (fingerprint, [guid strings]) stored in the model or (None, []) """
+    try:
+        schema = Schema.Lookup(SCHEMA_GUID)
+        if not schema:
+            return None, []
+        ds = get_binding_storage(doc)
+        if not ds:
+            return None, []
+        entity = ds.GetEntity(schema)
+        if not entity.IsValid():
+            return None, []
+        fingerprint = entity.Get[System.String]("Fingerprint")
+        guids = [g for g in (entity.Get[System.String]("BoundGuids") or '').split(',') if g]
+        return fingerprint, guids
+    except:
+        return None, []
+
 
-    # Get existing parameters in the model
+def save_model_state(doc, fingerprint, guids):
+    """ Must be called inside an open transaction """
+    schema = get_or_create_schema()
+    ds = get_binding_storage(doc)
+    if not ds:
+        ds = DataStorage.Create(doc)
+        ds.Name = DATA_STORAGE_NAME
+    entity = Entity(schema)
+    entity.Set("Fingerprint", fingerprint)
+    entity.Set("BoundGuids", ','.join(sorted(guids)))
+    ds.SetEntity(entity)
+
+
+def guids_are_bound(doc, guids):
+    if not guids:
+        return False
+    for g in guids:
+        if SharedParameterElement.Lookup(doc, System.Guid(g)) is None:
+            return False
+    return True
+
+
+def is_binding_current(doc, fullPath):
+    """ Fast path: True when the parameters of this file are already bound.
+    Session hit costs one stat call, a model hit one DataStorage read plus a
+    GUID lookup per parameter. Neither opens a transaction. """
+    mtime = repr(os.path.getmtime(fullPath))
+    state = get_session_state(doc)
+    if state is not None and state[0] == mtime:
+        return True, mtime, state[1]
+
+    fingerprint = file_fingerprint(fullPath)
+    stored, guids = load_model_state(doc)
+    if stored == fingerprint and guids_are_bound(doc, guids):
+        set_session_state(doc, mtime, fingerprint)
+        return True, mtime, fingerprint
+    return False, mtime, fingerprint
+
+
+def Shared_Params():
+    fullPath = shared_param_file_path()
+
+    try:
+        is_current, mtime, fingerprint = is_binding_current(doc, fullPath)
+        if is_current:
+            return
+    except:
+        mtime = fingerprint = None
+
+    # Diff the parsed file against the model; only missing definitions need a transaction
     existing_params = FilteredElementCollector(doc).OfClass(SharedParameterElement).ToElements()
     existing_param_names = {p.Name: str(p.GuidValue) for p in existing_params}
+    plan = plan_bindings(load_shared_param_file(fullPath), PARAM_GROUPS, existing_param_names)
+
+    # GUIDs of every file parameter the model must hold, inserts included
+    required_guids = set(d.guid for d in plan.already_bound)
+    required_guids.update(guid for d, guid in plan.conflicts)
+    required_guids.update(d.guid for d in plan.inserts)
+
+    stored, guids = load_model_state(doc)
+    state_changed = fingerprint and (stored != fingerprint or set(guids) != required_guids)
+    if not plan.inserts and not state_changed:
+        if fingerprint:
+            set_session_state(doc, mtime, fingerprint)
+        return
+
+    t = Transaction(doc, 'Add Parameters')
+    t.Start()
+
+    # An insert that fails leaves the state unsaved, so the next call binds again
+    failed = 0
+
+    if plan.inserts:
+        # Define categories
+        cat1 = doc.Settings.Categories.get_Item(BuiltInCategory.OST_FabricationPipework)
+        cat2 = doc.Settings.Categories.get_Item(BuiltInCategory.OST_FabricationHangers)
+        cat3 = doc.Settings.Categories.get_Item(BuiltInCategory.OST_FabricationDuctwork)
+        cat4 = doc.Settings.Categories.get_Item(BuiltInCategory.OST_PlumbingFixtures)
+        cat5 = doc.Settings.Categories.get_Item(BuiltInCategory.OST_PipeAccessory)
+        cat6 = doc.Settings.Categories.get_Item(BuiltInCategory.OST_GenericModel)
+        cat7 = doc.Settings.Categories.get_Item(BuiltInCategory.OST_StructuralFraming)
+        cat8 = doc.Settings.Categories.get_Item(BuiltInCategory.OST_PipeFitting)
+        cat9 = doc.Settings.Categories.get_Item(BuiltInCategory.OST_DuctAccessory)
+        cat10 = doc.Settings.Categories.get_Item(BuiltInCategory.OST_FlexDuctCurves)
+        cat11 = doc.Settings.Categories.get_Item(BuiltInCategory.OST_StructuralStiffener)
+
+        STRATUScatSet = app.Create.NewCategorySet()
+        STRATUScatSet.Insert(cat1)
+        STRATUScatSet.Insert(cat2)
+        STRATUScatSet.Insert(cat3)
+        STRATUScatSet.Insert(cat4)
+        STRATUScatSet.Insert(cat5)
+        STRATUScatSet.Insert(cat6)
+        STRATUScatSet.Insert(cat7)
+        STRATUScatSet.Insert(cat8)
+        STRATUScatSet.Insert(cat9)
+        STRATUScatSet.Insert(cat10)
+        STRATUScatSet.Insert(cat11)
+
+        if RevitINT > 2024:
+            from Autodesk.Revit.DB import GroupTypeId
+            group_type = GroupTypeId.General
+        else:
+            from Autodesk.Revit.DB import BuiltInParameterGroup
+            group_type = BuiltInParameterGroup.INVALID
+
+        # Revit still has to hand out the ExternalDefinitions for the inserts
+        app.SharedParametersFilename = fullPath
+        spFile = app.OpenSharedParameterFile()
+
+        for definition in plan.inserts:
+            try:
+                eD = spFile.Groups.get_Item(definition.group).Definitions.get_Item(definition.name)
+            except:
+                eD = None
+            if eD is None:
+                failed += 1
+                continue
+            newIB = app.Create.NewInstanceBinding(STRATUScatSet)
+            if not doc.ParameterBindings.Insert(eD, newIB, group_type):
+                failed += 1
+                # print("Could not add parameter '{}' with GUID {}.".format(definition.name, definition.guid))
+
+    # Remember the result so the next call can take the fast path
+    if fingerprint and not failed:
+        try:
+            if state_changed:
+                save_model_state(doc, fingerprint, required_guids)
+        except:
+            pass
+
+    t.Commit()
 
-    def add_parameters(group_name, category_set, group_type):
-        for dG in spFile.Groups:
-            if dG.Name == group_name:
-                definitions = sorted(dG.Definitions, key=lambda x: x.Name)
-                for eD in definitions:
-                    param_name = eD.Name
-                    param_guid = str(eD.GUID)
-                    # Check if parameter already exists
-                    if param_name in existing_param_names:
-                        if existing_param_names[param_name] == param_guid:
-                            # print("Parameter '{}' already exists with matching GUID, skipping.".format(param_name))
-                            continue
-                        else:
-                            continue
-                    newIB = app.Create.NewInstanceBinding(category_set)
-                    doc.ParameterBindings.Insert(eD, newIB, group_type)
-                    # print("Added parameter '{}' with GUID {}.".format(param_name, param_guid))
-
-    if RevitINT > 2024:
-        from Autodesk.Revit.DB import GroupTypeId
-        add_parameters('FP Parameters', STRATUScatSet, GroupTypeId.General)
-        add_parameters('STRATUS Parameters', STRATUScatSet, GroupTypeId.General)
-        add_parameters('MC_General Data', STRATUScatSet, GroupTypeId.General)
-    else:
-        from Autodesk.Revit.DB import BuiltInParameterGroup
-        add_parameters('FP Parameters', STRATUScatSet, BuiltInParameterGroup.INVALID)
-        add_parameters('STRATUS Parameters', STRATUScatSet, BuiltInParameterGroup.INVALID)
-        add_parameters('MC_General Data', STRATUScatSet, BuiltInParameterGroup.INVALID)
-
-    t.Commit()
\ No newline at end of file
+    if fingerprint and not failed:
+        set_session_state(doc, mtime, fingerprint)
@@ -0,0 +1,560 @@
+# -*- coding: UTF-8 -*-
+# Single pass FP_* parameter sync engine.
+#
+# Every element is visited exactly once. For each element the plan for its
+# category is run in three separated phases:
+#   read   - pull every source value the category needs (one GetDimensions,
+#            one LookupParameter per source parameter)
+#   derive - turn the record into an ordered list of (parameter, value) writes
+#   write  - apply the writes, skipping values that already match
+#
+# The engine only duck-types the Revit API so it can be driven by
+# FabPart_Params.py inside Revit or by a stand-in document headless.
+#
+# Incremental mode fingerprints each element's read record together with the
+# current values of the FP_* parameters it writes. When the fingerprint
+# matches the one stored by the previous run the write phase is skipped, so
+# unchanged parts add nothing to the transaction. An Undo of the sync or a
+# hand edit of an FP_* value changes the target values and so the
+# fingerprint, and the element is written again.
+import hashlib
+import os
+
+from Parameters.Get_Set_Params import set_parameter_value, parameter_value, FAILED, DOUBLE_TOLERANCE
+
+CATEGORY_HANGER = 'hanger'
+CATEGORY_PIPE = 'pipe'
+CATEGORY_DUCT = 'duct'
+CATEGORY_PART = 'part'    # FabricationPart in any other category
+CATEGORY_FLEX = 'flex'    # Flex duct curves (not FabricationParts)
+
+FAB_CATEGORIES = (CATEGORY_HANGER, CATEGORY_PIPE, CATEGORY_DUCT, CATEGORY_PART)
+
+# Bump when rules change so stored fingerprints force a full rebuild
+PLAN_VERSION = 2
+
+FINGERPRINT_FOLDER = r"C:\Temp"
+
+# Single rod hangers only use Length A, trapezes the rest too
+ROD_DIMENSIONS = ('Length A',)
+HANGER_DIMENSIONS = ('Length A', 'Length B', 'Width', 'Bearer Extn')
+DUCT_DIMENSIONS = ('Top Extension', 'Bottom Extension')
+
+
+class _Missing(object):
+    def __repr__(self):
+        return 'MISSING'
+
+MISSING = _Missing()
+
+
+def new_stats():
+    return {
+        'passes': 0,
+        'elements': 0,
+        'LookupParameter': 0,
+        'GetDimensions': 0,
+        'GetDimensionValue': 0,
+        'GetElement': 0,
+        'GetServiceTypeName': 0,
+        'GetFabricationConnectorName': 0,
+        'written': 0,
+        'skipped': 0,
+        'failed': 0,
+        'missing': 0,
+        'unchanged': 0,
+    }
+
+
+def _need(rec, key):
+    # Mirrors the old per-lambda try/except: a missing source aborts the rule
+    value = rec.get(key, MISSING)
+    if value is MISSING:
+        raise KeyError(key)
+    return value
+
+
+class SyncContext(object):
+    def __init__(self, config, get_element, stats=None):
+        """ Shared state for one sync run
+        :param config: FabricationConfiguration of the document
+        :param get_element: callable(ElementId) -> Element, usually doc.GetElement"""
+        self.config = config
+        self.get_element = get_element
+        self.stats = stats if stats is not None else new_stats()
+        self._service_types = {}
+        self._connector_names = {}
+        self._host_sizes = {}
+        self._storage = {}
+
+    def lookup(self, element, name):
+        self.stats['LookupParameter'] += 1
+        return element.LookupParameter(name)
+
+    def storages(self, category):
+        """ {parameter name: str of StorageType} of category, filled as parameters are met """
+        storages = self._storage.get(category)
+        if storages is None:
+            storages = self._storage[category] = {}
+        return storages
+
+    def param_string(self, element, name):
+        p = self.lookup(element, name)
+        if not p:
+            return MISSING
+        return p.AsString()
+
+    def param_value_string(self, element, name):
+        p = self.lookup(element, name)
+        if not p:
+            return MISSING
+        return p.AsValueString()
+
+    def param_double(self, element, name):
+        p = self.lookup(element, name)
+        if not p:
+            return MISSING
+        return p.AsDouble()
+
+    def dimensions(self, element, wanted):
+        self.stats['GetDimensions'] += 1
+        values = {}
+        for dta in element.GetDimensions():
+            if dta.Name in wanted and dta.Name not in values:
+                self.stats['GetDimensionValue'] += 1
+                values[dta.Name] = element.GetDimensionValue(dta)
+                if len(values) == len(wanted):
+                    break
+        return values
+
+    def service_type_name(self, service_type):
+        name = self._service_types.get(service_type, MISSING)
+        if name is MISSING:
+            self.stats['GetServiceTypeName'] += 1
+            name = self.config.GetServiceTypeName(service_type)
+            self._service_types[service_type] = name
+        return name
+
+    def connector_name(self, body_connector_id):
+        name = self._connector_names.get(body_connector_id, MISSING)
+        if name is MISSING:
+            self.stats['GetFabricationConnectorName'] += 1
+            name = self.config.GetFabricationConnectorName(body_connector_id)
+            self._connector_names[body_connector_id] = name
+        return name
+
+    def host_size(self, host_id):
+        size = self._host_sizes.get(host_id, MISSING)
+        if size is MISSING:
+            self.stats['GetElement'] += 1
+            host = self.get_element(host_id)
+            try:
+                size = self.param_string(host, 'Size')
+                if size is not MISSING and size is not None:
+                    size = size.strip('"')
+                else:
+                    size = MISSING
+            except:
+                size = MISSING
+            self._host_sizes[host_id] = size
+        return size
+
+
+# ------------------------------------------------------------------------------------
+# READ PHASE
+# ------------------------------------------------------------------------------------
+def _safe(rec, key, getter):
+    try:
+        rec[key] = getter()
+    except:
+        rec[key] = MISSING
+
+
+def _read_strings(ctx, el, rec, names):
+    # param_string over several (record key, parameter name) pairs in one loop
+    ctx.stats['LookupParameter'] += len(names)
+    for key, name in names:
+        try:
+            p = el.LookupParameter(name)
+            rec[key] = p.AsString() if p else MISSING
+        except:
+            rec[key] = MISSING
+
+
+COMMON_STRINGS = (('service_name', 'Fabrication Service Name'),
+                  ('service_abbreviation', 'Fabrication Service Abbreviation'),
+                  ('product_entry', 'Product Entry'))
+
+
+def read_common(ctx, el, rec):
+    try:
+        rec['cid'] = el.ItemCustomId
+    except:
+        rec['cid'] = MISSING
+    _safe(rec, 'service_type', lambda: ctx.service_type_name(el.ServiceType))
+    _read_strings(ctx, el, rec, COMMON_STRINGS)
+    if rec['product_entry'] is MISSING:
+        _safe(rec, 'size', lambda: ctx.param_string(el, 'Size'))
+    if rec['cid'] == 2041:
+        _safe(rec, 'centerline_length', lambda: el.CenterlineLength)
+    connectors = []
+    try:
+        for connector in el.ConnectorManager.Connectors:
+            try:
+                body_id = connector.GetFabricationConnectorInfo().BodyConnectorId
+                connectors.append((connector.Id, ctx.connector_name(body_id)))
+            except:
+                pass
+    except:
+        pass
+    rec['connectors'] = connectors
+
+
+def read_hanger(ctx, el, rec):
+    try:
+        rod_info = el.GetRodInfo()
+        rec['rod_count'] = rod_info.RodCount
+        rec['rod_attached'] = rod_info.IsAttachedToStructure
+    except:
+        rec['rod_count'] = MISSING
+        rec['rod_attached'] = MISSING
+    try:
+        rec['ancillary_widths'] = [n.AncillaryWidthOrDiameter for n in el.GetPartAncillaryUsage()]
+    except:
+        rec['ancillary_widths'] = MISSING
+    rec['dims'] = {}
+    if rec['rod_count'] is not MISSING:
+        try:
+            rec['dims'] = ctx.dimensions(el, ROD_DIMENSIONS if rec['rod_count'] < 2 else HANGER_DIMENSIONS)
+        except:
+            pass
+    rec['host_size'] = MISSING
+    if rec['rod_count'] is not MISSING and rec['rod_count'] < 2:
+        try:
+            rec['host_size'] = ctx.host_size(el.GetHostedInfo().HostId)
+        except:
+            pass
+
+
+def read_pipe(ctx, el, rec):
+    if 'size' not in rec:
+        _read_strings(ctx, el, rec, (('size', 'Size'),))
+    try:
+        rec['alias'] = el.Alias
+    except:
+        rec['alias'] = MISSING
+    if rec['alias'] is not MISSING and rec['alias'] and rec['alias'].upper() == 'TRM':
+        _safe(rec, 'angle', lambda: ctx.param_value_string(el, 'Angle'))
+    _safe(rec, 'part_material', lambda: ctx.param_value_string(el, 'Part Material'))
+
+
+def read_duct(ctx, el, rec):
+    try:
+        rec['dims'] = ctx.dimensions(el, DUCT_DIMENSIONS)
+    except:
+        rec['dims'] = MISSING
+    if 'centerline_length' not in rec:
+        _safe(rec, 'centerline_length', lambda: el.CenterlineLength)
+    _safe(rec, 'part_material', lambda: ctx.param_value_string(el, 'Part Material'))
+
+
+def read_flex(ctx, el, rec):
+    _safe(rec, 'length', lambda: ctx.param_double(el, 'Length'))
+    _safe(rec, 'overall_size', lambda: ctx.param_string(el, 'Overall Size'))
+
+
+# ------------------------------------------------------------------------------------
+# DERIVE PHASE
+# Rules append (parameter, value) pairs in the same order the old pass-per-rule
+# sync applied them, so later rules still override earlier ones.
+# ------------------------------------------------------------------------------------
+def derive_duct_extensions(rec, out):
+    dims = _need(rec, 'dims')
+    top = dims.get('Top Extension', 0)
+    bottom = dims.get('Bottom Extension', 0)
+    if top and bottom != 0:
+        out.append(('FP_Extension Top', top))
+        out.append(('FP_Extension Bottom', bottom))
+
+
+def derive_hanger_rods(rec, out):
+    rod_count = _need(rec, 'rod_count')
+    dims = rec.get('dims') or {}
+    if rod_count < 2:
+        host_size = _need(rec, 'host_size')
+        hanger_size = _need(rec, 'product_entry')
+        out.append(('FP_Product Entry', hanger_size))
+        out.append(('Comments', host_size))
+        out.append(('FP_Hanger Host Diameter', host_size))
+        out.append(('FP_Hanger Shield', 'No' if host_size == hanger_size else 'Yes'))
+        rla = dims['Length A']
+        out.append(('FP_Rod Length', rla))
+        out.append(('FP_Rod Length A', rla))
+    else:
+        bearer_length = dims['Width'] + dims['Bearer Extn'] + dims['Bearer Extn']
+        out.append(('FP_Bearer Length', bearer_length))
+        out.append(('FP_Rod Length', dims['Length A']))
+        out.append(('FP_Rod Length A', dims['Length A']))
+        out.append(('FP_Rod Length B', dims['Length B']))
+
+
+def derive_pipe_centerline(rec, out):
+    if _need(rec, 'cid') == 2041:
+        out.append(('FP_Centerline Length', _need(rec, 'centerline_length')))
+
+
+def derive_cid(rec, out):
+    out.append(('FP_CID', _need(rec, 'cid')))
+
+
+def derive_service_type(rec, out):
+    out.append(('FP_Service Type', _need(rec, 'service_type')))
+
+
+def derive_service_name(rec, out):
+    out.append(('FP_Service Name', _need(rec, 'service_name')))
+
+
+def derive_service_abbreviation(rec, out):
+    out.append(('FP_Service Abbreviation', _need(rec, 'service_abbreviation')))
+
+
+def derive_rod_attached(rec, out):
+    out.append(('FP_Rod Attached', 'Yes' if _need(rec, 'rod_attached') else 'No'))
+
+
+def derive_rod_size(rec, out):
+    for width in _need(rec, 'ancillary_widths'):
+        if width > 0:
+            out.append(('FP_Rod Size', width))
+
+
+def derive_hanger_diameter(rec, out):
+    if rec.get('product_entry', MISSING) is not MISSING:
+        out.append(('FP_Hanger Diameter', rec['product_entry']))
+
+
+def derive_product_entry(rec, out):
+    if rec.get('product_entry', MISSING) is not MISSING:
+        out.append(('FP_Product Entry', rec['product_entry']))
+    else:
+        out.append(('FP_Product Entry', _need(rec, 'size')))
+
+
+def derive_pipe_product_entry(rec, out):
+    alias = _need(rec, 'alias')
+    if alias and alias.upper() == 'TRM':
+        size = _need(rec, 'size')
+        angle = _need(rec, 'angle')
+        out.append(('FP_Product Entry', (size or '') + ' x ' + (angle or '')))
+    else:
+        out.append(('FP_Product Entry', _need(rec, 'size')))
+
+
+def derive_duct_centerline(rec, out):
+    out.append(('FP_Centerline Length', _need(rec, 'centerline_length')))
+
+
+def derive_part_material(rec, out):
+    material = _need(rec, 'part_material')
+    if material:
+        out.append(('FP_Part Material', material))
+
+
+def derive_flex_centerline(rec, out):
+    out.append(('FP_Centerline Length', _need(rec, 'length')))
+
+
+def derive_flex_product_entry(rec, out):
+    out.append(('FP_Product Entry', _need(rec, 'overall_size')))
+
+
+def derive_connectors(rec, out):
+    for connector_id, name in rec.get('connectors') or []:
+        out.append(('FP_Connector C{}'.format(connector_id + 1), name))
+
+
+_COMMON_RULES = (derive_pipe_centerline, derive_cid, derive_service_type,
+                 derive_service_name, derive_service_abbreviation)
+
+
+def build_plan():
+    """ Returns {category: (readers, rules)} built once per run """
+    return {
+        CATEGORY_HANGER: (
+            (read_common, read_hanger),
+            (derive_hanger_rods,) + _COMMON_RULES + (
+                derive_rod_attached, derive_rod_size, derive_hanger_diameter,
+                derive_product_entry, derive_connectors)),
+        CATEGORY_PIPE: (
+            (read_common, read_pipe),
+            _COMMON_RULES + (
+                derive_product_entry, derive_pipe_product_entry,
+                derive_part_material, derive_connectors)),
+        CATEGORY_DUCT: (
+            (read_common, read_duct),
+            (derive_duct_extensions,) + _COMMON_RULES + (
+                derive_product_entry, derive_duct_centerline,
+                derive_part_material, derive_connectors)),
+        CATEGORY_PART: (
+            (read_common,),
+            _COMMON_RULES + (derive_product_entry, derive_connectors)),
+        CATEGORY_FLEX: (
+            (read_flex,),
+            (derive_flex_centerline, derive_flex_product_entry)),
+    }
+
+
+def read_element(ctx, el, readers):
+    rec = {}
+    for reader in readers:
+        reader(ctx, el, rec)
+    return rec
+
+
+def derive_writes(rec, rules):
+    """ Runs the rules in order and collapses to the last value per parameter """
+    out = []
+    for rule in rules:
+        try:
+            rule(rec, out)
+        except:
+            pass
+    last = dict(out)
+    if len(last) == len(out):
+        return out
+    return [(name, last.pop(name)) for name, value in out if name in last]
+
+
+def target_params(ctx, el, writes, category=None):
+    """ (name, value, parameter, storage) of every write, parameter None when el lacks it """
+    ctx.stats['LookupParameter'] += len(writes)
+    storages = ctx.storages(category)
+    targets = []
+    for name, value in writes:
+        try:
+            p = el.LookupParameter(name)
+        except:
+            p = None
+        if not p:
+            targets.append((name, value, None, None))
+            continue
+        storage = storages.get(name)
+        if storage is None:
+            storage = storages[name] = str(p.StorageType)
+        targets.append((name, value, p, storage))
+    return targets
+
+
+def target_values(targets):
+    """ (name, current value) of the targets, MISSING for absent parameters """
+    return [(name, parameter_value(p, storage) if p is not None else MISSING) for name, value, p, storage in targets]
+
+
+def write_element(ctx, el, writes, targets=None, category=None):
+    """ Compare-before-write of the derived values. Returns False when a target
+    parameter is missing or a Set failed, so the element is retried next run
+    :param targets: target_params of writes when already looked up"""
+    if targets is None:
+        targets = target_params(ctx, el, writes, category)
+    stats = ctx.stats
+    ok = True
+    for name, value, p, storage in targets:
+        if p is None:
+            stats['missing'] += 1
+            ok = False
+            continue
+        result = set_parameter_value(p, value, None, DOUBLE_TOLERANCE, storage)
+        stats[result] += 1
+        if result == FAILED:
+            ok = False
+    return ok
+
+
+# ------------------------------------------------------------------------------------
+# INCREMENTAL STATE
+# ------------------------------------------------------------------------------------
+def _canonical(value):
+    if isinstance(value, dict):
+        return '{' + ','.join('{}:{}'.format(k, _canonical(value[k])) for k in sorted(value)) + '}'
+    if isinstance(value, (list, tuple)):
+        return '[' + ','.join(_canonical(v) for v in value) + ']'
+    return repr(value)
+
+
+def fingerprint(category, rec, targets=()):
+    """ Compact hash of every source value the rules read for an element
+    :param targets: (name, current value) of the parameters written, see target_values"""
+    text = category + _canonical(rec) + _canonical(targets)
+    return hashlib.md5(text.encode('utf-8')).hexdigest()[:16]
+
+
+def fingerprint_path(model_name, folder=None):
+    return os.path.join(folder or FINGERPRINT_FOLDER,
+                        'Ribbon_FPSync_{}.txt'.format(model_name.replace(' ', '_')))
+
+
+def load_fingerprints(path):
+    """ Returns {element id: fingerprint} or an empty dict when the file is
+    missing, unreadable or was written by a different PLAN_VERSION """
+    fingerprints = {}
+    if not os.path.exists(path):
+        return fingerprints
+    try:
+        with open(path, 'r') as f:
+            if f.readline().strip() != 'version={}'.format(PLAN_VERSION):
+                return fingerprints
+            for line in f:
+                key, sep, value = line.strip().partition(':')
+                if sep:
+                    fingerprints[int(key)] = value
+    except:
+        return {}
+    return fingerprints
+
+
+def save_fingerprints(path, fingerprints):
+    folder = os.path.dirname(path)
+    if folder and not os.path.exists(folder):
+        os.makedirs(folder)
+    with open(path, 'w') as f:
+        f.write('version={}\n'.format(PLAN_VERSION))
+        for key in sorted(fingerprints):
+            f.write('{}:{}\n'.format(key, fingerprints[key]))
+
+
+def sync_elements(items, config, get_element, plan=None, stats=None,
+                  previous=None, element_key=None):
+    """ Syncs FP_* parameters on every element in a single pass
+    :param items: iterable of (category, element) pairs, each element once
+    :param config: FabricationConfiguration used for service type / connector names
+    :param get_element: callable used to resolve hanger hosts
+    :param previous: {key: fingerprint} from the last run, enables incremental mode
+    :param element_key: callable(element) -> int key, required with previous
+    :return: (stats, fingerprints) - fingerprints holds every element written or unchanged"""
+    if plan is None:
+        plan = build_plan()
+    ctx = SyncContext(config, get_element, stats)
+    ctx.stats['passes'] += 1
+    fingerprints = {}
+    for category, el in items:
+        steps = plan.get(category)
+        if steps is None:
+            continue
+        readers, rules = steps
+        ctx.stats['elements'] += 1
+        rec = read_element(ctx, el, readers)
+        writes = derive_writes(rec, rules)
+        if element_key is None:
+            write_element(ctx, el, writes, category=category)
+            continue
+        key = element_key(el)
+        targets = target_params(ctx, el, writes, category)
+        if previous is not None and previous.get(key) == fingerprint(category, rec, target_values(targets)):
+            fingerprints[key] = previous[key]
+            ctx.stats['unchanged'] += 1
+            continue
+        # Fingerprinted after the writes, on the values the next run will read
+        if write_element(ctx, el, writes, targets):
+            fingerprints[key] = fingerprint(category, rec, target_values(targets))
+    return ctx.stats, fingerprints
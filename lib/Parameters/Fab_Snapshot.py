@@ -0,0 +1,363 @@
+# -*- coding: UTF-8 -*-
+# Columnar snapshot of the element properties most tools filter and report on.
+#
+# Every element is read once. Values land in array backed columns addressed
+# by row, and rows are found through an element id index. String columns are
+# dictionary encoded: each distinct string is stored once and rows only hold
+# its integer code, so a 100k element view with a dozen services costs a
+# dozen strings plus one int per row.
+#
+# Readers only duck-type the Revit API so the snapshot can be built inside
+# Revit or headless from a stand-in document.
+from array import array
+
+from Parameters.Get_Set_Params import get_id_value
+
+STRING = 'string'
+INT = 'int'
+DOUBLE = 'double'
+
+INT_NULL = -2147483648
+NAN = float('nan')
+
+
+class StringColumn(object):
+    kind = STRING
+
+    def __init__(self):
+        self.values = [None]     # code -> string, code 0 is None
+        self.codes = {}          # string -> code
+        self.data = array('i')
+
+    def append_null(self):
+        self.data.append(0)
+
+    def encode(self, value):
+        if value is None:
+            return 0
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.codes[value] = code
+            self.values.append(value)
+        return code
+
+    def set(self, row, value):
+        self.data[row] = self.encode(value)
+
+    def get(self, row):
+        return self.values[self.data[row]]
+
+    def rows_in(self, values, rows=None):
+        """ Rows whose value, as a string, is one of values """
+        wanted = set(str(v) for v in values)
+        codes = set(code for code, v in enumerate(self.values) if v is not None and str(v) in wanted)
+        data = self.data
+        if rows is None:
+            rows = range(len(data))
+        return set(r for r in rows if data[r] in codes)
+
+    def distinct(self, rows=None):
+        data = self.data
+        if rows is None:
+            used = set(data)
+        else:
+            used = set(data[r] for r in rows)
+        return set(self.values[c] for c in used if c)
+
+
+class _NumberColumn(object):
+    typecode = None
+    null = None
+
+    def __init__(self):
+        self.data = array(self.typecode)
+
+    def append_null(self):
+        self.data.append(self.null)
+
+    def is_null(self, value):
+        return value == self.null
+
+    def set(self, row, value):
+        self.data[row] = self.null if value is None else value
+
+    def get(self, row):
+        value = self.data[row]
+        return None if self.is_null(value) else value
+
+    def rows_in(self, values, rows=None):
+        wanted = set(str(v) for v in values)
+        data = self.data
+        if rows is None:
+            rows = range(len(data))
+        return set(r for r in rows if not self.is_null(data[r]) and str(data[r]) in wanted)
+
+    def distinct(self, rows=None):
+        data = self.data
+        if rows is None:
+            rows = range(len(data))
+        return set(data[r] for r in rows if not self.is_null(data[r]))
+
+
+class IntColumn(_NumberColumn):
+    kind = INT
+    typecode = 'i'
+    null = INT_NULL
+
+
+class DoubleColumn(_NumberColumn):
+    kind = DOUBLE
+    typecode = 'd'
+    null = NAN
+
+    def is_null(self, value):
+        return value != value
+
+
+COLUMN_TYPES = {STRING: StringColumn, INT: IntColumn, DOUBLE: DoubleColumn}
+
+
+class Field(object):
+    def __init__(self, name, kind, read):
+        """ One snapshot column
+        :param read: callable(element, SnapshotContext) -> value or None"""
+        self.name = name
+        self.kind = kind
+        self.read = read
+
+
+class SnapshotContext(object):
+    def __init__(self, doc=None, config=None):
+        """ Lookups shared by all readers, cached per run
+        :param config: FabricationConfiguration, needed for ServiceType and Specification"""
+        self.doc = doc
+        self.config = config
+        self.calls = 0
+        self._level_names = {}
+        self._service_types = {}
+        self._specifications = {}
+
+    def lookup(self, element, name):
+        self.calls += 1
+        return element.LookupParameter(name)
+
+    def level_name(self, level_id):
+        key = get_id_value(level_id)
+        if key not in self._level_names:
+            level = self.doc.GetElement(level_id) if self.doc is not None else None
+            self._level_names[key] = level.Name if level is not None else None
+        return self._level_names[key]
+
+    def service_type_name(self, service_type):
+        if service_type not in self._service_types:
+            self._service_types[service_type] = self.config.GetServiceTypeName(service_type)
+        return self._service_types[service_type]
+
+    def specification_name(self, specification):
+        if specification not in self._specifications:
+            self._specifications[specification] = self.config.GetSpecificationName(specification)
+        return self._specifications[specification]
+
+
+def param_string(name):
+    def read(el, ctx):
+        return ctx.lookup(el, name).AsString()
+    return read
+
+
+def param_value_string(name):
+    def read(el, ctx):
+        return ctx.lookup(el, name).AsValueString()
+    return read
+
+
+def param_double(name):
+    def read(el, ctx):
+        param = ctx.lookup(el, name)
+        return param.AsDouble() if param.HasValue else None
+    return read
+
+
+def read_cid(el, ctx):
+    return str(el.ItemCustomId) if el.ItemCustomId else None
+
+
+def read_service_type(el, ctx):
+    return ctx.service_type_name(el.ServiceType) if el.ServiceType else None
+
+
+def read_specification(el, ctx):
+    return ctx.specification_name(el.Specification) if el.Specification else None
+
+
+def read_level(el, ctx):
+    return ctx.level_name(el.LevelId)
+
+
+def read_family(el, ctx):
+    return ctx.lookup(el, 'Family').AsValueString()
+
+
+def read_category(el, ctx):
+    return el.Category.Name if el.Category else None
+
+
+FIELDS = dict((f.name, f) for f in [
+    Field('CID', STRING, read_cid),
+    Field('ServiceType', STRING, read_service_type),
+    Field('Specification', STRING, read_specification),
+    Field('Service Name', STRING, param_string('Fabrication Service Name')),
+    Field('Service Abbreviation', STRING, param_string('Fabrication Service Abbreviation')),
+    Field('Size', STRING, param_string('Size of Primary End')),
+    Field('Material', STRING, param_value_string('Part Material')),
+    Field('Level', STRING, read_level),
+    Field('Reference Level', STRING, param_value_string('Reference Level')),
+    Field('Product Entry', STRING, param_string('Product Entry')),
+    Field('Item Number', STRING, param_string('Item Number')),
+    Field('STRATUS Assembly', STRING, param_string('STRATUS Assembly')),
+    Field('STRATUS Status', STRING, param_string('STRATUS Status')),
+    Field('Line Number', STRING, param_string('FP_Line Number')),
+    Field('Bundle Number', STRING, param_string('FP_Bundle')),
+    Field('REF BS Designation', STRING, param_string('FP_REF BS Designation')),
+    Field('REF Line Number', STRING, param_string('FP_REF Line Number')),
+    Field('Hanger Rod Size', STRING, param_value_string('FP_Rod Size')),
+    Field('Valve Number', STRING, param_string('FP_Valve Number')),
+    Field('Beam Hanger', STRING, param_string('FP_Beam Hanger')),
+    Field('Pointload', DOUBLE, param_double('FP_Pointload')),
+    Field('Name', STRING, read_family),
+    Field('Comments', STRING, param_string('Comments')),
+    Field('Category', STRING, read_category),
+])
+
+
+def get_fields(names):
+    """ Resolves names (or Field objects) against FIELDS """
+    return [n if isinstance(n, Field) else FIELDS[n] for n in names]
+
+
+class FabSnapshot(object):
+    def __init__(self):
+        self.ids = []        # row -> element id value
+        self.index = {}      # element id value -> row
+        self.columns = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def column(self, field):
+        column = self.columns.get(field.name)
+        if column is None:
+            column = COLUMN_TYPES[field.kind]()
+            for _ in self.ids:
+                column.append_null()
+            self.columns[field.name] = column
+        return column
+
+    def row_for(self, key):
+        row = self.index.get(key)
+        if row is None:
+            row = len(self.ids)
+            self.index[key] = row
+            self.ids.append(key)
+            for column in self.columns.values():
+                column.append_null()
+        return row
+
+    def get(self, key, name, default=None):
+        row = self.index.get(key)
+        column = self.columns.get(name)
+        if row is None or column is None:
+            return default
+        value = column.get(row)
+        return default if value is None else value
+
+    def record(self, key):
+        row = self.index.get(key)
+        if row is None:
+            return None
+        return dict((name, column.get(row)) for name, column in self.columns.items())
+
+    def rows_for(self, keys):
+        index = self.index
+        return set(index[k] for k in keys if k in index)
+
+    def distinct(self, name, rows=None):
+        """ Non-empty values of a column, optionally limited to rows """
+        column = self.columns.get(name)
+        if column is None:
+            return set()
+        return set(v for v in column.distinct(rows) if v)
+
+    def rows_in(self, name, values, rows=None):
+        column = self.columns.get(name)
+        if column is None:
+            return set()
+        return column.rows_in(values, rows)
+
+    def match(self, filters, rows=None):
+        """ Rows passing every property filter
+        :param filters: {name: [(values, is_and), ...]} - AND entries must all
+            match, at least one OR entry must match
+        :return: set of rows"""
+        result = set(range(len(self.ids))) if rows is None else set(rows)
+        for name, filter_list in filters.items():
+            and_rows = None
+            or_rows = None
+            for values, is_and in filter_list:
+                hit = self.rows_in(name, values, result)
+                if is_and:
+                    and_rows = hit if and_rows is None else and_rows & hit
+                else:
+                    or_rows = hit if or_rows is None else or_rows | hit
+            if and_rows is not None:
+                result &= and_rows
+            if or_rows is not None:
+                result &= or_rows
+        return result
+
+    def group_sum(self, group_names, value_name, rows=None):
+        """ Totals value_name grouped by the values of group_names
+        :return: {(group value, ...): total}"""
+        groups = [self.columns[n] for n in group_names]
+        values = self.columns[value_name]
+        if rows is None:
+            rows = range(len(self.ids))
+        totals = {}
+        for row in rows:
+            value = values.get(row)
+            if value is None:
+                continue
+            key = tuple(c.get(row) for c in groups)
+            totals[key] = totals.get(key, 0.0) + value
+        return totals
+
+
+def build_snapshot(elements, fields, ctx=None, snapshot=None, get_key=None):
+    """ Reads fields of every element once into a FabSnapshot
+    A reader that raises stores None, like the per-property try/except it replaces.
+    :param fields: Field objects or FIELDS names
+    :param snapshot: existing snapshot to extend, rows are matched by element id
+    :return: FabSnapshot"""
+    if ctx is None:
+        ctx = SnapshotContext()
+    if snapshot is None:
+        snapshot = FabSnapshot()
+    if get_key is None:
+        get_key = lambda el: get_id_value(el.Id)
+    fields = get_fields(fields)
+    columns = [(f.read, snapshot.column(f)) for f in fields]
+    for el in elements:
+        if el is None:
+            continue
+        row = snapshot.row_for(get_key(el))
+        for read, column in columns:
+            try:
+                value = read(el, ctx)
+            except:
+                value = None
+            column.set(row, value)
+    return snapshot
@@ -1,5 +1,3 @@
-import Autodesk
-
 #FUNCTION TO GET PARAMETER VALUE  change "AsDouble()" to "AsString()" to change data type.
 def set_parameter_by_name(element, parameterName, value):
     element.LookupParameter(parameterName).Set(value)
@@ -14,4 +12,121 @@ def get_parameter_value_by_name_AsDouble(element, parameterName):
     return element.LookupParameter(parameterName).AsDouble()
 
 def get_parameter_value_by_name_AsValueString(element, parameterName):
-    return element.LookupParameter(parameterName).AsValueString()
\ No newline at end of file
+    return element.LookupParameter(parameterName).AsValueString()
+
+
+#ELEMENT ID VALUE
+#ElementId.Value replaces IntegerValue from Revit 2024 on; older versions only have IntegerValue.
+def get_id_value(eid):
+    try:
+        return eid.Value
+    except AttributeError:
+        return eid.IntegerValue
+
+
+#COMPARE BEFORE WRITE
+#Skips Set() when the parameter already holds the value, so unchanged values
+#never reach the transaction. Counts are returned per call and accumulated in
+#WRITE_COUNTS for the whole run.
+WRITTEN = 'written'
+SKIPPED = 'skipped'
+FAILED = 'failed'
+
+DOUBLE_TOLERANCE = 1e-9
+
+WRITE_COUNTS = {WRITTEN: 0, SKIPPED: 0, FAILED: 0}
+
+def new_write_counts():
+    return {WRITTEN: 0, SKIPPED: 0, FAILED: 0}
+
+def reset_write_counts():
+    for key in WRITE_COUNTS:
+        WRITE_COUNTS[key] = 0
+
+def get_write_counts():
+    return dict(WRITE_COUNTS)
+
+def parameter_value_equals(param, value, tolerance=DOUBLE_TOLERANCE, storage=None):
+    """ Type aware comparison of a parameter's current value against value
+    :param storage: str of param.StorageType when the caller already knows it"""
+    storage = storage or str(param.StorageType)
+    try:
+        if storage == 'Double':
+            return abs(param.AsDouble() - float(value)) <= tolerance
+        if storage == 'Integer':
+            return param.AsInteger() == int(value)
+        if storage == 'String':
+            return (param.AsString() or '') == (value or '')
+        if storage == 'ElementId':
+            return param.AsElementId() == value
+    except:
+        pass
+    return False
+
+def parameter_value(param, storage=None):
+    """ Current value of param read by its storage type, None when it cannot be read """
+    storage = storage or str(param.StorageType)
+    try:
+        if storage == 'Double':
+            return param.AsDouble()
+        if storage == 'Integer':
+            return param.AsInteger()
+        if storage == 'String':
+            return param.AsString() or ''
+        if storage == 'ElementId':
+            return str(param.AsElementId())
+    except:
+        pass
+    return None
+
+def set_parameter_value(param, value, counts=None, tolerance=DOUBLE_TOLERANCE, storage=None):
+    """ Sets param to value unless it already matches
+    :param storage: str of param.StorageType when the caller already knows it
+    :return: WRITTEN, SKIPPED or FAILED"""
+    if not param:
+        result = FAILED
+    elif parameter_value_equals(param, value, tolerance, storage):
+        result = SKIPPED
+    elif param.IsReadOnly:
+        result = FAILED
+    else:
+        try:
+            result = WRITTEN if param.Set(value) is not False else FAILED
+        except:
+            result = FAILED
+    WRITE_COUNTS[result] += 1
+    if counts is not None:
+        counts[result] += 1
+    return result
+
+def set_parameter_if_changed(element, parameterName, value, counts=None, tolerance=DOUBLE_TOLERANCE):
+    try:
+        param = element.LookupParameter(parameterName)
+    except:
+        param = None
+    return set_parameter_value(param, value, counts, tolerance)
+
+def set_parameters(element, values, counts=None, tolerance=DOUBLE_TOLERANCE):
+    """ Batch compare-before-write for one element
+    :param values: dict or iterable of (parameter name, value) pairs
+    :return: counts dict for this element (written, skipped, failed)"""
+    if counts is None:
+        counts = new_write_counts()
+    if isinstance(values, dict):
+        values = values.items()
+    for parameterName, value in values:
+        set_parameter_if_changed(element, parameterName, value, counts, tolerance)
+    return counts
+
+def write_failure(counts, parameterName):
+    """ Message for the failed writes in counts, empty when none failed """
+    if not counts[FAILED]:
+        return ''
+    return "Could not set '{}' on {} element(s). The parameter is missing or read-only.".format(
+        parameterName, counts[FAILED])
+
+def check_write_counts(counts, parameterName):
+    """ Raises when a write in counts failed, as set_parameter_by_name does """
+    message = write_failure(counts, parameterName)
+    if message:
+        raise Exception(message)
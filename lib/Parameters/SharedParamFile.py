@@ -0,0 +1,138 @@
+# -*- coding: UTF-8 -*-
+# Pure Python reader for Revit shared parameter files and a planner that works
+# out which definitions still need binding. Nothing here touches the Revit API,
+# so both can run headless against the checked-in .txt files.
+import io
+import os
+from collections import namedtuple
+
+SharedParamDef = namedtuple('SharedParamDef', [
+    'guid', 'name', 'datatype', 'datacategory', 'group', 'group_id',
+    'visible', 'description', 'user_modifiable', 'hide_when_no_value'])
+
+# Parsed files keyed by path -> (mtime, SharedParamFile)
+_CACHE = {}
+
+
+class SharedParamFile(object):
+    def __init__(self, path, groups, definitions, meta=None):
+        """ Parsed shared parameter file
+        :param groups: {group id: group name}
+        :param definitions: list of SharedParamDef in file order"""
+        self.path = path
+        self.groups = groups
+        self.definitions = definitions
+        self.meta = meta or {}
+        self.by_guid = dict((d.guid, d) for d in definitions)
+        self.by_name = dict((d.name, d) for d in definitions)
+
+    def in_groups(self, group_names):
+        group_names = set(group_names)
+        return [d for d in self.definitions if d.group in group_names]
+
+
+def _read_text(path):
+    with open(path, 'rb') as f:
+        raw = f.read()
+    if raw[:2] in (b'\xff\xfe', b'\xfe\xff'):
+        return raw.decode('utf-16')
+    if raw[:3] == b'\xef\xbb\xbf':
+        return raw[3:].decode('utf-8')
+    try:
+        return raw.decode('utf-8')
+    except UnicodeDecodeError:
+        return raw.decode('utf-16')
+
+
+def _flag(value):
+    return value.strip() == '1'
+
+
+def parse_text(text, path=None):
+    """ Parses shared parameter file text. Column order comes from the *META,
+    *GROUP and *PARAM header rows, so reordered files still read correctly. """
+    headers = {}
+    meta = {}
+    groups = {}
+    rows = []
+    for line in io.StringIO(text):
+        line = line.rstrip('\r\n')
+        if not line or line.startswith('#'):
+            continue
+        cells = line.split('\t')
+        kind = cells[0]
+        if kind.startswith('*'):
+            headers[kind[1:]] = cells[1:]
+            continue
+        columns = headers.get(kind)
+        if columns is None:
+            continue
+        record = dict(zip(columns, cells[1:]))
+        if kind == 'META':
+            meta = record
+        elif kind == 'GROUP':
+            groups[record.get('ID', '').strip()] = record.get('NAME', '')
+        elif kind == 'PARAM':
+            rows.append(record)
+
+    definitions = []
+    for record in rows:
+        group_id = record.get('GROUP', '').strip()
+        definitions.append(SharedParamDef(
+            guid=record.get('GUID', '').strip().lower(),
+            name=record.get('NAME', ''),
+            datatype=record.get('DATATYPE', ''),
+            datacategory=record.get('DATACATEGORY', ''),
+            group=groups.get(group_id, ''),
+            group_id=group_id,
+            visible=_flag(record.get('VISIBLE', '1')),
+            description=record.get('DESCRIPTION', ''),
+            user_modifiable=_flag(record.get('USERMODIFIABLE', '1')),
+            hide_when_no_value=_flag(record.get('HIDEWHENNOVALUE', '0'))))
+    return SharedParamFile(path, groups, definitions, meta)
+
+
+def load_shared_param_file(path):
+    """ Parses path once and returns the cached result until its mtime changes """
+    mtime = os.path.getmtime(path)
+    cached = _CACHE.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    parsed = parse_text(_read_text(path), path)
+    _CACHE[path] = (mtime, parsed)
+    return parsed
+
+
+class BindingPlan(object):
+    def __init__(self):
+        self.inserts = []          # SharedParamDef still to bind
+        self.already_bound = []    # SharedParamDef present with the same GUID
+        self.conflicts = []        # (SharedParamDef, existing guid) same name, other GUID
+
+    @property
+    def is_current(self):
+        return not self.inserts
+
+
+def plan_bindings(sp_file, group_names, existing):
+    """ Diffs the file definitions of group_names against the document
+    :param existing: {parameter name: guid string} of shared parameters in the model
+    :return: BindingPlan - only inserts need a transaction"""
+    existing = dict((name, str(guid).lower()) for name, guid in existing.items())
+    plan = BindingPlan()
+    seen = set()
+    definitions = []
+    for group_name in group_names:
+        definitions.extend(sorted(sp_file.in_groups([group_name]), key=lambda d: d.name))
+    for definition in definitions:
+        if definition.name in seen:
+            continue
+        seen.add(definition.name)
+        current = existing.get(definition.name)
+        if current is None:
+            plan.inserts.append(definition)
+        elif current == definition.guid:
+            plan.already_bound.append(definition)
+        else:
+            plan.conflicts.append((definition, current))
+    return plan
@@ -0,0 +1,299 @@
+# -*- coding: UTF-8 -*-
+# Near-duplicate search for the Overkill tools.
+#
+# Elements are keyed on a signature (what the element is) and the center of
+# their bounding box. Kept centers are hashed per signature into cubic cells
+# one tolerance wide, so a center is compared with the kept centers of its
+# own and the 26 neighbouring cells instead of every element kept so far.
+# Like the original scans, the first element of a cluster in collector
+# order is kept and every later one within tolerance is a duplicate.
+#
+# scan_model matches fabrication parts on their connector endpoints instead
+# of the bounding box center: same signature and every endpoint within
+# tolerance of one on the kept part. It runs one category at a time and
+# keeps only element id values, coordinates and the duplicate clusters, so
+# memory follows the largest category, not the model. The clusters can be
+# written out as a report before anything is deleted.
+#
+# Only duck-types the Revit API until fabrication_collectors and
+# delete_elements.
+import math
+
+from Diagnostics.Reports import write_csv
+from Parameters.Get_Set_Params import get_id_value
+
+try:
+    long
+except NameError:
+    long = int      # CPython 3
+
+MIN_TOLERANCE = 1e-6     # ft, scan_model treats a zero fuzz as this
+
+FABRICATION_CATEGORIES = ('OST_FabricationPipework', 'OST_FabricationDuctwork', 'OST_FabricationHangers',
+                          'OST_FabricationContainment')
+
+
+def bbox_center(element, view=None):
+    bbox = element.get_BoundingBox(view)
+    if bbox is None:
+        return None
+    return ((bbox.Max.X + bbox.Min.X) / 2.0, (bbox.Max.Y + bbox.Min.Y) / 2.0, (bbox.Max.Z + bbox.Min.Z) / 2.0)
+
+
+def part_signature(part):
+    """ CID, size and type of a FabricationPart """
+    try:
+        size = part.LookupParameter('Size').AsString()
+    except:
+        size = None
+    return (part.ItemCustomId, size, get_id_value(part.GetTypeId()))
+
+
+def part_endpoints(part):
+    """ Connector origins, or the part origin for parts without connectors (hangers) """
+    try:
+        points = [(c.Origin.X, c.Origin.Y, c.Origin.Z) for c in part.ConnectorManager.Connectors]
+    except:
+        points = []
+    if points:
+        return points
+    try:
+        origin = part.Origin
+        return [(origin.X, origin.Y, origin.Z)]
+    except:
+        center = bbox_center(part)
+        return [center] if center else []
+
+
+def endpoints_match(points, others, tolerance):
+    """ True when every point has its own point of others within tolerance """
+    if len(points) != len(others):
+        return False
+    limit = tolerance * tolerance
+    free = list(others)
+    for x, y, z in points:
+        for i, (ox, oy, oz) in enumerate(free):
+            if (ox - x) ** 2 + (oy - y) ** 2 + (oz - z) ** 2 <= limit:
+                del free[i]
+                break
+        else:
+            return False
+    return True
+
+
+def family_signature(element):
+    """ Category and family type """
+    try:
+        category = get_id_value(element.Category.Id)
+    except:
+        category = None
+    return (category, get_id_value(element.GetTypeId()))
+
+
+class DuplicateIndex(object):
+    def __init__(self, tolerance):
+        """ :param tolerance: largest center distance of a duplicate, 0 for identical centers"""
+        self.tolerance = tolerance
+        self.cells = {}     # (signature, cell) -> [(center, element, keep order)]
+        self.kept = 0
+
+    def cell(self, point):
+        t = self.tolerance
+        if t <= 0:
+            return point
+        return (int(math.floor(point[0] / t)), int(math.floor(point[1] / t)), int(math.floor(point[2] / t)))
+
+    def match(self, signature, point):
+        """ Earliest kept element of signature within tolerance of point, or None """
+        if self.tolerance <= 0:
+            found = self.cells.get((signature, point))
+            return found[0][1] if found else None
+        limit = self.tolerance * self.tolerance
+        x, y, z = point
+        cx, cy, cz = self.cell(point)
+        best = None
+        for i in (cx - 1, cx, cx + 1):
+            for j in (cy - 1, cy, cy + 1):
+                for k in (cz - 1, cz, cz + 1):
+                    for kept_point, element, order in self.cells.get((signature, (i, j, k)), ()):
+                        dx = kept_point[0] - x
+                        dy = kept_point[1] - y
+                        dz = kept_point[2] - z
+                        if dx * dx + dy * dy + dz * dz <= limit and (best is None or order < best[1]):
+                            best = (element, order)
+        return best[0] if best else None
+
+    def add(self, signature, point, element):
+        self.cells.setdefault((signature, self.cell(point)), []).append((point, element, self.kept))
+        self.kept += 1
+
+    def check(self, signature, point, element):
+        """ The kept element that element duplicates, or None after keeping element """
+        kept = self.match(signature, point)
+        if kept is None:
+            self.add(signature, point, element)
+        return kept
+
+
+def find_duplicates(elements, tolerance, signature, center=bbox_center):
+    """ Elements within tolerance of an earlier element with the same signature
+    :param signature: callable(element) -> hashable, None to compare centers only
+    :param center: callable(element) -> (x, y, z) or None to skip the element
+    :return: list of (duplicate, kept element) in collector order"""
+    index = DuplicateIndex(tolerance)
+    duplicates = []
+    for element in elements:
+        point = center(element)
+        if point is None:
+            continue
+        kept = index.check(signature(element) if signature else None, point, element)
+        if kept is not None:
+            duplicates.append((element, kept))
+    return duplicates
+
+
+class EndpointIndex(DuplicateIndex):
+    """ Kept parts hashed on the centroid of their endpoints. Every endpoint
+    within tolerance puts the centroids within tolerance too, so the
+    neighbouring cells hold every candidate. """
+
+    def match(self, signature, points):
+        center = centroid(points)
+        limit = self.tolerance * self.tolerance
+        cx, cy, cz = self.cell(center)
+        best = None
+        for i in (cx - 1, cx, cx + 1):
+            for j in (cy - 1, cy, cy + 1):
+                for k in (cz - 1, cz, cz + 1):
+                    for kept_center, (kept_points, key), order in self.cells.get((signature, (i, j, k)), ()):
+                        if best is not None and order > best[1]:
+                            continue
+                        d = (kept_center[0] - center[0]) ** 2 + (kept_center[1] - center[1]) ** 2 + \
+                            (kept_center[2] - center[2]) ** 2
+                        if d <= limit and endpoints_match(points, kept_points, self.tolerance):
+                            best = (key, order)
+        return best[0] if best else None
+
+    def check(self, signature, points, key):
+        """ Key of the kept part that points duplicate, or None after keeping them """
+        kept = self.match(signature, points)
+        if kept is None:
+            self.add(signature, centroid(points), (points, key))
+        return kept
+
+
+def centroid(points):
+    n = float(len(points))
+    return (sum(p[0] for p in points) / n, sum(p[1] for p in points) / n, sum(p[2] for p in points) / n)
+
+
+class Cluster(object):
+    __slots__ = ('category', 'kept', 'duplicates')
+
+    def __init__(self, category, kept):
+        self.category = category
+        self.kept = kept            # element id value
+        self.duplicates = []        # element id values, collector order
+
+
+def scan_model(collectors, tolerance, signature=part_signature, endpoints=part_endpoints, scanned=None):
+    """ Duplicate clusters, one category at a time
+    :param collectors: list of (category name, iterable of parts), each iterated once
+    :param scanned: optional dict, filled with the parts read per category
+    :return: list of Cluster"""
+    tolerance = max(tolerance, MIN_TOLERANCE)
+    clusters = []
+    for category, elements in collectors:
+        index = EndpointIndex(tolerance)
+        by_kept = {}
+        count = 0
+        for element in elements:
+            count += 1
+            points = endpoints(element)
+            if not points:
+                continue
+            key = get_id_value(element.Id)
+            kept = index.check(signature(element), points, key)
+            if kept is None:
+                continue
+            cluster = by_kept.get(kept)
+            if cluster is None:
+                cluster = by_kept[kept] = Cluster(category, kept)
+                clusters.append(cluster)
+            cluster.duplicates.append(key)
+        index = None
+        if scanned is not None:
+            scanned[category] = scanned.get(category, 0) + count
+    return clusters
+
+
+def duplicate_ids(clusters):
+    return [key for cluster in clusters for key in cluster.duplicates]
+
+
+def fabrication_collectors(doc, view_id=None, categories=FABRICATION_CATEGORIES):
+    """ (category name, collector) per fabrication category for scan_model, not yet iterated """
+    from Autodesk.Revit.DB import FilteredElementCollector, BuiltInCategory
+    collectors = []
+    for name in categories:
+        bic = getattr(BuiltInCategory, name, None)
+        if bic is None:
+            continue
+        collector = FilteredElementCollector(doc, view_id) if view_id is not None else FilteredElementCollector(doc)
+        collectors.append((name[4:], collector.OfCategory(bic).WhereElementIsNotElementType()))
+    return collectors
+
+
+REPORT_COLUMNS = ['Cluster', 'Role', 'Element Id', 'Category', 'Service', 'Level', 'Kept Id']
+
+
+def report_rows(clusters, describe):
+    """ :param describe: callable(id value) -> (service, level)"""
+    rows = [REPORT_COLUMNS]
+    for n, cluster in enumerate(clusters, 1):
+        for role, key in [('Kept', cluster.kept)] + [('Duplicate', key) for key in cluster.duplicates]:
+            service, level = describe(key)
+            rows.append([n, role, key, cluster.category, service, level, cluster.kept])
+    return rows
+
+
+def write_report(path, clusters, describe):
+    return write_csv(path, report_rows(clusters, describe))
+
+
+def as_element_id(eid):
+    if not isinstance(eid, (int, long)):
+        return eid
+    try:
+        from Autodesk.Revit.DB import ElementId
+    except ImportError:
+        return eid
+    return ElementId(eid)
+
+
+def id_collection(element_ids):
+    try:
+        from System.Collections.Generic import List
+        from Autodesk.Revit.DB import ElementId
+    except ImportError:
+        return list(element_ids)        # headless
+    return List[ElementId](element_ids)
+
+
+def delete_elements(doc, element_ids):
+    """ Deletes element_ids (ElementIds or id values) with one Delete call, one by one when the batch is refused
+    :return: number of ids deleted, dependents included"""
+    element_ids = [as_element_id(eid) for eid in element_ids]
+    if not element_ids:
+        return 0
+    try:
+        return len(doc.Delete(id_collection(element_ids)))
+    except:
+        pass
+    deleted = 0
+    for eid in element_ids:
+        try:
+            deleted += len(doc.Delete(eid))
+        except:
+            pass
+    return deleted
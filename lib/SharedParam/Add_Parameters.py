@@ -1,6 +1,7 @@
 import System
-from Autodesk.Revit.DB import BuiltInCategory, Transaction, BuiltInParameterGroup, TransactionGroup
+from Autodesk.Revit.DB import BuiltInCategory, Transaction, BuiltInParameterGroup, TransactionGroup, FilteredElementCollector, SharedParameterElement
 import os
+from Parameters.SharedParamFile import load_shared_param_file, plan_bindings
 
 doc = __revit__.ActiveUIDocument.Document
 uidoc = __revit__.ActiveUIDocument
@@ -10,6 +11,15 @@ def Shared_Params():
     path, filename = os.path.split(__file__)
     NewFilename = '\MC Shared Parameters.txt'
 
+    # Only definitions missing from the model need binding; skip Revit entirely when none are
+    existing_params = FilteredElementCollector(doc).OfClass(SharedParameterElement).ToElements()
+    existing_param_names = {p.Name: str(p.GuidValue) for p in existing_params}
+    spDefs = load_shared_param_file(os.path.join(path, NewFilename.strip('\\')))
+    plan = plan_bindings(spDefs, ['FP Parameters'], existing_param_names)
+    if not plan.inserts:
+        return
+    missing_names = set(d.name for d in plan.inserts)
+
     sel = uidoc.Selection
     cat1 = doc.Settings.Categories.get_Item(BuiltInCategory.OST_FabricationPipework)
     cat2 = doc.Settings.Categories.get_Item(BuiltInCategory.OST_FabricationHangers)
@@ -50,6 +60,8 @@ def Shared_Params():
             t = Transaction(doc, 'FP Parameters')
             t.Start()					
             for eD in d:
+                if eD.Name not in missing_names:
+                    continue
                 if eD.Name == 'FP_Service Name' or 'FP_Valve Number' or 'FP_Line Number' or 'FP_Bundle':
                     newIB = app.Create.NewInstanceBinding(STRATUScatSet)
                     doc.ParameterBindings.Insert(eD,newIB,BuiltInParameterGroup.INVALID)   #BuiltInParameterGroup.INVALID for other   BuiltInParameterGroup.PG_IDENTITY_DATA for Identity Data